@@ -0,0 +1,146 @@
+"""
+Speed and peak memory of the DOCX and ODT loaders.
+
+Generates a large DOCX and a large ODT file (paragraphs with a table every
+100 paragraphs) and loads each one with the streaming loaders of
+document_loader.py and with the python-docx / odfpy document models they
+replaced. Every load runs in a fresh interpreter, so its peak resident memory
+(VmHWM, so Linux only) is measured on its own; growth is the peak minus the
+peak after imports.
+
+Usage:
+    python benchmarks/document_loaders.py --paragraphs 50000
+    python benchmarks/document_loaders.py --paragraphs 200000 --formats docx
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+
+# Each loader returns the extracted text; python-docx and odfpy are read the
+# way document_loader.py read them before streaming
+LOADERS = {
+    "docx": {
+        "streaming": "from document_loader import load_docx as load",
+        "python-docx": (
+            "from docx import Document\n"
+            "def load(path):\n"
+            "    return '\\n'.join(p.text for p in Document(path).paragraphs)"
+        ),
+    },
+    "odt": {
+        "streaming": "from document_loader import load_odt as load",
+        "odfpy": (
+            "from odf import teletype, text\n"
+            "from odf.opendocument import load as load_document\n"
+            "def load(path):\n"
+            "    document = load_document(path)\n"
+            "    return '\\n'.join(teletype.extractText(p) for p in document.getElementsByType(text.P))"
+        ),
+    },
+}
+
+# Peak resident memory in KB. VmHWM belongs to the new address space, whereas
+# ru_maxrss keeps the parent's peak across fork and exec.
+MEASURE = """
+import json, sys, time
+{setup}
+def peak_kb():
+    with open("/proc/self/status") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmHWM"))
+before = peak_kb()
+start = time.perf_counter()
+content = load(sys.argv[1])
+seconds = time.perf_counter() - start
+peak = peak_kb()
+print(json.dumps({{"seconds": seconds, "peak": peak, "growth": peak - before, "chars": len(content)}}))
+"""
+
+
+def paragraph_text(rng):
+    words = ("budget", "travel", "policy", "contract", "review", "approval", "invoice", "team")
+    return " ".join(rng.choice(words) for _ in range(rng.randint(10, 60)))
+
+
+def make_docx(path, paragraphs, seed=0):
+    """Write a DOCX file of the given number of paragraphs"""
+    import docx
+
+    rng = random.Random(seed)
+    document = docx.Document()
+    for index in range(paragraphs):
+        document.add_paragraph(paragraph_text(rng))
+        if index % 100 == 99:
+            table = document.add_table(rows=4, cols=3)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = str(rng.randint(0, 10000))
+    document.save(path)
+
+
+def make_odt(path, paragraphs, seed=0):
+    """Write an ODT file of the given number of paragraphs"""
+    from odf import table, text
+    from odf.opendocument import OpenDocumentText
+
+    rng = random.Random(seed)
+    document = OpenDocumentText()
+    for index in range(paragraphs):
+        document.text.addElement(text.P(text=paragraph_text(rng)))
+        if index % 100 == 99:
+            grid = table.Table()
+            grid.addElement(table.TableColumn(numbercolumnsrepeated=3))
+            for _ in range(4):
+                row = table.TableRow()
+                for _ in range(3):
+                    cell = table.TableCell()
+                    cell.addElement(text.P(text=str(rng.randint(0, 10000))))
+                    row.addElement(cell)
+                grid.addElement(row)
+            document.text.addElement(grid)
+    document.save(path)
+
+
+def measure(setup, path):
+    """Load a file in a fresh interpreter and return its measurements"""
+    env = {**os.environ, "PYTHONPATH": os.path.abspath(SRC)}
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE.format(setup=setup), path],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--paragraphs", type=int, default=50000)
+    parser.add_argument("--formats", default="docx,odt")
+    args = parser.parse_args()
+
+    makers = {"docx": make_docx, "odt": make_odt}
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'file':<6} {'loader':<12} {'seconds':>8} {'peak MB':>8} {'growth MB':>10} {'chars':>12}")
+        for extension in args.formats.split(","):
+            path = os.path.join(directory, f"large.{extension}")
+            makers[extension](path, args.paragraphs)
+            size = os.path.getsize(path) / 1e6
+            print(f"{extension} ({size:.1f} MB zipped, {args.paragraphs} paragraphs)")
+            for name, setup in LOADERS[extension].items():
+                result = measure(setup, path)
+                print(
+                    f"{'':<6} {name:<12} {result['seconds']:>8.2f} {result['peak'] / 1024:>8.1f} "
+                    f"{result['growth'] / 1024:>10.1f} {result['chars']:>12}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Embedding throughput of local model settings.
+
+Embeds the same chunks with Chroma's default embedder and with
+LocalEmbeddingFunction for every combination of batch size, thread count and
+model file, and reports chunks per second. Each setting's vectors are compared
+with the first setting of the same model, so settings that should not change
+the vectors (batch size, threads, padding) are checked too.
+
+Chunks are synthetic 250-character texts unless --folder is given, in which
+case the folder's documents are loaded and chunked as when indexing.
+
+Usage:
+    python benchmarks/embedding_throughput.py --chunks 2000
+    python benchmarks/embedding_throughput.py --batch-sizes 16,32,64,128 --threads 1,2,4
+    python benchmarks/embedding_throughput.py --models ~/models/minilm,~/models/minilm/model_quint8.onnx
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from embeddings import LocalEmbeddingFunction
+from vector_store import CHUNK_SIZE
+
+
+def _list(text, cast=str):
+    return [cast(value) for value in text.split(",") if value]
+
+
+def synthetic_chunks(count, seed=0):
+    """Chunks of CHUNK_SIZE characters of English-like words."""
+    rng = random.Random(seed)
+    words = (
+        "the report budget travel policy contract employee quarterly revenue "
+        "meeting project deadline invoice customer approval review summary "
+        "department office expense schedule update requirement"
+    ).split()
+    chunks = []
+    for _ in range(count):
+        text = ""
+        while len(text) < CHUNK_SIZE - 12:
+            text += rng.choice(words) + " "
+        chunks.append(text.strip())
+    return chunks
+
+
+def folder_chunks(folder, count):
+    """Chunks of the documents in a folder, as indexing produces them."""
+    from document_loader import LOADERS
+    from scan_folders import scan_folders
+    from vector_store import chunk_text
+
+    chunks = []
+    for file in scan_folders(folder):
+        loader = LOADERS.get(os.path.splitext(file)[1])
+        if loader is None:
+            continue
+        text = loader(file)
+        chunks.extend(chunk.page_content for chunk in chunk_text(text or "", file))
+        if len(chunks) >= count:
+            break
+    return chunks[:count]
+
+
+def measure(embed, chunks, repeats):
+    """Best time of a few runs, after one warm-up call that loads the model."""
+    embed(chunks[:8])
+    best, vectors = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        vectors = embed(chunks)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, np.asarray(vectors, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--folder", help="Embed chunks of this folder's documents.")
+    parser.add_argument("--batch-sizes", type=lambda t: _list(t, int), default=[16, 32, 64, 128])
+    parser.add_argument("--threads", type=lambda t: _list(t, int), default=[0, 1, 2, 4])
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument(
+        "--models", type=_list, default=[""], help="Model folders or .onnx files; empty for the default."
+    )
+    parser.add_argument("--repeats", type=int, default=2)
+    args = parser.parse_args()
+
+    chunks = folder_chunks(args.folder, args.chunks) if args.folder else synthetic_chunks(args.chunks)
+    print(f"{len(chunks)} chunks, {sum(map(len, chunks)) / len(chunks):.0f} characters on average")
+    print(f"{'setting':<44} {'chunks/s':>9} {'ms/chunk':>9} {'min cos':>8}")
+
+    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+    seconds, baseline = measure(DefaultEmbeddingFunction(), chunks, args.repeats)
+    print(
+        f"{'chroma default (padded to 256)':<44} {len(chunks) / seconds:>9.1f} "
+        f"{1000 * seconds / len(chunks):>9.2f} {'':>8}"
+    )
+
+    for model in args.models:
+        reference = baseline if not model else None
+        for batch_size in args.batch_sizes:
+            for threads in args.threads:
+                embedder = LocalEmbeddingFunction(
+                    os.path.expanduser(model) or None,
+                    batch_size=batch_size,
+                    threads=threads,
+                    max_length=args.max_length,
+                )
+                seconds, vectors = measure(embedder, chunks, args.repeats)
+                if reference is None:
+                    reference = vectors
+                similarity = float((vectors * reference).sum(axis=1).min())
+                label = f"{embedder.model_id} batch={batch_size} threads={threads or 'auto'}"
+                print(
+                    f"{label:<44} {len(chunks) / seconds:>9.1f} "
+                    f"{1000 * seconds / len(chunks):>9.2f} {similarity:>8.4f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Import time of each entry point, measured with python -X importtime.
+
+Imports the project modules that cli.py, app.py and manage.py load at startup
+in a fresh interpreter per entry point (third-party frameworks such as
+Streamlit excluded), and reports the total and the slowest packages. Heavy
+dependencies (chromadb, LangChain, document parsers) should only appear after
+their first use, not here.
+
+Usage:
+    python benchmarks/import_time.py --top 10
+"""
+
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+
+ENTRY_POINTS = ("cli.py", "app.py", "manage.py")
+
+
+def project_imports(entry_point):
+    """Project modules imported at the top level of an entry point script."""
+    with open(os.path.join(SRC, entry_point), "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        elif isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        for name in names:
+            if os.path.exists(os.path.join(SRC, f"{name}.py")) and name not in modules:
+                modules.append(name)
+    return modules
+
+
+def measure(modules):
+    """
+    Import modules in a fresh interpreter under -X importtime.
+
+    Returns:
+        tuple[float, dict]: Total seconds spent importing the modules and the
+            cumulative seconds of each top-level package they pulled in.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    packages, total = {}, 0.0
+    started = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Top-level entries have a single leading space; deeper ones are indented
+        if name.startswith("  "):
+            continue
+        name = name.strip()
+        # Everything up to and including site is interpreter startup
+        if name == "site":
+            started = True
+            continue
+        if not started:
+            continue
+        seconds = int(cumulative) / 1e6
+        total += seconds
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + seconds
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top", type=int, default=10, help="Slowest packages to list.")
+    args = parser.parse_args()
+
+    for entry_point in ENTRY_POINTS:
+        modules = project_imports(entry_point)
+        total, packages = measure(modules)
+        print(f"{entry_point}: {total * 1000:.0f} ms ({len(modules)} project modules)")
+        slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        for package, seconds in slowest[: args.top]:
+            print(f"  {package:<28} {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Recall@k vs. memory vs. latency of stored-vector compression settings.
+
+Builds a synthetic corpus with low intrinsic dimension (clustered points in a
+latent space projected to the embedding dimension, like real sentence
+embeddings), stores it in NumPy collections with each compression setting and
+compares their top-k results against exact float32 search.
+
+Usage:
+    python benchmarks/quantization_report.py --chunks 50000 --dim 384 --k 10
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from numpy_backend import NumpyCollection
+
+SETTINGS = [
+    "",
+    "float16",
+    "int8",
+    "int8,rescore",
+    "pca:192",
+    "pca:128",
+    "int8,pca:192",
+    "int8,pca:128",
+    "int8,pca:128,rescore",
+    "int8,pca:64",
+    "int8,pca:64,rescore",
+]
+
+
+def synthetic_corpus(chunks, dim, queries, latent=64, clusters=200, seed=0):
+    """Clustered unit vectors plus queries that are noisy copies of corpus vectors."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, latent))
+    points = centers[rng.integers(0, clusters, chunks)] + 0.6 * rng.standard_normal(
+        (chunks, latent)
+    )
+    projection = rng.standard_normal((latent, dim))
+    vectors = points @ projection + 0.3 * rng.standard_normal((chunks, dim))
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+    probes = vectors[rng.integers(0, chunks, queries)]
+    probes = probes + 0.05 * rng.standard_normal(probes.shape).astype(np.float32)
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+    return vectors, probes.astype(np.float32)
+
+
+def exact_top_k(vectors, probes, k):
+    scores = probes @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def directory_bytes(directory, names):
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for name in names
+        if os.path.exists(os.path.join(directory, name))
+    )
+
+
+def evaluate(setting, vectors, probes, truth, k, root):
+    directory = os.path.join(root, setting.replace(",", "_").replace(":", "") or "float32")
+    dtype = "float16" if setting == "float16" else "float32"
+    compression = None if setting in ("", "float16") else setting
+    collection = NumpyCollection(
+        directory, "report", dtype=dtype, compression=compression
+    )
+    ids = [str(i) for i in range(len(vectors))]
+    for start in range(0, len(vectors), 10000):
+        collection.upsert(
+            ids=ids[start : start + 10000],
+            embeddings=vectors[start : start + 10000],
+            documents=[""] * len(ids[start : start + 10000]),
+        )
+    collection.fit_compression()
+
+    latencies, hits = [], 0
+    for probe, expected in zip(probes, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[probe], n_results=k, include=[])
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(map(int, result["ids"][0])) & set(expected.tolist()))
+
+    searched = directory_bytes(directory, ["embeddings.bin"])
+    total = searched + directory_bytes(directory, ["originals.bin"])
+    return {
+        "setting": setting or "float32",
+        "recall": hits / (len(probes) * k),
+        "bytes_per_vector": searched / len(vectors),
+        "total_mb": total / 2**20,
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors, probes = synthetic_corpus(args.chunks, args.dim, args.queries)
+    truth = exact_top_k(vectors, probes, args.k)
+
+    print(f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, recall@{args.k}")
+    print(
+        f"{'setting':<22} {'recall':>7} {'B/vec':>7} {'disk MB':>8} "
+        f"{'p50 ms':>7} {'p95 ms':>7}"
+    )
+    with tempfile.TemporaryDirectory() as root:
+        for setting in SETTINGS:
+            row = evaluate(setting, vectors, probes, truth, args.k, root)
+            print(
+                f"{row['setting']:<22} {row['recall']:>7.3f} {row['bytes_per_vector']:>7.0f} "
+                f"{row['total_mb']:>8.1f} {row['p50_ms']:>7.2f} {row['p95_ms']:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
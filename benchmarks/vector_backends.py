@@ -0,0 +1,165 @@
+"""
+Benchmark the Chroma and NumPy vector backends on a synthetic corpus.
+
+Builds the same random corpus in both backends, then measures in a fresh
+process per backend: time to open the collection, time to the first answer,
+query latency (p50/p95) and resident memory.
+
+Usage:
+    python benchmarks/vector_backends.py --chunks 50000 --dim 384 --queries 200
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.insert(0, SRC)
+
+
+def synthetic_corpus(chunks, dim, seed=0):
+    """Random unit vectors with short documents and metadata."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((chunks, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk-{i}" for i in range(chunks)]
+    documents = [f"synthetic document {i}" for i in range(chunks)]
+    metadatas = [{"source": f"file{i // 20}.txt", "chunk": i % 20} for i in range(chunks)]
+    return ids, documents, metadatas, vectors
+
+
+def open_collection(backend, directory):
+    if backend == "chroma":
+        import chromadb
+
+        client = chromadb.PersistentClient(path=os.path.join(directory, "chroma"))
+        return client.get_or_create_collection(
+            name="benchmark", metadata={"hnsw:space": "cosine"}
+        )
+
+    from numpy_backend import NumpyCollection
+
+    dtype = backend.split("-")[1] if "-" in backend else "float32"
+    return NumpyCollection(os.path.join(directory, backend), "benchmark", dtype=dtype)
+
+
+def build(backend, directory, corpus, batch_size=5000):
+    ids, documents, metadatas, vectors = corpus
+    collection = open_collection(backend, directory)
+    start = time.perf_counter()
+    for offset in range(0, len(ids), batch_size):
+        end = offset + batch_size
+        collection.upsert(
+            ids=ids[offset:end],
+            documents=documents[offset:end],
+            metadatas=metadatas[offset:end],
+            embeddings=vectors[offset:end],
+        )
+    return time.perf_counter() - start
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux), falling back to peak RSS."""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(backend, directory, dim, queries, n_results):
+    """Run in a fresh process: open, query and report timings and memory."""
+    import chromadb  # noqa: F401  (import cost is excluded from the open time)
+
+    rng = np.random.default_rng(1)
+    probes = rng.standard_normal((queries, dim)).astype(np.float32)
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    collection = open_collection(backend, directory)
+    open_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    collection.query(query_embeddings=[probes[0]], n_results=n_results)
+    first_query = time.perf_counter() - start
+
+    latencies = []
+    for probe in probes:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[probe], n_results=n_results)
+        latencies.append(time.perf_counter() - start)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "backend": backend,
+        "open_ms": open_time * 1000,
+        "first_query_ms": first_query * 1000,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "rss_mb": rss_mb() - baseline,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        result = measure(
+            args.measure, args.directory, args.dim, args.queries, args.n_results
+        )
+        print(json.dumps(result))
+        return
+
+    corpus = synthetic_corpus(args.chunks, args.dim)
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{args.chunks} chunks x {args.dim} dims, top-{args.n_results}")
+        print(
+            f"{'backend':<14} {'build s':>8} {'open ms':>8} {'first ms':>9} "
+            f"{'p50 ms':>7} {'p95 ms':>7} {'RSS MB':>7} {'disk MB':>8}"
+        )
+        for backend in ("chroma", "numpy", "numpy-float16"):
+            build_time = build(backend, directory, corpus)
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--measure", backend,
+                    "--directory", directory,
+                    "--dim", str(args.dim),
+                    "--queries", str(args.queries),
+                    "--n-results", str(args.n_results),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            disk = sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(os.path.join(directory, backend))
+                for name in names
+            )
+            print(
+                f"{backend:<14} {build_time:>8.1f} {result['open_ms']:>8.1f} "
+                f"{result['first_query_ms']:>9.1f} {result['p50_ms']:>7.2f} "
+                f"{result['p95_ms']:>7.2f} {result['rss_mb']:>7.1f} {disk / 2**20:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
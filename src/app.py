@@ -5,27 +5,42 @@ This application allows users to select a folder containing documents, processes
 a vector store, and enables question-answering based on the document content using an LLM.
 """
 
+import functools
 import os
 import time
+import uuid
 
 import streamlit as st
 
-from document_loader import load_txt, load_pdf, load_docx, load_odt
 from scan_folders import scan_folders
-from vector_store import (
-    chunk_text,
-    create_collection,
-    add_chunks,
-    create_file_index_chunk,
+from indexing_jobs import (
+    RUNNING,
+    folder_key,
+    format_status,
+    get_job,
+    start_indexing,
+    zip_key,
 )
-
-from response_generator import set_llm, generate_answer, set_langchain_history
-from retrieval_system import query_documents
-
-from langchain_core.messages import HumanMessage, AIMessage
-
-# Map file extensions to their respective loader functions
-loaders = {".txt": load_txt, ".pdf": load_pdf, ".docx": load_docx, ".odt": load_odt}
+from path_index import path_index_file
+from query_router import QueryRouter
+from retrieval_cache import shared_cache
+from watcher import stop_watching, watch_folder
+from chat_history import PAGE_SIZE, RENDER_WINDOW, ChatHistory, to_langchain
+from resource_manager import resources
+from embeddings import EmbeddingModelError
+from vector_store import create_collection
+
+from llm_client import LLMError
+from response_generator import set_llm, generate_answer
+from retrieval_system import query_documents, expand_neighbours, search_files
+from metrics import format_breakdown, metrics
+from profiling import format_run, profile_run
+from utils import load_environment
+
+# Settings such as VECTOR_BACKEND and GEMINI_API_KEY may come from .env
+load_environment()
+metrics.configure()
+resources.configure()
 
 
 # ============================================================================
@@ -38,6 +53,43 @@ def is_streamlit_cloud():
     return os.getenv("STREAMLIT_SHARING_MODE") is not None
 
 
+def is_admin():
+    """Check if admin-only tools (profiling) are enabled with ADMIN_TOOLS"""
+    return os.getenv("ADMIN_TOOLS", "false").lower() in ("1", "true", "yes")
+
+
+def session_collection():
+    """
+    Return this session's collection from the shared resource manager.
+
+    Sessions keep only the job key; the handle is looked up on every rerun, so
+    the manager can unload it while the session is idle.
+
+    Returns:
+        The collection, or None before documents are loaded.
+    """
+    if "job_key" not in st.session_state:
+        return None
+    return resources.get(st.session_state.session_id, st.session_state.job_key)
+
+
+def forget_collection():
+    """Detach the session from its collection, so the next run re-indexes."""
+    st.session_state.pop("job_key", None)
+    resources.detach(st.session_state.session_id)
+
+
+def release_router(router):
+    """
+    Drop an evicted session's collection handle held by its router.
+
+    Args:
+        router (QueryRouter): The session's router; it gets the collection
+            back on the session's next rerun.
+    """
+    router.collection = None
+
+
 def extract_zip_and_scan(uploaded_zip):
     """
     Extract uploaded ZIP file to temporary directory and scan for documents.
@@ -90,8 +142,7 @@ def render_sidebar():
                 if st.button("Load ZIP", use_container_width=True):
                     st.session_state.uploaded_zip = uploaded_zip
                     # Clear collection to trigger re-indexing
-                    if "collection" in st.session_state:
-                        del st.session_state.collection
+                    forget_collection()
                     if "files" in st.session_state:
                         del st.session_state.files
                     st.rerun()
@@ -117,8 +168,7 @@ def render_sidebar():
                 if folder_path and os.path.exists(folder_path):
                     st.session_state.folder_path = folder_path
                     # Clear collection to trigger re-indexing
-                    if "collection" in st.session_state:
-                        del st.session_state.collection
+                    forget_collection()
                     if "files" in st.session_state:
                         del st.session_state.files
                     st.rerun()
@@ -141,103 +191,317 @@ def render_sidebar():
                 if "files" in st.session_state:
                     st.info(f"📄 **Files Indexed:** {len(st.session_state.files)}")
 
+                # Index added, changed and deleted files without reloading
+                job = get_job(st.session_state.get("job_key"))
+                if "job_key" in st.session_state and job and not job.running:
+                    watching = st.toggle(
+                        "👀 Watch folder for changes",
+                        key="watch_folder",
+                        help="Re-index only the files that change while the app runs",
+                    )
+                    render_watcher(watching)
+
+        # Routed vs. LLM-answered query counts and latency
+        if "router" in st.session_state:
+            st.markdown("---")
+            with st.expander("📊 Query Stats"):
+                for route, data in st.session_state.router.stats.summary().items():
+                    st.caption(
+                        f"**{route}**: {data['count']} queries, "
+                        f"mean {data['mean_ms']:.0f} ms, p95 {data['p95_ms']:.0f} ms"
+                    )
+                for name, data in shared_cache.stats().items():
+                    st.caption(
+                        f"**{name} cache**: {data['hit_rate']:.0%} hit rate "
+                        f"({data['hits']}/{data['hits'] + data['misses']})"
+                    )
+
+        # Time spent per pipeline stage since the app started
+        if metrics.enabled:
+            with st.expander("⏱️ Stage Timings"):
+                for name, timer in sorted(metrics.snapshot()["timers"].items()):
+                    st.caption(
+                        f"**{name}**: {timer['count']} calls, "
+                        f"mean {timer['mean_ms']:.0f} ms, max {timer['max_ms']:.0f} ms"
+                    )
+
+        # Admin tools: resident collections and sessions, and profiling
+        if is_admin():
+            st.markdown("---")
+            render_resources()
+            st.toggle(
+                "🔬 Profile indexing and questions",
+                key="profiling",
+                help="Save cProfile stats and flame graph stacks to ./profiles "
+                "for the next indexing run and every question",
+            )
+
         # Clear chat button
         st.markdown("---")
         if st.button("🗑️ Clear Chat History", use_container_width=True):
-            st.session_state.messages = []
+            st.session_state.chat.clear()
             st.rerun()
 
 
-def initialize_vector_store(folder_path, files):
+def render_resources():
+    """Show the collections held open by the resource manager and the sessions."""
+    stats = resources.stats()
+    with st.expander("🧠 Resources"):
+        st.caption(
+            f"**Resident**: {stats['resident_bytes'] / 2**20:.0f} MB of collections, "
+            f"{len(stats['sessions'])} sessions ({stats['evicted_sessions']} evicted, "
+            f"{stats['unloaded_collections']} collections unloaded)"
+        )
+        for entry in stats["collections"]:
+            state = "open" if entry["resident"] else "unloaded"
+            st.caption(
+                f"**{entry['key']}**: {state}, {entry['sessions']} sessions, "
+                f"~{entry['bytes'] / 2**20:.1f} MB"
+            )
+        chat_bytes = sum(session["chat_bytes"] for session in stats["sessions"])
+        st.caption(f"**Chat memory**: {chat_bytes / 1024:.0f} KB across sessions")
+
+
+def render_watcher(watching):
+    """
+    Start or stop the folder watcher and show what it has indexed.
+
+    The watcher is shared by every session on the same folder, so its path index
+    replaces the session's own to keep file questions up to date. Turning the
+    toggle off releases only this session's hold on it.
+
+    Args:
+        watching (bool): Whether the user enabled watching.
+    """
+    folder_path = st.session_state.folder_path
+    if not watching:
+        stop_watching(folder_path, owner=st.session_state.session_id)
+        return
+
+    collection = session_collection()
+    watcher = watch_folder(
+        folder_path,
+        collection,
+        st.session_state.path_index,
+        path_index_file(collection.name),
+        owner=st.session_state.session_id,
+    )
+    st.session_state.path_index = watcher.path_index
+    st.session_state.router.path_index = watcher.path_index
+    st.caption(
+        f"{watcher.mode}: {watcher.stats['indexed']} files indexed, "
+        f"{watcher.stats['removed']} removed, {watcher.pending()} pending"
+    )
+
+
+def attach_indexing_job(key, collection_path, files, source_dir=None):
     """
-    Initialize and populate the vector store with document chunks.
+    Start or join the background job indexing the loaded documents.
 
     Args:
-        folder_path (str): Path to the folder containing documents.
+        key (str): Job key of the folder or ZIP (see indexing_jobs).
+        collection_path (str): Folder path or ZIP name the collection is named after.
         files (list): List of file paths to process and index.
+        source_dir (str | None): Folder holding the files.
+
+    Returns:
+        IndexingJob: The job, which may still be running.
     """
-    if "collection" not in st.session_state:
+    if st.session_state.get("job_key") != key:
         try:
-            collection = create_collection(folder_path)
+            job = start_indexing(
+                key,
+                collection_path,
+                files,
+                source_dir,
+                profile=st.session_state.get("profiling", False),
+            )
+        except EmbeddingModelError as error:
+            st.write(str(error))
+            st.stop()
         except Exception:
             st.write("Error setting up the document storage system.")
             st.stop()
+        st.session_state.job_key = key
+        # The shared manager owns the handle and reopens it once unloaded
+        resources.attach(
+            st.session_state.session_id,
+            key,
+            job.collection,
+            reopen=functools.partial(create_collection, collection_path),
+            busy=lambda: job.running,
+            unload=job.release,
+        )
+        st.session_state.path_index = job.path_index
+        st.session_state.router = QueryRouter(job.path_index, job.collection)
+        return job
+
+    job = get_job(key)
+    # The path index is built once every file is indexed
+    if job.path_index is not None and st.session_state.path_index is None:
+        st.session_state.path_index = job.path_index
+        st.session_state.router.path_index = job.path_index
+    return job
+
+
+@st.fragment(run_every=1)
+def render_indexing_status(job):
+    """
+    Show the progress of a running indexing job, refreshed every second.
 
-        with st.spinner("Indexing documents..."):
-            # Create progress bar
-            progress_bar = st.progress(0)
-
-            # Process each document file
-            for i, file in enumerate(files):
-                # Show progress
-                progress_bar.progress((i + 1) / len(files))
-                _, extension = os.path.splitext(file)
-
-                # Load document content using the appropriate loader
-                try:
-                    fn = loaders[extension]
-                    content = fn(file)
-                except KeyError:
-                    content = ""
-                    st.write(f"File {file} not supported. Skipping.")
-
-                # Split content into chunks and add to vector store
-                chunks = chunk_text(content, file)
-                if chunks:
-                    try:
-                        collection = add_chunks(chunks, collection)
-                    except Exception:
-                        st.write(f"Error processing file {file}. Skipping.")
-
-            # Create and add a special index of all file names for better retrieval
-            file_index = create_file_index_chunk(files)
-            try:
-                collection = add_chunks(file_index, collection)
-            except Exception:
-                st.write(
-                    "Warning: Could not index file names. You can still search document content."
-                )
-
-            st.session_state.collection = collection
-            # Reload page after indexing
-            st.rerun()
-    else:
-        collection = st.session_state.collection
+    Reruns the whole app once the job finishes, so the sidebar and file
+    questions pick up the completed index.
+
+    Args:
+        job (IndexingJob): The job indexing the loaded documents.
+    """
+    status = job.status()
+    if status["state"] != RUNNING:
+        st.rerun()
+    st.progress(
+        status["files_done"] / max(status["files_total"], 1),
+        text=f"Indexing documents: {format_status(status)}",
+    )
+    st.caption("You can already ask about the documents indexed so far.")
+
+
+def render_indexing_result(job):
+    """
+    List the files a finished job skipped, the duplicates it found and where
+    its profile was saved.
+
+    Args:
+        job (IndexingJob): The job indexing the loaded documents.
+    """
+    if job.dedup is not None and job.dedup.aliases:
+        with st.expander(f"🗂️ {len(job.dedup.aliases)} duplicate files indexed once"):
+            st.caption(job.dedup.format_report())
+            for alias, (canonical, similarity) in sorted(job.dedup.aliases.items()):
+                st.write(f"{alias} → {canonical} ({similarity:.0%} similar)")
+    errors = job.status()["errors"]
+    if errors:
+        with st.expander(f"⚠️ {len(errors)} indexing issues"):
+            for error in errors:
+                st.write(error)
+    if job.profile_run:
+        render_profile(job.profile_run)
+
+
+def render_profile(run):
+    """
+    Show where a profile was saved and its slowest functions.
+
+    Args:
+        run (ProfileRun): A completed profiling run.
+    """
+    with st.expander(f"🔬 {run.label} profile ({run.seconds:.2f} s)"):
+        st.code(format_run(run), language=None)
+
+
+def render_messages(messages):
+    """
+    Show chat messages.
+
+    Args:
+        messages (list[dict]): Messages with "role" and "content" keys.
+    """
+    for message in messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
 
 
-def handle_chat_input(collection, llm):
+def render_chat_history(chat):
+    """
+    Show the latest turns, with earlier ones a page at a time in an expander.
+
+    Only RENDER_WINDOW messages and one page are rendered per rerun, however
+    long the conversation is.
+
+    Args:
+        chat (ChatHistory): The session's conversation.
+    """
+    recent = chat.recent(RENDER_WINDOW)
+    earlier = len(chat) - len(recent)
+    if earlier > 0:
+        with st.expander(f"🕘 {earlier} earlier messages"):
+            pages = -(-earlier // PAGE_SIZE)
+            page = st.number_input(
+                "Page (1 is the most recent)",
+                min_value=1,
+                max_value=pages,
+                value=1,
+                key="history_page",
+            )
+            stop = earlier - (page - 1) * PAGE_SIZE
+            render_messages(chat.messages(max(0, stop - PAGE_SIZE), stop))
+    render_messages(recent)
+
+
+def handle_chat_input(collection, llm, router):
     """
     Handle user chat input, retrieve relevant documents, and generate responses.
 
     Args:
         collection: ChromaDB collection containing indexed documents.
         llm: Language model instance for generating answers.
+        router (QueryRouter): Answers metadata questions without calling the LLM.
     """
     user_input = st.chat_input("Ask your question")
     if user_input:
+        start = time.perf_counter()
 
-        # Add and display user message
-        st.session_state.messages.append({"role": "user", "content": user_input})
+        # Display the user message; it is added to the chat together with the
+        # answer, so a failed question does not stay in the history unanswered
+        chat = st.session_state.chat
         with st.chat_message("user"):
             st.markdown(user_input)
 
-        # Retrieve relevant document chunks based on the user's question
-        try:
-            related_chunks = query_documents(
-                collection=collection, query_text=user_input
-            )
-        except Exception:
-            st.info("Error searching documents. Please try again.")
-            st.stop()
+        # Time each stage of this answer when metrics are enabled
+        with metrics.trace() as trace:
+            # Answer metadata questions (counts, listings, dates) without the LLM
+            answer = router.route(user_input)
+            route = "routed" if answer is not None else "llm"
+
+            query_profile = None
+            if answer is None:
+                profiling = st.session_state.get("profiling", False)
+                with profile_run("query", enabled=profiling) as query_profile:
+                    # Retrieve relevant document chunks based on the user's question
+                    try:
+                        related_chunks = query_documents(
+                            collection=collection, query_text=user_input, cache=shared_cache
+                        )
+                        # Widen each small matching chunk with its neighbours for fuller context
+                        related_chunks = expand_neighbours(collection, related_chunks)
+                    except Exception:
+                        st.info("Error searching documents. Please try again.")
+                        st.stop()
 
-        # Generate LLM response using retrieved context and conversation history
-        history = set_langchain_history(st.session_state.messages)
-        answer = generate_answer(llm, user_input, related_chunks, history)
+                    # Look up indexed files whose names or folders match the question
+                    matching_files = search_files(router.path_index, user_input)
 
-        # Add and display assistant response
-        st.session_state.messages.append({"role": "assistant", "content": answer})
+                    # Generate LLM response using retrieved context and conversation history
+                    history = chat.langchain_history() + [
+                        to_langchain({"role": "user", "content": user_input})
+                    ]
+                    try:
+                        answer = generate_answer(
+                            llm, user_input, related_chunks, history, matching_files
+                        )
+                    except LLMError as error:
+                        st.info(str(error))
+                        st.stop()
+
+        # Add the question and display the assistant response
+        chat.append("user", user_input)
+        chat.append("assistant", answer)
         with st.chat_message("assistant"):
             st.markdown(answer)
+            if metrics.enabled:
+                st.caption(f"⏱️ {format_breakdown(trace)}")
+        if query_profile:
+            render_profile(query_profile)
+        router.stats.record(route, time.perf_counter() - start)
 
 
 # ============================================================================
@@ -247,6 +511,13 @@ def handle_chat_input(collection, llm):
 st.title("Chat with your documents!")
 st.write(time.strftime("%d %b, %Y"))
 
+# Identifies the session to the shared resource manager and names its chat file
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+# Created before the sidebar, whose Clear Chat History button uses it
+if "chat" not in st.session_state:
+    st.session_state.chat = ChatHistory(st.session_state.session_id)
+
 # Sidebar
 render_sidebar()
 
@@ -261,9 +532,16 @@ if "folder_path" in st.session_state:
         st.stop()
 
     st.session_state.files = files
+    job_key = folder_key(st.session_state.folder_path)
+    temp_dir = None
 elif "uploaded_zip" in st.session_state:
-    # Cloud mode: extract ZIP and scan
-    temp_dir, files = extract_zip_and_scan(st.session_state.uploaded_zip)
+    # Cloud mode: extract ZIP and scan, unless a job for the same ZIP already did
+    job_key = zip_key(st.session_state.uploaded_zip.getvalue())
+    job = get_job(job_key)
+    if job is not None and os.path.isdir(job.source_dir):
+        temp_dir, files = job.source_dir, job.files
+    else:
+        temp_dir, files = extract_zip_and_scan(st.session_state.uploaded_zip)
     if not files:
         st.info("No documents found in ZIP")
         st.stop()
@@ -283,24 +561,33 @@ if is_streamlit_cloud():
 else:
     collection_path = st.session_state.folder_path
 
-initialize_vector_store(collection_path, st.session_state.files)
+job = attach_indexing_job(job_key, collection_path, st.session_state.files, temp_dir)
+if job.running:
+    render_indexing_status(job)
+else:
+    render_indexing_result(job)
 
 # ============================================================================
 # Chat Interface and Question Answering
 # ============================================================================
 
-# Initialize LLM and conversation history
+# Initialize LLM
 if "llm" not in st.session_state:
     st.session_state.llm = set_llm()
 llm = st.session_state.llm
 
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Keep the session alive in the resource manager, which evicts idle ones
+collection = session_collection()
+router = st.session_state.router
+router.collection = collection
+resources.touch(
+    st.session_state.session_id,
+    chat=st.session_state.chat,
+    on_evict=functools.partial(release_router, router),
+)
 
-# Display existing chat history
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# Display the latest turns, with earlier ones paged
+render_chat_history(st.session_state.chat)
 
 # Handle new user input
-handle_chat_input(st.session_state.collection, llm)
+handle_chat_input(collection, llm, router)
@@ -0,0 +1,194 @@
+"""
+Chat history of one Streamlit session, bounded in memory.
+
+The newest messages are kept in memory together with their LangChain versions,
+which are built once when a message is added instead of on every turn. Once a
+session holds more than max_in_memory messages, the oldest are appended to a
+JSON Lines file in CHAT_HISTORY_PATH and read back a page at a time when the
+user scrolls through earlier turns. An idle session can offload everything; the
+newest messages are reloaded when it comes back.
+"""
+
+import collections
+import json
+import os
+import sys
+import uuid
+
+# Folder where offloaded messages are stored, one file per session
+CHAT_HISTORY_PATH = "./chat_history"
+
+# Messages kept in memory per session; older ones are offloaded to disk. The
+# LLM sees the in-memory messages as conversation history.
+MAX_MESSAGES_IN_MEMORY = 200
+
+# Latest messages rendered on every rerun; older ones are paged
+RENDER_WINDOW = 20
+
+# Messages per page of earlier turns
+PAGE_SIZE = 20
+
+
+def to_langchain(message):
+    """
+    Convert a message dict to a LangChain message.
+
+    Args:
+        message (dict): A message with "role" and "content" keys.
+
+    Returns:
+        HumanMessage | AIMessage: The LangChain message.
+    """
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    if message["role"] == "user":
+        return HumanMessage(message["content"])
+    return AIMessage(message["content"])
+
+
+class ChatHistory:
+    """
+    Messages of one conversation, with the oldest offloaded to disk.
+
+    Args:
+        session_id (str | None): Names the offload file; random if None.
+        max_in_memory (int): Messages kept in memory.
+        directory (str | None): Folder of the offload file; defaults to
+            CHAT_HISTORY_PATH.
+    """
+
+    def __init__(self, session_id=None, max_in_memory=MAX_MESSAGES_IN_MEMORY, directory=None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.max_in_memory = max_in_memory
+        self.filepath = os.path.join(directory or CHAT_HISTORY_PATH, f"{self.session_id}.jsonl")
+        self._recent = collections.deque()
+        self._langchain = collections.deque()
+        # Byte offset of each offloaded message in the file
+        self._offsets = []
+
+    def __len__(self):
+        return len(self._offsets) + len(self._recent)
+
+    @property
+    def offloaded(self):
+        """Number of messages stored on disk."""
+        return len(self._offsets)
+
+    def append(self, role, content):
+        """
+        Add a message, offloading the oldest ones if over the memory cap.
+
+        Args:
+            role (str): "user" or "assistant".
+            content (str): The message text.
+        """
+        message = {"role": role, "content": content}
+        self._recent.append(message)
+        self._langchain.append(to_langchain(message))
+        if len(self._recent) > self.max_in_memory:
+            self._offload(len(self._recent) - self.max_in_memory)
+
+    def _offload(self, count):
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        with open(self.filepath, "ab") as file:
+            for _ in range(count):
+                message = self._recent.popleft()
+                self._langchain.popleft()
+                self._offsets.append(file.tell())
+                file.write(json.dumps(message).encode("utf-8") + b"\n")
+
+    def offload_all(self):
+        """Move every in-memory message to disk, e.g. when the session goes idle."""
+        if self._recent:
+            self._offload(len(self._recent))
+
+    def reload(self):
+        """
+        Bring the newest offloaded messages back into memory, up to max_in_memory.
+
+        Undoes offload_all when the session returns, so the LLM sees the same
+        conversation history as before and the latest turns render again.
+        """
+        count = min(self.max_in_memory - len(self._recent), self.offloaded)
+        if count <= 0:
+            return
+        first = self.offloaded - count
+        with open(self.filepath, "r+b") as file:
+            file.seek(self._offsets[first])
+            messages = [json.loads(file.readline()) for _ in range(count)]
+            # The file keeps only the messages that stay offloaded
+            file.truncate(self._offsets[first])
+        del self._offsets[first:]
+        for message in reversed(messages):
+            self._recent.appendleft(message)
+            self._langchain.appendleft(to_langchain(message))
+
+    def memory_bytes(self):
+        """
+        Estimate the memory held by the in-memory messages.
+
+        Returns:
+            int: Bytes of the message texts, counted twice for the dicts and
+                their LangChain copies, plus the offsets of offloaded messages.
+        """
+        text = sum(sys.getsizeof(message["content"]) for message in self._recent)
+        return 2 * text + 8 * len(self._offsets)
+
+    def recent(self, count=RENDER_WINDOW):
+        """
+        Return the latest messages.
+
+        Args:
+            count (int): Number of messages; at most the ones in memory.
+
+        Returns:
+            list[dict]: Messages, oldest first.
+        """
+        count = min(count, len(self._recent))
+        return list(self._recent)[len(self._recent) - count :] if count else []
+
+    def messages(self, start, stop):
+        """
+        Return a range of messages, reading offloaded ones from disk.
+
+        Args:
+            start (int): Index of the first message (0 is the oldest).
+            stop (int): Index after the last message.
+
+        Returns:
+            list[dict]: The messages, oldest first.
+        """
+        start, stop = max(0, start), min(stop, len(self))
+        if start >= stop:
+            return []
+        result = []
+        if start < self.offloaded:
+            with open(self.filepath, "rb") as file:
+                file.seek(self._offsets[start])
+                for _ in range(min(stop, self.offloaded) - start):
+                    result.append(json.loads(file.readline()))
+        first_recent = max(start - self.offloaded, 0)
+        last_recent = stop - self.offloaded
+        if last_recent > 0:
+            recent = self._recent
+            result.extend(recent[i] for i in range(first_recent, last_recent))
+        return result
+
+    def langchain_history(self):
+        """
+        Return the in-memory messages as LangChain messages for the prompt.
+
+        Returns:
+            list: HumanMessage and AIMessage objects, oldest first.
+        """
+        return list(self._langchain)
+
+    def clear(self):
+        """Forget every message and delete the offload file."""
+        self._recent.clear()
+        self._langchain.clear()
+        self._offsets = []
+        try:
+            os.remove(self.filepath)
+        except FileNotFoundError:
+            pass
@@ -3,23 +3,44 @@ CLI application for document-based question answering using RAG (Retrieval-Augme
 Scans a directory for documents, indexes them in a vector store, and enables conversational Q&A.
 """
 
+import argparse
 import os
 import time
 import sys
 
-from document_loader import load_txt, load_pdf, load_docx, load_odt
+from dedup import Deduplicator
+from embeddings import EmbeddingModelError
+from document_loader import LOADERS
 from scan_folders import scan_folders
+from text_cache import default_text_cache
 from vector_store import (
-    chunk_text,
     create_collection,
-    add_chunks,
-    create_file_index_chunk,
+    migrate_collection,
+    optimize_collection,
 )
+from path_index import build_path_index
+from query_router import QueryRouter
+from retrieval_cache import shared_cache
+from llm_client import LLMError
 from response_generator import set_llm, generate_answer, set_history
-from retrieval_system import query_documents
-
-# Map file extensions to loader functions
-loaders = {".txt": load_txt, ".pdf": load_pdf, ".docx": load_docx, ".odt": load_odt}
+from retrieval_system import query_documents, expand_neighbours, search_files
+from metrics import format_breakdown, metrics
+from profiling import format_run, profile_run
+from utils import load_environment
+
+# Settings such as VECTOR_BACKEND and GEMINI_API_KEY may come from .env
+load_environment()
+metrics.configure()
+
+parser = argparse.ArgumentParser(description="Chat with the documents in a folder.")
+parser.add_argument(
+    "--profile",
+    choices=("index", "query", "all"),
+    help="Profile indexing, every question, or both; artifacts are saved in ./profiles.",
+)
+args = parser.parse_args()
+profile_index = args.profile in ("index", "all")
+profile_query = args.profile in ("query", "all")
 
 # Get directory from user input with validation
 directory = input("Enter directory to scan (default: data): ").strip()
@@ -41,42 +62,73 @@ if not files:
 # Create directory-specific vector database collection
 try:
     collection = create_collection(directory)
+except EmbeddingModelError as error:
+    print(error)
+    sys.exit(1)
 except Exception:
     print("Error setting up the document storage system.")
     sys.exit(1)
 
-# Load and index each document into the vector store
-for file in files:
-    name, extension = os.path.splitext(file)
-    try:
-        fn = loaders[extension]
-        content = fn(file)
-    except KeyError:
-        # Skip unsupported file types
-        content = ""
-        print(f"File {file} not supported. Skipping.")
-
-    chunks = chunk_text(content, file)
-    if chunks:
+# Optionally profile the whole indexing run
+with profile_run("index", enabled=profile_index) as index_profile:
+    # Upgrade chunks stored by older versions (source headers, file-list chunks, chunk size)
+    migration = migrate_collection(collection)
+    if migration["chunks"] or migration["removed"]:
+        print(
+            f"Migrated {migration['chunks']} chunks and removed {migration['removed']} "
+            f"file-list chunks: saved {migration['bytes_saved']} bytes "
+            f"(~{migration['tokens_saved']} tokens)."
+        )
+    if migration["rechunked_files"]:
+        print(f"Split {migration['rechunked_files']} files into smaller chunks.")
+
+    # Load and index each document into the vector store, embedding one copy of duplicates
+    dedup = Deduplicator(collection)
+    # Documents extracted by an earlier run are not parsed again
+    text_cache = default_text_cache()
+    for file in files:
+        name, extension = os.path.splitext(file)
         try:
-            collection = add_chunks(chunks, collection)
+            fn = LOADERS[extension]
+            content = text_cache.load(file, fn)
+        except KeyError:
+            # Skip unsupported file types
+            content = ""
+            print(f"File {file} not supported. Skipping.")
+
+        try:
+            dedup.index(file, content)
         except Exception:
             # skip problematic files and continue indexing others
             print(f"Error processing file {file}. Skipping.")
             continue
+    if dedup.aliases:
+        print(dedup.format_report())
+    if text_cache.hits:
+        print(f"Reused the extracted text of {text_cache.hits} documents from the text cache.")
+    text_cache.save_stats()
 
-# Create and add file index chunk (provides LLM with list of available documents)
-file_index = create_file_index_chunk(files)
-try:
-    collection = add_chunks(file_index, collection)
-except Exception:
-    print("Warning: Could not index file names. You can still search document content.")
+    # Fit stored-vector compression, if configured for the backend
+    optimize_collection(collection)
+
+    # Build the path index (answers file-listing questions without vector search)
+    try:
+        path_index = build_path_index(files, collection.name)
+    except OSError:
+        path_index = None
+        print("Warning: Could not index file names. You can still search document content.")
+
+if index_profile:
+    print(format_run(index_profile))
 
 # Display indexing completion timestamp
 print(time.strftime("%b %d, %Y %H:%M:%S"))
+if metrics.enabled:
+    print(metrics.format())
 
-# Initialize LLM and conversation history
+# Initialize LLM, metadata query router and conversation history
 llm = set_llm()
+router = QueryRouter(path_index, collection)
 history = []
 
 
@@ -85,19 +137,54 @@ while True:
     user_input = input("Ask a question (or type 'exit' to quit): ")
 
     if user_input.lower() == "exit":
+        print(router.stats.format())
+        print(shared_cache.format())
+        if metrics.enabled:
+            print(metrics.format())
         break
 
-    # Retrieve relevant document chunks via semantic search
-    try:
-        related_chunks = query_documents(collection=collection, query_text=user_input)
-    except Exception:
-        # allow user to retry query
-        print("Error searching documents. Please try again.")
-        continue
-
-    # Generate LLM response using retrieved context and conversation history
-    answer = generate_answer(llm, user_input, related_chunks, history)
+    start = time.perf_counter()
+
+    # Time each stage of this answer when metrics are enabled
+    with metrics.trace() as trace:
+        # Answer metadata questions (counts, listings, dates) without the LLM
+        answer = router.route(user_input)
+        route = "routed" if answer is not None else "llm"
+
+        query_profile = None
+        if answer is None:
+            with profile_run("query", enabled=profile_query) as query_profile:
+                # Retrieve relevant document chunks via semantic search
+                try:
+                    related_chunks = query_documents(
+                        collection=collection, query_text=user_input, cache=shared_cache
+                    )
+                    # Widen each small matching chunk with its neighbours for fuller context
+                    related_chunks = expand_neighbours(collection, related_chunks)
+                except Exception:
+                    # allow user to retry query
+                    print("Error searching documents. Please try again.")
+                    continue
+
+                # Look up indexed files whose names or folders match the question
+                matching_files = search_files(path_index, user_input)
+
+                # Generate LLM response using retrieved context and conversation history
+                try:
+                    answer = generate_answer(
+                        llm, user_input, related_chunks, history, matching_files
+                    )
+                except LLMError as error:
+                    # allow user to retry query
+                    print(error)
+                    continue
+
     print(answer)
+    if query_profile:
+        print(format_run(query_profile))
+    if metrics.enabled:
+        print(f"[{format_breakdown(trace)}]")
+    router.stats.record(route, time.perf_counter() - start)
 
     # Append to conversation history for context continuity
     history = set_history(history=history, query=user_input, answer=answer)
@@ -0,0 +1,367 @@
+"""
+Exact and near-duplicate document detection for indexing runs.
+
+Shared folders hold many copies of the same document (v1, v1-final, email
+attachments). Indexing every copy costs embedding time and storage, and
+retrieval then returns the same passage once per copy. During an indexing run
+each document's extracted text is fingerprinted:
+
+- exact copies match on a SHA-256 of the whitespace- and case-normalized text
+- near copies match on a MinHash signature of word shingles, looked up in an
+  LSH (locality-sensitive hashing) index and confirmed by estimated Jaccard
+  similarity
+
+Only the first copy seen (the canonical one) is chunked and embedded; the
+others are recorded as aliases in the canonical chunks' metadata and cited with
+them in answers.
+"""
+
+import hashlib
+import time
+import zlib
+
+# NumPy is imported on first use, so the entry points do not pay for it at startup
+from vector_store import add_alias, add_chunks, chunk_text, remove_stale_chunks
+
+# Estimated Jaccard similarity of word shingles from which documents count as copies
+SIMILARITY_THRESHOLD = 0.9
+
+# MinHash signature length, split into LSH bands of BANDS rows each
+NUM_PERM = 128
+BANDS = 32
+
+# Words per shingle
+SHINGLE_SIZE = 5
+
+# Mersenne prime 2**31 - 1: with hashes and coefficients below it, a * h + b
+# fits in 64 bits
+_PRIME = (1 << 31) - 1
+
+# Shingles hashed per block when computing a signature, to bound memory
+_BLOCK = 4096
+
+
+def normalize_text(text):
+    """
+    Normalize text for fingerprinting.
+
+    Args:
+        text (str): Extracted document text.
+
+    Returns:
+        str: Lowercased text with runs of whitespace collapsed to one space.
+    """
+    return " ".join(text.lower().split())
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """
+    Split normalized text into overlapping word shingles.
+
+    Args:
+        text (str): Normalized text.
+        size (int): Words per shingle.
+
+    Returns:
+        set[str]: The shingles; a text shorter than one shingle is its own shingle.
+    """
+    words = text.split()
+    if len(words) <= size:
+        return {text} if text else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures with a fixed family of hash permutations.
+
+    Args:
+        num_perm (int): Signature length.
+        seed (int): Seed of the permutation coefficients; signatures are only
+            comparable between hashers with the same seed and length.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        """
+        Return the MinHash signature of a normalized text.
+
+        Args:
+            text (str): Normalized text.
+
+        Returns:
+            np.ndarray | None: uint64 array of num_perm minimums, or None for
+                empty text.
+        """
+        import numpy as np
+
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) % _PRIME for shingle in shingles(text)),
+            dtype=np.uint64,
+        )
+        if not hashes.size:
+            return None
+        signature = np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        for start in range(0, hashes.size, _BLOCK):
+            block = hashes[start : start + _BLOCK, None]
+            permuted = (block * self._a + self._b) % _PRIME
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature
+
+
+def estimate_similarity(first, second):
+    """
+    Estimate the Jaccard similarity of two documents from their signatures.
+
+    Args:
+        first (np.ndarray): MinHash signature.
+        second (np.ndarray): MinHash signature of the same length.
+
+    Returns:
+        float: Fraction of matching signature positions.
+    """
+    return float((first == second).mean())
+
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing index of MinHash signatures.
+
+    Signatures are cut into bands; documents sharing any whole band are
+    candidates. With 32 bands of 4 rows, documents 90% similar share a band
+    with near certainty while unrelated ones rarely do.
+
+    Args:
+        bands (int): Number of bands; must divide the signature length.
+    """
+
+    def __init__(self, bands=BANDS):
+        self.bands = bands
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature):
+        rows = len(signature) // self.bands
+        for band in range(self.bands):
+            yield band, signature[band * rows : (band + 1) * rows].tobytes()
+
+    def add(self, key, signature):
+        """
+        Index a signature.
+
+        Args:
+            key (str): The document it belongs to.
+            signature (np.ndarray): Its MinHash signature.
+        """
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def remove(self, key):
+        """
+        Drop a document's signature.
+
+        Args:
+            key (str): The document it belongs to; unknown keys are ignored.
+        """
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key, [])
+            if key in bucket:
+                bucket.remove(key)
+            if not bucket:
+                self._buckets[band].pop(band_key, None)
+
+    def query(self, signature, threshold=SIMILARITY_THRESHOLD):
+        """
+        Find the indexed document most similar to a signature.
+
+        Args:
+            signature (np.ndarray): MinHash signature to look up.
+            threshold (float): Smallest estimated similarity to report.
+
+        Returns:
+            tuple[str, float] | None: Key and similarity of the best match.
+        """
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+
+        best = None
+        for key in candidates:
+            similarity = estimate_similarity(signature, self._signatures[key])
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+
+class Deduplicator:
+    """
+    Indexes the documents of one run, embedding a single copy of duplicates.
+
+    Usage: call index(file, text) for each document in place of chunk_text and
+    add_chunks, then report() or format_report() for the savings.
+
+    Args:
+        collection: The collection being indexed.
+        threshold (float): Estimated similarity from which documents are copies;
+            1.0 only matches documents with identical signatures.
+        num_perm (int): MinHash signature length.
+        bands (int): LSH bands; must divide num_perm.
+    """
+
+    def __init__(self, collection, threshold=SIMILARITY_THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        self.collection = collection
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self._hasher = None
+        self.lsh = LSHIndex(bands)
+        # Canonical file of each normalized-text digest, its digest and chunk count
+        self._exact = {}
+        self._digests = {}
+        self._chunks = {}
+        # Alias file -> (canonical file, similarity)
+        self.aliases = {}
+        self.files = 0
+        self.chunks_skipped = 0
+        self.bytes_skipped = 0
+        self._chunks_indexed = 0
+        self._index_seconds = 0.0
+
+    def find_canonical(self, text):
+        """
+        Look up the indexed copy of a document.
+
+        Args:
+            text (str): Extracted document text.
+
+        Returns:
+            tuple: (canonical file or None, similarity, digest, signature); the
+                digest and signature are reused when registering the text.
+        """
+        normalized = normalize_text(text)
+        if not normalized:
+            return None, 0.0, None, None
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        if digest in self._exact:
+            return self._exact[digest], 1.0, digest, None
+        if self._hasher is None:
+            self._hasher = MinHasher(self.num_perm)
+        signature = self._hasher.signature(normalized)
+        match = self.lsh.query(signature, self.threshold)
+        if match is not None:
+            return match[0], match[1], digest, signature
+        return None, 0.0, digest, signature
+
+    def index(self, file, text):
+        """
+        Chunk and store a document unless it duplicates one already indexed.
+
+        A duplicate's own chunks (from earlier runs) are deleted and it is added
+        to the canonical chunks' aliases instead.
+
+        Args:
+            file (str): The document's path.
+            text (str): Its extracted text.
+
+        Returns:
+            int: Number of chunks stored (0 for duplicates).
+        """
+        self.files += 1
+        source = file.replace("\\", "/")
+        canonical, similarity, digest, signature = self.find_canonical(text)
+        if canonical is not None and canonical != source:
+            remove_stale_chunks(self.collection, source)
+            add_alias(self.collection, canonical, source)
+            self.aliases[source] = (canonical, similarity)
+            self.chunks_skipped += self._chunks.get(canonical, 0)
+            self.bytes_skipped += len(text.encode("utf-8"))
+            return 0
+
+        start = time.perf_counter()
+        chunks = chunk_text(text, file)
+        if chunks:
+            add_chunks(chunks, self.collection)
+        self._index_seconds += time.perf_counter() - start
+        self._chunks_indexed += len(chunks)
+
+        if digest is not None:
+            self._exact[digest] = source
+            self._digests[source] = digest
+            self._chunks[source] = len(chunks)
+            if signature is not None:
+                self.lsh.add(source, signature)
+        return len(chunks)
+
+    def forget(self, file):
+        """
+        Drop what is known about a document, e.g. after it changed or was deleted.
+
+        Later copies of its old content are then indexed as files of their own.
+
+        Args:
+            file (str): The document's path.
+        """
+        source = file.replace("\\", "/")
+        self.aliases.pop(source, None)
+        self._chunks.pop(source, None)
+        digest = self._digests.pop(source, None)
+        if digest is not None and self._exact.get(digest) == source:
+            del self._exact[digest]
+        self.lsh.remove(source)
+
+    def release(self):
+        """Drop the fingerprints once the run is over; aliases and the report are kept."""
+        self._exact = {}
+        self._digests = {}
+        self._chunks = {}
+        self.lsh = LSHIndex(self.lsh.bands)
+        self._hasher = None
+
+    def report(self):
+        """
+        Summarize what deduplication saved in this run.
+
+        Returns:
+            dict: "files" seen, "duplicates" skipped, "chunks_skipped",
+                "bytes_skipped" of extracted text and "seconds_saved", the
+                chunking and embedding time the skipped chunks would have
+                taken at this run's average rate.
+        """
+        per_chunk = self._index_seconds / self._chunks_indexed if self._chunks_indexed else 0.0
+        return {
+            "files": self.files,
+            "duplicates": len(self.aliases),
+            "chunks_skipped": self.chunks_skipped,
+            "bytes_skipped": self.bytes_skipped,
+            "seconds_saved": self.chunks_skipped * per_chunk,
+        }
+
+    def format_report(self):
+        """
+        Describe the savings in one line.
+
+        Returns:
+            str: e.g. "Skipped 3 duplicate files: 42 chunks, 120.5 KB of text,
+                ~6.3 s of embedding.", or an empty string if none were found.
+        """
+        report = self.report()
+        if not report["duplicates"]:
+            return ""
+        return (
+            f"Skipped {report['duplicates']} duplicate files: {report['chunks_skipped']} chunks, "
+            f"{report['bytes_skipped'] / 1024:.1f} KB of text, "
+            f"~{report['seconds_saved']:.1f} s of embedding."
+        )
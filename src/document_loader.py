@@ -1,9 +1,18 @@
-from pypdf import PdfReader
-from docx import Document
-from odf.opendocument import load
-from odf import text, teletype
+"""
+Text extraction for the supported document formats.
 
+Each format's parser is imported the first time a file of that format is
+loaded, so scanning or indexing plain text never pays for pypdf. DOCX and ODT
+files are read by streaming their XML parts with expat rather than through
+python-docx or odfpy, which build the whole document in memory first.
+"""
 
+import re
+
+from metrics import metrics
+
+
+@metrics.timed("load.txt")
 def load_txt(filepath):
     """
     Load and extract text content from a TXT file.
@@ -26,6 +35,7 @@ def load_txt(filepath):
     return ""
 
 
+@metrics.timed("load.pdf")
 def load_pdf(filepath):
     """
     Load and extract text content from a PDF file.
@@ -36,6 +46,8 @@ def load_pdf(filepath):
     Returns:
         str: The extracted text content from all pages
     """
+    from pypdf import PdfReader
+
     try:
         reader = PdfReader(filepath)
         content = "\n".join(page.extract_text() or "" for page in reader.pages)
@@ -49,6 +61,241 @@ def load_pdf(filepath):
     return ""
 
 
+# XML namespaces of the OOXML and ODF parts that hold document text
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+MC = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+ODF_TEXT = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+ODF_TABLE = "urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+ODF_OFFICE = "urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+ODF_STYLE = "urn:oasis:names:tc:opendocument:xmlns:style:1.0"
+
+# Bytes of a zipped XML part decompressed and parsed at a time
+XML_BLOCK_SIZE = 1 << 16
+
+
+class _XmlText:
+    """
+    Paragraph and table-cell text of an XML part, collected by an expat parser.
+
+    A format is described by sets of namespaced tag names ("<uri> <local>"):
+
+    - paragraphs: each becomes one block of text
+    - cells: table cells; their paragraphs become one block
+    - groups: notes, headers and footers; their paragraphs become one block,
+      and a note inside a paragraph is emitted after the part's other text
+    - text: elements whose character data is text; None means any character
+      data inside a paragraph
+    - characters: empty elements standing for characters, such as tabs
+    - skipped: elements whose content is not document text
+
+    Args:
+        rules (dict): The tag sets above.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.blocks = []
+        self.notes = []
+        # Text of the open paragraphs, innermost last
+        self.paragraphs = []
+        # Blocks of the open cells and groups, innermost last
+        self.containers = []
+        self.text_depth = 0
+        self.skip_depth = 0
+
+    def _finish(self, text, keep_empty):
+        if self.containers:
+            self.containers[-1].append(text)
+        elif text or keep_empty:
+            self.blocks.append(text)
+
+    def start(self, name, attributes):
+        rules = self.rules
+        if self.skip_depth or name in rules["skipped"]:
+            self.skip_depth += 1
+        elif name in rules["paragraphs"]:
+            self.paragraphs.append([])
+        elif name in rules["cells"] or name in rules["groups"]:
+            self.containers.append([])
+        elif name in rules["characters"] and self.paragraphs:
+            self.paragraphs[-1].append(rules["characters"][name](attributes))
+        elif rules["text"] is not None and name in rules["text"]:
+            self.text_depth += 1
+
+    def end(self, name):
+        rules = self.rules
+        if self.skip_depth:
+            self.skip_depth -= 1
+        elif name in rules["paragraphs"]:
+            # Empty paragraphs are kept as blank lines between paragraphs
+            self._finish("".join(self.paragraphs.pop()), keep_empty=True)
+        elif name in rules["cells"]:
+            self._finish("\n".join(filter(None, self.containers.pop())), keep_empty=False)
+        elif name in rules["groups"]:
+            text = "\n".join(filter(None, self.containers.pop()))
+            if text and self.paragraphs:
+                self.notes.append(text)
+            else:
+                self._finish(text, keep_empty=False)
+        elif rules["text"] is not None and name in rules["text"]:
+            self.text_depth -= 1
+
+    def characters(self, data):
+        if self.skip_depth or not self.paragraphs:
+            return
+        if self.rules["text"] is None or self.text_depth:
+            self.paragraphs[-1].append(data)
+
+
+def _reject_doctype(*args):
+    # Office documents have no DTD; refusing one rules out entity expansion
+    raise ValueError("XML parts with a document type declaration are not supported")
+
+
+def _iter_xml_text(archive, member, rules):
+    """
+    Stream the text blocks of one XML part of a zip archive.
+
+    The part is decompressed and parsed XML_BLOCK_SIZE bytes at a time, and no
+    element tree is built, so memory does not grow with the document.
+
+    Args:
+        archive (zipfile.ZipFile): The open document archive.
+        member (str): Name of the XML part.
+        rules (dict): Tag sets of the format (see _XmlText).
+
+    Yields:
+        str: Paragraphs, table cells, notes, headers and footers in document order.
+    """
+    from xml.parsers import expat
+
+    collector = _XmlText(rules)
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.StartElementHandler = collector.start
+    parser.EndElementHandler = collector.end
+    parser.CharacterDataHandler = collector.characters
+    parser.StartDoctypeDeclHandler = _reject_doctype
+    parser.buffer_text = True
+
+    with archive.open(member) as stream:
+        while True:
+            data = stream.read(XML_BLOCK_SIZE)
+            parser.Parse(data, not data)
+            yield from collector.blocks
+            collector.blocks.clear()
+            if not data:
+                break
+    yield from collector.notes
+
+
+def _unique(blocks):
+    seen = set()
+    for block in blocks:
+        if block not in seen:
+            seen.add(block)
+            yield block
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+DOCX_RULES = {
+    "paragraphs": {f"{W} p"},
+    "cells": {f"{W} tc"},
+    "groups": {f"{W} footnote", f"{W} endnote", f"{W} hdr", f"{W} ftr"},
+    "text": {f"{W} t"},
+    "characters": {
+        f"{W} tab": lambda attributes: "\t",
+        f"{W} br": lambda attributes: "\n",
+        f"{W} cr": lambda attributes: "\n",
+        f"{W} noBreakHyphen": lambda attributes: "-",
+    },
+    # Fallback copies of text boxes already read from their modern version
+    "skipped": {f"{MC} Fallback"},
+}
+
+ODT_RULES = {
+    "paragraphs": {f"{ODF_TEXT} p", f"{ODF_TEXT} h"},
+    "cells": {f"{ODF_TABLE} table-cell"},
+    "groups": {
+        f"{ODF_TEXT} note-body",
+        f"{ODF_STYLE} header",
+        f"{ODF_STYLE} header-left",
+        f"{ODF_STYLE} header-first",
+        f"{ODF_STYLE} footer",
+        f"{ODF_STYLE} footer-left",
+        f"{ODF_STYLE} footer-first",
+    },
+    "text": None,
+    "characters": {
+        f"{ODF_TEXT} tab": lambda attributes: "\t",
+        f"{ODF_TEXT} line-break": lambda attributes: "\n",
+        f"{ODF_TEXT} s": lambda attributes: " " * int(attributes.get(f"{ODF_TEXT} c", 1)),
+    },
+    # Comments and the deleted text of tracked changes
+    "skipped": {f"{ODF_OFFICE} annotation", f"{ODF_TEXT} tracked-changes"},
+}
+
+
+def iter_docx_text(filepath):
+    """
+    Stream the text of a DOCX file without building its document model.
+
+    Reads word/document.xml, then the footnotes, endnotes, headers and footers,
+    straight out of the zip archive. Headers and footers repeated across
+    sections are returned once.
+
+    Args:
+        filepath (str): Path to the .docx file
+
+    Yields:
+        str: Paragraphs (empty ones included) and table cells in document
+            order, then each footnote, endnote, header and footer.
+    """
+    import zipfile
+
+    with zipfile.ZipFile(filepath) as archive:
+        names = set(archive.namelist())
+        yield from _iter_xml_text(archive, "word/document.xml", DOCX_RULES)
+        for member in ("word/footnotes.xml", "word/endnotes.xml"):
+            if member in names:
+                yield from _iter_xml_text(archive, member, DOCX_RULES)
+        members = [
+            name
+            for prefix in ("word/header", "word/footer")
+            for name in sorted(names, key=_natural_key)
+            if name.startswith(prefix) and name.endswith(".xml")
+        ]
+        yield from _unique(
+            block for member in members for block in _iter_xml_text(archive, member, DOCX_RULES)
+        )
+
+
+def iter_odt_text(filepath):
+    """
+    Stream the text of an ODT file without building its document model.
+
+    Reads content.xml, then the headers and footers in styles.xml, straight
+    out of the zip archive. Headers and footers shared by several page styles
+    are returned once.
+
+    Args:
+        filepath (str): Path to the .odt file
+
+    Yields:
+        str: Headings, paragraphs (empty ones included) and table cells in
+            document order, then the footnotes, headers and footers.
+    """
+    import zipfile
+
+    with zipfile.ZipFile(filepath) as archive:
+        yield from _iter_xml_text(archive, "content.xml", ODT_RULES)
+        if "styles.xml" in archive.namelist():
+            yield from _unique(_iter_xml_text(archive, "styles.xml", ODT_RULES))
+
+
+@metrics.timed("load.docx")
 def load_docx(filepath):
     """
     Load and extract text content from a DOCX file.
@@ -57,12 +304,11 @@ def load_docx(filepath):
         filepath (str): Path to the .docx file
 
     Returns:
-        str: The extracted text content from all paragraphs
+        str: The paragraphs, table cells, notes, headers and footers, one per
+            line (see iter_docx_text)
     """
     try:
-        document = Document(filepath)
-        content = "\n".join([p.text for p in document.paragraphs])
-        return content
+        return "\n".join(iter_docx_text(filepath))
     except FileNotFoundError:
         print("The file does not exist. Please check the path or select another file.")
     except PermissionError:
@@ -72,6 +318,7 @@ def load_docx(filepath):
     return ""
 
 
+@metrics.timed("load.odt")
 def load_odt(filepath):
     """
     Load and extract text content from an ODT file.
@@ -80,16 +327,11 @@ def load_odt(filepath):
         filepath (str): Path to the .odt file
 
     Returns:
-        str: The extracted text content from all paragraphs
+        str: The headings, paragraphs, table cells, notes, headers and footers,
+            one per line (see iter_odt_text)
     """
     try:
-        document = load(filepath)
-
-        all_paragraphs = [
-            teletype.extractText(p) for p in document.getElementsByType(text.P)
-        ]
-        content = "\n".join(all_paragraphs)
-        return content
+        return "\n".join(iter_odt_text(filepath))
     except FileNotFoundError:
         print("The file does not exist. Please check the path or select another file.")
     except PermissionError:
@@ -97,3 +339,12 @@ def load_odt(filepath):
     except Exception:
         print("An unexpected error occurred while trying to read the file.")
     return ""
+
+
+# Map file extensions to their loader functions
+LOADERS = {".txt": load_txt, ".pdf": load_pdf, ".docx": load_docx, ".odt": load_odt}
+
+# Version of each loader's output, part of the text cache key (see text_cache):
+# bump it when a loader extracts different text so cached text is re-extracted.
+# Plain text is read directly and not cached.
+LOADER_VERSIONS = {".pdf": 1, ".docx": 2, ".odt": 2}
@@ -0,0 +1,294 @@
+"""
+Local sentence embeddings with configurable batching and threading.
+
+Collections used to rely on Chroma's implicit default embedder, which runs
+all-MiniLM-L6-v2 through ONNX Runtime with fixed settings: batches of 32 texts
+each padded to 256 tokens, and ONNX Runtime's default thread pools.
+LocalEmbeddingFunction runs the same model, or another ONNX export such as a
+quantized one, with:
+
+- batch_size: texts per model call
+- threads: ONNX Runtime intra-op threads (0 lets it decide)
+- max_length: tokens per text; longer texts are truncated, and each batch is
+  padded only to its longest text, sorted by length to keep padding small
+- model_path: a local folder holding model.onnx (or any .onnx file) and
+  tokenizer.json
+
+Batch size, threads and padding do not change the vectors; the model does. Every
+collection records the id of the model that embedded it, and
+vector_store.create_collection refuses to open it with another one, so query
+and document embeddings always match.
+"""
+
+import hashlib
+import os
+import threading
+
+from utils import env_number
+
+# Model of Chroma's default embedder, which every collection used before models
+# were recorded; collections without a recorded model were embedded with it
+DEFAULT_MODEL_ID = "all-MiniLM-L6-v2"
+
+# Model names other code recorded for the default embedder
+_DEFAULT_MODEL_ALIASES = ("default", "onnx_mini_lm_l6_v2")
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_THREADS = 0
+DEFAULT_MAX_LENGTH = 256
+
+# Process-wide embedder configured from the environment
+_default = None
+_default_lock = threading.Lock()
+# Model ids of local model files, by path
+_file_ids = {}
+
+
+class EmbeddingModelError(ValueError):
+    """Raised when a collection was embedded with another model than the configured one."""
+
+
+def _file_model_id(model_file):
+    """Name a model file by its file name and content hash."""
+    if model_file not in _file_ids:
+        digest = hashlib.sha256()
+        with open(model_file, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        name = os.path.splitext(os.path.basename(model_file))[0]
+        _file_ids[model_file] = f"{name}-{digest.hexdigest()[:12]}"
+    return _file_ids[model_file]
+
+
+def embedding_model_id(embedding_function):
+    """
+    Return the id of the model behind an embedding function.
+
+    Args:
+        embedding_function: A LocalEmbeddingFunction, or any Chroma-style
+            embedding function (identified by its name()).
+
+    Returns:
+        str | None: The model id, or None for None.
+    """
+    if embedding_function is None:
+        return None
+    model_id = getattr(embedding_function, "model_id", None)
+    if model_id is None:
+        name = getattr(embedding_function, "name", None)
+        model_id = name() if callable(name) else type(embedding_function).__name__
+    return DEFAULT_MODEL_ID if model_id in _DEFAULT_MODEL_ALIASES else model_id
+
+
+class LocalEmbeddingFunction:
+    """
+    Sentence embeddings from an ONNX model run in process with ONNX Runtime.
+
+    Vectors are mean-pooled over the tokens and unit-normalized, as in
+    sentence-transformers. The model is loaded on first use.
+
+    Args:
+        model_path (str | None): Folder holding model.onnx and tokenizer.json,
+            or an .onnx file next to tokenizer.json. None uses all-MiniLM-L6-v2,
+            downloaded by Chroma on first use.
+        batch_size (int): Texts per model call.
+        threads (int): ONNX Runtime intra-op threads; 0 lets it decide.
+        max_length (int): Tokens per text; longer texts are truncated.
+        model_id (str | None): Id recorded on collections; defaults to
+            DEFAULT_MODEL_ID, or the model file's name and content hash.
+    """
+
+    def __init__(
+        self,
+        model_path=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        threads=DEFAULT_THREADS,
+        max_length=DEFAULT_MAX_LENGTH,
+        model_id=None,
+    ):
+        self.model_path = model_path
+        self.batch_size = max(1, batch_size)
+        self.threads = max(0, threads)
+        self.max_length = max(1, max_length)
+        self._model_id = model_id
+        self._session = None
+        self._tokenizer = None
+        self._input_names = ()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Worker processes load their own session
+        state = dict(self.__dict__)
+        state.update(_session=None, _tokenizer=None, _input_names=(), _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def name():
+        return "local_onnx"
+
+    @property
+    def model_id(self):
+        if self._model_id is None:
+            model_file = self._files()[0] if self.model_path else None
+            self._model_id = _file_model_id(model_file) if model_file else DEFAULT_MODEL_ID
+        return self._model_id
+
+    def _files(self):
+        """Return the model and tokenizer files."""
+        if self.model_path is None:
+            from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+            default = ONNXMiniLM_L6_V2()
+            default._download_model_if_not_exists()
+            folder = os.path.join(default.DOWNLOAD_PATH, default.EXTRACTED_FOLDER_NAME)
+            model_file = os.path.join(folder, "model.onnx")
+        elif os.path.isdir(self.model_path):
+            folder = self.model_path
+            model_file = os.path.join(folder, "model.onnx")
+        else:
+            folder = os.path.dirname(self.model_path)
+            model_file = self.model_path
+        return model_file, os.path.join(folder, "tokenizer.json")
+
+    def _load(self):
+        with self._lock:
+            if self._session is not None:
+                return
+            import onnxruntime
+            from tokenizers import Tokenizer
+
+            model_file, tokenizer_file = self._files()
+            tokenizer = Tokenizer.from_file(tokenizer_file)
+            tokenizer.enable_truncation(max_length=self.max_length)
+            # Without a length, batches are padded to their longest text
+            tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+            options = onnxruntime.SessionOptions()
+            options.log_severity_level = 3
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = self.threads
+            providers = [
+                provider
+                for provider in onnxruntime.get_available_providers()
+                # Slower than the CPU provider for this model size
+                if provider != "CoreMLExecutionProvider"
+            ]
+            session = onnxruntime.InferenceSession(
+                model_file, sess_options=options, providers=providers
+            )
+            self._input_names = {model_input.name for model_input in session.get_inputs()}
+            self._tokenizer = tokenizer
+            self._session = session
+
+    def _embed_batch(self, texts):
+        import numpy as np
+
+        encoded = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self._session.run(None, inputs)[0]
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def __call__(self, input):
+        """
+        Embed texts.
+
+        Args:
+            input (list[str]): The texts.
+
+        Returns:
+            list[np.ndarray]: One float32 vector per text, in input order.
+        """
+        import numpy as np
+
+        texts = list(input)
+        if not texts:
+            return []
+        self._load()
+        # Similar lengths share a batch, so little padding is computed
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            positions = order[start : start + self.batch_size]
+            batch = self._embed_batch([texts[i] for i in positions])
+            for position, vector in zip(positions, batch):
+                vectors[position] = vector
+        return [np.asarray(vector) for vector in vectors]
+
+    def embed_query(self, input):
+        """Embed questions; the same as embedding documents for this model."""
+        return self(input)
+
+
+def embedding_from_environment():
+    """
+    Create an embedding function from the environment.
+
+    Reads EMBEDDING_MODEL_PATH, EMBEDDING_MODEL_ID, EMBEDDING_BATCH_SIZE,
+    EMBEDDING_THREADS and EMBEDDING_MAX_LENGTH.
+
+    Returns:
+        LocalEmbeddingFunction: The configured embedder.
+    """
+    return LocalEmbeddingFunction(
+        model_path=os.getenv("EMBEDDING_MODEL_PATH") or None,
+        batch_size=env_number("EMBEDDING_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+        threads=env_number("EMBEDDING_THREADS", DEFAULT_THREADS),
+        max_length=env_number("EMBEDDING_MAX_LENGTH", DEFAULT_MAX_LENGTH),
+        model_id=os.getenv("EMBEDDING_MODEL_ID") or None,
+    )
+
+
+def default_embedding_function():
+    """
+    Return the process-wide embedder, created from the environment on first use.
+
+    Returns:
+        LocalEmbeddingFunction: The shared embedder; its model is loaded once.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = embedding_from_environment()
+        return _default
+
+
+def check_embedding_model(collection, embedding_function):
+    """
+    Make sure a collection is queried with the model that embedded it.
+
+    An empty collection adopts the configured model.
+
+    Args:
+        collection: The collection; its metadata's "embedding_model" names the
+            model, and collections without one were embedded with
+            DEFAULT_MODEL_ID.
+        embedding_function: The embedding function about to be used.
+
+    Raises:
+        EmbeddingModelError: If the models differ.
+    """
+    metadata = collection.metadata or {}
+    recorded = metadata.get("embedding_model") or DEFAULT_MODEL_ID
+    configured = embedding_model_id(embedding_function)
+    if recorded == configured:
+        return
+    if not collection.count():
+        collection.modify(metadata={**metadata, "embedding_model": configured})
+    else:
+        raise EmbeddingModelError(
+            f"Collection '{collection.name}' was embedded with model '{recorded}', "
+            f"but '{configured}' is configured. Restore the EMBEDDING_MODEL_PATH "
+            "setting it was built with, or delete the collection and index it again."
+        )
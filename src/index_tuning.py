@@ -0,0 +1,224 @@
+"""
+Sweep HNSW index parameters on a sample of a collection.
+
+Each candidate setting builds a throwaway in-memory Chroma collection from the
+sampled embeddings and is scored by recall@k against exact NumPy search and by
+query latency. Held-out sample vectors serve as queries, so the sweep reflects
+the real embedding distribution without calling the embedding model.
+
+Chroma caches a loaded index with the ef_search it was built with, so every
+combination gets its own build; keep the sample and grid small.
+"""
+
+import time
+import uuid
+
+import numpy as np
+
+from vector_store import get_index_params
+
+# Values tried for each parameter unless a grid is passed to tune_index
+DEFAULT_GRID = {
+    "max_neighbors": (8, 16, 32),
+    "ef_construction": (64, 128, 256),
+    "ef_search": (10, 20, 40, 80, 160),
+}
+
+# Rows added to a trial collection per call
+BUILD_BATCH = 1000
+
+
+def sample_embeddings(collection, size, seed=0):
+    """
+    Draw a random sample of stored embeddings.
+
+    Args:
+        collection: The collection to sample.
+        size (int): Maximum number of embeddings.
+        seed (int): Seed of the random sample.
+
+    Returns:
+        np.ndarray: (n, dim) float32 embeddings, n <= size.
+    """
+    ids = collection.get(include=[])["ids"]
+    if len(ids) > size:
+        rng = np.random.default_rng(seed)
+        ids = [ids[i] for i in sorted(rng.choice(len(ids), size=size, replace=False))]
+
+    vectors = []
+    for start in range(0, len(ids), BUILD_BATCH):
+        batch = collection.get(ids=ids[start : start + BUILD_BATCH], include=["embeddings"])
+        vectors.extend(batch["embeddings"])
+    return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+
+
+def exact_neighbours(corpus, queries, k, space="l2"):
+    """
+    Find the true k nearest corpus rows of each query.
+
+    Args:
+        corpus (np.ndarray): (n, dim) vectors.
+        queries (np.ndarray): (q, dim) vectors.
+        k (int): Number of neighbours.
+        space (str): "l2", "cosine" or "ip", as in Chroma.
+
+    Returns:
+        np.ndarray: (q, k) corpus row indices, nearest first.
+    """
+    if space == "cosine":
+        corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    if space == "l2":
+        distances = (corpus**2).sum(axis=1) - 2 * queries @ corpus.T
+    else:
+        distances = -(queries @ corpus.T)
+    return np.argsort(distances, axis=1, kind="stable")[:, :k]
+
+
+def evaluate_params(corpus, queries, truth, params, k=10):
+    """
+    Build a trial index with the given settings and measure it.
+
+    Args:
+        corpus (np.ndarray): (n, dim) vectors to index.
+        queries (np.ndarray): (q, dim) query vectors.
+        truth (np.ndarray): (q, k) exact neighbours from exact_neighbours().
+        params (dict): HNSW settings (see vector_store.INDEX_PARAMS).
+        k (int): Number of results per query.
+
+    Returns:
+        dict: The params plus recall, p50_ms, p95_ms and build_s.
+    """
+    import chromadb
+
+    client = chromadb.EphemeralClient()
+    name = f"tune-{uuid.uuid4().hex}"
+    collection = client.create_collection(
+        name=name, configuration={"hnsw": dict(params)}, embedding_function=None
+    )
+    try:
+        start = time.perf_counter()
+        for offset in range(0, len(corpus), BUILD_BATCH):
+            batch = corpus[offset : offset + BUILD_BATCH]
+            collection.add(
+                ids=[str(offset + i) for i in range(len(batch))], embeddings=batch
+            )
+        build_s = time.perf_counter() - start
+
+        hits, latencies = 0, []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[query], n_results=k, include=[])
+            latencies.append(time.perf_counter() - start)
+            hits += len(set(map(int, result["ids"][0])) & set(expected.tolist()))
+    finally:
+        client.delete_collection(name)
+
+    return {
+        **params,
+        "recall": hits / truth.size if truth.size else 0.0,
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+        "build_s": build_s,
+    }
+
+
+def recommend(results, target_recall):
+    """
+    Pick the fastest setting that reaches the target recall.
+
+    Args:
+        results (list[dict]): Outputs of evaluate_params().
+        target_recall (float): Minimum acceptable recall.
+
+    Returns:
+        dict | None: The setting with the lowest p95 (then build time) among those
+            meeting the target, or the highest-recall one if none does.
+    """
+    if not results:
+        return None
+    passing = [result for result in results if result["recall"] >= target_recall]
+    if passing:
+        return min(passing, key=lambda result: (result["p95_ms"], result["build_s"]))
+    return max(results, key=lambda result: (result["recall"], -result["p95_ms"]))
+
+
+def tune_index(
+    collection,
+    target_recall=0.95,
+    sample_size=5000,
+    n_queries=200,
+    k=10,
+    grid=None,
+    seed=0,
+    progress=None,
+):
+    """
+    Sweep HNSW settings on a sample of a collection and recommend one.
+
+    Args:
+        collection: The Chroma collection to tune.
+        target_recall (float): Minimum recall@k the recommendation must reach.
+        sample_size (int): Number of stored embeddings sampled (queries included).
+        n_queries (int): Sampled embeddings held out as queries.
+        k (int): Number of results per query.
+        grid (dict | None): Values to try per parameter; defaults to DEFAULT_GRID.
+        seed (int): Seed of the sample.
+        progress (callable | None): Called with each result as it is measured.
+
+    Returns:
+        dict: "space", "sample" and "queries" sizes, every "results" row and the
+            "recommended" one (None if the collection is too small).
+    """
+    space = get_index_params(collection).get("space", "l2")
+    vectors = sample_embeddings(collection, sample_size, seed)
+    n_queries = min(n_queries, len(vectors) // 2)
+    queries, corpus = vectors[:n_queries], vectors[n_queries:]
+    report = {"space": space, "sample": len(corpus), "queries": n_queries, "results": []}
+    if not n_queries or len(corpus) < k:
+        report["recommended"] = None
+        return report
+
+    truth = exact_neighbours(corpus, queries, k, space)
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    for max_neighbors in grid["max_neighbors"]:
+        for ef_construction in grid["ef_construction"]:
+            for ef_search in grid["ef_search"]:
+                params = {
+                    "space": space,
+                    "max_neighbors": max_neighbors,
+                    "ef_construction": ef_construction,
+                    "ef_search": max(ef_search, k),
+                }
+                result = evaluate_params(corpus, queries, truth, params, k)
+                report["results"].append(result)
+                if progress:
+                    progress(result)
+
+    report["recommended"] = recommend(report["results"], target_recall)
+    return report
+
+
+def format_result(result):
+    """
+    Render one tuning result as a table row.
+
+    Args:
+        result (dict): Output of evaluate_params().
+
+    Returns:
+        str: The row, aligned with format_header().
+    """
+    return (
+        f"{result['max_neighbors']:>5} {result['ef_construction']:>8} "
+        f"{result['ef_search']:>7} {result['recall']:>7.3f} {result['p50_ms']:>7.2f} "
+        f"{result['p95_ms']:>7.2f} {result['build_s']:>8.2f}"
+    )
+
+
+def format_header():
+    """Column titles for format_result() rows."""
+    return (
+        f"{'M':>5} {'ef_cons':>8} {'ef_srch':>7} {'recall':>7} {'p50 ms':>7} "
+        f"{'p95 ms':>7} {'build s':>8}"
+    )
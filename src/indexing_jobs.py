@@ -0,0 +1,325 @@
+"""
+Background indexing jobs shared by every session of the Streamlit app.
+
+Indexing runs in a worker thread instead of the script run, so the UI stays
+responsive and chat works over the documents indexed so far (add_chunks bumps
+the collection version, so cached results never hide new chunks). Jobs are kept
+per process and keyed by folder path or ZIP contents: a second session, or the
+same browser after a refresh, loading the same documents attaches to the
+running job instead of starting another one.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from dedup import Deduplicator
+from document_loader import LOADERS
+from path_index import build_path_index, normalize_path, path_index_directory
+from profiling import profile_run
+from text_cache import default_text_cache
+from vector_store import (
+    create_collection,
+    migrate_collection,
+    optimize_collection,
+)
+
+RUNNING, DONE, FAILED = "running", "done", "failed"
+
+# Every job started in this process, by key
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def folder_key(folder_path):
+    """
+    Return the job key of a local folder.
+
+    Args:
+        folder_path (str): The documents folder.
+
+    Returns:
+        str: Key shared by every spelling of the same folder.
+    """
+    return "folder:" + normalize_path(os.path.abspath(folder_path))
+
+
+def zip_key(data):
+    """
+    Return the job key of an uploaded ZIP file.
+
+    Args:
+        data (bytes): The ZIP file contents.
+
+    Returns:
+        str: Key derived from a SHA-256 of the contents, so re-uploads of the
+            same archive share a job whatever the file is called.
+    """
+    return "zip:" + hashlib.sha256(data).hexdigest()
+
+
+class IndexingJob:
+    """
+    Index a list of files into a collection in a background thread.
+
+    Args:
+        key (str): The job key (see folder_key and zip_key).
+        path (str): Folder path or ZIP name the collection is named after.
+        files (list[str]): Scanned file paths to index.
+        source_dir (str | None): Folder holding the files, e.g. the ZIP's
+            extraction folder, so attaching sessions can reuse it.
+        backend (str | None): Vector store backend (see vector_store.BACKENDS).
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+        embedding_function (callable | None): Embedding function to use instead
+            of the backend default.
+        path_index_dir (str | None): Folder where the path index is saved;
+            defaults to the path index folder of the store.
+        text_cache (TextCache | None): Cache of extracted text; defaults to
+            text_cache.default_text_cache().
+        profile (bool): Profile the indexing thread; the artifacts are in
+            profile_run once the job finishes.
+    """
+
+    def __init__(
+        self,
+        key,
+        path,
+        files,
+        source_dir=None,
+        backend=None,
+        directory=None,
+        embedding_function=None,
+        path_index_dir=None,
+        text_cache=None,
+        profile=False,
+    ):
+        self.key = key
+        self.path = path
+        self.files = list(files)
+        self.source_dir = source_dir
+        self.backend = backend
+        self.directory = directory
+        self.embedding_function = embedding_function
+        self.path_index_dir = path_index_dir or path_index_directory(directory)
+        self.text_cache = text_cache or default_text_cache()
+        self.profile = profile
+        self.profile_run = None
+        self.collection = None
+        self.dedup = None
+        self.path_index = None
+
+        self._lock = threading.Lock()
+        self._state = RUNNING
+        self._files_done = 0
+        self._chunks = 0
+        self._current = None
+        self._errors = []
+        self._started = None
+        self._finished = None
+        self._thread = None
+
+    def start(self):
+        """
+        Open the collection and start indexing in the background.
+
+        The collection is opened before returning, so storage errors reach the
+        caller and chat can start right away.
+
+        Returns:
+            IndexingJob: self, for chaining.
+        """
+        self.collection = create_collection(
+            self.path,
+            backend=self.backend,
+            embedding_function=self.embedding_function,
+            directory=self.directory,
+        )
+        migrate_collection(self.collection)
+        self.dedup = Deduplicator(self.collection)
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="indexing-job", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        """
+        Block until the job finishes.
+
+        Args:
+            timeout (float | None): Seconds to wait at most.
+
+        Returns:
+            bool: True if the job finished.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.running
+
+    def status(self):
+        """
+        Return a snapshot of the job's progress.
+
+        Returns:
+            dict: The "state" (running, done or failed), "files_done",
+                "files_total", "chunks", "current" file, "seconds" elapsed,
+                "files_per_second", "chunks_per_second", "eta_seconds" (None
+                until a file has finished), "duplicates" skipped and per-file
+                "errors".
+        """
+        with self._lock:
+            end = self._finished or time.perf_counter()
+            seconds = end - self._started if self._started else 0.0
+            files_done, chunks = self._files_done, self._chunks
+            status = {
+                "state": self._state,
+                "files_done": files_done,
+                "files_total": len(self.files),
+                "chunks": chunks,
+                "current": self._current,
+                "seconds": seconds,
+                "duplicates": len(self.dedup.aliases) if self.dedup else 0,
+                "errors": list(self._errors),
+            }
+        status["files_per_second"] = files_done / seconds if seconds else 0.0
+        status["chunks_per_second"] = chunks / seconds if seconds else 0.0
+        if status["state"] != RUNNING:
+            status["eta_seconds"] = 0.0
+        elif files_done:
+            status["eta_seconds"] = (len(self.files) - files_done) * seconds / files_done
+        else:
+            status["eta_seconds"] = None
+        return status
+
+    def release(self):
+        """
+        Drop the finished job's collection handle and duplicate fingerprints.
+
+        Called when the resource manager unloads the collection; the status,
+        errors and duplicate report stay available.
+        """
+        if self.running:
+            return
+        self.collection = None
+        if self.dedup is not None:
+            self.dedup.release()
+
+    def _run(self):
+        with profile_run("index", enabled=self.profile) as run:
+            state = self._index_all()
+        self.profile_run = run
+        self.text_cache.save_stats()
+
+        with self._lock:
+            self._state = state
+            self._current = None
+            self._finished = time.perf_counter()
+
+    def _index_all(self):
+        try:
+            for file in self.files:
+                with self._lock:
+                    self._current = file
+                chunks = self._index_file(file)
+                with self._lock:
+                    self._files_done += 1
+                    self._chunks += chunks
+
+            # Fit stored-vector compression, if configured for the backend
+            optimize_collection(self.collection)
+
+            # Build the path index used to answer file-listing questions
+            try:
+                self.path_index = build_path_index(
+                    self.files, self.collection.name, self.path_index_dir
+                )
+            except OSError:
+                self._error(
+                    "Warning: Could not index file names. You can still search document content."
+                )
+        except Exception as error:
+            self._error(f"Indexing failed: {error}")
+            return FAILED
+        return DONE
+
+    def _index_file(self, file):
+        loader = LOADERS.get(os.path.splitext(file)[1])
+        if loader is None:
+            self._error(f"File {file} not supported. Skipping.")
+            return 0
+
+        text = self.text_cache.load(file, loader)
+        try:
+            # Copies of a file already indexed are recorded as aliases, not embedded
+            return self.dedup.index(file, text)
+        except Exception:
+            self._error(f"Error processing file {file}. Skipping.")
+            return 0
+
+    def _error(self, message):
+        with self._lock:
+            self._errors.append(message)
+
+
+def get_job(key):
+    """
+    Return the latest job started for a key.
+
+    Args:
+        key (str): The job key.
+
+    Returns:
+        IndexingJob | None: The job, running or finished, or None.
+    """
+    with _jobs_lock:
+        return _jobs.get(key)
+
+
+def start_indexing(key, path, files, source_dir=None, **options):
+    """
+    Attach to the running job for a key, or start a new one.
+
+    Finished jobs are replaced, so loading the same documents again re-indexes
+    them as before.
+
+    Args:
+        key (str): The job key (see folder_key and zip_key).
+        path (str): Folder path or ZIP name the collection is named after.
+        files (list[str]): Scanned file paths to index.
+        source_dir (str | None): Folder holding the files.
+        **options: Further IndexingJob arguments for a new job.
+
+    Returns:
+        IndexingJob: The running job.
+    """
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None or not job.running:
+            job = IndexingJob(key, path, files, source_dir, **options).start()
+            _jobs[key] = job
+        return job
+
+
+def format_status(status):
+    """
+    Describe a job's progress in one line.
+
+    Args:
+        status (dict): The result of IndexingJob.status().
+
+    Returns:
+        str: e.g. "12/40 files, 310 chunks (4.1 files/s, 105 chunks/s), about 7 s left".
+    """
+    line = (
+        f"{status['files_done']}/{status['files_total']} files, {status['chunks']} chunks "
+        f"({status['files_per_second']:.1f} files/s, {status['chunks_per_second']:.0f} chunks/s)"
+    )
+    if status.get("duplicates"):
+        line += f", {status['duplicates']} duplicates skipped"
+    if status["state"] == RUNNING and status["eta_seconds"] is not None:
+        line += f", about {status['eta_seconds']:.0f} s left"
+    return line
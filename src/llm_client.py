@@ -0,0 +1,345 @@
+"""
+Rate-limited, retrying access to the language model.
+
+LLMClient wraps the model returned by set_llm and is shared by every caller in
+the process (every CLI question, every Streamlit session):
+
+- token buckets keep requests and prompt tokens per minute under the quota
+- a concurrency cap bounds the upstream calls in flight
+- rate-limit and transient errors are retried with jittered exponential
+  backoff, honouring the server's retry hint when it sends one
+- identical prompts already in flight are coalesced, so concurrent duplicate
+  questions share one upstream call and its answer
+
+Failures surface as LLMError instead of exiting the process.
+"""
+
+import os
+import random
+import re
+import threading
+import time
+
+from metrics import metrics
+from utils import env_number, estimate_tokens
+
+# Defaults, overridable from the environment (see client_from_environment)
+REQUESTS_PER_MINUTE = 10
+TOKENS_PER_MINUTE = 250_000
+MAX_CONCURRENCY = 4
+MAX_RETRIES = 5
+
+# Backoff before retry n is about BASE_DELAY * 2**n seconds, capped at MAX_DELAY
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Phrases of errors worth retrying when the exception carries no status code
+RETRYABLE_PHRASES = (
+    "429",
+    "rate limit",
+    "quota",
+    "resource exhausted",
+    "resource_exhausted",
+    "unavailable",
+    "deadline exceeded",
+    "timed out",
+    "timeout",
+)
+
+RATE_LIMIT_PHRASES = ("429", "rate limit", "quota", "resource exhausted", "resource_exhausted")
+
+# "Please retry in 12.5s." or "retry_delay { seconds: 12 }" in Gemini errors
+_RETRY_HINT = re.compile(r"retry in (\d+(?:\.\d+)?)\s*s|retry_delay\s*\{\s*seconds:\s*(\d+)", re.I)
+
+
+class LLMError(RuntimeError):
+    """Raised when the language model cannot produce an answer."""
+
+
+def _status(error):
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if callable(status):
+        # gRPC errors expose code() returning an enum
+        try:
+            status = status()
+        except Exception:
+            return None
+    status = getattr(status, "value", status)
+    if isinstance(status, tuple):
+        status = status[0]
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limit(error):
+    """
+    Check whether an error means the quota was exceeded.
+
+    Args:
+        error (Exception): Error raised by the model.
+
+    Returns:
+        bool: True for HTTP 429 or a quota/rate-limit message.
+    """
+    if _status(error) == 429:
+        return True
+    message = str(error).lower()
+    return any(phrase in message for phrase in RATE_LIMIT_PHRASES)
+
+
+def is_retryable(error):
+    """
+    Check whether a failed call is worth retrying.
+
+    Args:
+        error (Exception): Error raised by the model.
+
+    Returns:
+        bool: True for rate limits, timeouts, connection and server errors.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = _status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    message = str(error).lower()
+    return any(phrase in message for phrase in RETRYABLE_PHRASES)
+
+
+def retry_after(error):
+    """
+    Read the server's retry hint from an error, if any.
+
+    Args:
+        error (Exception): Error raised by the model.
+
+    Returns:
+        float | None: Seconds to wait before retrying.
+    """
+    hint = getattr(error, "retry_after", None)
+    if isinstance(hint, (int, float)):
+        return float(hint)
+    match = _RETRY_HINT.search(str(error))
+    if match:
+        return float(match.group(1) or match.group(2))
+    return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at a steady rate.
+
+    Callers reserve tokens up front and sleep off any deficit outside the lock,
+    so waiting callers are served in the order they arrived.
+
+    Args:
+        per_minute (float): Tokens added per minute.
+        capacity (float | None): Largest burst; defaults to one minute's worth.
+        clock (callable): Returns the current time in seconds.
+        sleep (callable): Waits for a number of seconds.
+    """
+
+    def __init__(self, per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """
+        Take tokens, waiting until the bucket can cover them.
+
+        Args:
+            amount (float): Tokens needed; more than the capacity counts as a
+                full bucket.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(amount, self.capacity)
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+class _Call:
+    """One upstream call that identical concurrent prompts wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMClient:
+    """
+    Rate-limited, retrying, coalescing wrapper around a LangChain model.
+
+    Args:
+        llm: Model with an invoke(prompt) method.
+        requests_per_minute (float | None): Request quota; None for no limit.
+        tokens_per_minute (float | None): Prompt token quota; None for no limit.
+        max_concurrency (int): Upstream calls allowed in flight at once.
+        max_retries (int): Retries of a retryable error before giving up.
+        base_delay (float): Backoff before the first retry, in seconds.
+        max_delay (float): Longest backoff, in seconds.
+        clock (callable): Returns the current time in seconds.
+        sleep (callable): Waits for a number of seconds.
+    """
+
+    def __init__(
+        self,
+        llm,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+        max_concurrency=MAX_CONCURRENCY,
+        max_retries=MAX_RETRIES,
+        base_delay=BASE_DELAY,
+        max_delay=MAX_DELAY,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.llm = llm
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.requests = (
+            TokenBucket(requests_per_minute, clock=clock, sleep=sleep)
+            if requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket(tokens_per_minute, clock=clock, sleep=sleep) if tokens_per_minute else None
+        )
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt):
+        """
+        Get the model's answer to a prompt.
+
+        Args:
+            prompt: A string or LangChain prompt value.
+
+        Returns:
+            str: The answer text.
+
+        Raises:
+            LLMError: If the call fails with a non-retryable error or still
+                fails after max_retries retries.
+        """
+        key = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+
+        if not leader:
+            metrics.count("llm_coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._call_with_retries(prompt, estimate_tokens(key))
+        except LLMError as error:
+            call.error = error
+            raise
+        except BaseException:
+            call.error = LLMError("The language model call was interrupted.")
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+    def backoff(self, attempt, error=None):
+        """
+        Return how long to wait before a retry.
+
+        Args:
+            attempt (int): Number of the failed attempt, from 0.
+            error (Exception | None): The error, checked for a retry hint.
+
+        Returns:
+            float: Seconds; the server's hint if given, otherwise an
+                exponential delay with jitter between half and all of it.
+        """
+        hint = retry_after(error) if error is not None else None
+        if hint is not None:
+            return min(hint, self.max_delay)
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _call_with_retries(self, prompt, prompt_tokens):
+        for attempt in range(self.max_retries + 1):
+            if self.requests:
+                self.requests.acquire(1)
+            if self.tokens:
+                self.tokens.acquire(prompt_tokens)
+            try:
+                with self._slots:
+                    metrics.count("llm_calls")
+                    result = self.llm.invoke(prompt)
+                # Chat models return a message, text models a string
+                return getattr(result, "content", result)
+            except Exception as error:
+                if not is_retryable(error) or attempt == self.max_retries:
+                    raise LLMError(describe_error(error)) from error
+                metrics.count("llm_retries")
+                self.sleep(self.backoff(attempt, error))
+
+
+def describe_error(error):
+    """
+    Explain a failed model call to the user.
+
+    Args:
+        error (Exception): Error raised by the model.
+
+    Returns:
+        str: A short message suggesting what to do.
+    """
+    if is_rate_limit(error):
+        return "The Gemini API rate limit was reached. Please wait a minute and try again."
+    return (
+        "Error calling Gemini API. This may be due to an invalid GEMINI_API_KEY "
+        f"in your .env file or network connection issues. ({type(error).__name__})"
+    )
+
+
+def client_from_environment(llm):
+    """
+    Wrap a model with the limits set in the environment.
+
+    Reads LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_CONCURRENCY
+    and LLM_MAX_RETRIES; 0 turns a per-minute limit off.
+
+    Args:
+        llm: Model with an invoke(prompt) method.
+
+    Returns:
+        LLMClient: The wrapped model.
+    """
+    return LLMClient(
+        llm,
+        requests_per_minute=env_number("LLM_REQUESTS_PER_MINUTE", REQUESTS_PER_MINUTE),
+        tokens_per_minute=env_number("LLM_TOKENS_PER_MINUTE", TOKENS_PER_MINUTE),
+        max_concurrency=max(1, env_number("LLM_MAX_CONCURRENCY", MAX_CONCURRENCY)),
+        max_retries=max(0, env_number("LLM_MAX_RETRIES", MAX_RETRIES)),
+    )
@@ -0,0 +1,330 @@
+"""
+Housekeeping of the vector store: listing, cleanup and compaction.
+
+Every folder ever loaded leaves a collection in VECTORDB_PATH, and deleting or
+moving files leaves their chunks behind, so the store only grows. This module
+backs the stats, cleanup and compact commands of manage.py:
+
+- list_collections reports each collection's chunks, bytes, source folder and
+  last use (recorded by vector_store.create_collection)
+- cleanup deletes collections whose source folder no longer exists and purges
+  chunks of files that were deleted from folders still present
+- compact rewrites NumPy collections without deleted rows, removes index files
+  Chroma leaves behind for deleted collections, and vacuums its SQLite file
+
+Collections of uploaded ZIPs have no folder to check and are never cleaned
+up; neither are collections created before the registry existed.
+"""
+
+import os
+import shutil
+import sqlite3
+
+from path_index import PathIndex, path_index_directory, path_index_file
+from vector_store import (
+    VECTORDB_PATH,
+    forget_collection,
+    get_aliases,
+    load_collection_registry,
+    remove_stale_chunks,
+)
+
+# Chunks whose metadata is read per batch when looking for deleted files
+PURGE_BATCH_SIZE = 1000
+
+# Chroma's SQLite database in the store root
+CHROMA_DATABASE = "chroma.sqlite3"
+
+
+def directory_bytes(path):
+    """
+    Return the total size of the files under a folder.
+
+    Args:
+        path (str): The folder (or a single file).
+
+    Returns:
+        int: Bytes on disk, 0 if the path does not exist.
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _chroma_client(directory):
+    if not os.path.exists(os.path.join(directory, CHROMA_DATABASE)):
+        return None
+    import chromadb
+
+    return chromadb.PersistentClient(path=directory)
+
+
+def _chroma_segments(directory):
+    """Map each collection ID to the IDs of its vector index segments."""
+    segments = {}
+    database = sqlite3.connect(os.path.join(directory, CHROMA_DATABASE))
+    try:
+        rows = database.execute("SELECT id, collection FROM segments WHERE scope = 'VECTOR'")
+        for segment, collection in rows:
+            segments.setdefault(collection, []).append(segment)
+    finally:
+        database.close()
+    return segments
+
+
+def open_collections(directory=None):
+    """
+    Open every collection of a store.
+
+    Args:
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+
+    Returns:
+        list[tuple[str, object]]: (backend, collection) pairs.
+    """
+    directory = directory or VECTORDB_PATH
+    collections = []
+    client = _chroma_client(directory)
+    if client is not None:
+        collections += [("chroma", collection) for collection in client.list_collections()]
+
+    numpy_root = os.path.join(directory, "numpy")
+    if os.path.isdir(numpy_root):
+        from numpy_backend import NumpyCollection
+
+        for name in sorted(os.listdir(numpy_root)):
+            folder = os.path.join(numpy_root, name)
+            if os.path.exists(os.path.join(folder, "manifest.json")):
+                collections.append(("numpy", NumpyCollection(folder, name)))
+    return collections
+
+
+def list_collections(directory=None):
+    """
+    Describe every collection of a store.
+
+    Args:
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+
+    Returns:
+        list[dict]: Per collection its "name", "backend", "chunks", "bytes"
+            on disk, the "path" it was indexed from (None if unknown),
+            whether that path is a "folder", whether the folder is "missing",
+            its "last_used" time and the "cwd" relative chunk sources were
+            indexed from (None if unknown). Chroma collections
+            count their index files only; their text and metadata share the
+            store's SQLite file.
+    """
+    directory = directory or VECTORDB_PATH
+    registry = load_collection_registry(directory)
+    collections = open_collections(directory)
+    segments = _chroma_segments(directory) if any(b == "chroma" for b, _ in collections) else {}
+
+    rows = []
+    for backend, collection in collections:
+        if backend == "chroma":
+            size = sum(
+                directory_bytes(os.path.join(directory, segment))
+                for segment in segments.get(str(collection.id), ())
+            )
+        else:
+            size = directory_bytes(collection.directory)
+        entry = registry.get(collection.name, {})
+        folder = entry.get("folder", False)
+        rows.append(
+            {
+                "name": collection.name,
+                "backend": backend,
+                "chunks": collection.count(),
+                "bytes": size,
+                "path": entry.get("path"),
+                "folder": folder,
+                "missing": folder and not os.path.isdir(entry["path"]),
+                "last_used": entry.get("last_used"),
+                "cwd": entry.get("cwd"),
+            }
+        )
+    return rows
+
+
+def delete_collection(name, backend, directory=None):
+    """
+    Delete a collection with its path index and registry entry.
+
+    Args:
+        name (str): The collection name.
+        backend (str): "chroma" or "numpy".
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+    """
+    directory = directory or VECTORDB_PATH
+    if backend == "chroma":
+        _chroma_client(directory).delete_collection(name)
+    else:
+        shutil.rmtree(os.path.join(directory, "numpy", name))
+
+    # The other backend may still hold a collection with the same name
+    if not any(collection.name == name for _, collection in open_collections(directory)):
+        try:
+            os.remove(path_index_file(name, path_index_directory(directory)))
+        except FileNotFoundError:
+            pass
+        forget_collection(name, directory)
+
+
+def find_missing_files(
+    collection, exists=os.path.exists, batch_size=PURGE_BATCH_SIZE, base_directory=None
+):
+    """
+    Find indexed files that no longer exist.
+
+    A file whose duplicates (see dedup) still exist is kept, since its chunks
+    also answer for them. Sources stored as relative paths are resolved against
+    the working directory they were indexed from; without it they are never
+    reported, as the current working directory says nothing about them.
+
+    Args:
+        collection: The collection to check.
+        exists (callable): Tells whether a file path exists.
+        batch_size (int): Chunks read per batch.
+        base_directory (str | None): Working directory at indexing time.
+
+    Returns:
+        dict: Missing file path -> number of its chunks.
+    """
+    chunks, aliases = {}, {}
+    offset = 0
+    while True:
+        batch = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        offset += len(batch["ids"])
+        for metadata in batch["metadatas"]:
+            source = (metadata or {}).get("source")
+            if source:
+                chunks[source] = chunks.get(source, 0) + 1
+                aliases.setdefault(source, get_aliases(metadata))
+
+    def gone(path):
+        if not os.path.isabs(path):
+            if base_directory is None:
+                return False
+            path = os.path.join(base_directory, path)
+        return not exists(path)
+
+    return {
+        source: count
+        for source, count in chunks.items()
+        if gone(source) and all(gone(alias) for alias in aliases[source])
+    }
+
+
+def purge_missing_files(collection, missing, directory=None):
+    """
+    Delete the chunks and path index entries of missing files.
+
+    Args:
+        collection: The collection holding them.
+        missing (dict): Files to purge, as returned by find_missing_files.
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+
+    Returns:
+        int: Number of chunks deleted.
+    """
+    for source in missing:
+        remove_stale_chunks(collection, source)
+
+    index_file = path_index_file(collection.name, path_index_directory(directory))
+    if os.path.exists(index_file):
+        path_index = PathIndex.load(index_file)
+        for source in missing:
+            path_index.remove(source)
+        path_index.save(index_file)
+    return sum(missing.values())
+
+
+def cleanup(directory=None, dry_run=False):
+    """
+    Delete collections of removed folders and chunks of removed files.
+
+    Only collections indexed from a folder are checked: uploaded ZIPs are
+    indexed from temporary folders and collections created before the
+    registry existed have no known folder.
+
+    Args:
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+        dry_run (bool): Only report what would be deleted.
+
+    Returns:
+        dict: "collections" deleted (name, backend, chunks and bytes of each),
+            and "files" purged per remaining collection as (name, files, chunks).
+    """
+    directory = directory or VECTORDB_PATH
+    report = {"collections": [], "files": []}
+    collections = dict(
+        ((backend, collection.name), collection)
+        for backend, collection in open_collections(directory)
+    )
+    for row in list_collections(directory):
+        if not row["folder"]:
+            continue
+        if row["missing"]:
+            report["collections"].append(row)
+            if not dry_run:
+                delete_collection(row["name"], row["backend"], directory)
+            continue
+
+        collection = collections[(row["backend"], row["name"])]
+        missing = find_missing_files(collection, base_directory=row["cwd"])
+        if missing:
+            chunks = sum(missing.values())
+            if not dry_run:
+                chunks = purge_missing_files(collection, missing, directory)
+            report["files"].append((row["name"], len(missing), chunks))
+    return report
+
+
+def compact(directory=None):
+    """
+    Reclaim the disk space of deleted chunks and collections.
+
+    NumPy collections are rewritten without deleted rows. For Chroma, index
+    folders of deleted collections are removed and the SQLite file is
+    vacuumed; Chroma reuses the slots of deleted chunks in live indexes
+    itself. Run it while the app and other commands are stopped.
+
+    Args:
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+
+    Returns:
+        dict: "before" and "after" bytes of the store, and the "rows" dropped
+            from NumPy collections.
+    """
+    directory = directory or VECTORDB_PATH
+    before = directory_bytes(directory)
+    rows = 0
+    for backend, collection in open_collections(directory):
+        if backend == "numpy":
+            rows += collection.compact()
+
+    database = os.path.join(directory, CHROMA_DATABASE)
+    if os.path.exists(database):
+        segments = {segment for ids in _chroma_segments(directory).values() for segment in ids}
+        for name in os.listdir(directory):
+            # Vector segments are folders named after their UUID
+            path = os.path.join(directory, name)
+            if os.path.isdir(path) and len(name) == 36 and name.count("-") == 4:
+                if name not in segments:
+                    shutil.rmtree(path)
+        connection = sqlite3.connect(database)
+        try:
+            connection.execute("VACUUM")
+        finally:
+            connection.close()
+    return {"before": before, "after": directory_bytes(directory), "rows": rows}
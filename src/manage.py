@@ -0,0 +1,454 @@
+"""
+Maintenance commands for indexed collections.
+
+Usage:
+    python src/manage.py tune data --target-recall 0.95
+    python src/manage.py tune data --apply
+    python src/manage.py query "budget for 2024" data/hr data/finance
+    python src/manage.py index archive --shards 8 --processes 4
+    python src/manage.py merge archive
+    python src/manage.py export data data.snapshot
+    python src/manage.py import data.snapshot
+    python src/manage.py watch data
+    python src/manage.py stats
+    python src/manage.py cleanup --dry-run
+    python src/manage.py compact
+    python src/manage.py text-cache
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import maintenance
+from embeddings import EmbeddingModelError
+from index_tuning import DEFAULT_GRID, format_header, format_result, tune_index
+from path_index import PathIndex, build_path_index, path_index_file
+from retrieval_cache import shared_cache
+from retrieval_system import SHARD_TIMEOUT, format_shards, query_collections
+from scan_folders import scan_folders
+from sharded_indexing import (
+    FINISHED,
+    load_shards,
+    merge_shards,
+    open_shards,
+    run_sharded_indexing,
+)
+from snapshot import SnapshotError, export_snapshot, import_snapshot
+from text_cache import TEXT_CACHE_PATH, TextCache, default_text_cache
+from watcher import POLL_INTERVAL, FolderWatcher
+from vector_store import (
+    UPDATABLE_INDEX_PARAMS,
+    VECTORDB_PATH,
+    CollectionNotFoundError,
+    create_collection,
+    get_index_params,
+    open_collection,
+    optimize_collection,
+)
+from metrics import metrics
+from utils import load_environment
+
+
+def _int_list(text):
+    return tuple(int(value) for value in text.split(","))
+
+
+def tune(args):
+    """Sweep HNSW settings on a sample of a collection and print a recommendation."""
+    try:
+        collection = open_collection(args.path, backend="chroma")
+    except (CollectionNotFoundError, EmbeddingModelError) as error:
+        print(error)
+        return 1
+    if not collection.count():
+        print(f"Collection for '{args.path}' is empty. Index it first.")
+        return 1
+
+    grid = {
+        "max_neighbors": args.m,
+        "ef_construction": args.ef_construction,
+        "ef_search": args.ef_search,
+    }
+    print(f"Current settings: {get_index_params(collection)}")
+    print(format_header())
+    report = tune_index(
+        collection,
+        target_recall=args.target_recall,
+        sample_size=args.sample,
+        n_queries=args.queries,
+        k=args.k,
+        grid=grid,
+        progress=lambda result: print(format_result(result), flush=True),
+    )
+
+    best = report["recommended"]
+    if best is None:
+        print("Not enough chunks to tune. Index more documents first.")
+        return 1
+    if best["recall"] < args.target_recall:
+        print(f"No setting reached recall {args.target_recall}; the best one is:")
+    else:
+        print(f"Fastest setting with recall@{args.k} >= {args.target_recall}:")
+    print(format_result(best))
+
+    params = {
+        key: best[key] for key in ("space", "max_neighbors", "ef_construction", "ef_search")
+    }
+    print(
+        "Use it for new collections with:\n"
+        "VECTOR_INDEX_PARAMS=" + ",".join(f"{key}={value}" for key, value in params.items())
+    )
+
+    if args.apply:
+        updates = {key: params[key] for key in UPDATABLE_INDEX_PARAMS if key in params}
+        create_collection(args.path, backend="chroma", index_params=updates)
+        print(f"Applied {updates} to '{collection.name}' (takes effect on next start).")
+    return 0
+
+
+def query(args):
+    """Search several folder collections at once and report per-shard latency."""
+    if args.sharded:
+        collections = [shard for path in args.paths for shard in open_shards(path)]
+    else:
+        collections = [create_collection(path) for path in args.paths]
+    results = query_collections(
+        collections, args.question, n_results=args.k, cache=shared_cache, timeout=args.timeout
+    )
+
+    rows = zip(results["metadatas"][0], results["distances"][0], results["documents"][0])
+    for metadata, distance, document in rows:
+        preview = " ".join(document.split())[:80]
+        print(f"{distance:.3f}  [{metadata['collection']}] {metadata.get('source')}: {preview}")
+    print(format_shards(results["shards"]))
+    return 0 if all(shard["status"] == "ok" for shard in results["shards"]) else 1
+
+
+def index(args):
+    """Index a folder as hash-partitioned shards in parallel worker processes."""
+    files = scan_folders(args.path)
+    if not files:
+        print("No documents found to index.")
+        return 1
+
+    manifests = run_sharded_indexing(
+        args.path, files, args.shards, processes=args.processes, shards=args.only
+    )
+    for manifest in manifests:
+        state = "already complete" if manifest.get("skipped") else f"{manifest['seconds']:.1f} s"
+        print(
+            f"Shard {manifest['shard']}: {len(manifest['files'])} files, "
+            f"{manifest['chunks']} chunks, {len(manifest['failed'])} failed ({state})"
+        )
+    return 0
+
+
+def merge(args):
+    """Merge completed shards into the folder's collection and path index."""
+    # The target is created by merging, so a mistyped path must fail before that
+    _, manifests = load_shards(args.path)
+    if not any(manifest and manifest.get("status") in FINISHED for manifest in manifests):
+        print(f"No finished shards found for '{args.path}'. Run the index command first.")
+        return 1
+    collection = create_collection(args.path)
+    stats = merge_shards(args.path, collection)
+
+    optimize_collection(collection)
+    try:
+        build_path_index(stats["files"], collection.name)
+    except OSError:
+        print("Warning: Could not index file names. You can still search document content.")
+    print(f"Merged {stats['chunks']} chunks from {stats['shards']} shards into '{collection.name}'.")
+    if stats["partial"]:
+        partial = ", ".join(map(str, stats["partial"]))
+        print(f"Shards with failed files (run index again to retry): {partial}.")
+    if stats["missing"]:
+        print(f"Shards not finished yet: {', '.join(map(str, stats['missing']))}.")
+        return 1
+    return 0
+
+
+def export(args):
+    """Write a collection and its path index to a snapshot file."""
+    try:
+        collection = open_collection(args.path)
+    except (CollectionNotFoundError, EmbeddingModelError) as error:
+        print(error)
+        return 1
+    manifest = export_snapshot(collection, args.snapshot)
+    size = os.path.getsize(args.snapshot) / 2**20
+    print(
+        f"Exported {manifest['chunks']} chunks of '{collection.name}' "
+        f"to {args.snapshot} ({size:.1f} MB)."
+    )
+    return 0
+
+
+def import_(args):
+    """Load a snapshot file into a collection without re-embedding."""
+    try:
+        stats = import_snapshot(
+            args.snapshot,
+            path=args.path,
+            replace=args.replace,
+            verify=not args.no_verify,
+            allow_model_mismatch=args.allow_model_mismatch,
+        )
+    except (SnapshotError, EmbeddingModelError) as error:
+        print(error)
+        return 1
+    print(
+        f"Imported {stats['chunks']} chunks into '{stats['collection']}' "
+        f"in {stats['seconds']:.1f} s."
+    )
+    return 0
+
+
+def watch(args):
+    """Keep a folder's collection in sync with its files until interrupted."""
+    collection = create_collection(args.path)
+    index_file = path_index_file(collection.name)
+
+    def report(changes):
+        for path, action in changes:
+            print(f"{time.strftime('%H:%M:%S')} {action}: {path}", flush=True)
+
+    watcher = FolderWatcher(
+        args.path,
+        collection,
+        PathIndex.load(index_file),
+        index_file,
+        poll_interval=args.poll_interval,
+        use_watchdog=False if args.poll else None,
+        on_change=report,
+    ).start(sync=True)
+    print(f"Watching '{args.path}' ({watcher.mode}). Press Ctrl+C to stop.")
+    try:
+        while watcher.running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+    stats = watcher.stats
+    print(f"Indexed {stats['indexed']} and removed {stats['removed']} files.")
+    return 0
+
+
+def _size(size):
+    return f"{size / 2**20:.1f} MB"
+
+
+def stats(args):
+    """List the collections of the store with their size and last use."""
+    rows = maintenance.list_collections(args.directory)
+    if not rows:
+        print("No collections found.")
+        return 0
+    print(f"{'Collection':<32} {'Backend':<7} {'Chunks':>8} {'Size':>10}  {'Last used':<16}  Source")
+    for row in sorted(rows, key=lambda row: row["last_used"] or 0, reverse=True):
+        last_used = (
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(row["last_used"]))
+            if row["last_used"]
+            else "unknown"
+        )
+        source = row["path"] or "unknown"
+        if not row["folder"] and row["path"]:
+            source += " (upload)"
+        elif row["missing"]:
+            source += " (missing)"
+        print(
+            f"{row['name']:<32} {row['backend']:<7} {row['chunks']:>8} "
+            f"{_size(row['bytes']):>10}  {last_used:<16}  {source}"
+        )
+    total = maintenance.directory_bytes(args.directory or VECTORDB_PATH)
+    print(f"{len(rows)} collections, {_size(total)} on disk in total.")
+    return 0
+
+
+def cleanup(args):
+    """Delete collections of removed folders and chunks of removed files."""
+    report = maintenance.cleanup(args.directory, dry_run=args.dry_run)
+    verb = "Would delete" if args.dry_run else "Deleted"
+    for row in report["collections"]:
+        print(
+            f"{verb} '{row['name']}' ({row['backend']}, {row['chunks']} chunks, "
+            f"{_size(row['bytes'])}): {row['path']} no longer exists."
+        )
+    for name, files, chunks in report["files"]:
+        print(f"{verb} {chunks} chunks of {files} removed files from '{name}'.")
+    if not report["collections"] and not report["files"]:
+        print("Nothing to clean up.")
+    elif not args.dry_run:
+        print("Run the compact command to reclaim the disk space.")
+    return 0
+
+
+def compact(args):
+    """Reclaim the disk space of deleted chunks and collections."""
+    report = maintenance.compact(args.directory)
+    print(
+        f"Compacted the store from {_size(report['before'])} to {_size(report['after'])} "
+        f"({report['rows']} deleted rows dropped)."
+    )
+    return 0
+
+
+def text_cache(args):
+    """Report the size and hit rate of the extracted-text cache, or clear it."""
+    cache = default_text_cache()
+    if args.directory:
+        cache = TextCache(args.directory, max_bytes=cache.max_bytes)
+    if args.clear:
+        print(f"Deleted {cache.clear()} cached documents from {cache.directory}.")
+        return 0
+    report = cache.report()
+    print(
+        f"{report['entries']} documents, {_size(report['bytes'])} of "
+        f"{_size(report['max_bytes'])} in {cache.directory}"
+    )
+    if report["hit_rate"] is None:
+        print("No lookups recorded yet.")
+    else:
+        print(
+            f"{report['hits']} hits, {report['misses']} misses: "
+            f"{report['hit_rate']:.0%} of extractions skipped"
+        )
+    return 0
+
+
+def build_parser():
+    """Build the command line parser."""
+    parser = argparse.ArgumentParser(description="Maintenance commands for indexed collections.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    tune_parser = commands.add_parser(
+        "tune", help="Recommend HNSW settings meeting a target recall at the lowest p95."
+    )
+    tune_parser.add_argument("path", help="Folder or ZIP name the collection was indexed from.")
+    tune_parser.add_argument("--target-recall", type=float, default=0.95)
+    tune_parser.add_argument("--k", type=int, default=10, help="Results per query.")
+    tune_parser.add_argument("--sample", type=int, default=5000, help="Chunks sampled.")
+    tune_parser.add_argument("--queries", type=int, default=200, help="Sampled chunks used as queries.")
+    tune_parser.add_argument("--m", type=_int_list, default=DEFAULT_GRID["max_neighbors"])
+    tune_parser.add_argument(
+        "--ef-construction", type=_int_list, default=DEFAULT_GRID["ef_construction"]
+    )
+    tune_parser.add_argument("--ef-search", type=_int_list, default=DEFAULT_GRID["ef_search"])
+    tune_parser.add_argument(
+        "--apply", action="store_true", help="Store the recommended ef_search on the collection."
+    )
+    tune_parser.set_defaults(handler=tune)
+
+    query_parser = commands.add_parser(
+        "query", help="Search several indexed folders at once and report per-folder latency."
+    )
+    query_parser.add_argument("question")
+    query_parser.add_argument("paths", nargs="+", help="Folders or ZIP names to search.")
+    query_parser.add_argument("--k", type=int, default=5, help="Merged results returned.")
+    query_parser.add_argument(
+        "--timeout", type=float, default=SHARD_TIMEOUT, help="Seconds to wait for each folder."
+    )
+    query_parser.add_argument(
+        "--sharded", action="store_true", help="Search the shards of each sharded index."
+    )
+    query_parser.set_defaults(handler=query)
+
+    index_parser = commands.add_parser(
+        "index", help="Index a folder as shards in parallel worker processes."
+    )
+    index_parser.add_argument("path", help="Folder to scan and index.")
+    index_parser.add_argument("--shards", type=int, default=8, help="Number of shards.")
+    index_parser.add_argument("--processes", type=int, help="Worker processes (default: CPUs).")
+    index_parser.add_argument(
+        "--only", type=_int_list, help="Shard numbers to index on this machine, e.g. 0,1."
+    )
+    index_parser.set_defaults(handler=index)
+
+    merge_parser = commands.add_parser(
+        "merge", help="Merge completed shards into the folder's collection."
+    )
+    merge_parser.add_argument("path", help="Folder the shards were indexed from.")
+    merge_parser.set_defaults(handler=merge)
+
+    export_parser = commands.add_parser("export", help="Write a collection to a snapshot file.")
+    export_parser.add_argument("path", help="Folder or ZIP name the collection was indexed from.")
+    export_parser.add_argument("snapshot", help="Snapshot file to write.")
+    export_parser.set_defaults(handler=export)
+
+    import_parser = commands.add_parser(
+        "import", help="Load a snapshot into a collection without re-embedding."
+    )
+    import_parser.add_argument("snapshot", help="Snapshot file to read.")
+    import_parser.add_argument("--path", help="Collection name (default: the exported one).")
+    import_parser.add_argument(
+        "--replace", action="store_true", help="Overwrite a collection that already has chunks."
+    )
+    import_parser.add_argument(
+        "--no-verify", action="store_true", help="Skip the checksum verification."
+    )
+    import_parser.add_argument(
+        "--allow-model-mismatch",
+        action="store_true",
+        help="Import a snapshot embedded with another model than the configured one.",
+    )
+    import_parser.set_defaults(handler=import_)
+
+    watch_parser = commands.add_parser(
+        "watch", help="Index changed, moved and deleted files of a folder as they happen."
+    )
+    watch_parser.add_argument("path", help="Folder to keep in sync.")
+    watch_parser.add_argument(
+        "--poll", action="store_true", help="Poll for changes instead of file notifications."
+    )
+    watch_parser.add_argument(
+        "--poll-interval", type=float, default=POLL_INTERVAL, help="Seconds between scans."
+    )
+    watch_parser.set_defaults(handler=watch)
+
+    stats_parser = commands.add_parser(
+        "stats", help="List collections with their chunks, size and last use."
+    )
+    cleanup_parser = commands.add_parser(
+        "cleanup", help="Delete collections of removed folders and chunks of removed files."
+    )
+    cleanup_parser.add_argument(
+        "--dry-run", action="store_true", help="Only report what would be deleted."
+    )
+    compact_parser = commands.add_parser(
+        "compact", help="Reclaim disk space; stop the app and other commands first."
+    )
+    for store_parser, handler in (
+        (stats_parser, stats),
+        (cleanup_parser, cleanup),
+        (compact_parser, compact),
+    ):
+        store_parser.add_argument(
+            "--directory", help=f"Root folder of the store (default: {VECTORDB_PATH})."
+        )
+        store_parser.set_defaults(handler=handler)
+
+    text_cache_parser = commands.add_parser(
+        "text-cache", help="Report the size and hit rate of the extracted-text cache."
+    )
+    text_cache_parser.add_argument(
+        "--clear", action="store_true", help="Delete the cached text and statistics."
+    )
+    text_cache_parser.add_argument(
+        "--directory", help=f"Cache folder (default: {TEXT_CACHE_PATH})."
+    )
+    text_cache_parser.set_defaults(handler=text_cache)
+    return parser
+
+
+def main(argv=None):
+    load_environment()
+    metrics.configure()
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
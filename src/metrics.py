@@ -0,0 +1,374 @@
+"""
+Stage timings and counters for the indexing and question-answering pipeline.
+
+Code marks its stages with spans (``with metrics.span("embed"):``) or the
+``@metrics.timed("chunk")`` decorator and counts events with
+``metrics.count("chunks", n)``. Recording is off by default: a disabled span is
+a shared no-op object, so instrumented code pays one attribute check.
+
+Enable it with METRICS_ENABLED=true. Totals can be exported as Prometheus text
+(served on METRICS_PORT) or as JSON (written to METRICS_FILE on exit), and a
+trace collects the spans of a single question for a per-query breakdown.
+
+Stages recorded by the pipeline: scan, load.<ext>, chunk, embed, upsert,
+retrieve, embed_query, prompt and llm.
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+# Prefix of every exported Prometheus metric
+PROMETHEUS_PREFIX = "docchat"
+
+
+class _NullSpan:
+    """Span returned while metrics are disabled; does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Times one stage and records it on exit, also into the thread's trace."""
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.start = None
+        self.seconds = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self.start
+        self.registry.observe(self.name, self.seconds, start=self.start)
+        return False
+
+
+class Trace:
+    """The spans recorded by one thread between entering and leaving a trace."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.spans = []
+
+    def breakdown(self):
+        """
+        Summarize the trace by stage.
+
+        Returns:
+            list[dict]: One entry per stage, in the order stages started, with
+                its "stage", number of "calls" and total "ms".
+        """
+        stages = {}
+        for name, offset, seconds in sorted(self.spans, key=lambda span: span[1]):
+            entry = stages.setdefault(name, {"stage": name, "calls": 0, "ms": 0.0})
+            entry["calls"] += 1
+            entry["ms"] += seconds * 1000
+        return list(stages.values())
+
+
+class Metrics:
+    """
+    Thread-safe registry of stage timers and event counters.
+
+    Args:
+        enabled (bool): Record spans and counters; when False they are no-ops.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self._local = threading.local()
+        self._server = None
+        self._json_file = None
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def span(self, name):
+        """
+        Time a block of code as one stage.
+
+        Args:
+            name (str): The stage name.
+
+        Returns:
+            A context manager; a shared no-op one while disabled.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name)
+
+    def timed(self, name):
+        """
+        Decorate a function so every call is timed as one stage.
+
+        Args:
+            name (str): The stage name.
+
+        Returns:
+            callable: The decorator.
+        """
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Span(self, name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def observe(self, name, seconds, start=None):
+        """
+        Record the duration of one stage.
+
+        Args:
+            name (str): The stage name.
+            seconds (float): How long it took.
+            start (float | None): perf_counter() value when it started, used to
+                order the stage within the current trace.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = {"count": 0, "seconds": 0.0, "max_seconds": 0.0}
+            timer["count"] += 1
+            timer["seconds"] += seconds
+            timer["max_seconds"] = max(timer["max_seconds"], seconds)
+
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            offset = (start if start is not None else time.perf_counter()) - trace.start
+            trace.spans.append((name, offset, seconds))
+
+    def count(self, name, value=1):
+        """
+        Add to an event counter.
+
+        Args:
+            name (str): The counter name, e.g. "chunks" or "cache_hits".
+            value (int | float): Amount to add.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def trace(self):
+        """
+        Collect the spans this thread records until the block exits.
+
+        Usage: ``with metrics.trace() as trace: ...`` then trace.breakdown().
+        Traces are empty while metrics are disabled.
+
+        Returns:
+            A context manager yielding the Trace.
+        """
+        return _TraceContext(self)
+
+    def reset(self):
+        """Clear every timer and counter."""
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def snapshot(self):
+        """
+        Return the current totals.
+
+        Returns:
+            dict: "timers" maps each stage to its count, total seconds, mean_ms
+                and max_ms; "counters" maps each counter to its value.
+        """
+        with self._lock:
+            timers = {
+                name: {
+                    "count": timer["count"],
+                    "seconds": timer["seconds"],
+                    "mean_ms": 1000 * timer["seconds"] / timer["count"],
+                    "max_ms": 1000 * timer["max_seconds"],
+                }
+                for name, timer in self._timers.items()
+            }
+            counters = dict(self._counters)
+        return {"enabled": self.enabled, "timers": timers, "counters": counters}
+
+    def format(self):
+        """
+        Render the totals as a short human-readable report.
+
+        Returns:
+            str: One line per stage, then one line with every counter.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            f"{name}: {timer['count']} calls, {timer['seconds']:.2f} s total, "
+            f"mean {timer['mean_ms']:.1f} ms, max {timer['max_ms']:.1f} ms"
+            for name, timer in sorted(snapshot["timers"].items())
+        ]
+        if snapshot["counters"]:
+            lines.append(
+                ", ".join(f"{name}: {value}" for name, value in sorted(snapshot["counters"].items()))
+            )
+        return "\n".join(lines)
+
+    def to_prometheus(self):
+        """
+        Render the totals in the Prometheus text exposition format.
+
+        Returns:
+            str: Stage timings as a summary and counters as counters.
+        """
+        snapshot = self.snapshot()
+        stage = f"{PROMETHEUS_PREFIX}_stage_seconds"
+        events = f"{PROMETHEUS_PREFIX}_events_total"
+        lines = [
+            f"# HELP {stage} Time spent in each pipeline stage.",
+            f"# TYPE {stage} summary",
+        ]
+        for name, timer in sorted(snapshot["timers"].items()):
+            lines.append(f'{stage}_sum{{stage="{name}"}} {timer["seconds"]:.6f}')
+            lines.append(f'{stage}_count{{stage="{name}"}} {timer["count"]}')
+        lines += [
+            f"# HELP {events} Files, chunks, tokens and cache lookups processed.",
+            f"# TYPE {events} counter",
+        ]
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f'{events}{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, filepath):
+        """
+        Write the totals to a JSON file, replacing it atomically.
+
+        Args:
+            filepath (str): Destination file.
+        """
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.snapshot(), file, indent=2)
+        os.replace(tmp_path, filepath)
+
+    def serve_prometheus(self, port, host="127.0.0.1"):
+        """
+        Serve the totals at http://<host>:<port>/metrics from a daemon thread.
+
+        Only one server runs per registry; later calls return it.
+
+        Args:
+            port (int): Port to listen on (0 picks a free one).
+            host (str): Interface to bind.
+
+        Returns:
+            ThreadingHTTPServer: The running server (see server_address).
+        """
+        if self._server is not None:
+            return self._server
+
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(
+            target=self._server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        return self._server
+
+    def configure(self):
+        """
+        Apply the METRICS_ENABLED, METRICS_PORT and METRICS_FILE settings.
+
+        Safe to call repeatedly (e.g. on every Streamlit rerun): the server is
+        started and the exit hook registered once.
+        """
+        self.enabled = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+        if not self.enabled:
+            return
+        port = os.getenv("METRICS_PORT")
+        if port:
+            try:
+                self.serve_prometheus(int(port))
+            except (OSError, ValueError):
+                print(f"Warning: Could not serve metrics on port {port}.")
+        filepath = os.getenv("METRICS_FILE")
+        if filepath and self._json_file is None:
+            self._json_file = filepath
+            atexit.register(self.write_json, filepath)
+
+
+class _TraceContext:
+    def __init__(self, registry):
+        self.registry = registry
+        self.trace = Trace()
+        self.previous = None
+
+    def __enter__(self):
+        local = self.registry._local
+        self.previous = getattr(local, "trace", None)
+        local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, *exc_info):
+        self.trace.seconds = time.perf_counter() - self.trace.start
+        self.registry._local.trace = self.previous
+        return False
+
+
+def format_breakdown(trace):
+    """
+    Describe a trace's stages in one line.
+
+    Args:
+        trace (Trace): A finished trace.
+
+    Returns:
+        str: e.g. "retrieve 42 ms, embed_query 30 ms, prompt 1 ms, llm 820 ms".
+    """
+    return ", ".join(f"{entry['stage']} {entry['ms']:.0f} ms" for entry in trace.breakdown())
+
+
+# Process-wide registry used by every instrumented module
+metrics = Metrics()
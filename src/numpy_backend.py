@@ -0,0 +1,807 @@
+"""
+In-process vector store backed by memory-mapped NumPy files.
+
+NumpyCollection implements the subset of the ChromaDB collection API used by this
+project (upsert/add/update/get/query/delete/count/modify), so it can be returned
+by vector_store.create_collection in place of a Chroma collection. Vectors are
+kept as a flat, unit-normalized matrix that is memory-mapped from disk: opening
+a collection only stats a few files, and several processes serving the same
+corpus share one copy through the OS page cache. Top-k search is a blocked
+matrix product followed by np.argpartition.
+
+float32 storage is the default because BLAS multiplies the mapped matrix without
+a conversion pass; float16 halves disk and page-cache use but NumPy's float16 to
+float32 conversion makes each query several times slower.
+
+Storage is append-only and read-mostly. A collection directory contains:
+
+- manifest.json: format version, id, name, dimension, dtype and metadata
+- embeddings.bin: row-major vectors (rows x dim) in the stored dtype
+- alive.bin: one byte per row, 0 for deleted rows; its size is the row count
+- documents.bin / documents.idx: UTF-8 text blobs and (offset, length) pairs
+- metadatas.bin / metadatas.idx: JSON metadata blobs and (offset, length) pairs
+- ids.txt: one chunk ID per row
+- codec.npz / originals.bin: only with compression (see vector_codec), the
+  fitted codec and, if rescoring is enabled, the full-precision float32 vectors
+
+Rows are committed by appending to alive.bin last, so readers in other
+processes never see a half-written row. Before appending, a writer truncates the
+other per-row files to alive.bin's row count, discarding what an interrupted
+write left behind, so new rows stay aligned across the files.
+"""
+
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+
+from vector_codec import VectorCodec, parse_compression
+
+FORMAT_VERSION = 1
+
+# Rows converted to float32 per matrix-product block during a query
+QUERY_BLOCK_ROWS = 16384
+
+# With rescoring, this many times n_results candidates are re-ranked exactly
+RESCORE_FACTOR = 4
+
+# Compression is fitted on at most this many vectors, and needs at least MIN_FIT_ROWS
+FIT_SAMPLE_ROWS = 50000
+MIN_FIT_ROWS = 256
+
+_FILES = {
+    "embeddings": "embeddings.bin",
+    "alive": "alive.bin",
+    "documents": "documents.bin",
+    "documents_idx": "documents.idx",
+    "metadatas": "metadatas.bin",
+    "metadatas_idx": "metadatas.idx",
+    "ids": "ids.txt",
+    "originals": "originals.bin",
+    "codec": "codec.npz",
+}
+
+
+def matches_where(metadata, where):
+    """
+    Evaluate a Chroma-style metadata filter against one metadata dict.
+
+    Supports field equality, the $eq/$ne/$gt/$gte/$lt/$lte/$in/$nin operators
+    and $and/$or combinations.
+
+    Args:
+        metadata (dict | None): Metadata of one record.
+        where (dict | None): The filter; None matches everything.
+
+    Returns:
+        bool: True if the record matches.
+    """
+    if not where:
+        return True
+    metadata = metadata or {}
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, expected in condition.items():
+            if operator == "$eq" and value != expected:
+                return False
+            if operator == "$ne" and value == expected:
+                return False
+            if operator == "$in" and value not in expected:
+                return False
+            if operator == "$nin" and value in expected:
+                return False
+            if operator in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if operator == "$gt" and not value > expected:
+                    return False
+                if operator == "$gte" and not value >= expected:
+                    return False
+                if operator == "$lt" and not value < expected:
+                    return False
+                if operator == "$lte" and not value <= expected:
+                    return False
+    return True
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class NumpyCollection:
+    """
+    A collection stored as memory-mapped NumPy arrays in one directory.
+
+    Distances are cosine distances (1 - cosine similarity), like a Chroma
+    collection created with {"hnsw:space": "cosine"}.
+
+    Args:
+        directory (str): Folder holding the collection files (created if missing).
+        name (str): Collection name.
+        metadata (dict | None): Collection metadata, used only when creating it.
+        embedding_function (callable | None): Maps a list of texts to vectors.
+            Defaults to embeddings.default_embedding_function(), on first use.
+        dtype (str): Storage dtype for new collections ("float32" or "float16").
+        compression (str | dict | None): Optional compression for new collections,
+            e.g. "int8,pca:128,rescore" (see vector_codec.parse_compression). It
+            takes effect once fit_compression() runs at the end of indexing.
+    """
+
+    # Distance function of query results, as in Chroma's "space" setting
+    space = "cosine"
+
+    def __init__(
+        self,
+        directory,
+        name,
+        metadata=None,
+        embedding_function=None,
+        dtype="float32",
+        compression=None,
+    ):
+        self.directory = directory
+        self.name = name
+        self._embedder = embedding_function
+        self._lock = threading.RLock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._manifest = self._read_manifest()
+        if self._manifest is None:
+            self._manifest = {
+                "format": FORMAT_VERSION,
+                "id": str(uuid.uuid4()),
+                "name": name,
+                "dim": None,
+                "dtype": dtype,
+                "metadata": metadata,
+                "compression": parse_compression(compression),
+                "codec": False,
+            }
+            self._write_manifest()
+            for key, filename in _FILES.items():
+                if key not in ("originals", "codec"):
+                    open(self._path(filename), "ab").close()
+
+        self._state = None
+        self._codec = None
+        self._rows = -1
+        self._ids = None
+        self._id_rows = None
+        self._metadata_cache = None
+        self._refresh()
+
+    # ------------------------------------------------------------------
+    # Collection properties
+    # ------------------------------------------------------------------
+
+    @property
+    def id(self):
+        return self._manifest["id"]
+
+    @property
+    def metadata(self):
+        return self._manifest.get("metadata")
+
+    @property
+    def _embedding_function(self):
+        if self._embedder is None:
+            from embeddings import default_embedding_function
+
+            self._embedder = default_embedding_function()
+        return self._embedder
+
+    def modify(self, name=None, metadata=None):
+        """Replace the collection metadata (and optionally rename it)."""
+        with self._lock:
+            if name is not None:
+                self.name = self._manifest["name"] = name
+            if metadata is not None:
+                self._manifest["metadata"] = metadata
+            self._write_manifest()
+
+    def count(self):
+        """Return the number of live records."""
+        with self._lock:
+            self._refresh()
+            return int(self._alive.sum()) if self._rows else 0
+
+    # ------------------------------------------------------------------
+    # Files and memory maps
+    # ------------------------------------------------------------------
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def _read_manifest(self):
+        try:
+            with open(self._path("manifest.json"), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self):
+        tmp_path = self._path("manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._manifest, file)
+        os.replace(tmp_path, self._path("manifest.json"))
+
+    @property
+    def _dtype(self):
+        if self._codec is not None:
+            return self._codec.dtype
+        return np.dtype(self._manifest["dtype"])
+
+    @property
+    def _stored_dim(self):
+        dim = self._manifest["dim"] or 0
+        if self._codec is not None and self._codec.stored_dim:
+            return self._codec.stored_dim
+        return dim
+
+    @property
+    def _has_originals(self):
+        return self._codec is not None and os.path.exists(self._path(_FILES["originals"]))
+
+    def _map(self, filename, dtype, shape=None, mode="r"):
+        if os.path.getsize(self._path(filename)) == 0:
+            return np.zeros(shape or (0,), dtype=dtype)
+        return np.memmap(self._path(filename), dtype=dtype, mode=mode, shape=shape)
+
+    def _refresh(self):
+        """Remap the files if rows were committed or the layout changed (by any process)."""
+        rows = os.path.getsize(self._path(_FILES["alive"]))
+        state = (rows, os.stat(self._path("manifest.json")).st_mtime_ns)
+        if rows == self._rows and state == self._state:
+            return
+
+        manifest = self._read_manifest()
+        if manifest is not None:
+            self._manifest = manifest
+        self._codec = (
+            VectorCodec.load(self._path(_FILES["codec"]))
+            if self._manifest.get("codec")
+            else None
+        )
+
+        self._rows = rows
+        self._state = state
+        dim = self._manifest["dim"] or 0
+        self._alive = self._map(_FILES["alive"], np.uint8, (rows,))
+        self._embeddings = self._map(
+            _FILES["embeddings"], self._dtype, (rows, self._stored_dim)
+        )
+        self._originals = (
+            self._map(_FILES["originals"], np.float32, (rows, dim))
+            if self._has_originals
+            else None
+        )
+        self._doc_index = self._map(_FILES["documents_idx"], np.int64, (rows, 2))
+        self._meta_index = self._map(_FILES["metadatas_idx"], np.int64, (rows, 2))
+        self._ids = None
+        self._id_rows = None
+        self._metadata_cache = None
+
+    def _load_ids(self):
+        if self._ids is None:
+            with open(self._path(_FILES["ids"]), "r", encoding="utf-8") as file:
+                ids = file.read().split("\n")[: self._rows]
+            self._ids = ids
+            self._id_rows = {id_: row for row, id_ in enumerate(ids)}
+        return self._ids
+
+    def _read_blob(self, kind, row):
+        offset, length = (
+            self._doc_index[row] if kind == "documents" else self._meta_index[row]
+        )
+        with open(self._path(_FILES[kind]), "rb") as file:
+            file.seek(int(offset))
+            return file.read(int(length)).decode("utf-8")
+
+    def _document(self, row):
+        return self._read_blob("documents", row)
+
+    def _metadata(self, row):
+        if self._metadata_cache is not None:
+            return self._metadata_cache[row]
+        blob = self._read_blob("metadatas", row)
+        return json.loads(blob) if blob else None
+
+    def _all_metadatas(self):
+        """Decode every row's metadata once; used for filtered queries."""
+        if self._metadata_cache is None:
+            with open(self._path(_FILES["metadatas"]), "rb") as file:
+                data = file.read()
+            self._metadata_cache = [
+                json.loads(data[offset : offset + length]) if length else None
+                for offset, length in self._meta_index.tolist()
+            ]
+        return self._metadata_cache
+
+    def _live_rows(self, where=None):
+        rows = np.flatnonzero(self._alive) if self._rows else np.array([], dtype=np.int64)
+        if where:
+            metadatas = self._all_metadatas()
+            rows = np.array(
+                [row for row in rows if matches_where(metadatas[row], where)],
+                dtype=np.int64,
+            )
+        return rows
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _embed(self, documents):
+        return _normalize(self._embedding_function(list(documents)))
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        """Insert new records and overwrite existing ones with the same IDs."""
+        self._write(ids, documents, metadatas, embeddings, partial=False)
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        """Insert records (existing IDs are overwritten, as with upsert)."""
+        self._write(ids, documents, metadatas, embeddings, partial=False)
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None):
+        """Update the given fields of existing records; unknown IDs are ignored."""
+        self._write(ids, documents, metadatas, embeddings, partial=True)
+
+    def _write(self, ids, documents, metadatas, embeddings, partial):
+        if isinstance(ids, str):
+            ids = [ids]
+        if not ids:
+            return
+
+        # Embed before taking the lock, so searches are not blocked by the model
+        if embeddings is None and documents is not None:
+            vectors = self._embed(documents)
+        elif embeddings is not None:
+            vectors = _normalize(embeddings)
+        else:
+            vectors = None
+
+        with self._lock:
+            self._refresh()
+            self._load_ids()
+
+            if vectors is not None and not self._manifest["dim"]:
+                self._manifest["dim"] = int(vectors.shape[1])
+                self._write_manifest()
+                self._embeddings = np.zeros((0, vectors.shape[1]), dtype=self._dtype)
+            stored = self._encode(vectors) if vectors is not None else None
+            originals = vectors if vectors is not None and self._has_originals else None
+
+            new_rows, updates = [], []
+            for position, id_ in enumerate(ids):
+                row = self._id_rows.get(id_)
+                if row is None:
+                    if not partial:
+                        new_rows.append(position)
+                elif self._alive[row] or not partial:
+                    updates.append((position, row))
+
+            self._apply_updates(updates, documents, metadatas, stored, originals)
+            self._append(new_rows, ids, documents, metadatas, stored, originals)
+            self._metadata_cache = None
+
+    def _encode(self, vectors):
+        """Convert normalized float32 vectors to the stored representation."""
+        if self._codec is not None:
+            return self._codec.encode(vectors)
+        return vectors.astype(self._dtype)
+
+    def _append_blobs(self, kind, values):
+        """Append text blobs and return their (offset, length) pairs."""
+        path = self._path(_FILES[kind])
+        offset = os.path.getsize(path)
+        pairs = []
+        with open(path, "ab") as file:
+            for value in values:
+                blob = value.encode("utf-8")
+                file.write(blob)
+                pairs.append((offset, len(blob)))
+                offset += len(blob)
+        return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+    @staticmethod
+    def _encode_metadata(metadata):
+        return json.dumps(metadata) if metadata is not None else ""
+
+    def _apply_updates(self, updates, documents, metadatas, stored, originals):
+        if not updates:
+            return
+
+        def rewrite_index(kind, values):
+            pairs = self._append_blobs(kind, values)
+            index = self._map(_FILES[f"{kind}_idx"], np.int64, (self._rows, 2), "r+")
+            for (_, row), pair in zip(updates, pairs):
+                index[row] = pair
+            index.flush()
+
+        if documents is not None:
+            rewrite_index("documents", [documents[p] or "" for p, _ in updates])
+        if metadatas is not None:
+            rewrite_index(
+                "metadatas", [self._encode_metadata(metadatas[p]) for p, _ in updates]
+            )
+        if stored is not None:
+            matrix = self._map(
+                _FILES["embeddings"], self._dtype, (self._rows, self._stored_dim), "r+"
+            )
+            for position, row in updates:
+                matrix[row] = stored[position]
+            matrix.flush()
+        if originals is not None:
+            matrix = self._map(
+                _FILES["originals"], np.float32, (self._rows, self._manifest["dim"]), "r+"
+            )
+            for position, row in updates:
+                matrix[row] = originals[position]
+            matrix.flush()
+
+        alive = self._map(_FILES["alive"], np.uint8, (self._rows,), "r+")
+        for _, row in updates:
+            alive[row] = 1
+        alive.flush()
+
+        # Remap so readers see the new index entries
+        self._rows = -1
+        self._refresh()
+        self._load_ids()
+
+    def _discard_uncommitted(self):
+        """Truncate the per-row files to the committed rows, dropping a half-written append."""
+        rows = max(self._rows, 0)
+        index_bytes = rows * 2 * np.dtype(np.int64).itemsize
+        # documents.idx is written first, so if it is intact no later file was touched
+        if os.path.getsize(self._path(_FILES["documents_idx"])) == index_bytes:
+            return
+        sizes = {
+            "documents_idx": index_bytes,
+            "metadatas_idx": index_bytes,
+            "embeddings": rows * self._stored_dim * self._dtype.itemsize,
+            "ids": len("\n".join(self._load_ids()).encode("utf-8")),
+        }
+        if self._has_originals:
+            sizes["originals"] = rows * self._manifest["dim"] * np.dtype(np.float32).itemsize
+        for key, size in sizes.items():
+            path = self._path(_FILES[key])
+            if os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _append(self, positions, ids, documents, metadatas, stored, originals):
+        if not positions:
+            return
+        if stored is None:
+            raise ValueError("New records need documents or embeddings")
+
+        self._discard_uncommitted()
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        doc_pairs = self._append_blobs(
+            "documents", [documents[p] or "" for p in positions]
+        )
+        meta_pairs = self._append_blobs(
+            "metadatas", [self._encode_metadata(metadatas[p]) for p in positions]
+        )
+
+        with open(self._path(_FILES["documents_idx"]), "ab") as file:
+            file.write(doc_pairs.tobytes())
+        with open(self._path(_FILES["metadatas_idx"]), "ab") as file:
+            file.write(meta_pairs.tobytes())
+        with open(self._path(_FILES["embeddings"]), "ab") as file:
+            file.write(np.ascontiguousarray(stored[positions]).tobytes())
+        if originals is not None:
+            with open(self._path(_FILES["originals"]), "ab") as file:
+                file.write(np.ascontiguousarray(originals[positions]).tobytes())
+        with open(self._path(_FILES["ids"]), "a", encoding="utf-8") as file:
+            prefix = "\n" if self._rows > 0 else ""
+            file.write(prefix + "\n".join(ids[p] for p in positions))
+        # Committing the rows: alive.bin's size is the row count readers trust
+        with open(self._path(_FILES["alive"]), "ab") as file:
+            file.write(b"\x01" * len(positions))
+
+        self._refresh()
+
+    def delete(self, ids=None, where=None):
+        """Mark records as deleted by ID and/or metadata filter."""
+        with self._lock:
+            self._refresh()
+            if not self._rows:
+                return
+            self._load_ids()
+            if ids is not None:
+                rows = [self._id_rows[id_] for id_ in ids if id_ in self._id_rows]
+                if where:
+                    metadatas = self._all_metadatas()
+                    rows = [row for row in rows if matches_where(metadatas[row], where)]
+            else:
+                rows = self._live_rows(where).tolist()
+            if not rows:
+                return
+
+            alive = self._map(_FILES["alive"], np.uint8, (self._rows,), "r+")
+            alive[rows] = 0
+            alive.flush()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def _codes(self, rows):
+        """Return stored vectors/codes for the given rows as float32 (no copy if stored so)."""
+        return np.asarray(self._embeddings[rows], dtype=np.float32)
+
+    def _vectors(self, rows):
+        """Return full-dimension float32 vectors: exact if kept, else decoded codes."""
+        if self._originals is not None:
+            return np.asarray(self._originals[rows], dtype=np.float32)
+        if self._codec is not None:
+            return self._codec.decode(self._embeddings[rows])
+        return self._codes(rows)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        """Fetch records by ID and/or metadata filter, in insertion order."""
+        include = ["documents", "metadatas"] if include is None else include
+        with self._lock:
+            self._refresh()
+            all_ids = self._load_ids()
+            if ids is not None:
+                if isinstance(ids, str):
+                    ids = [ids]
+                rows = [
+                    self._id_rows[id_]
+                    for id_ in ids
+                    if id_ in self._id_rows and self._alive[self._id_rows[id_]]
+                ]
+                if where:
+                    rows = [row for row in rows if matches_where(self._metadata(row), where)]
+            else:
+                rows = self._live_rows(where).tolist()
+
+            start = offset or 0
+            rows = rows[start : start + limit] if limit is not None else rows[start:]
+            return self._records(rows, all_ids, include)
+
+    def _records(self, rows, all_ids, include):
+        result = {
+            "ids": [all_ids[row] for row in rows],
+            "documents": None,
+            "metadatas": None,
+            "embeddings": None,
+            "included": list(include),
+        }
+        if "documents" in include:
+            result["documents"] = [self._document(row) for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self._metadata(row) for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = self._vectors(rows)
+        return result
+
+    def _scores(self, queries, rows=None):
+        """Cosine similarities of every query against all (or only the given) rows."""
+        if self._codec is not None:
+            weights, offsets = self._codec.prepare_queries(queries)
+        else:
+            weights, offsets = queries, np.zeros(len(queries), dtype=np.float32)
+
+        count = self._rows if rows is None else len(rows)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, QUERY_BLOCK_ROWS):
+            end = min(start + QUERY_BLOCK_ROWS, count)
+            block = slice(start, end) if rows is None else rows[start:end]
+            scores[:, start:end] = weights @ self._codes(block).T
+        return scores + offsets[:, np.newaxis]
+
+    def query(
+        self,
+        query_embeddings=None,
+        query_texts=None,
+        n_results=10,
+        where=None,
+        include=None,
+    ):
+        """Return the n_results nearest records to each query, best first."""
+        include = ["metadatas", "documents", "distances"] if include is None else include
+        if isinstance(query_texts, str):
+            query_texts = [query_texts]
+        queries = (
+            self._embed(query_texts)
+            if query_embeddings is None
+            else _normalize(query_embeddings)
+        )
+
+        result = {key: [] for key in ("ids", "documents", "metadatas", "embeddings")}
+        result["distances"] = []
+        with self._lock:
+            self._refresh()
+            all_ids = self._load_ids()
+
+            rows = self._live_rows(where) if where else None
+            if self._rows:
+                scores = self._scores(queries, rows)
+                if rows is None:
+                    scores[:, self._alive == 0] = -np.inf
+            else:
+                scores = np.zeros((len(queries), 0), dtype=np.float32)
+
+            for query, query_scores in zip(queries, scores):
+                if self._originals is not None:
+                    top_rows, similarities = self._rescore(
+                        query, query_scores, rows, n_results
+                    )
+                else:
+                    top = self._top_k(query_scores, n_results)
+                    top_rows = (rows[top] if rows is not None else top).tolist()
+                    similarities = query_scores[top].tolist()
+                records = self._records(top_rows, all_ids, include)
+                for key in ("ids", "documents", "metadatas", "embeddings"):
+                    result[key].append(records[key])
+                result["distances"].append([float(1.0 - s) for s in similarities])
+
+        for key in ("documents", "metadatas", "embeddings", "distances"):
+            if key not in include:
+                result[key] = None
+        result["included"] = list(include)
+        return result
+
+    def _rescore(self, query, scores, rows, n_results):
+        """Re-rank the best approximate candidates with full-precision vectors."""
+        top = self._top_k(scores, n_results * RESCORE_FACTOR)
+        candidates = np.sort(rows[top] if rows is not None else top)
+        exact = self._vectors(candidates) @ query
+        order = np.argsort(-exact, kind="stable")[:n_results]
+        return candidates[order].tolist(), exact[order].tolist()
+
+    def fit_compression(self, refit=False, sample_rows=FIT_SAMPLE_ROWS, seed=0):
+        """
+        Fit the configured compression and re-encode every stored vector.
+
+        Until this runs, vectors are stored at full precision. Afterwards new
+        writes are encoded with the fitted codec, so call it once indexing is
+        done (vector_store.optimize_collection does this).
+
+        Args:
+            refit (bool): Fit again even if a codec already exists.
+            sample_rows (int): Maximum number of vectors used for fitting.
+            seed (int): Seed for sampling rows.
+
+        Returns:
+            bool: True if a codec was fitted.
+        """
+        compression = self._manifest.get("compression")
+        with self._lock:
+            self._refresh()
+            if not compression or (self._codec is not None and not refit):
+                return False
+
+            live = self._live_rows()
+            if len(live) < max(MIN_FIT_ROWS, compression.get("dims") or 0):
+                return False
+
+            rng = np.random.default_rng(seed)
+            sample = rng.choice(live, size=min(sample_rows, len(live)), replace=False)
+            codec = VectorCodec.fit(
+                self._vectors(np.sort(sample)),
+                compression["dtype"],
+                compression.get("dims"),
+                compression.get("method", "pca"),
+            )
+
+            # Re-encode block by block into new files, then swap them in
+            targets = [_FILES["embeddings"]]
+            if compression.get("rescore"):
+                targets.append(_FILES["originals"])
+            files = [open(self._path(f"{name}.tmp"), "wb") for name in targets]
+            try:
+                for start in range(0, self._rows, QUERY_BLOCK_ROWS):
+                    block = self._vectors(slice(start, start + QUERY_BLOCK_ROWS))
+                    files[0].write(np.ascontiguousarray(codec.encode(block)).tobytes())
+                    if len(files) > 1:
+                        files[1].write(np.ascontiguousarray(block).tobytes())
+            finally:
+                for file in files:
+                    file.close()
+            for name in targets:
+                os.replace(self._path(f"{name}.tmp"), self._path(name))
+            if not compression.get("rescore") and os.path.exists(
+                self._path(_FILES["originals"])
+            ):
+                os.remove(self._path(_FILES["originals"]))
+            codec.save(self._path(_FILES["codec"]))
+
+            self._manifest["codec"] = True
+            self._write_manifest()
+            self._rows = -1
+            self._refresh()
+            return True
+
+    def compact(self):
+        """
+        Rewrite the collection files without deleted rows and replaced text.
+
+        Deletes only mark rows dead and updates append new blobs, so the files
+        grow until compacted. Run it while no other process writes to the
+        collection.
+
+        Returns:
+            int: Rows dropped.
+        """
+        with self._lock:
+            self._refresh()
+            live = self._live_rows()
+            dropped = self._rows - len(live)
+            ids = self._load_ids()
+
+            def write(filename, blocks):
+                with open(self._path(f"{filename}.tmp"), "wb") as file:
+                    for block in blocks:
+                        file.write(block)
+
+            def rows_of(matrix):
+                for start in range(0, len(live), QUERY_BLOCK_ROWS):
+                    rows = live[start : start + QUERY_BLOCK_ROWS]
+                    yield np.ascontiguousarray(matrix[rows]).tobytes()
+
+            targets = [_FILES["embeddings"]]
+            write(_FILES["embeddings"], rows_of(self._embeddings))
+            if self._originals is not None:
+                targets.append(_FILES["originals"])
+                write(_FILES["originals"], rows_of(self._originals))
+            for kind in ("documents", "metadatas"):
+                index = self._doc_index if kind == "documents" else self._meta_index
+                pairs = np.zeros((len(live), 2), dtype=np.int64)
+                offset = 0
+                with open(self._path(_FILES[kind]), "rb") as source, open(
+                    self._path(f"{_FILES[kind]}.tmp"), "wb"
+                ) as target:
+                    for position, row in enumerate(live):
+                        start, length = (int(value) for value in index[row])
+                        source.seek(start)
+                        target.write(source.read(length))
+                        pairs[position] = (offset, length)
+                        offset += length
+                write(_FILES[f"{kind}_idx"], [pairs.tobytes()])
+                targets += [_FILES[kind], _FILES[f"{kind}_idx"]]
+            with open(self._path(f"{_FILES['ids']}.tmp"), "w", encoding="utf-8") as file:
+                file.write("\n".join(ids[row] for row in live))
+            targets.append(_FILES["ids"])
+            # alive.bin last: its size is the row count readers trust
+            write(_FILES["alive"], [b"\x01" * len(live)])
+            targets.append(_FILES["alive"])
+
+            for filename in targets:
+                os.replace(self._path(f"{filename}.tmp"), self._path(filename))
+            self._write_manifest()
+            self._rows = -1
+            self._refresh()
+            return dropped
+
+    @staticmethod
+    def _top_k(scores, k):
+        """Indices of the k highest finite scores, best first."""
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return np.array([], dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
@@ -0,0 +1,357 @@
+"""
+Structured index of indexed file paths.
+
+Keeps a directory trie for folder listings plus token and trigram indexes on file
+names, so file-listing questions are answered directly instead of through vector
+search over flattened path text. The index is persisted as JSON in the vector
+store's folder, one file per collection.
+"""
+
+import json
+import os
+import re
+import time
+from collections import defaultdict
+
+import vector_store
+
+# Folder of the path indexes inside a vector store's root folder
+PATH_INDEX_FOLDER = "path_index"
+
+
+def normalize_path(path):
+    """
+    Normalize a path to forward slashes, matching the metadata stored with chunks.
+
+    Args:
+        path (str): The file or folder path.
+
+    Returns:
+        str: The path with forward slashes and no trailing slash.
+    """
+    normalized = path.replace("\\", "/")
+    return normalized.rstrip("/") or normalized
+
+
+def tokenize_name(name):
+    """
+    Split a file name into lowercase alphanumeric tokens.
+
+    Args:
+        name (str): The file name, e.g. "Invoice_2024-Q3.pdf".
+
+    Returns:
+        list[str]: Tokens such as ["invoice", "2024", "q3", "pdf"].
+    """
+    return [token for token in re.split(r"[^a-z0-9]+", name.lower()) if token]
+
+
+def trigrams(text):
+    """
+    Return the set of character trigrams of a lowercase string.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        set[str]: All 3-character substrings (empty for shorter text).
+    """
+    text = text.lower()
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class _TrieNode:
+    """A directory in the path trie: child folders and the files directly inside it."""
+
+    __slots__ = ("children", "files")
+
+    def __init__(self):
+        self.children = {}
+        self.files = set()
+
+
+class PathIndex:
+    """
+    In-memory index of file paths with directory, token and trigram lookups.
+
+    Only the per-file entries are persisted; the trie and the name indexes are
+    rebuilt on load, which keeps the on-disk format small and easy to evolve.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self._root = _TrieNode()
+        self._tokens = defaultdict(set)
+        self._trigrams = defaultdict(set)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, path):
+        return normalize_path(path) in self.files
+
+    @classmethod
+    def from_files(cls, files, previous=None):
+        """
+        Build an index from a list of file paths.
+
+        Args:
+            files (list[str]): Paths of the indexed files.
+            previous (PathIndex | None): An earlier index whose "added" times are kept.
+
+        Returns:
+            PathIndex: The populated index.
+        """
+        index = cls()
+        for file in files:
+            added = None
+            if previous is not None:
+                entry = previous.files.get(normalize_path(file))
+                added = entry["added"] if entry else None
+            index.add(file, added=added)
+        return index
+
+    def add(self, path, added=None):
+        """
+        Add (or refresh) a file in the index.
+
+        Args:
+            path (str): The file path.
+            added (float | None): When the file was first indexed; defaults to now.
+        """
+        path = normalize_path(path)
+        if path in self.files:
+            self.remove(path)
+
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            modified = None
+
+        self.files[path] = {
+            "added": added if added is not None else time.time(),
+            "modified": modified,
+        }
+        self._index(path)
+
+    def remove(self, path):
+        """
+        Remove a file from the index if present.
+
+        Args:
+            path (str): The file path.
+        """
+        path = normalize_path(path)
+        if self.files.pop(path, None) is None:
+            return
+
+        node = self._node_for(os.path.dirname(path))
+        if node is not None:
+            node.files.discard(path)
+
+        name = os.path.basename(path).lower()
+        for token in tokenize_name(name):
+            self._tokens[token].discard(path)
+        for gram in trigrams(name):
+            self._trigrams[gram].discard(path)
+
+    def _index(self, path):
+        node = self._root
+        for part in self._split_dir(os.path.dirname(path)):
+            node = node.children.setdefault(part, _TrieNode())
+        node.files.add(path)
+
+        name = os.path.basename(path).lower()
+        for token in tokenize_name(name):
+            self._tokens[token].add(path)
+        for gram in trigrams(name):
+            self._trigrams[gram].add(path)
+
+    @staticmethod
+    def _split_dir(directory):
+        return [part for part in normalize_path(directory).split("/") if part]
+
+    def _node_for(self, directory):
+        node = self._root
+        for part in self._split_dir(directory):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def _find_folder_nodes(self, folder):
+        """Find trie nodes whose path ends with the given folder components."""
+        parts = self._split_dir(folder.lower())
+        if not parts:
+            return [self._root]
+
+        matches = []
+        stack = [(self._root, [])]
+        while stack:
+            node, trail = stack.pop()
+            lowered = [part.lower() for part in trail]
+            if lowered[-len(parts) :] == parts:
+                matches.append(node)
+                continue
+            for name, child in node.children.items():
+                stack.append((child, trail + [name]))
+        return matches
+
+    def list_directory(self, folder="", extension=None, recursive=True):
+        """
+        List files inside a folder.
+
+        The folder may be an absolute path or any trailing part of one (e.g.
+        "contracts" matches "/srv/docs/contracts"), compared case-insensitively.
+
+        Args:
+            folder (str): Folder path or trailing path components.
+            extension (str | None): Only return files with this extension, e.g. ".pdf".
+            recursive (bool): Include files in subfolders.
+
+        Returns:
+            list[str]: Sorted matching file paths.
+        """
+        results = set()
+        for node in self._find_folder_nodes(folder):
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                results.update(current.files)
+                if recursive:
+                    stack.extend(current.children.values())
+
+        if extension:
+            extension = extension.lower()
+            results = {path for path in results if path.lower().endswith(extension)}
+        return sorted(results)
+
+    def search(self, terms, extension=None, folder=None, limit=None):
+        """
+        Find files whose names contain all of the given terms.
+
+        Whole tokens are matched through the token index; other terms fall back to
+        substring matching narrowed down by the trigram index.
+
+        Args:
+            terms (list[str]): Search terms; an empty list matches every file.
+            extension (str | None): Only return files with this extension.
+            folder (str | None): Only return files under this folder.
+            limit (int | None): Maximum number of results.
+
+        Returns:
+            list[str]: Sorted matching file paths.
+        """
+        candidates = (
+            set(self.list_directory(folder)) if folder else set(self.files.keys())
+        )
+
+        for term in terms:
+            term = term.lower()
+            matched = set(self._tokens.get(term, ()))
+            grams = trigrams(term)
+            if grams:
+                substring = set.intersection(
+                    *(self._trigrams.get(gram, set()) for gram in grams)
+                )
+                matched |= {
+                    path
+                    for path in substring
+                    if term in os.path.basename(path).lower()
+                }
+            candidates &= matched
+            if not candidates:
+                break
+
+        if extension:
+            extension = extension.lower()
+            candidates = {p for p in candidates if p.lower().endswith(extension)}
+
+        results = sorted(candidates)
+        return results[:limit] if limit else results
+
+    def save(self, filepath):
+        """
+        Write the index to a JSON file.
+
+        Args:
+            filepath (str): Destination path; parent folders are created as needed.
+        """
+        os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": 1, "files": self.files}, file)
+        os.replace(tmp_path, filepath)
+
+    @classmethod
+    def load(cls, filepath):
+        """
+        Load an index from a JSON file.
+
+        Args:
+            filepath (str): Path written by save().
+
+        Returns:
+            PathIndex: The loaded index, or an empty one if the file is missing or invalid.
+        """
+        index = cls()
+        try:
+            with open(filepath, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return index
+
+        for path, entry in data.get("files", {}).items():
+            index.files[path] = entry
+            index._index(path)
+        return index
+
+
+def path_index_directory(store_directory=None):
+    """
+    Return the folder holding the path indexes of a vector store.
+
+    Args:
+        store_directory (str | None): Root folder of the store; defaults to
+            vector_store.VECTORDB_PATH.
+
+    Returns:
+        str: The path index folder.
+    """
+    return os.path.join(store_directory or vector_store.VECTORDB_PATH, PATH_INDEX_FOLDER)
+
+
+def path_index_file(collection_name, directory=None):
+    """
+    Return the JSON file holding the path index of a collection.
+
+    Args:
+        collection_name (str): Name of the vector store collection.
+        directory (str | None): Folder where path indexes are stored; defaults
+            to path_index_directory().
+
+    Returns:
+        str: Path of the index file.
+    """
+    return os.path.join(directory or path_index_directory(), f"{collection_name}.json")
+
+
+def build_path_index(files, collection_name, directory=None):
+    """
+    Build and persist the path index for a collection.
+
+    First-indexed times from an existing index are preserved.
+
+    Args:
+        files (list[str]): Paths of the indexed files.
+        collection_name (str): Name of the vector store collection.
+        directory (str | None): Folder where path indexes are stored; defaults
+            to path_index_directory().
+
+    Returns:
+        PathIndex: The saved index.
+    """
+    filepath = path_index_file(collection_name, directory)
+    index = PathIndex.from_files(files, previous=PathIndex.load(filepath))
+    index.save(filepath)
+    return index
@@ -0,0 +1,219 @@
+"""
+On-demand profiling of indexing runs and single questions.
+
+profile_run wraps a block in cProfile and saves two artifacts per run in
+PROFILES_PATH:
+
+- <run>.pstats: the raw statistics, for ``python -m pstats`` or snakeviz
+- <run>.collapsed: one "frame;frame;frame microseconds" line per call path,
+  the collapsed-stack format read by flamegraph.pl, speedscope and inferno
+
+cProfile only sees the thread that enabled it, so a run covers the block's own
+thread. When profiling is off the block runs unwrapped, with no profiler hook,
+and cProfile is never imported.
+"""
+
+import contextlib
+import os
+import time
+import uuid
+
+from utils import sanitize_filename
+
+# Folder where profile artifacts are saved
+PROFILES_PATH = "./profiles"
+
+# Call paths shorter than this many microseconds are left out of collapsed stacks
+MIN_STACK_MICROSECONDS = 1
+
+# Deepest call path followed when collapsing stacks
+MAX_STACK_DEPTH = 256
+
+
+class ProfileRun:
+    """
+    The artifacts of one profiled block, filled in when the block exits.
+
+    Attributes:
+        label (str): What was profiled, e.g. "index" or "query".
+        seconds (float | None): Wall time of the block.
+        pstats_file (str | None): Path of the saved pstats file.
+        collapsed_file (str | None): Path of the saved collapsed-stack file.
+        stats (pstats.Stats | None): The statistics, for reports.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.seconds = None
+        self.pstats_file = None
+        self.collapsed_file = None
+        self.stats = None
+
+
+def _frame_name(function):
+    filename, line, name = function
+    if filename == "~":
+        # Built-ins are reported as ("~", 0, "<built-in method ...>")
+        return name.replace(";", ":")
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ":")
+
+
+def collapse_stacks(stats):
+    """
+    Turn cProfile statistics into collapsed call stacks.
+
+    cProfile records caller/callee pairs rather than whole stacks, so each
+    function's own time is spread over its call paths in proportion to the
+    time spent on each caller edge; time no profiled caller accounts for starts
+    a path of its own. Recursive calls end the path.
+
+    Args:
+        stats (pstats.Stats): The profile statistics.
+
+    Returns:
+        dict[str, int]: Maps "root;...;function" to its own time in microseconds.
+    """
+    entries = stats.stats
+    callees = {}
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            # edge is (primitive calls, calls, own time, cumulative time)
+            callees.setdefault(caller, []).append((function, edge[3]))
+
+    stacks = {}
+
+    def visit(function, path, share, visiting):
+        _, _, own_time, cumulative, _ = entries[function]
+        path = path + [_frame_name(function)]
+        microseconds = round(own_time * share * 1e6)
+        if microseconds >= MIN_STACK_MICROSECONDS:
+            key = ";".join(path)
+            stacks[key] = stacks.get(key, 0) + microseconds
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(function, ()):
+            if callee in visiting or not entries[callee][3]:
+                continue
+            callee_share = min(1.0, edge_time * share / entries[callee][3])
+            if entries[callee][3] * callee_share * 1e6 < MIN_STACK_MICROSECONDS:
+                continue
+            visiting.add(callee)
+            visit(callee, path, callee_share, visiting)
+            visiting.discard(callee)
+
+    for function, (_, _, _, cumulative, callers) in entries.items():
+        # Time not explained by profiled callers was spent in calls made
+        # straight from the profiled block, so the function is also a root
+        known = sum(
+            edge[3] for caller, edge in callers.items() if caller in entries and caller != function
+        )
+        if not cumulative:
+            share = 0.0 if known else 1.0
+        else:
+            share = max(0.0, cumulative - known) / cumulative
+        if share > 1e-6:
+            visit(function, [], share, {function})
+    return stacks
+
+
+def write_collapsed(stats, filepath):
+    """
+    Save collapsed call stacks for flame graph tools.
+
+    Args:
+        stats (pstats.Stats): The profile statistics.
+        filepath (str): Destination file.
+    """
+    with open(filepath, "w", encoding="utf-8") as file:
+        for stack, microseconds in sorted(collapse_stacks(stats).items()):
+            file.write(f"{stack} {microseconds}\n")
+
+
+@contextlib.contextmanager
+def profile_run(label, enabled=True, directory=None):
+    """
+    Profile a block and save its pstats and collapsed-stack files.
+
+    Usage: ``with profile_run("query", enabled=flag) as run: ...``; after the
+    block, run.pstats_file and run.collapsed_file name the artifacts.
+
+    Args:
+        label (str): What is profiled; part of the artifact names.
+        enabled (bool): Profile the block; when False it runs unprofiled and
+            None is yielded.
+        directory (str | None): Folder where artifacts are saved; defaults to
+            PROFILES_PATH.
+
+    Yields:
+        ProfileRun | None: The run, completed when the block exits.
+    """
+    if not enabled:
+        yield None
+        return
+
+    import cProfile
+    import pstats
+
+    run = ProfileRun(label)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield run
+    finally:
+        profiler.disable()
+        run.seconds = time.perf_counter() - start
+        directory = directory or PROFILES_PATH
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        name = f"{stamp}-{uuid.uuid4().hex[:6]}-{sanitize_filename(label)}"
+        run.pstats_file = os.path.join(directory, f"{name}.pstats")
+        run.collapsed_file = os.path.join(directory, f"{name}.collapsed")
+        run.stats = pstats.Stats(profiler)
+        run.stats.dump_stats(run.pstats_file)
+        write_collapsed(run.stats, run.collapsed_file)
+
+
+def top_functions(stats, limit=15):
+    """
+    List the functions with the most cumulative time.
+
+    Args:
+        stats (pstats.Stats): The profile statistics.
+        limit (int): Number of functions to return.
+
+    Returns:
+        list[dict]: "function", "calls", "own_s" and "cumulative_s" per function.
+    """
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            "function": _frame_name(function),
+            "calls": calls,
+            "own_s": own_time,
+            "cumulative_s": cumulative,
+        }
+        for function, (_, calls, own_time, cumulative, _) in rows[:limit]
+    ]
+
+
+def format_run(run, limit=10):
+    """
+    Describe a profiled run: where its artifacts are and its slowest functions.
+
+    Args:
+        run (ProfileRun): A completed run.
+        limit (int): Number of functions to list.
+
+    Returns:
+        str: A short multi-line report.
+    """
+    lines = [
+        f"Profiled {run.label} in {run.seconds:.2f} s: {run.pstats_file}, {run.collapsed_file}"
+    ]
+    for row in top_functions(run.stats, limit):
+        lines.append(
+            f"  {row['cumulative_s']:8.3f} s cumulative {row['own_s']:8.3f} s own "
+            f"{row['calls']:>7} calls  {row['function']}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,317 @@
+"""
+Fast-path routing for metadata questions.
+
+Questions such as "how many documents are indexed", "what files are in folder X"
+or "when was Y added" are answered straight from the path index and collection
+metadata, skipping retrieval and the LLM call. Deterministic rules run first; a
+tiny local Naive Bayes classifier can optionally catch other phrasings.
+"""
+
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+
+from retrieval_system import parse_file_query
+
+COUNT, LIST, ADDED = "count", "list", "added"
+
+# Maximum number of paths written out in a routed file listing
+MAX_LISTED_FILES = 50
+
+FILE_NOUNS = r"(?:files?|documents?|docs?|pdfs?|txts?|docx|odts?)"
+
+# Words allowed between a trigger and the file noun ("list all indexed PDFs").
+# Anything else in between ("how many days of leave does the policy document
+# give") makes it a question about content.
+FILE_QUALIFIERS = (
+    r"(?:(?:all|the|my|our|these|those)\s+)?"
+    r"(?:(?:indexed|uploaded|stored|loaded|available)\s+)?"
+)
+
+# A file noun or a file name with a supported extension
+FILE_MENTION = rf"(?:\b{FILE_NOUNS}\b|\b[\w-]+\.(?:pdf|txt|docx|odt)\b)"
+
+# Ordered rules: the first matching pattern decides the intent
+RULES = [
+    (
+        ADDED,
+        re.compile(
+            r"\bwhen\s+(?:was|were|did|is)\b.*\b(?:added|indexed|uploaded)\b"
+            # "When was the leave policy changed?" asks about content; only
+            # changes to a named file or document are file metadata
+            rf"|\bwhen\s+(?:was|were|did|is)\b(?=.*{FILE_MENTION}).*\b(?:modified|changed|updated)\b",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        COUNT,
+        re.compile(
+            rf"\b(?:how\s+many|number\s+of|count\s+of|count)\s+{FILE_QUALIFIERS}{FILE_NOUNS}\b",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        LIST,
+        re.compile(
+            rf"^\s*(?:please\s+)?(?:list|show(?:\s+me)?|display|give\s+me)\s+"
+            rf"{FILE_QUALIFIERS}{FILE_NOUNS}\b"
+            # "what files are in ...", but not "what documents are required for ..."
+            rf"|\b(?:what|which)\s+{FILE_QUALIFIERS}{FILE_NOUNS}\s+"
+            r"(?:(?:are|were)\s+(?:there|in|inside|under|indexed|stored|available|uploaded)\b"
+            r"|do\s+you\s+have\b|exist\b)",
+            re.IGNORECASE,
+        ),
+    ),
+]
+
+# Questions about what documents say must go to the RAG chain even if they
+# mention files ("which files mention invoices")
+CONTENT_PATTERN = re.compile(
+    r"\b(?:mention|mentions|about|discuss|discusses|say|says|contain|contains|"
+    r"describe|describes|explain|explains|talk|talks|cover|covers)\b",
+    re.IGNORECASE,
+)
+
+# Seed examples for the optional classifier; "rag" means "not a metadata question"
+TRAINING_EXAMPLES = [
+    (COUNT, "how many documents are indexed"),
+    (COUNT, "how many files do we have"),
+    (COUNT, "number of pdfs in the collection"),
+    (COUNT, "total count of indexed documents"),
+    (COUNT, "how big is the document collection"),
+    (LIST, "list all files"),
+    (LIST, "what files are in the folder reports"),
+    (LIST, "show me the documents under contracts"),
+    (LIST, "which pdfs do you have"),
+    (LIST, "give me the names of the indexed documents"),
+    (ADDED, "when was the report added"),
+    (ADDED, "when did you index the contract"),
+    (ADDED, "what date was budget.txt indexed"),
+    (ADDED, "when was invoice.pdf last modified"),
+    ("rag", "what does the contract say about termination"),
+    ("rag", "summarize the quarterly report"),
+    ("rag", "who signed the agreement"),
+    ("rag", "what is the total budget for 2024"),
+    ("rag", "explain the methodology section"),
+    ("rag", "which documents mention invoices"),
+]
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class IntentClassifier:
+    """Multinomial Naive Bayes over question words, small enough to train at startup."""
+
+    def __init__(self, examples=TRAINING_EXAMPLES):
+        self.class_counts = Counter()
+        self.word_counts = defaultdict(Counter)
+        self.vocabulary = set()
+        for label, text in examples:
+            self.class_counts[label] += 1
+            for word in _words(text):
+                self.word_counts[label][word] += 1
+                self.vocabulary.add(word)
+
+    def predict(self, text):
+        """
+        Predict the intent of a question.
+
+        Args:
+            text (str): The user's question.
+
+        Returns:
+            tuple[str, float]: The most likely label and its probability.
+        """
+        total = sum(self.class_counts.values())
+        words = _words(text)
+        scores = {}
+        for label, count in self.class_counts.items():
+            label_words = self.word_counts[label]
+            denominator = sum(label_words.values()) + len(self.vocabulary)
+            score = math.log(count / total)
+            for word in words:
+                score += math.log((label_words[word] + 1) / denominator)
+            scores[label] = score
+
+        best = max(scores, key=scores.get)
+        # Softmax over log scores to get a comparable confidence
+        peak = scores[best]
+        normalizer = sum(math.exp(score - peak) for score in scores.values())
+        return best, 1 / normalizer
+
+
+class RouterStats:
+    """Counts and latencies of routed versus LLM-answered queries."""
+
+    def __init__(self):
+        self.latencies = {"routed": [], "llm": []}
+
+    def record(self, route, seconds):
+        """
+        Record one answered query.
+
+        Args:
+            route (str): "routed" or "llm".
+            seconds (float): End-to-end latency of the answer.
+        """
+        self.latencies[route].append(seconds)
+
+    def summary(self):
+        """
+        Summarize counts and latencies per route.
+
+        Returns:
+            dict: For each route, the query count and mean/p95 latency in milliseconds.
+        """
+        summary = {}
+        for route, values in self.latencies.items():
+            ordered = sorted(values)
+            summary[route] = {
+                "count": len(ordered),
+                "mean_ms": 1000 * sum(ordered) / len(ordered) if ordered else 0.0,
+                "p95_ms": (
+                    1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+                    if ordered
+                    else 0.0
+                ),
+            }
+        return summary
+
+    def format(self):
+        """
+        Render the summary as a short human-readable report.
+
+        Returns:
+            str: One line per route.
+        """
+        return "\n".join(
+            f"{route}: {data['count']} queries, mean {data['mean_ms']:.1f} ms, "
+            f"p95 {data['p95_ms']:.1f} ms"
+            for route, data in self.summary().items()
+        )
+
+
+class QueryRouter:
+    """
+    Answer metadata questions from the path index and collection, or defer to the LLM.
+
+    Args:
+        path_index (PathIndex | None): Index of the indexed file paths.
+        collection: Vector store collection, used for chunk counts.
+        use_classifier (bool | None): Fall back to the local classifier when no rule
+            matches. Defaults to the QUERY_ROUTER_CLASSIFIER environment variable.
+        threshold (float): Minimum classifier confidence to route a query.
+    """
+
+    def __init__(self, path_index, collection=None, use_classifier=None, threshold=0.8):
+        if use_classifier is None:
+            use_classifier = os.getenv("QUERY_ROUTER_CLASSIFIER", "").lower() == "true"
+
+        self.path_index = path_index
+        self.collection = collection
+        self.classifier = IntentClassifier() if use_classifier else None
+        self.threshold = threshold
+        self.stats = RouterStats()
+
+    def detect_intent(self, query_text):
+        """
+        Detect whether a question is a metadata question.
+
+        Args:
+            query_text (str): The user's question.
+
+        Returns:
+            str | None: COUNT, LIST or ADDED, or None for questions for the RAG chain.
+        """
+        if CONTENT_PATTERN.search(query_text):
+            return None
+
+        for intent, pattern in RULES:
+            if pattern.search(query_text):
+                return intent
+
+        if self.classifier is not None:
+            label, confidence = self.classifier.predict(query_text)
+            if label != "rag" and confidence >= self.threshold:
+                return label
+        return None
+
+    def route(self, query_text):
+        """
+        Answer a question directly if it is a metadata question.
+
+        Args:
+            query_text (str): The user's question.
+
+        Returns:
+            str | None: The answer, or None if the question needs the RAG chain.
+        """
+        if self.path_index is None:
+            return None
+
+        intent = self.detect_intent(query_text)
+        if intent is None:
+            return None
+
+        parsed = parse_file_query(query_text)
+        if intent == COUNT:
+            return self._answer_count(parsed)
+        if intent == LIST:
+            return self._answer_list(parsed)
+        return self._answer_added(parsed)
+
+    def _matching_files(self, parsed, use_terms=True):
+        terms = parsed["terms"] if use_terms else []
+        return self.path_index.search(terms, parsed["extension"], parsed["folder"])
+
+    @staticmethod
+    def _describe(parsed, count=2):
+        kind = "file" if count == 1 else "files"
+        if parsed["extension"]:
+            kind = f"{parsed['extension'][1:].upper()} {kind}"
+        return f"{kind} in '{parsed['folder']}'" if parsed["folder"] else kind
+
+    def _answer_count(self, parsed):
+        files = self._matching_files(parsed, use_terms=False)
+        verb = "is" if len(files) == 1 else "are"
+        answer = f"There {verb} {len(files)} indexed {self._describe(parsed, len(files))}."
+        if not parsed["extension"] and not parsed["folder"] and self.collection is not None:
+            answer += f" The collection holds {self.collection.count()} searchable chunks."
+        return answer
+
+    def _answer_list(self, parsed):
+        files = self._matching_files(parsed)
+        if not files and parsed["terms"]:
+            # Words that name no file make it a question about content
+            return None
+        if not files:
+            return f"No indexed {self._describe(parsed)} found."
+
+        listing = "\n".join(f"- {file}" for file in files[:MAX_LISTED_FILES])
+        answer = f"Indexed {self._describe(parsed)} ({len(files)}):\n{listing}"
+        if len(files) > MAX_LISTED_FILES:
+            answer += f"\n... and {len(files) - MAX_LISTED_FILES} more."
+        return answer
+
+    def _answer_added(self, parsed):
+        files = self._matching_files(parsed) if parsed["terms"] else []
+        if not files:
+            # Not specific enough to look up; let the LLM handle it
+            return None
+
+        lines = []
+        for file in files[:MAX_LISTED_FILES]:
+            entry = self.path_index.files[file]
+            line = f"- {file}: added {_format_time(entry['added'])}"
+            if entry.get("modified"):
+                line += f", last modified {_format_time(entry['modified'])}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def _format_time(timestamp):
+    return time.strftime("%b %d, %Y %H:%M:%S", time.localtime(timestamp))
@@ -0,0 +1,337 @@
+"""
+Process-wide registry of open collections and app sessions.
+
+Many Streamlit sessions on one server would otherwise each keep their own
+collection handle, router and chat in st.session_state until the process
+exits. The resource manager owns the collection handles instead:
+
+- collections are keyed by their indexing job key and reference-counted by the
+  sessions using them; sessions look their handle up on every rerun
+- unreferenced collections stay open in an LRU while their estimated size fits
+  the memory ceiling, and are unloaded (then reopened on demand) past it
+- sessions not seen for the idle timeout are evicted: their reference is
+  dropped, their chat offloaded to disk (and reloaded if they come back) and
+  their eviction callback run
+
+stats() reports the resident collections and the memory of each session.
+"""
+
+import collections
+import threading
+import time
+
+from utils import env_number
+
+# Estimated resident bytes per stored chunk: a 384-dimension float32 vector,
+# its index links and about 250 characters of text and metadata
+BYTES_PER_CHUNK = 2048
+
+# Estimated bytes of unreferenced collections kept open
+MEMORY_LIMIT_BYTES = 1024 * 1024 * 1024
+
+# Seconds without a rerun after which a session is evicted
+IDLE_TIMEOUT = 30 * 60
+
+# Seconds between idle-session sweeps
+SWEEP_INTERVAL = 30
+
+
+def estimate_collection_bytes(collection):
+    """
+    Estimate the memory an open collection holds.
+
+    Args:
+        collection: A collection from any backend.
+
+    Returns:
+        int: count() times BYTES_PER_CHUNK, or 0 if it cannot be counted.
+    """
+    try:
+        return collection.count() * BYTES_PER_CHUNK
+    except Exception:
+        return 0
+
+
+class _Entry:
+    """An open (or unloaded) collection and the sessions using it."""
+
+    def __init__(self, collection, reopen, busy, unload):
+        self.collection = collection
+        self.reopen = reopen
+        self.busy = busy
+        self.unload = unload
+        self.sessions = set()
+        self.bytes = estimate_collection_bytes(collection)
+        self.last_used = None
+
+
+class _Session:
+    """What the manager knows about one app session."""
+
+    def __init__(self, now):
+        self.last_seen = now
+        self.key = None
+        self.chat = None
+        self.on_evict = None
+
+
+class ResourceManager:
+    """
+    Reference-counted collection handles with an LRU memory ceiling, and
+    idle-session eviction.
+
+    Args:
+        memory_limit (int): Estimated bytes of unreferenced collections to keep open.
+        idle_timeout (float): Seconds without a rerun before a session is evicted.
+        clock (callable): Returns the current time in seconds.
+    """
+
+    def __init__(
+        self, memory_limit=MEMORY_LIMIT_BYTES, idle_timeout=IDLE_TIMEOUT, clock=time.monotonic
+    ):
+        self.memory_limit = memory_limit
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._lock = threading.RLock()
+        # Least recently used first
+        self._entries = collections.OrderedDict()
+        self._sessions = {}
+        self._last_sweep = clock()
+        self.evicted_sessions = 0
+        self.unloaded_collections = 0
+
+    # ------------------------------------------------------------------
+    # Collections
+    # ------------------------------------------------------------------
+
+    def attach(self, session_id, key, collection, reopen, busy=None, unload=None):
+        """
+        Register a collection and make it the one a session uses.
+
+        Args:
+            session_id (str): The session.
+            key (str): The collection's key, e.g. its indexing job key.
+            collection: The open collection.
+            reopen (callable): Opens the collection again after it was unloaded.
+            busy (callable | None): Returns True while the collection must stay
+                open, e.g. while it is being indexed.
+            unload (callable | None): Called after the handle is dropped, to
+                release other references to it.
+
+        Returns:
+            The collection.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(collection, reopen, busy, unload)
+            else:
+                entry.collection, entry.reopen = collection, reopen
+                entry.busy, entry.unload = busy, unload
+                entry.bytes = estimate_collection_bytes(collection)
+            self._use(session_id, key)
+            self.trim()
+            return collection
+
+    def get(self, session_id, key):
+        """
+        Return the collection a session uses, reopening it if it was unloaded.
+
+        Args:
+            session_id (str): The session.
+            key (str): The collection's key.
+
+        Returns:
+            The collection, or None if no collection was attached under key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.collection is None:
+                entry.collection = entry.reopen()
+                entry.bytes = estimate_collection_bytes(entry.collection)
+            self._use(session_id, key)
+            self.trim()
+            return entry.collection
+
+    def detach(self, session_id):
+        """
+        Stop a session from using its collection.
+
+        Args:
+            session_id (str): The session.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.key is None:
+                return
+            entry = self._entries.get(session.key)
+            if entry is not None:
+                entry.sessions.discard(session_id)
+            session.key = None
+            self.trim()
+
+    def _use(self, session_id, key):
+        session = self._session(session_id)
+        if session.key != key:
+            previous = self._entries.get(session.key)
+            if previous is not None:
+                previous.sessions.discard(session_id)
+            session.key = key
+        entry = self._entries[key]
+        entry.sessions.add(session_id)
+        entry.last_used = self.clock()
+        self._entries.move_to_end(key)
+
+    def trim(self):
+        """
+        Unload least recently used collections until the unreferenced ones fit
+        the memory ceiling.
+
+        Collections used by a session or busy are never unloaded.
+
+        Returns:
+            list[str]: Keys of the unloaded collections.
+        """
+        unloaded = []
+        with self._lock:
+            idle = [
+                (key, entry)
+                for key, entry in self._entries.items()
+                if entry.collection is not None
+                and not entry.sessions
+                and not (entry.busy and entry.busy())
+            ]
+            resident = sum(entry.bytes for _, entry in idle)
+            for key, entry in idle:
+                if resident <= self.memory_limit:
+                    break
+                resident -= entry.bytes
+                entry.collection = None
+                if entry.unload:
+                    entry.unload()
+                unloaded.append(key)
+            self.unloaded_collections += len(unloaded)
+        return unloaded
+
+    # ------------------------------------------------------------------
+    # Sessions
+    # ------------------------------------------------------------------
+
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session(self.clock())
+        return session
+
+    def touch(self, session_id, chat=None, on_evict=None):
+        """
+        Record that a session is active, and sweep idle sessions now and then.
+
+        Args:
+            session_id (str): The session.
+            chat (ChatHistory | None): Its conversation, offloaded on eviction,
+                reloaded when the session is touched again and counted in
+                stats().
+            on_evict (callable | None): Called when the session is evicted, to
+                drop what it holds (e.g. its router's collection handle).
+        """
+        with self._lock:
+            session = self._session(session_id)
+            session.last_seen = self.clock()
+            if chat is not None:
+                session.chat = chat
+                chat.reload()
+            if on_evict is not None:
+                session.on_evict = on_evict
+            if session.last_seen - self._last_sweep >= SWEEP_INTERVAL:
+                self.evict_idle()
+
+    def evict_idle(self):
+        """
+        Evict sessions idle for longer than the timeout.
+
+        Their collection references are dropped, their chat is offloaded to disk
+        and their on_evict callback runs. A session that comes back starts a new
+        record, reloads its latest messages on touch() and reopens its
+        collection through get().
+
+        Returns:
+            list[str]: IDs of the evicted sessions.
+        """
+        with self._lock:
+            now = self.clock()
+            self._last_sweep = now
+            idle = [
+                session_id
+                for session_id, session in self._sessions.items()
+                if now - session.last_seen > self.idle_timeout
+            ]
+            for session_id in idle:
+                self.detach(session_id)
+                session = self._sessions.pop(session_id)
+                if session.chat is not None:
+                    session.chat.offload_all()
+                if session.on_evict is not None:
+                    session.on_evict()
+            self.evicted_sessions += len(idle)
+            if idle:
+                self.trim()
+            return idle
+
+    # ------------------------------------------------------------------
+    # Configuration and stats
+    # ------------------------------------------------------------------
+
+    def configure(self):
+        """Apply the RESOURCE_MEMORY_LIMIT_MB and SESSION_IDLE_TIMEOUT settings."""
+        megabyte = 1024 * 1024
+        self.memory_limit = (
+            env_number("RESOURCE_MEMORY_LIMIT_MB", self.memory_limit / megabyte) * megabyte
+        )
+        self.idle_timeout = env_number("SESSION_IDLE_TIMEOUT", float(self.idle_timeout))
+
+    def stats(self):
+        """
+        Describe the open collections and the sessions.
+
+        Returns:
+            dict: "collections" lists each key with its "sessions" count,
+                estimated "bytes", whether it is "resident" and "idle_seconds";
+                "sessions" lists each session's "idle_seconds", "collection" key
+                and "chat_bytes"; plus "resident_bytes", "evicted_sessions" and
+                "unloaded_collections" totals.
+        """
+        with self._lock:
+            now = self.clock()
+            open_collections = [
+                {
+                    "key": key,
+                    "sessions": len(entry.sessions),
+                    "bytes": entry.bytes,
+                    "resident": entry.collection is not None,
+                    "idle_seconds": now - entry.last_used if entry.last_used else None,
+                }
+                for key, entry in reversed(self._entries.items())
+            ]
+            sessions = [
+                {
+                    "session": session_id,
+                    "idle_seconds": now - session.last_seen,
+                    "collection": session.key,
+                    "chat_bytes": session.chat.memory_bytes() if session.chat else 0,
+                }
+                for session_id, session in self._sessions.items()
+            ]
+            return {
+                "collections": open_collections,
+                "sessions": sessions,
+                "resident_bytes": sum(c["bytes"] for c in open_collections if c["resident"]),
+                "evicted_sessions": self.evicted_sessions,
+                "unloaded_collections": self.unloaded_collections,
+            }
+
+
+# Process-wide manager shared by every session of the app
+resources = ResourceManager()
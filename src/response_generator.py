@@ -1,78 +1,176 @@
-from dotenv import load_dotenv
 import os
 import sys
+import threading
 
-from langchain_google_genai import GoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.messages import AIMessage, HumanMessage
+from llm_client import LLMClient, LLMError, client_from_environment
+from metrics import metrics
+from utils import estimate_tokens
+from vector_store import get_aliases
 
-load_dotenv(override=True)
+# LangChain and the Gemini client are imported on first use: together they take
+# over a second, which every run paid before it found any documents
+
+# The model client shared by every session, so they share one rate limit
+_client = None
+_client_lock = threading.Lock()
+
+# Clients wrapping models passed to generate_answer directly, by id of the model
+_wrapped_clients = {}
 
 
 def set_llm():
     """
     Initialize and configure the Google Generative AI language model.
 
+    The model is created once per process and wrapped in an LLMClient, so every
+    caller shares its rate limits, concurrency cap and in-flight prompts.
+
     Returns:
-        GoogleGenerativeAI: Configured LLM instance with Gemini 2.5 Flash model.
+        LLMClient: Client for the Gemini 2.5 Flash model.
     """
+    global _client
+
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
     if not GEMINI_API_KEY:
         print("GEMINI_API_KEY not found. Please set it in your .env file.")
         sys.exit(1)
 
-    llm = GoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        google_api_key=GEMINI_API_KEY,
-        temperature=0.2,
-    )
+    with _client_lock:
+        if _client is None:
+            from langchain_google_genai import GoogleGenerativeAI
+
+            llm = GoogleGenerativeAI(
+                model="gemini-2.5-flash",
+                google_api_key=GEMINI_API_KEY,
+                temperature=0.2,
+                # LLMClient retries with backoff; the Google client must not
+                # retry on its own as well
+                max_retries=0,
+            )
+            _client = client_from_environment(llm)
+
+    return _client
+
+
+def wrap_llm(llm):
+    """
+    Return the LLMClient wrapping a model, creating it on first use.
+
+    Every call with the same model returns the same client, so its rate limits
+    and in-flight prompts are shared across questions.
+
+    Args:
+        llm (LLMClient | object): A client, returned as is, or a bare model.
+
+    Returns:
+        LLMClient: The model's client.
+    """
+    if isinstance(llm, LLMClient):
+        return llm
+    with _client_lock:
+        client = _wrapped_clients.get(id(llm))
+        # An id can be reused once its model is garbage collected
+        if client is None or client.llm is not llm:
+            client = _wrapped_clients[id(llm)] = LLMClient(llm)
+        return client
+
+
+def format_context(results, files=None):
+    """
+    Render retrieved chunks as prompt context, citing each source file once.
 
-    return llm
+    Chunks are grouped by their metadata source (in order of first appearance)
+    and sorted by chunk index within each group, so the path is written a single
+    time per prompt instead of once per chunk. Duplicate copies recorded at
+    indexing time are cited with their source.
 
+    Args:
+        results (dict): Query results from ChromaDB with documents and metadatas.
+        files (list[str] | None): Indexed file paths matching the question, from
+            the path index.
 
-def generate_answer(llm, user_input, chunks, history):
+    Returns:
+        str: The formatted context, or an empty string if nothing was retrieved.
+    """
+    documents = results.get("documents") or [[]]
+    metadatas = results.get("metadatas") or [[]]
+
+    groups = {}
+    aliases = {}
+    for document, metadata in zip(documents[0], metadatas[0]):
+        metadata = metadata or {}
+        source = metadata.get("source", "unknown")
+        groups.setdefault(source, []).append((metadata.get("chunk", 0), document))
+        aliases.setdefault(source, get_aliases(metadata))
+
+    sections = []
+    for source, chunks in groups.items():
+        chunks.sort(key=lambda item: item[0])
+        body = "\n\n".join(document for _, document in chunks)
+        header = f"[Source: {source}]"
+        if aliases[source]:
+            header += f"\n[Same document: {', '.join(aliases[source])}]"
+        sections.append(f"{header}\n{body}")
+
+    if files:
+        listing = "\n".join(f"- {file}" for file in files)
+        sections.append(f"[Indexed files matching the question]\n{listing}")
+
+    return "\n\n---\n\n".join(sections)
+
+
+def generate_answer(llm, user_input, chunks, history, files=None):
     """
     Generate an answer to a user query using retrieved document chunks and chat history.
 
     Args:
-        llm (GoogleGenerativeAI): The language model instance.
+        llm (LLMClient): The model client; a bare model is wrapped in one.
         user_input (str): The user's question or input text.
-        chunks: Retrieved document chunks relevant to the query.
+        chunks (dict): Query results relevant to the query, rendered with format_context.
         history (list): List of previous chat messages (HumanMessage and AIMessage objects).
+        files (list[str] | None): Indexed file paths relevant to the query.
 
     Returns:
         str: The generated answer from the LLM.
-    """
-    try:
-        with open("prompts/system.txt", "r", encoding="utf-8") as file:
-            system_prompt = file.read()
-    except FileNotFoundError:
-        print("Error: Required system configuration file missing.")
-        sys.exit(1)
 
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system_prompt),
-            MessagesPlaceholder(variable_name="history"),
-            ("user", "{user_input}"),
-        ]
-    )
+    Raises:
+        LLMError: If the system prompt is missing or the model call fails.
+    """
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+    with metrics.span("prompt"):
+        try:
+            with open("prompts/system.txt", "r", encoding="utf-8") as file:
+                system_prompt = file.read()
+        except FileNotFoundError as error:
+            raise LLMError("Error: Required system configuration file missing.") from error
+
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", system_prompt),
+                MessagesPlaceholder(variable_name="history"),
+                ("user", "{user_input}"),
+            ]
+        )
+        context = format_context(chunks, files)
+        if metrics.enabled:
+            metrics.count("prompt_tokens", estimate_tokens(system_prompt + context + user_input))
+
+        prompt_value = prompt.invoke(
+            {
+                "user_input": user_input,
+                "chunks": context,
+                "history": history,
+            }
+        )
 
-    chain = prompt | llm | StrOutputParser()
+    llm = wrap_llm(llm)
 
-    try:
-        answer = chain.invoke(
-            {"user_input": user_input, "chunks": chunks, "history": history}
-        )
-    except Exception:
-        print("Error calling Gemini API. This may be due to:")
-        print("- Invalid GEMINI_API_KEY in your .env file")
-        print("- Network connection issues")
-        print("- API rate limits")
-        sys.exit(1)
+    with metrics.span("llm"):
+        answer = llm.invoke(prompt_value)
 
+    metrics.count("answer_tokens", estimate_tokens(answer))
     return answer
 
 
@@ -88,6 +186,8 @@ def set_history(history, query, answer):
     Returns:
         list: Updated chat history with the new messages appended.
     """
+    from langchain_core.messages import AIMessage, HumanMessage
+
     if history is None:
         history = []
 
@@ -107,6 +207,8 @@ def set_langchain_history(messages):
     Returns:
         list: List of LangChain HumanMessage and AIMessage objects
     """
+    from langchain_core.messages import AIMessage, HumanMessage
+
     langchain_history = []
     for msg in messages:
         if msg["role"] == "user":
@@ -0,0 +1,200 @@
+"""
+In-process caches for retrieval.
+
+Caches query embeddings and full query results so repeated questions skip both
+the embedding model and the vector index. Result keys include the collection's
+write version (see vector_store.get_collection_version): this process's write
+count and the modification times of the store's files, so any write, including
+one made by another process sharing the store, invalidates earlier results
+without explicit flushing.
+"""
+
+import copy
+import json
+import threading
+from collections import OrderedDict
+
+from embeddings import embedding_model_id
+
+
+def normalize_query(query_text):
+    """
+    Normalize a question for cache lookups (case and whitespace insensitive).
+
+    Args:
+        query_text (str): The user's question.
+
+    Returns:
+        str: The casefolded question with runs of whitespace collapsed.
+    """
+    return " ".join(query_text.split()).casefold()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with hit/miss counters.
+
+    Args:
+        max_size (int): Maximum number of entries kept.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """
+        Return a cached value and mark it as recently used.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The cached value, or None on a miss.
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry when full.
+
+        Args:
+            key: The cache key.
+            value: The value to store.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """
+        Report cache usage.
+
+        Returns:
+            dict: size, max_size, hits, misses and hit_rate (0.0 when unused).
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class RetrievalCache:
+    """
+    Query-embedding and query-result caches used by query_documents.
+
+    Args:
+        max_embeddings (int): Maximum number of cached query embeddings.
+        max_results (int): Maximum number of cached query results.
+    """
+
+    def __init__(self, max_embeddings=1024, max_results=256):
+        self.embeddings = LRUCache(max_embeddings)
+        self.results = LRUCache(max_results)
+
+    @staticmethod
+    def embedding_key(embedding_function, query_text):
+        """
+        Build the embedding cache key for a question.
+
+        Args:
+            embedding_function: The collection's embedding function.
+            query_text (str): The user's question.
+
+        Returns:
+            tuple: Embedding model name and normalized question.
+        """
+        return (embedding_model_id(embedding_function), normalize_query(query_text))
+
+    @staticmethod
+    def results_key(collection_key, version, query_text, n_results, where):
+        """
+        Build the results cache key for a query.
+
+        Args:
+            collection_key (str): Identifier of the collection.
+            version (tuple): The collection's current write version.
+            query_text (str): The user's question.
+            n_results (int): Number of requested results.
+            where (dict | None): Metadata filter of the query.
+
+        Returns:
+            tuple: A hashable key covering every input that changes the results.
+        """
+        filters = json.dumps(where, sort_keys=True) if where else None
+        return (collection_key, version, normalize_query(query_text), n_results, filters)
+
+    def get_results(self, key):
+        """
+        Look up cached results.
+
+        Args:
+            key (tuple): Key from results_key().
+
+        Returns:
+            dict | None: A copy of the cached results, or None on a miss.
+        """
+        results = self.results.get(key)
+        return copy.deepcopy(results) if results is not None else None
+
+    def put_results(self, key, results):
+        """
+        Cache query results.
+
+        Args:
+            key (tuple): Key from results_key().
+            results (dict): The query results; a copy is stored.
+        """
+        self.results.put(key, copy.deepcopy(results))
+
+    def stats(self):
+        """
+        Report usage of both caches.
+
+        Returns:
+            dict: Stats of the "embeddings" and "results" caches.
+        """
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
+
+    def format(self):
+        """
+        Render cache stats as a short human-readable report.
+
+        Returns:
+            str: One line per cache.
+        """
+        return "\n".join(
+            f"{name} cache: {data['hits']} hits, {data['misses']} misses "
+            f"({data['hit_rate']:.0%} hit rate, {data['size']}/{data['max_size']} entries)"
+            for name, data in self.stats().items()
+        )
+
+
+# Process-wide cache shared by the CLI and every Streamlit session
+shared_cache = RetrievalCache()
@@ -1,14 +1,389 @@
-def query_documents(collection, query_text, n_results=5):
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from metrics import metrics
+from vector_store import (
+    CHUNK_BREAK,
+    chunk_id,
+    collection_key,
+    get_collection_version,
+    get_distance_space,
+    merge_chunks,
+)
+
+# Seconds a federated query waits for shards before returning partial results
+SHARD_TIMEOUT = 5.0
+
+# Upper bound on threads used to query shards concurrently
+MAX_SHARD_WORKERS = 16
+
+# Words in a question that hint at a file type
+EXTENSION_HINTS = {
+    "pdf": ".pdf",
+    "pdfs": ".pdf",
+    "txt": ".txt",
+    "docx": ".docx",
+    "word": ".docx",
+    "odt": ".odt",
+}
+
+# Words that ask about files in general rather than naming them
+FILE_WORDS = {"file", "files", "document", "documents", "doc", "docs"}
+
+# "under /contracts", "in the folder reports", "inside HR folder", "in docs/2024"
+FOLDER_PATTERN = re.compile(
+    r"\b(?:under\s+(?:the\s+)?[\"']?(?P<under>[\w./\\:-]+)"
+    r"|(?:in|inside|within|from)\s+(?:the\s+)?"
+    r"(?:(?:folder|directory|dir)\s+[\"']?(?P<named>[\w./\\:-]+)"
+    r"|[\"']?(?P<path>[\w.:-]*[/\\][\w./\\-]*)"
+    r"|(?P<suffixed>[\w.-]+)\s+(?:folder|directory|dir)\b))",
+    re.IGNORECASE,
+)
+
+# Question words ignored when matching file names
+STOPWORDS = set(
+    """
+    a about added all an and any are as at be by can changed contain contains count
+    date did directory display do does exist folder for from give have how i in
+    indexed inside is it last list many me mention mentions modified name named
+    names number of on or our please show that the there to total under updated
+    uploaded was we were what when where which with within you
+    """.split()
+)
+
+
+@metrics.timed("retrieve")
+def query_documents(collection, query_text, n_results=5, where=None, cache=None):
     """
     Query the vector database for relevant document chunks.
 
+    With a cache, repeated questions reuse the query embedding and, as long as the
+    collection has not been written to since, the previous results.
+
     Args:
         collection: ChromaDB collection
         query_text (str): The user's question
         n_results (int): Number of results to return (default: 5)
+        where (dict | None): Optional metadata filter
+        cache (RetrievalCache | None): Cache for query embeddings and results
 
     Returns:
         dict: Query results with documents, metadatas, and distances
     """
-    results = collection.query(query_texts=[query_text], n_results=n_results)
+    if cache is None:
+        return collection.query(
+            query_texts=[query_text], n_results=n_results, where=where
+        )
+
+    key = cache.results_key(
+        collection_key(collection),
+        get_collection_version(collection),
+        query_text,
+        n_results,
+        where,
+    )
+    results = cache.get_results(key)
+    if results is not None:
+        metrics.count("cache_hits")
+        return results
+    metrics.count("cache_misses")
+
+    embedding_function = getattr(collection, "_embedding_function", None)
+    if embedding_function is None:
+        results = collection.query(
+            query_texts=[query_text], n_results=n_results, where=where
+        )
+    else:
+        embedding_key = cache.embedding_key(embedding_function, query_text)
+        embedding = cache.embeddings.get(embedding_key)
+        if embedding is None:
+            with metrics.span("embed_query"):
+                embedding = embedding_function([query_text])[0]
+            cache.embeddings.put(embedding_key, embedding)
+        else:
+            metrics.count("embedding_cache_hits")
+        results = collection.query(
+            query_embeddings=[embedding], n_results=n_results, where=where
+        )
+
+    cache.put_results(key, results)
     return results
+
+
+def normalize_distance(distance, space):
+    """
+    Convert a distance to cosine distance so results from any space compare.
+
+    Embeddings are unit-normalized, so Chroma's squared L2 distance equals twice
+    the cosine distance and inner-product distance (1 - dot) equals it.
+
+    Args:
+        distance (float): Distance reported by the collection.
+        space (str): The collection's space, "l2", "cosine" or "ip".
+
+    Returns:
+        float: Cosine distance (0 for identical directions, up to 2).
+    """
+    return distance / 2 if space == "l2" else distance
+
+
+def query_collections(
+    collections, query_text, n_results=5, where=None, cache=None, timeout=SHARD_TIMEOUT
+):
+    """
+    Query several collections (shards) concurrently and merge their top results.
+
+    Every shard is queried on its own thread. Shards that have not answered
+    within the timeout, or that fail, are left out, so a slow index delays the
+    answer by at most the timeout instead of blocking it.
+
+    Args:
+        collections (list): Collections to search, e.g. one per folder.
+        query_text (str): The user's question.
+        n_results (int): Number of merged results to return.
+        where (dict | None): Optional metadata filter applied to every shard.
+        cache (RetrievalCache | None): Cache for query embeddings and results.
+        timeout (float): Seconds to wait for the shards.
+
+    Returns:
+        dict: Query results in the query_documents shape with cosine distances,
+            best first; each metadata gains "collection" (the shard's name).
+            "shards" lists one report per collection with its name, status
+            ("ok", "timeout" or "error"), latency_ms and number of results.
+    """
+    if cache is not None and collections:
+        # Embed once up front instead of once per shard
+        _warm_query_embeddings(collections, query_text, cache)
+
+    def run(collection):
+        start = time.perf_counter()
+        results = query_documents(collection, query_text, n_results, where, cache)
+        return results, 1000 * (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    workers = max(1, min(len(collections), MAX_SHARD_WORKERS))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(run, collection) for collection in collections]
+    wait(futures, timeout=timeout)
+    # Do not wait for slow shards; their threads finish in the background
+    executor.shutdown(wait=False, cancel_futures=True)
+    elapsed_ms = 1000 * (time.perf_counter() - start)
+
+    hits, shards = [], []
+    for collection, future in zip(collections, futures):
+        shard = {"collection": collection.name, "status": "ok", "results": 0}
+        if not future.done():
+            shard.update(status="timeout", latency_ms=elapsed_ms)
+        elif future.exception() is not None:
+            shard.update(status="error", latency_ms=elapsed_ms, error=str(future.exception()))
+        else:
+            results, shard["latency_ms"] = future.result()
+            space = get_distance_space(collection)
+            rows = zip(
+                results["ids"][0],
+                results["documents"][0],
+                results["metadatas"][0],
+                results["distances"][0],
+            )
+            for id_, document, metadata, distance in rows:
+                metadata = {**(metadata or {}), "collection": collection.name}
+                hits.append((normalize_distance(distance, space), id_, document, metadata))
+            shard["results"] = len(results["ids"][0])
+        shards.append(shard)
+
+    hits.sort(key=lambda hit: hit[0])
+    hits = hits[:n_results]
+    return {
+        "ids": [[id_ for _, id_, _, _ in hits]],
+        "documents": [[document for _, _, document, _ in hits]],
+        "metadatas": [[metadata for _, _, _, metadata in hits]],
+        "distances": [[distance for distance, _, _, _ in hits]],
+        "shards": shards,
+    }
+
+
+def _warm_query_embeddings(collections, query_text, cache):
+    """Compute the question's embedding once per distinct embedding model."""
+    for collection in collections:
+        embedding_function = getattr(collection, "_embedding_function", None)
+        if embedding_function is None:
+            continue
+        key = cache.embedding_key(embedding_function, query_text)
+        if cache.embeddings.get(key) is None:
+            cache.embeddings.put(key, embedding_function([query_text])[0])
+
+
+def format_shards(shards):
+    """
+    Render per-shard status and latency, slowest first.
+
+    Args:
+        shards (list[dict]): The "shards" reports from query_collections.
+
+    Returns:
+        str: One line per shard.
+    """
+    ordered = sorted(shards, key=lambda shard: -shard["latency_ms"])
+    return "\n".join(
+        f"{shard['collection']}: {shard['status']}, {shard['latency_ms']:.1f} ms, "
+        f"{shard['results']} results"
+        for shard in ordered
+    )
+
+
+def expand_neighbours(collection, results, window=1):
+    """
+    Expand each retrieved chunk with its neighbouring chunks from the same file.
+
+    Neighbours are fetched by their deterministic (source, chunk) IDs with a single
+    get() call, so no extra vector search is needed. Hits whose windows overlap are
+    merged into one passage, keeping the best (smallest) distance.
+
+    Args:
+        collection: ChromaDB collection the results came from.
+        results (dict): Query results from query_documents.
+        window (int): Number of chunks to add on each side of every hit.
+
+    Returns:
+        dict: Results in the same shape, one passage per merged window. Each
+            passage's ID is that of its first chunk; metadatas keep those of the
+            hit (such as "aliases"), with "chunk" set to the first index and
+            "chunk_end" to the last.
+    """
+    metadatas = (results.get("metadatas") or [[]])[0]
+    if window <= 0 or not metadatas:
+        return results
+
+    distances = (results.get("distances") or [[None] * len(metadatas)])[0]
+
+    # Collect the chunk range around each hit, merging overlapping ranges per source
+    spans = {}
+    for metadata, distance in zip(metadatas, distances):
+        source, index = metadata.get("source"), metadata.get("chunk")
+        if source is None or index is None:
+            continue
+        start, end = max(0, index - window), index + window
+        ranges = spans.setdefault(source, [])
+        for span in ranges:
+            if start <= span["end"] + 1 and end >= span["start"] - 1:
+                span["start"], span["end"] = min(start, span["start"]), max(end, span["end"])
+                if distance is not None:
+                    span["distance"] = min(span["distance"], distance)
+                break
+        else:
+            ranges.append(
+                {"start": start, "end": end, "distance": distance, "metadata": metadata}
+            )
+
+    ids = [
+        chunk_id(source, index)
+        for source, ranges in spans.items()
+        for span in ranges
+        for index in range(span["start"], span["end"] + 1)
+    ]
+    fetched = collection.get(ids=ids, include=["documents"])
+    texts = dict(zip(fetched["ids"], fetched["documents"]))
+
+    passages = []
+    for source, ranges in spans.items():
+        for span in ranges:
+            present = [
+                index
+                for index in range(span["start"], span["end"] + 1)
+                if chunk_id(source, index) in texts
+            ]
+            if not present:
+                continue
+            text = merge_chunks(
+                [texts[chunk_id(source, index)] for index in present], separator=CHUNK_BREAK
+            )
+            metadata = {**span["metadata"], "chunk": present[0], "chunk_end": present[-1]}
+            passages.append((span["distance"], chunk_id(source, present[0]), text, metadata))
+
+    passages.sort(key=lambda passage: (passage[0] is None, passage[0]))
+    return {
+        "ids": [[id_ for _, id_, _, _ in passages]],
+        "documents": [[text for _, _, text, _ in passages]],
+        "metadatas": [[metadata for _, _, _, metadata in passages]],
+        "distances": [[distance for distance, _, _, _ in passages]],
+    }
+
+
+def parse_file_query(query_text):
+    """
+    Extract file-name terms, an extension and a folder from a question.
+
+    Args:
+        query_text (str): The user's question, e.g. "list the PDFs under /contracts".
+
+    Returns:
+        dict: "terms" (list[str]), "extension" (str | None), "folder" (str | None)
+            and "mentions_files" (bool, True if the question talks about files).
+    """
+    folder = None
+    match = FOLDER_PATTERN.search(query_text)
+    if match:
+        folder = next(group for group in match.groups() if group)
+        folder = folder.strip("\"'").rstrip("/\\?.")
+        query_text = query_text[: match.start()] + query_text[match.end() :]
+
+    extension = None
+    mentions_files = False
+    terms = []
+    for word in re.findall(r"[\w.-]+", query_text.lower()):
+        word = word.strip(".-")
+        if word in EXTENSION_HINTS or word.lstrip(".") in EXTENSION_HINTS:
+            extension = EXTENSION_HINTS[word.lstrip(".")]
+            mentions_files = True
+        elif word in FILE_WORDS:
+            mentions_files = True
+        elif word and word not in STOPWORDS:
+            # Crude singularisation so "invoices" matches "invoice_2024.pdf"
+            if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            terms.append(word)
+
+    return {
+        "terms": terms,
+        "extension": extension,
+        "folder": folder,
+        "mentions_files": mentions_files or folder is not None,
+    }
+
+
+def search_files(path_index, query_text, limit=20):
+    """
+    Answer file-listing questions directly from the path index.
+
+    Files whose names contain every remaining keyword are returned first. If no
+    name matches but the question is explicitly about files (a folder, a file type
+    or words like "files"), the files under that folder/type are listed instead.
+
+    Args:
+        path_index (PathIndex): The path index of the collection.
+        query_text (str): The user's question.
+        limit (int): Maximum number of paths to return.
+
+    Returns:
+        list[str]: Matching file paths (empty if the question is not about files).
+    """
+    if path_index is None or not len(path_index):
+        return []
+
+    parsed = parse_file_query(query_text)
+    extension, folder = parsed["extension"], parsed["folder"]
+
+    # Try every keyword first, then the single keywords, most specific wins
+    if parsed["terms"]:
+        matches = path_index.search(parsed["terms"], extension, folder, limit)
+        if matches:
+            return matches
+        for term in parsed["terms"]:
+            matches = path_index.search([term], extension, folder, limit)
+            if matches:
+                return matches
+
+    if parsed["mentions_files"]:
+        return path_index.search([], extension, folder, limit)
+    return []
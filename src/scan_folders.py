@@ -1,7 +1,10 @@
 import glob
 import os
 
+from metrics import metrics
 
+
+@metrics.timed("scan")
 def scan_folders(directory="data"):
     """
     Recursively scans the specified directory and returns a list of all files.
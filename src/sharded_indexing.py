@@ -0,0 +1,358 @@
+"""
+Index large file sets in parallel shards and combine the results.
+
+The scanned file list is split by a hash of each path into N shards, so every
+worker (a local process or another machine given the same file list) picks the
+same files without coordination. Each shard is indexed into its own store under
+SHARDS_PATH/<name>/shard-<i>, which avoids write contention between workers.
+Finished shards can then be merged into the regular collection, re-using their
+embeddings, or searched in place with retrieval_system.query_collections.
+
+Layout of SHARDS_PATH/<name>:
+
+- shards.json: number of shards and backend of the run
+- shard-<i>/: the shard's vector store
+- shard-<i>/shard.json: the shard's files, chunk count and status, written
+  when the shard finishes; "complete" shards are skipped on re-runs, "partial"
+  ones (some files failed) are indexed again
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+from dedup import Deduplicator
+from document_loader import LOADERS
+from path_index import normalize_path
+from text_cache import default_text_cache
+from utils import sanitize_filename
+from vector_store import (
+    VECTORDB_PATH,
+    bump_collection_version,
+    create_collection,
+    remove_stale_chunks,
+)
+
+# Root folder of every sharded index
+SHARDS_PATH = os.path.join(VECTORDB_PATH, "shards")
+
+# Shard statuses whose stores can be searched or merged
+FINISHED = ("complete", "partial")
+
+# Chunks copied per get/upsert round when merging shards
+MERGE_BATCH_SIZE = 1000
+
+
+def shard_of(file, num_shards):
+    """
+    Return the shard a file belongs to.
+
+    Uses a hash of the normalized path rather than hash(), so every process and
+    machine assigns the same shard.
+
+    Args:
+        file (str): Path of the file.
+        num_shards (int): Total number of shards.
+
+    Returns:
+        int: Shard number in range(num_shards).
+    """
+    digest = hashlib.md5(normalize_path(file).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def split_files(files, num_shards):
+    """
+    Split a file list into shards.
+
+    Args:
+        files (list[str]): Scanned file paths.
+        num_shards (int): Number of shards.
+
+    Returns:
+        list[list[str]]: The files of each shard, in their original order.
+    """
+    shards = [[] for _ in range(num_shards)]
+    for file in files:
+        shards[shard_of(file, num_shards)].append(file)
+    return shards
+
+
+def shard_directory(path, shard, directory=None):
+    """
+    Return the store folder of one shard.
+
+    Args:
+        path (str): Folder or ZIP name the index is named after.
+        shard (int): Shard number.
+        directory (str | None): Root of sharded indexes; defaults to SHARDS_PATH.
+
+    Returns:
+        str: The shard's store folder.
+    """
+    root = os.path.join(directory or SHARDS_PATH, sanitize_filename(path))
+    return os.path.join(root, f"shard-{shard}")
+
+
+def _read_json(filepath):
+    try:
+        with open(filepath, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_json(filepath, data):
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, filepath)
+
+
+def index_shard(
+    path, files, shard, num_shards, backend=None, directory=None, embedding_function=None
+):
+    """
+    Index one shard's files into the shard's own store.
+
+    Runs in a worker process. Chunk IDs are deterministic, so an interrupted
+    shard can simply be run again. Copies of a document are embedded once per
+    shard, as in a regular indexing run; copies in different shards are not
+    detected.
+
+    Args:
+        path (str): Folder or ZIP name the index is named after.
+        files (list[str]): The shard's files (from split_files).
+        shard (int): Shard number.
+        num_shards (int): Total number of shards.
+        backend (str | None): Vector store backend (see vector_store.BACKENDS).
+        directory (str | None): Root of sharded indexes; defaults to SHARDS_PATH.
+        embedding_function (callable | None): Embedding function to use instead
+            of the backend default; must be picklable.
+
+    Returns:
+        dict: The shard manifest: shard, files, chunks, duplicates (files
+            recorded as aliases), failed files, seconds and status.
+    """
+    store = shard_directory(path, shard, directory)
+    manifest_file = os.path.join(store, "shard.json")
+    manifest = _read_json(manifest_file)
+    if manifest and manifest.get("status") == "complete" and manifest["files"] == files:
+        return {**manifest, "skipped": True}
+
+    start = time.perf_counter()
+    os.makedirs(store, exist_ok=True)
+    collection = create_collection(
+        path, backend=backend, embedding_function=embedding_function, directory=store
+    )
+
+    text_cache = default_text_cache()
+    dedup = Deduplicator(collection)
+    chunks_added, failed = 0, []
+    for file in files:
+        loader = LOADERS.get(os.path.splitext(file)[1])
+        if loader is None:
+            continue
+        text = text_cache.load(file, loader)
+        if not text:
+            continue
+        try:
+            # Copies of a file already indexed are recorded as aliases, not embedded
+            count = dedup.index(file, text)
+            # Drop chunks left over from a longer version indexed by an earlier run
+            remove_stale_chunks(collection, file.replace("\\", "/"), keep=count)
+            chunks_added += count
+        except Exception:
+            # skip problematic files and continue indexing others
+            failed.append(file)
+    text_cache.save_stats()
+
+    manifest = {
+        "shard": shard,
+        "num_shards": num_shards,
+        "files": files,
+        "chunks": chunks_added,
+        "duplicates": len(dedup.aliases),
+        "failed": failed,
+        "seconds": time.perf_counter() - start,
+        "status": "partial" if failed else "complete",
+    }
+    _write_json(manifest_file, manifest)
+    return manifest
+
+
+def _index_shard_job(job):
+    return index_shard(**job)
+
+
+def run_sharded_indexing(
+    path,
+    files,
+    num_shards,
+    processes=None,
+    shards=None,
+    backend=None,
+    directory=None,
+    embedding_function=None,
+):
+    """
+    Index a file list as independent shards, in parallel worker processes.
+
+    Workers are started with the "spawn" method so none inherits the parent's
+    vector store clients or threads. To spread the work over several machines,
+    run each with the same file list and its own subset of shard numbers.
+
+    Args:
+        path (str): Folder or ZIP name the index is named after.
+        files (list[str]): Every scanned file path.
+        num_shards (int): Number of shards to split the files into.
+        processes (int | None): Worker processes; defaults to the CPU count,
+            capped at the number of shards. 1 indexes in this process.
+        shards (list[int] | None): Shard numbers to index here; defaults to all.
+        backend (str | None): Vector store backend (see vector_store.BACKENDS).
+        directory (str | None): Root of sharded indexes; defaults to SHARDS_PATH.
+        embedding_function (callable | None): Picklable embedding function to use
+            instead of the backend default.
+
+    Returns:
+        list[dict]: The manifest of each indexed shard, in shard order.
+    """
+    # Resolve the backend now so merging and searching use the same one
+    backend = backend or os.getenv("VECTOR_BACKEND") or "chroma"
+    root = os.path.join(directory or SHARDS_PATH, sanitize_filename(path))
+    os.makedirs(root, exist_ok=True)
+    _write_json(
+        os.path.join(root, "shards.json"),
+        {"path": path, "num_shards": num_shards, "backend": backend},
+    )
+
+    split = split_files(files, num_shards)
+    selected = range(num_shards) if shards is None else sorted(set(shards))
+    jobs = [
+        {
+            "path": path,
+            "files": split[shard],
+            "shard": shard,
+            "num_shards": num_shards,
+            "backend": backend,
+            "directory": directory,
+            "embedding_function": embedding_function,
+        }
+        for shard in selected
+    ]
+
+    processes = min(processes or os.cpu_count() or 1, len(jobs))
+    if processes <= 1:
+        return [_index_shard_job(job) for job in jobs]
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        return pool.map(_index_shard_job, jobs, chunksize=1)
+
+
+def load_shards(path, directory=None):
+    """
+    Read the manifests of a sharded index.
+
+    Args:
+        path (str): Folder or ZIP name the index is named after.
+        directory (str | None): Root of sharded indexes; defaults to SHARDS_PATH.
+
+    Returns:
+        tuple[dict | None, list[dict | None]]: The run settings from shards.json
+            (None if the index does not exist) and each shard's manifest (None
+            for shards that have not finished).
+    """
+    root = os.path.join(directory or SHARDS_PATH, sanitize_filename(path))
+    settings = _read_json(os.path.join(root, "shards.json"))
+    if settings is None:
+        return None, []
+    manifests = [
+        _read_json(os.path.join(shard_directory(path, shard, directory), "shard.json"))
+        for shard in range(settings["num_shards"])
+    ]
+    return settings, manifests
+
+
+def open_shards(path, directory=None, embedding_function=None):
+    """
+    Open every finished shard for federated search.
+
+    Args:
+        path (str): Folder or ZIP name the index is named after.
+        directory (str | None): Root of sharded indexes; defaults to SHARDS_PATH.
+        embedding_function (callable | None): Embedding function for queries.
+
+    Returns:
+        list: One collection per finished shard, for query_collections.
+    """
+    settings, manifests = load_shards(path, directory)
+    return [
+        create_collection(
+            path,
+            backend=settings["backend"],
+            embedding_function=embedding_function,
+            directory=shard_directory(path, manifest["shard"], directory),
+        )
+        for manifest in manifests
+        if manifest and manifest.get("status") in FINISHED
+    ]
+
+
+def merge_shards(path, target, directory=None, batch_size=MERGE_BATCH_SIZE):
+    """
+    Copy every finished shard into one collection without re-embedding.
+
+    Args:
+        path (str): Folder or ZIP name the index is named after.
+        target: Collection receiving the chunks, e.g. create_collection(path).
+        directory (str | None): Root of sharded indexes; defaults to SHARDS_PATH.
+        batch_size (int): Chunks copied per round.
+
+    Returns:
+        dict: Number of merged "shards" and "chunks", the merged "files", the
+            "missing" shard numbers that have not finished and the "partial"
+            ones where some files failed.
+    """
+    settings, manifests = load_shards(path, directory)
+    stats = {"shards": 0, "chunks": 0, "files": [], "missing": [], "partial": []}
+    if settings is None:
+        return stats
+
+    for shard, manifest in enumerate(manifests):
+        if not manifest or manifest.get("status") not in FINISHED:
+            stats["missing"].append(shard)
+            continue
+        if manifest["status"] == "partial":
+            stats["partial"].append(shard)
+
+        # Opened with the target's embedder, so shards of another model are refused
+        source = create_collection(
+            path,
+            backend=settings["backend"],
+            embedding_function=getattr(target, "_embedding_function", None),
+            directory=shard_directory(path, shard, directory),
+        )
+        offset = 0
+        while True:
+            batch = source.get(
+                include=["documents", "metadatas", "embeddings"],
+                limit=batch_size,
+                offset=offset,
+            )
+            if not batch["ids"]:
+                break
+            offset += len(batch["ids"])
+            target.upsert(
+                ids=batch["ids"],
+                documents=batch["documents"],
+                metadatas=batch["metadatas"],
+                embeddings=batch["embeddings"],
+            )
+            stats["chunks"] += len(batch["ids"])
+
+        stats["shards"] += 1
+        stats["files"].extend(manifest["files"])
+
+    bump_collection_version(target)
+    return stats
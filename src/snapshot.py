@@ -0,0 +1,314 @@
+"""
+Export a collection to a single snapshot file and import it elsewhere.
+
+A snapshot is a ZIP archive that any backend can produce and load:
+
+- manifest.json: snapshot format, collection name, metadata, HNSW settings,
+  embedding model, chunk count and dimension, and a SHA-256 per member
+- embeddings.npy: (chunks, dim) float32 matrix, stored uncompressed
+- chunks.jsonl: one {"id", "document", "metadata"} object per chunk, in the
+  same order as the embedding rows, deflate-compressed
+- path_index.json: the collection's path index, if one was built
+
+Importing streams both members in batches and bulk-upserts the stored
+embeddings, so nothing is re-embedded and memory stays bounded by the batch.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+from embeddings import embedding_model_id
+from path_index import path_index_directory, path_index_file
+from vector_store import (
+    INDEX_PARAMS,
+    bump_collection_version,
+    create_collection,
+    get_distance_space,
+    get_index_params,
+)
+
+# Version of the snapshot layout; imports reject newer snapshots
+SNAPSHOT_FORMAT = 1
+
+# Chunks read or written per batch
+SNAPSHOT_BATCH_SIZE = 2000
+
+# Bytes hashed per read when verifying checksums
+_HASH_BLOCK = 1 << 20
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot is corrupt, incompatible or cannot be imported."""
+
+
+def _embedding_model(collection):
+    return embedding_model_id(getattr(collection, "_embedding_function", None))
+
+
+def _member_checksum(archive, member):
+    digest = hashlib.sha256()
+    with archive.open(member) as file:
+        for block in iter(lambda: file.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _index_params(params):
+    """Keep the HNSW settings create_collection accepts."""
+    # Chroma's configuration also reports internal settings such as
+    # resize_factor, which older snapshots stored as well
+    return {key: value for key, value in (params or {}).items() if key in INDEX_PARAMS}
+
+
+def export_snapshot(
+    collection, filepath, path_index_dir=None, batch_size=SNAPSHOT_BATCH_SIZE
+):
+    """
+    Write a collection to a snapshot file.
+
+    The file is written next to its destination and renamed into place, so an
+    interrupted export never leaves a truncated snapshot behind.
+
+    Args:
+        collection: The collection to export.
+        filepath (str): Destination snapshot file.
+        path_index_dir (str | None): Folder holding the collection's path index;
+            defaults to path_index.path_index_directory().
+        batch_size (int): Chunks fetched per get() call.
+
+    Returns:
+        dict: The snapshot manifest.
+    """
+    ids = collection.get(include=[])["ids"]
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "created": time.time(),
+        "collection": collection.name,
+        "metadata": collection.metadata or {},
+        "index_params": _index_params(get_index_params(collection)),
+        "space": get_distance_space(collection),
+        "embedding_model": _embedding_model(collection),
+        "chunks": len(ids),
+        "dim": None,
+        "checksums": {},
+    }
+
+    workdir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(filepath)))
+    try:
+        embeddings_file = os.path.join(workdir, "embeddings.npy")
+        chunks_file = os.path.join(workdir, "chunks.jsonl")
+        matrix, written = None, 0
+        with open(chunks_file, "w", encoding="utf-8") as chunks:
+            for start in range(0, len(ids), batch_size):
+                batch = collection.get(
+                    ids=ids[start : start + batch_size],
+                    include=["documents", "metadatas", "embeddings"],
+                )
+                if not batch["ids"]:
+                    continue
+                vectors = np.asarray(batch["embeddings"], dtype=np.float32)
+                if matrix is None:
+                    manifest["dim"] = vectors.shape[1]
+                    matrix = np.lib.format.open_memmap(
+                        embeddings_file,
+                        mode="w+",
+                        dtype=np.float32,
+                        shape=(len(ids), vectors.shape[1]),
+                    )
+                matrix[written : written + len(vectors)] = vectors
+                written += len(vectors)
+                for id_, document, metadata in zip(
+                    batch["ids"], batch["documents"], batch["metadatas"]
+                ):
+                    record = {"id": id_, "document": document, "metadata": metadata}
+                    chunks.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        if matrix is None:
+            np.save(embeddings_file, np.zeros((0, 0), dtype=np.float32))
+        elif written < len(ids):
+            # Chunks deleted while exporting; drop their unused rows
+            trimmed = np.array(matrix[:written])
+            del matrix
+            np.save(embeddings_file, trimmed)
+        else:
+            matrix.flush()
+            del matrix
+        manifest["chunks"] = written
+
+        members = [
+            ("embeddings.npy", embeddings_file, zipfile.ZIP_STORED),
+            ("chunks.jsonl", chunks_file, zipfile.ZIP_DEFLATED),
+        ]
+        index_file = path_index_file(collection.name, path_index_dir)
+        if os.path.exists(index_file):
+            members.append(("path_index.json", index_file, zipfile.ZIP_DEFLATED))
+
+        tmp_path = os.path.join(workdir, "snapshot.zip")
+        with zipfile.ZipFile(tmp_path, "w", allowZip64=True) as archive:
+            for member, source, compression in members:
+                archive.write(source, member, compress_type=compression)
+            for member, _, _ in members:
+                manifest["checksums"][member] = _member_checksum(archive, member)
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        os.replace(tmp_path, filepath)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(filepath, verify=True):
+    """
+    Read and check a snapshot's manifest.
+
+    Args:
+        filepath (str): The snapshot file.
+        verify (bool): Also check every member against its SHA-256 checksum.
+
+    Returns:
+        dict: The manifest.
+
+    Raises:
+        SnapshotError: If the file is not a snapshot, is from a newer version or
+            fails verification.
+    """
+    try:
+        with zipfile.ZipFile(filepath) as archive:
+            manifest = json.loads(archive.read("manifest.json"))
+            if manifest.get("format", 0) > SNAPSHOT_FORMAT:
+                raise SnapshotError(
+                    f"Snapshot format {manifest['format']} is newer than supported "
+                    f"({SNAPSHOT_FORMAT}). Upgrade before importing."
+                )
+            if verify:
+                for member, checksum in manifest["checksums"].items():
+                    if _member_checksum(archive, member) != checksum:
+                        raise SnapshotError(f"Checksum mismatch for '{member}' in {filepath}.")
+    except (KeyError, zipfile.BadZipFile, json.JSONDecodeError) as error:
+        raise SnapshotError(f"'{filepath}' is not a valid snapshot: {error}") from error
+    return manifest
+
+
+def _read_embedding_batches(file, batch_size):
+    """Yield float32 row batches from an .npy stream without loading it whole."""
+    version = np.lib.format.read_magic(file)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+    if fortran_order or len(shape) != 2:
+        raise SnapshotError("embeddings.npy must be a C-ordered 2-D array.")
+    rows, dim = shape
+    row_bytes = dim * dtype.itemsize
+    for start in range(0, rows, batch_size):
+        count = min(batch_size, rows - start)
+        data = file.read(count * row_bytes)
+        yield np.frombuffer(data, dtype=dtype).reshape(count, dim).astype(np.float32, copy=False)
+
+
+def import_snapshot(
+    filepath,
+    path=None,
+    backend=None,
+    directory=None,
+    embedding_function=None,
+    replace=False,
+    verify=True,
+    path_index_dir=None,
+    batch_size=SNAPSHOT_BATCH_SIZE,
+    allow_model_mismatch=False,
+):
+    """
+    Load a snapshot into a collection using its stored embeddings.
+
+    Args:
+        filepath (str): The snapshot file.
+        path (str | None): Name for the collection; defaults to the exported one.
+        backend (str | None): Vector store backend (see vector_store.BACKENDS).
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+        embedding_function (callable | None): Query-time embedding function; must
+            be the model the snapshot was built with.
+        replace (bool): Delete the collection's existing chunks first. Without it,
+            importing into a non-empty collection is refused.
+        verify (bool): Check member checksums before importing.
+        path_index_dir (str | None): Folder where the path index is restored;
+            defaults to the path index folder of the store.
+        batch_size (int): Chunks upserted per call.
+        allow_model_mismatch (bool): Import even if the snapshot was embedded
+            with another model than the collection queries with, only warning.
+
+    Returns:
+        dict: The imported "collection", number of "chunks" and "seconds" taken.
+
+    Raises:
+        SnapshotError: If the snapshot is invalid, the target is not empty or
+            the embedding models differ.
+    """
+    start = time.perf_counter()
+    manifest = read_manifest(filepath, verify=verify)
+    collection = create_collection(
+        path or manifest["collection"],
+        backend=backend,
+        embedding_function=embedding_function,
+        index_params=_index_params(manifest.get("index_params")) or None,
+        directory=directory,
+    )
+
+    model = _embedding_model(collection)
+    if manifest.get("embedding_model") and model and model != manifest["embedding_model"]:
+        message = (
+            f"Snapshot was embedded with '{manifest['embedding_model']}' but the "
+            f"collection queries with '{model}'."
+        )
+        if not allow_model_mismatch:
+            raise SnapshotError(f"{message} Configure the snapshot's model to import it.")
+        print(f"Warning: {message} Results will be unreliable.")
+
+    existing = collection.get(include=[])["ids"]
+    if existing and not replace:
+        raise SnapshotError(
+            f"Collection '{collection.name}' already holds {len(existing)} chunks. "
+            "Use replace to overwrite it."
+        )
+    for offset in range(0, len(existing), batch_size):
+        collection.delete(ids=existing[offset : offset + batch_size])
+
+    imported = 0
+    with zipfile.ZipFile(filepath) as archive:
+        with archive.open("embeddings.npy") as vectors, archive.open("chunks.jsonl") as lines:
+            for embeddings in _read_embedding_batches(vectors, batch_size):
+                records = [json.loads(next(lines)) for _ in range(len(embeddings))]
+                collection.upsert(
+                    ids=[record["id"] for record in records],
+                    documents=[record["document"] for record in records],
+                    metadatas=[record["metadata"] for record in records],
+                    embeddings=embeddings,
+                )
+                imported += len(records)
+
+        if "path_index.json" in archive.namelist():
+            path_index_dir = path_index_dir or path_index_directory(directory)
+            os.makedirs(path_index_dir, exist_ok=True)
+            index_file = path_index_file(collection.name, path_index_dir)
+            with open(f"{index_file}.tmp", "wb") as file:
+                file.write(archive.read("path_index.json"))
+            os.replace(f"{index_file}.tmp", index_file)
+
+    # Keep the exported chunk format so migrate_collection upgrades old snapshots;
+    # the collection's own model stays recorded, since it answers the queries
+    exported = {
+        key: value for key, value in manifest["metadata"].items() if key != "embedding_model"
+    }
+    collection.modify(metadata={**(collection.metadata or {}), **exported})
+    bump_collection_version(collection)
+    return {
+        "collection": collection.name,
+        "chunks": imported,
+        "seconds": time.perf_counter() - start,
+    }
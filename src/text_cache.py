@@ -0,0 +1,328 @@
+"""
+On-disk cache of the text extracted from documents.
+
+Extracting text, above all from PDFs, is the slowest step of indexing that does
+not depend on the chunking or embedding settings. Re-indexing a corpus with a
+new chunk size or embedding model would otherwise extract exactly the same text
+again. TextCache keeps each document's text zlib-compressed in TEXT_CACHE_PATH,
+keyed by:
+
+- the SHA-256 of the file's bytes, so copies and renamed files hit and edited
+  files miss
+- the file extension and the version of its loader
+  (document_loader.LOADER_VERSIONS), so changing a loader re-extracts
+
+Plain text files are not cached: reading them costs no more than a hit. The
+cache is capped at TEXT_CACHE_MB; past it, the least recently used entries are
+evicted. Hits and misses are appended to a stats file after each indexing run
+for the hit-rate report of `manage.py text-cache`.
+"""
+
+import hashlib
+import os
+import threading
+import zlib
+
+from document_loader import LOADER_VERSIONS
+from metrics import metrics
+from utils import env_number
+
+# Folder of the cached text, one compressed file per document
+TEXT_CACHE_PATH = "./text_cache"
+
+# Size cap of the cache folder; 0 disables the cache
+DEFAULT_MAX_MB = 512
+
+# Fraction of the cap kept after an eviction, so eviction does not run on every write
+EVICT_TO = 0.9
+
+# Cumulative hits and misses, one "hits misses" line per indexing run
+STATS_FILE = "stats.log"
+
+_SUFFIX = ".z"
+
+# Process-wide cache configured from the environment
+_default = None
+_default_lock = threading.Lock()
+
+
+def file_digest(filepath):
+    """
+    Hash a file's contents.
+
+    Args:
+        filepath (str): The file.
+
+    Returns:
+        str: The hex SHA-256 of its bytes.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TextCache:
+    """
+    Extracted text of documents, compressed on disk with a size cap.
+
+    Safe to share between threads and between processes using the same
+    folder: entries are written to a temporary file and renamed into place.
+
+    Args:
+        directory (str | None): Folder of the cache; defaults to TEXT_CACHE_PATH.
+        max_bytes (int): Size cap of the cached text; 0 disables the cache.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_MB * 2**20):
+        self.directory = directory or TEXT_CACHE_PATH
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Counts already appended to the stats file
+        self._saved = (0, 0)
+        # Bytes of the entries, scanned on the first write
+        self._size = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, filepath):
+        """
+        Return the cache key of a file.
+
+        Args:
+            filepath (str): The document.
+
+        Returns:
+            str | None: Content hash, extension and loader version, or None
+                for formats that are not cached.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        extension = os.path.splitext(filepath)[1].lower()
+        version = LOADER_VERSIONS.get(extension)
+        if version is None:
+            return None
+        return f"{file_digest(filepath)}-{extension[1:]}-v{version}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key):
+        """
+        Return cached text and mark it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            str | None: The text, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                text = zlib.decompress(file.read()).decode("utf-8")
+            os.utime(path)
+        except (OSError, zlib.error, UnicodeDecodeError):
+            return None
+        return text
+
+    def put(self, key, text):
+        """
+        Store text, evicting the least recently used entries past the cap.
+
+        Args:
+            key (str): The cache key.
+            text (str): The extracted text.
+
+        Raises:
+            OSError: If the entry cannot be written.
+        """
+        data = zlib.compress(text.encode("utf-8"))
+        if len(data) > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as file:
+            file.write(data)
+        os.replace(temp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data)
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        """Return (last use, size, path) of every entry."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self, max_bytes=None):
+        """
+        Delete the least recently used entries down to EVICT_TO of the cap.
+
+        Args:
+            max_bytes (int | None): Cap to evict to instead of max_bytes.
+
+        Returns:
+            int: Number of entries deleted.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total > limit:
+            target = limit * EVICT_TO
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+        with self._lock:
+            self._size = total
+        return removed
+
+    def load(self, filepath, loader):
+        """
+        Extract a file's text, reusing the text cached for the same content.
+
+        Args:
+            filepath (str): The document.
+            loader (callable): Its loader from document_loader.LOADERS.
+
+        Returns:
+            str: The extracted text.
+        """
+        key = None
+        if self.enabled:
+            try:
+                key = self.key(filepath)
+            except OSError:
+                # The loader reports files it cannot read
+                pass
+        if key is None:
+            return loader(filepath)
+
+        text = self.get(key)
+        with self._lock:
+            if text is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if text is not None:
+            metrics.count("text_cache_hits")
+            return text
+        metrics.count("text_cache_misses")
+
+        text = loader(filepath)
+        # Loaders return "" for files they failed to read, which may work next time
+        if text:
+            try:
+                self.put(key, text)
+            except OSError:
+                print("Warning: Could not write to the text cache.")
+        return text
+
+    def save_stats(self):
+        """Append the hits and misses since the last call to the stats file."""
+        with self._lock:
+            hits, misses = self.hits - self._saved[0], self.misses - self._saved[1]
+            self._saved = (self.hits, self.misses)
+        if not hits and not misses:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # One short append per run, so concurrent runs do not overwrite each other
+            with open(os.path.join(self.directory, STATS_FILE), "a", encoding="utf-8") as file:
+                file.write(f"{hits} {misses}\n")
+        except OSError:
+            print("Warning: Could not save the text cache statistics.")
+
+    def report(self):
+        """
+        Summarize the cache's contents and its hit rate over all saved runs.
+
+        Returns:
+            dict: "entries", "bytes" on disk, "max_bytes", cumulative "hits" and
+                "misses" (including this instance's unsaved ones) and
+                "hit_rate" (None before the first lookup).
+        """
+        entries = self._entries()
+        hits, misses = self.hits - self._saved[0], self.misses - self._saved[1]
+        try:
+            with open(os.path.join(self.directory, STATS_FILE), "r", encoding="utf-8") as file:
+                for line in file:
+                    parts = line.split()
+                    if len(parts) == 2 and all(part.isdigit() for part in parts):
+                        hits += int(parts[0])
+                        misses += int(parts[1])
+        except OSError:
+            pass
+        lookups = hits + misses
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else None,
+        }
+
+    def clear(self):
+        """
+        Delete every entry and the statistics.
+
+        Returns:
+            int: Number of entries deleted.
+        """
+        removed = self.evict(max_bytes=0)
+        try:
+            os.remove(os.path.join(self.directory, STATS_FILE))
+        except OSError:
+            pass
+        with self._lock:
+            self.hits = self.misses = 0
+            self._saved = (0, 0)
+        return removed
+
+
+def default_text_cache():
+    """
+    Return the process-wide text cache, capped at TEXT_CACHE_MB on first use.
+
+    Returns:
+        TextCache: The shared cache.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            max_mb = max(0.0, env_number("TEXT_CACHE_MB", float(DEFAULT_MAX_MB)))
+            _default = TextCache(max_bytes=int(max_mb * 2**20))
+        return _default
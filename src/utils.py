@@ -1,3 +1,4 @@
+import os
 import re
 
 
@@ -61,3 +62,53 @@ def sanitize_filename(filename: str) -> str:
 
     # Add back leading dot if present
     return leading_dot + result
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the number of LLM tokens in a piece of text.
+
+    Uses the common heuristic of ~4 characters per token for English text,
+    which is close enough for reporting savings without loading a tokenizer.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        The estimated token count (0 for empty text).
+    """
+    if not text:
+        return 0
+    return max(1, round(len(text) / 4))
+
+
+def env_number(name: str, default):
+    """Reads a numeric setting from the environment.
+
+    Args:
+        name: The environment variable.
+        default: Value used when the variable is unset, empty or invalid; its
+            type (int or float) is the type of the result.
+
+    Returns:
+        The setting converted to the type of default.
+    """
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return type(default)(value)
+    except ValueError:
+        print(f"Warning: Ignoring invalid {name}={value!r}.")
+        return default
+
+
+def load_environment() -> None:
+    """Loads settings from the .env file into the environment.
+
+    Values in .env override variables already set, so the file is the single
+    place to configure a local run. Entry points call this before reading any
+    setting; library modules never do it at import time.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv(override=True)
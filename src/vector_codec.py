@@ -0,0 +1,204 @@
+"""
+Compression of stored embeddings: dimension reduction and int8 quantization.
+
+A VectorCodec is fitted once on the vectors of a collection at index time and
+then applied to every stored vector and every query, so both live in the same
+reduced space:
+
+- dimension reduction: "pca" projects onto the top principal components of the
+  corpus, "truncate" keeps the first dimensions (only sensible for models trained
+  to front-load information, e.g. Matryoshka embeddings)
+- int8 scalar quantization: each reduced dimension is scaled by its largest
+  absolute value to [-127, 127], shrinking storage 4x versus float32
+
+Similarities are computed directly on the codes: for a unit query q and a stored
+vector x ~ mean + components.T @ (scale * code), q . x ~ q . mean + (scale *
+(components @ q)) . code, so a query costs one projection plus one int8 matrix
+product.
+"""
+
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+METHODS = ("pca", "truncate")
+
+
+def parse_compression(spec):
+    """
+    Parse a compression spec such as "int8", "pca:128" or "int8,pca:128,rescore".
+
+    Args:
+        spec (str | dict | None): Comma-separated options, an already parsed
+            dict, or None/"" for no compression.
+
+    Returns:
+        dict | None: {"dtype", "dims", "method", "rescore"}, or None.
+
+    Raises:
+        ValueError: If an option is not recognised.
+    """
+    if not spec:
+        return None
+    if isinstance(spec, dict):
+        return spec
+
+    compression = {"dtype": "float32", "dims": None, "method": "pca", "rescore": False}
+    for option in spec.split(","):
+        option = option.strip().lower()
+        name, _, value = option.partition(":")
+        if name in DTYPES:
+            compression["dtype"] = name
+        elif name in METHODS:
+            compression["method"] = name
+            compression["dims"] = int(value) if value else None
+        elif name == "rescore":
+            compression["rescore"] = True
+        elif option:
+            raise ValueError(
+                f"Unknown compression option '{option}'. Use {DTYPES}, "
+                f"{METHODS} with ':<dims>', or 'rescore'."
+            )
+    return compression
+
+
+class VectorCodec:
+    """
+    A fitted reduction + quantization transform for unit-normalized vectors.
+
+    Args:
+        dtype (str): Storage dtype of the codes, one of DTYPES.
+        mean (np.ndarray | None): Corpus mean subtracted before projecting (PCA).
+        components (np.ndarray | None): (stored_dim, dim) projection matrix, or
+            None to keep every dimension.
+        scale (np.ndarray | None): Per-dimension int8 scale factors.
+    """
+
+    def __init__(self, dtype="float32", mean=None, components=None, scale=None):
+        self.dtype = np.dtype(dtype)
+        self.mean = mean
+        self.components = components
+        self.scale = scale
+
+    @classmethod
+    def fit(cls, vectors, dtype="float32", dims=None, method="pca"):
+        """
+        Fit a codec on a sample of (unit-normalized) vectors.
+
+        Args:
+            vectors (np.ndarray): (n, dim) float32 sample.
+            dtype (str): Storage dtype of the codes.
+            dims (int | None): Target dimension, or None to keep all.
+            method (str): "pca" or "truncate".
+
+        Returns:
+            VectorCodec: The fitted codec.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        mean = components = None
+
+        if dims and dims < dim:
+            if method == "pca":
+                mean = vectors.mean(axis=0)
+                # Rows of vt are the principal directions, strongest first
+                _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+                components = vt[:dims].astype(np.float32)
+            else:
+                components = np.eye(dims, dim, dtype=np.float32)
+
+        codec = cls(dtype, mean, components)
+        if codec.dtype == np.int8:
+            reduced = codec.project(vectors)
+            peak = np.abs(reduced).max(axis=0)
+            peak[peak == 0] = 1.0
+            codec.scale = (peak / 127.0).astype(np.float32)
+        return codec
+
+    @property
+    def stored_dim(self):
+        return None if self.components is None else self.components.shape[0]
+
+    def project(self, vectors):
+        """Apply the dimension reduction (identity if none) in float32."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.mean is not None:
+            vectors = vectors - self.mean
+        if self.components is not None:
+            vectors = vectors @ self.components.T
+        return vectors
+
+    def encode(self, vectors):
+        """
+        Convert unit vectors to stored codes.
+
+        Args:
+            vectors (np.ndarray): (n, dim) float32 vectors.
+
+        Returns:
+            np.ndarray: (n, stored_dim) codes in the storage dtype.
+        """
+        reduced = self.project(vectors)
+        if self.dtype == np.int8:
+            return np.clip(np.rint(reduced / self.scale), -127, 127).astype(np.int8)
+        return reduced.astype(self.dtype)
+
+    def decode(self, codes):
+        """
+        Approximately reconstruct full vectors from codes.
+
+        Args:
+            codes (np.ndarray): (n, stored_dim) stored codes.
+
+        Returns:
+            np.ndarray: (n, dim) float32 reconstructions.
+        """
+        reduced = np.asarray(codes, dtype=np.float32)
+        if self.scale is not None:
+            reduced = reduced * self.scale
+        if self.components is not None:
+            reduced = reduced @ self.components
+        if self.mean is not None:
+            reduced = reduced + self.mean
+        return reduced
+
+    def prepare_queries(self, queries):
+        """
+        Turn unit queries into weights that score codes directly.
+
+        Args:
+            queries (np.ndarray): (q, dim) float32 unit queries.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (q, stored_dim) weights and (q,) offsets;
+                similarity = codes @ weights.T + offsets.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        weights = queries @ self.components.T if self.components is not None else queries
+        if self.scale is not None:
+            weights = weights * self.scale
+        offsets = (
+            queries @ self.mean
+            if self.mean is not None
+            else np.zeros(len(queries), dtype=np.float32)
+        )
+        return weights.astype(np.float32), offsets.astype(np.float32)
+
+    def save(self, filepath):
+        """Write the codec parameters to an .npz file."""
+        arrays = {"dtype": np.array(self.dtype.name)}
+        for name in ("mean", "components", "scale"):
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        with open(filepath, "wb") as file:
+            np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, filepath):
+        """Read codec parameters written by save()."""
+        with np.load(filepath) as data:
+            return cls(
+                str(data["dtype"]),
+                data["mean"] if "mean" in data else None,
+                data["components"] if "components" in data else None,
+                data["scale"] if "scale" in data else None,
+            )
@@ -1,26 +1,103 @@
-import chromadb
 import hashlib
+import json
+import os
+import re
+import threading
+import time
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain.schema import Document
+# chromadb and LangChain take about a second to import; they are imported on
+# first use so that scanning, routing and the NumPy backend start quickly
+from embeddings import check_embedding_model, default_embedding_function, embedding_model_id
+from metrics import metrics
+from utils import sanitize_filename, estimate_tokens
 
-from utils import sanitize_filename
+# Root folder of every persisted collection
+VECTORDB_PATH = "./vectordb"
 
+# File in each store root recording the source and last use of every collection
+COLLECTIONS_FILE = "collections.json"
 
-def chunk_text(text, file):
+# Storage engines selectable with create_collection(backend=...) or VECTOR_BACKEND
+BACKENDS = ("chroma", "numpy")
+
+# HNSW settings of Chroma collections, settable with create_collection(index_params=...)
+# or VECTOR_INDEX_PARAMS. max_neighbors is HNSW's "M".
+INDEX_PARAMS = (
+    "space",
+    "max_neighbors",
+    "ef_construction",
+    "ef_search",
+    "batch_size",
+    "sync_threshold",
+)
+# Only these can change after a collection is created; the rest shape the graph
+UPDATABLE_INDEX_PARAMS = ("ef_search", "batch_size", "sync_threshold")
+INDEX_PARAM_ALIASES = {
+    "m": "max_neighbors",
+    "construction_ef": "ef_construction",
+    "search_ef": "ef_search",
+}
+INDEX_SPACES = ("l2", "cosine", "ip")
+
+# Version of the stored chunk layout. Version 1 prepended "[Source: ...]" to every
+# chunk; version 2 stores raw text and leaves the citation to the prompt builder;
+# version 3 drops the embedded file list in favour of the path index; version 4
+# splits text into CHUNK_SIZE chunks instead of 500-character ones.
+CHUNK_FORMAT = 4
+
+# Chunks are kept small for precise matching; retrieval expands hits to their
+# neighbours at answer time (see retrieval_system.expand_neighbours)
+CHUNK_SIZE = 250
+CHUNK_OVERLAP = 25
+
+# Overlap of the 500-character chunks written by CHUNK_FORMAT 1 to 3
+LEGACY_CHUNK_OVERLAP = 50
+
+# Joins neighbouring chunks that share no overlap. The splitter only cuts
+# without overlap where a piece is too long to repeat, which is mostly at
+# paragraph breaks, and strips the whitespace it cut at.
+CHUNK_BREAK = "\n\n"
+
+# Shortest shared text treated as splitter overlap when joining neighbouring chunks
+MIN_MERGE_OVERLAP = 8
+
+# Source name of the file-list chunks written by CHUNK_FORMAT 1 and 2
+LEGACY_FILE_INDEX_SOURCE = "indexing files"
+
+# Per-process write counters used, with the store files' modification times
+# (see storage_stamp), to invalidate cached retrieval results
+_collection_versions = {}
+_versions_lock = threading.Lock()
+_registry_lock = threading.Lock()
+
+# Matches the citation header written into chunks by CHUNK_FORMAT 1
+LEGACY_SOURCE_HEADER = re.compile(r"^\[Source: [^\]\n]*\]\n\n")
+
+
+class CollectionNotFoundError(ValueError):
+    """Raised when a command needs an existing collection and none was created for the path."""
+
+
+@metrics.timed("chunk")
+def chunk_text(text, file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
     Split text into smaller chunks with metadata for vector storage.
 
     Args:
         text (str): The text content to be split into chunks.
         file (str): The source file path to be stored in metadata.
+        chunk_size (int): Maximum characters per chunk.
+        chunk_overlap (int): Characters shared between consecutive chunks.
 
     Returns:
         list[Document]: List of Document objects containing chunked text with metadata.
     """
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=50,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
         separators=["\n\n", "\n", " ", ""],
     )
 
@@ -31,77 +108,728 @@ def chunk_text(text, file):
 
     docs = [
         Document(
-            page_content=f"[Source: {normalized_file}]\n\n{content}",
+            page_content=content,
             metadata={"source": normalized_file, "chunk": index},
         )
         for index, content in enumerate(chunks)
     ]
+    if metrics.enabled:
+        # Every indexed file is chunked exactly once
+        metrics.count("files")
+        metrics.count("document_tokens", sum(estimate_tokens(content) for content in chunks))
 
     return docs
 
 
-def create_collection(path):
+def parse_index_params(spec):
     """
-    Create or retrieve a ChromaDB collection for document storage.
+    Parse HNSW index parameters such as "max_neighbors=32,ef_search=80".
+
+    Args:
+        spec (str | dict | None): Comma-separated name=value pairs, a dict, or
+            None/"" for Chroma's defaults. "M", "construction_ef" and "search_ef"
+            are accepted as aliases.
 
     Returns:
-        chromadb.Collection: The ChromaDB collection named after the sanitized path.
+        dict: Parameters keyed by their INDEX_PARAMS name.
+
+    Raises:
+        ValueError: If a parameter or value is not valid.
+    """
+    if not spec:
+        return {}
+    if isinstance(spec, str):
+        pairs = [item.partition("=")[::2] for item in spec.split(",") if item.strip()]
+    else:
+        pairs = spec.items()
+
+    params = {}
+    for key, value in pairs:
+        key = str(key).strip()
+        key = INDEX_PARAM_ALIASES.get(key.lower(), key.lower())
+        if key not in INDEX_PARAMS:
+            raise ValueError(f"Unknown index parameter '{key}'. Choose from {INDEX_PARAMS}.")
+        if key == "space":
+            value = str(value).strip().lower()
+            if value not in INDEX_SPACES:
+                raise ValueError(f"Unknown space '{value}'. Choose from {INDEX_SPACES}.")
+        else:
+            value = int(value)
+            if value < 1:
+                raise ValueError(f"Index parameter '{key}' must be positive.")
+        params[key] = value
+    return params
+
+
+def get_index_params(collection):
+    """
+    Return the HNSW settings a collection was configured with.
+
+    Args:
+        collection: The vector store collection.
+
+    Returns:
+        dict: The collection's HNSW configuration, or {} for backends without one.
+    """
+    configuration = getattr(collection, "configuration", None) or {}
+    return dict(configuration.get("hnsw") or {})
+
+
+def get_distance_space(collection):
+    """
+    Return the distance function of a collection's query results.
+
+    Args:
+        collection: The vector store collection.
+
+    Returns:
+        str: "l2" (Chroma's default, squared Euclidean), "cosine" or "ip".
+    """
+    params = get_index_params(collection)
+    if params:
+        return params.get("space", "l2")
+    return getattr(collection, "space", "l2")
+
+
+def _apply_index_params(collection, params):
+    """Update the changeable HNSW settings of an existing Chroma collection."""
+    current = get_index_params(collection)
+    fixed = [
+        key
+        for key in params
+        if key not in UPDATABLE_INDEX_PARAMS and current.get(key, params[key]) != params[key]
+    ]
+    if fixed:
+        print(
+            f"Index parameters {', '.join(fixed)} only apply to new collections; "
+            f"delete and re-index '{collection.name}' to change them."
+        )
+
+    # Chroma does not report batch_size back, so it is only set on creation
+    updates = {
+        key: value
+        for key, value in params.items()
+        if key in UPDATABLE_INDEX_PARAMS and key in current and current[key] != value
+    }
+    if updates:
+        collection.modify(configuration={"hnsw": updates})
+
+
+def create_collection(
+    path,
+    backend=None,
+    embedding_function=None,
+    compression=None,
+    index_params=None,
+    directory=None,
+):
+    """
+    Create or retrieve a collection for document storage.
+
+    Every backend returns an object with the same collection interface (upsert,
+    update, get, query, delete, count, modify), so add_chunks and query_documents
+    work unchanged:
+
+    - "chroma": a ChromaDB persistent collection (HNSW index) in VECTORDB_PATH
+    - "numpy": a memory-mapped NumpyCollection in VECTORDB_PATH/numpy/<name>,
+      suited to read-mostly corpora that should start instantly
+
+    Args:
+        path (str): Folder path or ZIP name the collection is named after.
+        backend (str | None): One of BACKENDS; defaults to the VECTOR_BACKEND
+            environment variable, then "chroma".
+        embedding_function (callable | None): Embedding function to use instead
+            of the one configured with the EMBEDDING_* environment variables
+            (see embeddings.default_embedding_function).
+        compression (str | None): NumPy backend only: stored-vector compression
+            such as "int8,pca:128,rescore" (see vector_codec.parse_compression);
+            defaults to the VECTOR_COMPRESSION environment variable. Applied
+            when the collection is created and fitted by optimize_collection.
+        index_params (str | dict | None): Chroma backend only: HNSW settings (see
+            parse_index_params); defaults to the VECTOR_INDEX_PARAMS environment
+            variable. Stored with the collection when it is created; for existing
+            collections only UPDATABLE_INDEX_PARAMS are changed.
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+            Separate roots let independent processes index in parallel.
+
+    Returns:
+        The collection named after the sanitized path.
+
+    Raises:
+        ValueError: If the backend or an index parameter is unknown.
+        EmbeddingModelError: If the collection was embedded with another model.
     """
     name = sanitize_filename(path)
-    chroma_client = chromadb.PersistentClient(path="./vectordb")
-    collection = chroma_client.get_or_create_collection(name=name)
+    backend = backend or os.getenv("VECTOR_BACKEND") or "chroma"
+    directory = directory or VECTORDB_PATH
+    embedding_function = embedding_function or default_embedding_function()
+    # Metadata only applies to newly created collections; existing ones keep theirs
+    metadata = {
+        "chunk_format": CHUNK_FORMAT,
+        "embedding_model": embedding_model_id(embedding_function),
+    }
+
+    if backend == "chroma":
+        import chromadb
+
+        chroma_client = chromadb.PersistentClient(path=directory)
+        options = {}
+        params = parse_index_params(index_params or os.getenv("VECTOR_INDEX_PARAMS"))
+        if params:
+            options["configuration"] = {"hnsw": params}
+        # Chroma refuses to reopen a collection with an embedding function other
+        # than the one it persisted, so none is given to it; the recorded model
+        # id is checked instead
+        collection = chroma_client.get_or_create_collection(
+            name=name, metadata=metadata, embedding_function=None, **options
+        )
+        collection._embedding_function = embedding_function
+        if params:
+            _apply_index_params(collection, params)
+    elif backend == "numpy":
+        from numpy_backend import NumpyCollection
+
+        collection = NumpyCollection(
+            os.path.join(directory, "numpy", name),
+            name,
+            metadata=metadata,
+            embedding_function=embedding_function,
+            compression=compression or os.getenv("VECTOR_COMPRESSION"),
+        )
+    else:
+        raise ValueError(f"Unknown vector backend '{backend}'. Choose from {BACKENDS}.")
+    check_embedding_model(collection, embedding_function)
+    record_collection_use(name, path, directory)
+    return collection
+
+
+def open_collection(path, backend=None, embedding_function=None, directory=None):
+    """
+    Open an existing collection without creating or changing it.
+
+    Commands that only read a collection use this instead of create_collection,
+    so a mistyped path is reported rather than creating an empty collection.
+
+    Args:
+        path (str): Folder path or ZIP name the collection is named after.
+        backend (str | None): One of BACKENDS; defaults to the VECTOR_BACKEND
+            environment variable, then "chroma".
+        embedding_function (callable | None): Embedding function to use instead
+            of the configured one.
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+
+    Returns:
+        The collection named after the sanitized path.
+
+    Raises:
+        CollectionNotFoundError: If the path has no collection.
+        ValueError: If the backend is unknown.
+        EmbeddingModelError: If the collection was embedded with another model.
+    """
+    name = sanitize_filename(path)
+    backend = backend or os.getenv("VECTOR_BACKEND") or "chroma"
+    directory = directory or VECTORDB_PATH
+    embedding_function = embedding_function or default_embedding_function()
+    missing = CollectionNotFoundError(f"No collection found for '{path}'. Index it first.")
+
+    if backend == "chroma":
+        import chromadb
+        from chromadb.errors import NotFoundError
+
+        # Opening a client creates the store, so a missing one is checked first
+        if not os.path.isfile(os.path.join(directory, "chroma.sqlite3")):
+            raise missing
+        chroma_client = chromadb.PersistentClient(path=directory)
+        try:
+            collection = chroma_client.get_collection(name=name, embedding_function=None)
+        except NotFoundError:
+            raise missing from None
+        collection._embedding_function = embedding_function
+    elif backend == "numpy":
+        from numpy_backend import NumpyCollection
+
+        store = os.path.join(directory, "numpy", name)
+        if not os.path.isfile(os.path.join(store, "manifest.json")):
+            raise missing
+        collection = NumpyCollection(store, name, embedding_function=embedding_function)
+    else:
+        raise ValueError(f"Unknown vector backend '{backend}'. Choose from {BACKENDS}.")
+    # An empty collection would adopt the configured model; leave that to indexing
+    if collection.count():
+        check_embedding_model(collection, embedding_function)
     return collection
 
 
+def load_collection_registry(directory=None):
+    """
+    Return what is known about the collections of a store.
+
+    Args:
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+
+    Returns:
+        dict: Collection name -> {"path", "folder", "last_used"}; collections
+            created before the registry existed are missing.
+    """
+    filepath = os.path.join(directory or VECTORDB_PATH, COLLECTIONS_FILE)
+    try:
+        with open(filepath, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def record_collection_use(name, path, directory=None):
+    """
+    Record which folder a collection is indexed from and when it was last opened.
+
+    manage.py stats lists this, and manage.py cleanup deletes collections whose
+    folder is gone. A collection once opened from a folder stays a folder
+    collection when later opened by name after the folder was removed. For a
+    relative folder path the working directory is recorded too, since the
+    chunk sources of its files are relative to it.
+
+    Args:
+        name (str): The collection name.
+        path (str): Folder path or ZIP name the collection is named after.
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+    """
+    directory = directory or VECTORDB_PATH
+    with _registry_lock:
+        registry = load_collection_registry(directory)
+        entry = registry.get(name) or {}
+        if os.path.isdir(path):
+            entry.update(path=os.path.abspath(path), folder=True)
+            if not os.path.isabs(path):
+                entry["cwd"] = os.getcwd()
+        elif not entry.get("folder"):
+            entry.update(path=path, folder=False)
+        entry["last_used"] = time.time()
+        registry[name] = entry
+        try:
+            _save_collection_registry(registry, directory)
+        except OSError:
+            print("Warning: Could not record collection use; manage.py stats may be out of date.")
+
+
+def forget_collection(name, directory=None):
+    """
+    Remove a deleted collection from the registry.
+
+    Args:
+        name (str): The collection name.
+        directory (str | None): Root folder of the store; defaults to VECTORDB_PATH.
+    """
+    directory = directory or VECTORDB_PATH
+    with _registry_lock:
+        registry = load_collection_registry(directory)
+        if registry.pop(name, None) is not None:
+            _save_collection_registry(registry, directory)
+
+
+def _save_collection_registry(registry, directory):
+    os.makedirs(directory, exist_ok=True)
+    # Per-process temporary file, so concurrent writers never share one
+    tmp_path = os.path.join(directory, f"{COLLECTIONS_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(registry, file)
+    os.replace(tmp_path, os.path.join(directory, COLLECTIONS_FILE))
+
+
+def optimize_collection(collection):
+    """
+    Run post-indexing optimizations supported by the collection's backend.
+
+    For NumPy collections configured with compression this fits the codec
+    (PCA/truncation and int8 quantization) on the indexed vectors. Other
+    backends are left untouched.
+
+    Args:
+        collection: The collection that was just indexed.
+
+    Returns:
+        bool: True if the collection was changed.
+    """
+    fit_compression = getattr(collection, "fit_compression", None)
+    if fit_compression is None or not fit_compression():
+        return False
+    bump_collection_version(collection)
+    return True
+
+
+def migrate_collection(collection, batch_size=500):
+    """
+    Upgrade chunks stored by older versions to the current CHUNK_FORMAT.
+
+    Strips the legacy "[Source: ...]" header from chunk text, deletes the
+    embedded file-list chunks and re-splits each file's text into CHUNK_SIZE
+    chunks (re-embedding them, but without loading the files again).
+    Collections already marked with the current CHUNK_FORMAT are left
+    untouched, so calling this on every startup is cheap.
+
+    Args:
+        collection (chromadb.Collection): The collection to migrate.
+        batch_size (int): Number of chunks fetched and rewritten per batch.
+
+    Returns:
+        dict: Number of chunks rewritten without headers and of removed chunks,
+            the bytes and estimated tokens saved by stripping headers, and the
+            number of re-chunked files.
+    """
+    stats = {"chunks": 0, "removed": 0, "bytes_saved": 0, "tokens_saved": 0, "rechunked_files": 0}
+    metadata = collection.metadata or {}
+    version = metadata.get("chunk_format", 1)
+    if version >= CHUNK_FORMAT:
+        return stats
+
+    if version < 3:
+        legacy = collection.get(where={"source": LEGACY_FILE_INDEX_SOURCE}, include=[])
+        removed = legacy["ids"]
+        if removed:
+            collection.delete(ids=removed)
+            stats["removed"] = len(removed)
+
+    if version < 2:
+        _strip_source_headers(collection, stats, batch_size)
+
+    if version < 4:
+        _rechunk(collection, stats, batch_size)
+
+    collection.modify(metadata={**metadata, "chunk_format": CHUNK_FORMAT})
+    bump_collection_version(collection)
+    return stats
+
+
+def _rechunk(collection, stats, batch_size):
+    """Split every file's stored text again into CHUNK_SIZE chunks."""
+    sources = set()
+    offset = 0
+    while True:
+        batch = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        offset += len(batch["ids"])
+        for metadata in batch["metadatas"]:
+            # Chunks not written by add_chunks have no position to rebuild the file from
+            if metadata and "source" in metadata and "chunk" in metadata:
+                sources.add(metadata["source"])
+
+    for source in sorted(sources):
+        stored = collection.get(where={"source": source}, include=["documents", "metadatas"])
+        chunks = sorted(
+            zip(stored["metadatas"], stored["documents"]), key=lambda item: item[0]["chunk"]
+        )
+        # Aliases and other per-file metadata are the same on every chunk
+        extra = {
+            key: value for key, value in chunks[0][0].items() if key not in ("source", "chunk")
+        }
+        text = merge_chunks(
+            [document or "" for _, document in chunks], LEGACY_CHUNK_OVERLAP, CHUNK_BREAK
+        )
+        new_chunks = chunk_text(text, source)
+        for chunk in new_chunks:
+            chunk.metadata.update(extra)
+        if new_chunks:
+            add_chunks(new_chunks, collection)
+        new_ids = {chunk_id(source, index) for index in range(len(new_chunks))}
+        stale = [id_ for id_ in stored["ids"] if id_ not in new_ids]
+        if stale:
+            collection.delete(ids=stale)
+        stats["rechunked_files"] += 1
+
+
+def merge_chunks(parts, max_overlap=None, separator=None):
+    """
+    Join consecutive chunks into one passage, dropping the splitter overlap.
+
+    Args:
+        parts (list[str]): Consecutive chunk texts from one file.
+        max_overlap (int | None): Longest overlap to look for; None for any.
+        separator (str | None): Text put between chunks sharing no overlap of
+            at least MIN_MERGE_OVERLAP characters; None to refuse to join them.
+
+    Returns:
+        str: The joined passage.
+
+    Raises:
+        ValueError: If two chunks share no overlap and no separator is given.
+    """
+    merged = parts[0]
+    for part in parts[1:]:
+        overlap = 0
+        longest = min(len(merged), len(part), max_overlap or len(part))
+        for size in range(longest, MIN_MERGE_OVERLAP - 1, -1):
+            if merged.endswith(part[:size]):
+                overlap = size
+                break
+        if overlap:
+            merged += part[overlap:]
+        elif separator is not None:
+            merged += separator + part
+        else:
+            raise ValueError("Chunks share no overlap; pass a separator to join them.")
+    return merged
+
+
+def _strip_source_headers(collection, stats, batch_size):
+    """Remove the CHUNK_FORMAT 1 citation header from every stored chunk."""
+    offset = 0
+    while True:
+        batch = collection.get(include=["documents"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        offset += len(batch["ids"])
+
+        ids, documents = [], []
+        for id_, document in zip(batch["ids"], batch["documents"]):
+            match = LEGACY_SOURCE_HEADER.match(document or "")
+            if not match:
+                continue
+            header = match.group(0)
+            ids.append(id_)
+            documents.append(document[len(header) :])
+            stats["bytes_saved"] += len(header.encode("utf-8"))
+            stats["tokens_saved"] += estimate_tokens(header)
+
+        # Rewriting documents re-embeds them without the header noise
+        if ids:
+            collection.update(ids=ids, documents=documents)
+            stats["chunks"] += len(ids)
+
+
+def collection_key(collection):
+    """
+    Return a process-stable identifier for a collection.
+
+    Args:
+        collection: The vector store collection.
+
+    Returns:
+        str: The collection ID, or its name if it has no ID.
+    """
+    return str(getattr(collection, "id", None) or collection.name)
+
+
+def _storage_files(collection):
+    """Return the files that every write to a collection's store modifies."""
+    directory = getattr(collection, "directory", None)
+    if directory:
+        # NumpyCollection commits rows and deletions through alive.bin
+        return [
+            os.path.join(directory, filename)
+            for filename in ("alive.bin", "manifest.json", "codec.npz")
+        ]
+    try:
+        settings = collection._client.get_settings()
+    except AttributeError:
+        return []
+    if not settings.is_persistent or not settings.persist_directory:
+        return []
+    database = os.path.join(settings.persist_directory, "chroma.sqlite3")
+    return [database, database + "-wal"]
+
+
+def storage_stamp(collection):
+    """
+    Return the modification times and sizes of a collection's store files.
+
+    Writes from other processes change the stamp, although they do not bump
+    this process's write version.
+
+    Args:
+        collection: The vector store collection.
+
+    Returns:
+        tuple: (mtime_ns, size) of each existing store file; empty for
+            in-memory collections.
+    """
+    stamp = []
+    for filepath in _storage_files(collection):
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            continue
+        stamp.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def get_collection_version(collection):
+    """
+    Return a value that changes whenever a collection is written to.
+
+    Args:
+        collection: The vector store collection.
+
+    Returns:
+        tuple: The number of writes made by this process (0 if none) and the
+            storage_stamp of the collection's files.
+    """
+    return _collection_versions.get(collection_key(collection), 0), storage_stamp(collection)
+
+
+def bump_collection_version(collection):
+    """
+    Record a write made by this process, invalidating cached retrieval results.
+
+    Args:
+        collection: The vector store collection that was modified.
+
+    Returns:
+        int: The new write version.
+    """
+    key = collection_key(collection)
+    with _versions_lock:
+        _collection_versions[key] = _collection_versions.get(key, 0) + 1
+        return _collection_versions[key]
+
+
+def chunk_id(source, index):
+    """
+    Return the deterministic ID of a stored chunk.
+
+    IDs are derived from the source path and chunk index, so re-indexing a file
+    overwrites its chunks and neighbours can be fetched without a vector search.
+
+    Args:
+        source (str): The normalized source file path.
+        index (int): The position of the chunk within the file.
+
+    Returns:
+        str: The MD5 hex digest of "<source>-<index>".
+    """
+    return hashlib.md5(f"{source}-{index}".encode()).hexdigest()
+
+
 def add_chunks(chunks, collection):
     """
-    Add document chunks to a ChromaDB collection.
+    Add document chunks to a collection.
 
     Args:
         chunks (list[Document]): List of Document objects to add to the collection.
-        collection (chromadb.Collection): The ChromaDB collection to add chunks to.
+        collection: The collection (from any backend) to add chunks to.
 
     Returns:
-        chromadb.Collection: The updated collection with new chunks.
+        The updated collection with new chunks.
     """
-    collection.upsert(
-        documents=[doc.page_content for doc in chunks],
-        # Generate deterministic IDs using MD5 hash of source+index
-        # This ensures same document chunks get same ID, preventing duplicates on re-indexing
-        ids=[
-            hashlib.md5(f"{doc.metadata['source']}-{i}".encode()).hexdigest()
-            for i, doc in enumerate(chunks)
-        ],
-        metadatas=[doc.metadata for doc in chunks],
-    )
+    documents = [doc.page_content for doc in chunks]
+    embeddings = None
+    embedding_function = getattr(collection, "_embedding_function", None)
+    if embedding_function is not None:
+        # Embed apart from the write so the two stages are timed separately
+        with metrics.span("embed"):
+            embeddings = embedding_function(documents)
+
+    with metrics.span("upsert"):
+        collection.upsert(
+            documents=documents,
+            # Deterministic IDs prevent duplicates on re-indexing
+            ids=[chunk_id(doc.metadata["source"], i) for i, doc in enumerate(chunks)],
+            metadatas=[doc.metadata for doc in chunks],
+            embeddings=embeddings,
+        )
+    bump_collection_version(collection)
+    metrics.count("chunks", len(chunks))
 
     return collection
 
 
-def create_file_index_chunk(files):
+def remove_stale_chunks(collection, source, keep=0):
+    """
+    Delete a file's chunks from index `keep` on.
+
+    Re-indexing a file with add_chunks overwrites its chunks in place; this
+    removes the ones left over when the new version is shorter, or every chunk
+    (keep=0) when the file was deleted.
+
+    Args:
+        collection: The collection holding the file's chunks.
+        source (str): The file path stored in the chunks' "source" metadata.
+        keep (int): Number of leading chunks to keep.
+    """
+    where = {"source": source}
+    if keep:
+        where = {"$and": [where, {"chunk": {"$gte": keep}}]}
+    collection.delete(where=where)
+    bump_collection_version(collection)
+
+
+def get_aliases(metadata):
     """
-    Create document chunks from a list of indexed file paths.
+    Return the duplicate copies recorded on a chunk.
 
     Args:
-        files (list[str]): List of file paths that were indexed.
+        metadata (dict | None): The chunk's metadata.
 
     Returns:
-        list[Document]: List of Document objects containing file index information.
+        list[str]: Paths of files with the same content as the chunk's source.
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=50,
-        separators=["\n\n", "\n", " ", ""],
-    )
+    aliases = (metadata or {}).get("aliases") or ""
+    return [alias for alias in aliases.split("\n") if alias]
 
-    # Normalize paths to use forward slashes to avoid escape character issues
-    normalized_files = [file.replace("\\", "/") for file in files]
-    text = "The following files were indexed:\n" + "\n".join(normalized_files)
-    chunks = splitter.split_text(text)
 
-    docs = [
-        Document(page_content=c, metadata={"source": "indexing files", "chunk": i})
-        for i, c in enumerate(chunks)
-    ]
+def add_alias(collection, source, alias):
+    """
+    Record that a file is a copy of an indexed one.
 
-    return docs
+    The alias is added to the "aliases" metadata of every chunk of the source
+    (as a newline-separated string, since metadata values must be scalars), so
+    answers can cite both files.
+
+    Args:
+        collection: The collection holding the source's chunks.
+        source (str): The indexed (canonical) file path.
+        alias (str): The path of the duplicate.
+
+    Returns:
+        int: Number of chunks updated.
+    """
+    stored = collection.get(where={"source": source}, include=["metadatas"])
+    if not stored["ids"]:
+        return 0
+    metadatas = []
+    for metadata in stored["metadatas"]:
+        aliases = get_aliases(metadata)
+        if alias not in aliases:
+            aliases.append(alias)
+        metadatas.append({**metadata, "aliases": "\n".join(aliases)})
+    collection.update(ids=stored["ids"], metadatas=metadatas)
+    bump_collection_version(collection)
+    return len(stored["ids"])
+
+
+def remove_alias(collection, alias):
+    """
+    Forget that a file is a copy of an indexed one, e.g. after it changed or
+    was deleted.
+
+    Every chunk carries its file's aliases, so the sources listing the alias
+    are found from their first chunks alone.
+
+    Args:
+        collection: The collection holding the canonical chunks.
+        alias (str): The path of the former duplicate.
+
+    Returns:
+        int: Number of chunks updated.
+    """
+    first_chunks = collection.get(where={"chunk": 0}, include=["metadatas"])
+    canonicals = [
+        metadata["source"]
+        for metadata in first_chunks["metadatas"]
+        if alias in get_aliases(metadata)
+    ]
+    updated = 0
+    for source in canonicals:
+        stored = collection.get(where={"source": source}, include=["metadatas"])
+        metadatas = [
+            {
+                **metadata,
+                "aliases": "\n".join(a for a in get_aliases(metadata) if a != alias),
+            }
+            for metadata in stored["metadatas"]
+        ]
+        collection.update(ids=stored["ids"], metadatas=metadatas)
+        updated += len(stored["ids"])
+    if updated:
+        bump_collection_version(collection)
+    return updated
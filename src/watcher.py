@@ -0,0 +1,453 @@
+"""
+Keep a collection in sync with a folder while the application runs.
+
+FolderWatcher picks up created, modified, moved and deleted documents and
+re-indexes only those files. Like a full indexing run, it records copies of
+documents it indexed as aliases instead of embedding them again. File system
+notifications come from watchdog (inotify on Linux, FSEvents on macOS,
+ReadDirectoryChangesW on Windows); if it is not installed or cannot watch the
+folder, the watcher polls the modification times and sizes of the files found
+by scan_folders instead.
+
+Events are debounced per file, so a burst of writes to one document (editors
+often save in several steps) is indexed once after it goes quiet. A single
+writer thread applies every change, so the collection and the path index are
+never written concurrently by the watcher.
+"""
+
+import os
+import threading
+import time
+
+from dedup import Deduplicator
+from document_loader import LOADERS
+from path_index import normalize_path
+from scan_folders import scan_folders
+from text_cache import default_text_cache
+from vector_store import get_aliases, remove_alias, remove_stale_chunks
+
+# Seconds a file must stay unchanged before it is indexed
+DEBOUNCE_SECONDS = 1.0
+
+# Seconds between scans when polling
+POLL_INTERVAL = 2.0
+
+UPSERT, DELETE = "upsert", "delete"
+
+# One watcher per folder in this process, shared by every caller of watch_folder
+_watchers = {}
+# Owners (Streamlit sessions) of each folder's watcher; it stops when none are left
+_watcher_owners = {}
+_watchers_lock = threading.Lock()
+
+
+def snapshot_files(directory):
+    """
+    Record the modification time and size of every supported file in a folder.
+
+    Args:
+        directory (str): The watched folder.
+
+    Returns:
+        dict: Maps each file path (as returned by scan_folders) to (mtime_ns, size).
+    """
+    snapshot = {}
+    for file in scan_folders(directory):
+        if os.path.splitext(file)[1] not in LOADERS:
+            continue
+        try:
+            stat = os.stat(file)
+        except OSError:
+            continue
+        snapshot[file] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def diff_snapshots(old, new):
+    """
+    Compare two snapshots from snapshot_files.
+
+    Args:
+        old (dict): The earlier snapshot.
+        new (dict): The current snapshot.
+
+    Returns:
+        list[tuple[str, str]]: (path, UPSERT) for new or changed files and
+            (path, DELETE) for removed ones.
+    """
+    changes = [(path, UPSERT) for path, signature in new.items() if old.get(path) != signature]
+    changes += [(path, DELETE) for path in old if path not in new]
+    return changes
+
+
+class FolderWatcher:
+    """
+    Re-index the documents of a folder as they change.
+
+    Args:
+        directory (str): The folder that was indexed into the collection.
+        collection: The collection holding the folder's chunks.
+        path_index (PathIndex | None): Path index updated alongside the collection.
+        path_index_file (str | None): Where to save the path index after changes.
+        debounce (float): Seconds a file must stay unchanged before indexing.
+        poll_interval (float): Seconds between scans when polling.
+        use_watchdog (bool | None): Use file system notifications; None uses
+            them when watchdog is available and falls back to polling otherwise.
+        on_change (callable | None): Called from the writer thread with the list
+            of (path, action) changes applied in each batch.
+        text_cache (TextCache | None): Cache of extracted text, so moved or
+            re-saved but unchanged documents are not parsed again; defaults to
+            text_cache.default_text_cache().
+    """
+
+    def __init__(
+        self,
+        directory,
+        collection,
+        path_index=None,
+        path_index_file=None,
+        debounce=DEBOUNCE_SECONDS,
+        poll_interval=POLL_INTERVAL,
+        use_watchdog=None,
+        on_change=None,
+        text_cache=None,
+    ):
+        self.directory = directory
+        self.collection = collection
+        self.path_index = path_index
+        self.path_index_file = path_index_file
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_watchdog = use_watchdog
+        self.on_change = on_change
+        self.text_cache = text_cache or default_text_cache()
+        self.mode = None
+        self.stats = {"indexed": 0, "removed": 0, "unchanged": 0, "errors": 0}
+        # Fingerprints of the files indexed while watching, so copies are
+        # recorded as aliases as in a full indexing run
+        self.dedup = Deduplicator(collection)
+
+        self._root = os.path.abspath(directory)
+        self._known = {}
+        self._pending = {}
+        self._rescan_at = None
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._writer = None
+        self._observer = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self, sync=False):
+        """
+        Start watching.
+
+        Args:
+            sync (bool): First index files added or modified, and remove files
+                deleted, since the path index was saved. Without it, files present
+                now are assumed to be indexed already.
+
+        Returns:
+            FolderWatcher: self, for chaining.
+        """
+        self._known = snapshot_files(self.directory)
+        if sync:
+            self._queue_offline_changes()
+        self._stopped.clear()
+        self.mode = "polling"
+        if self.use_watchdog is not False:
+            self._observer = self._start_observer()
+            if self._observer is not None:
+                self.mode = "watchdog"
+            elif self.use_watchdog:
+                print("File notifications are unavailable; polling for changes instead.")
+
+        self._writer = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+        self._writer.start()
+        return self
+
+    def stop(self):
+        """Stop watching; changes not yet applied are dropped."""
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+
+    def _queue_offline_changes(self):
+        """Queue the differences between the folder and the saved path index."""
+        if self.path_index is None:
+            return
+        indexed = dict(self.path_index.files)
+        for path in list(self._known):
+            entry = indexed.pop(normalize_path(path), None)
+            if entry is None or entry.get("modified") != os.path.getmtime(path):
+                del self._known[path]
+                self._pending[path] = (UPSERT, 0.0)
+        for path in indexed:
+            self._known[path] = None
+            self._pending[path] = (DELETE, 0.0)
+
+    @property
+    def running(self):
+        return self._writer is not None and self._writer.is_alive()
+
+    def pending(self):
+        """Number of changed files waiting for the debounce delay."""
+        with self._condition:
+            return len(self._pending)
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    # Folders moved out of the tree or deleted only report the
+                    # folder itself; reconcile with a scan
+                    if event.event_type in ("deleted", "moved"):
+                        watcher.request_rescan()
+                elif event.event_type == "moved":
+                    watcher.notify(event.src_path, DELETE)
+                    watcher.notify(event.dest_path, UPSERT)
+                elif event.event_type == "deleted":
+                    watcher.notify(event.src_path, DELETE)
+                elif event.event_type in ("created", "modified", "closed"):
+                    watcher.notify(event.src_path, UPSERT)
+
+        observer = Observer()
+        try:
+            observer.schedule(Handler(), self._root, recursive=True)
+            observer.start()
+        except OSError:
+            # e.g. the inotify watch limit is exhausted
+            return None
+        return observer
+
+    # ------------------------------------------------------------------
+    # Events
+    # ------------------------------------------------------------------
+
+    def notify(self, path, action):
+        """
+        Queue a change to a file; repeated changes restart its debounce delay.
+
+        Args:
+            path (str): Path of the changed file, absolute or as scanned.
+            action (str): UPSERT or DELETE.
+        """
+        path = self._source_path(path)
+        if os.path.splitext(path)[1] not in LOADERS:
+            return
+        with self._condition:
+            self._pending[path] = (action, time.monotonic())
+            self._condition.notify()
+
+    def request_rescan(self):
+        """Reconcile the whole folder with the collection after the debounce delay."""
+        with self._condition:
+            self._rescan_at = time.monotonic() + self.debounce
+            self._condition.notify()
+
+    def _source_path(self, path):
+        """Map an event path to the form scan_folders produced at indexing time."""
+        relative = os.path.relpath(os.path.abspath(path), self._root)
+        return os.path.join(self.directory, relative)
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        next_poll = time.monotonic() + self.poll_interval
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            if self.mode == "polling" and now >= next_poll:
+                self._rescan()
+                next_poll = now + self.poll_interval
+            elif self._rescan_at is not None and now >= self._rescan_at:
+                self._rescan_at = None
+                self._rescan()
+
+            with self._condition:
+                now = time.monotonic()
+                ready = [
+                    path
+                    for path, (_, changed) in self._pending.items()
+                    if now - changed >= self.debounce
+                ]
+                batch = [(path, self._pending.pop(path)[0]) for path in ready]
+                if not batch:
+                    self._condition.wait(timeout=self._wait_time(now, next_poll))
+                    continue
+
+            self._apply(batch)
+
+    def _wait_time(self, now, next_poll):
+        deadlines = [changed + self.debounce for _, changed in self._pending.values()]
+        if self.mode == "polling":
+            deadlines.append(next_poll)
+        if self._rescan_at is not None:
+            deadlines.append(self._rescan_at)
+        return max(0.01, min(deadlines) - now) if deadlines else None
+
+    def _rescan(self):
+        current = snapshot_files(self.directory)
+        changes = diff_snapshots(self._known, current)
+        if changes:
+            # Scanned changes already waited at least one poll interval
+            with self._condition:
+                for path, action in changes:
+                    self._pending.setdefault(path, (action, 0.0))
+
+    def _apply(self, batch):
+        applied = []
+        for path, action in batch:
+            try:
+                if action == UPSERT and os.path.isfile(path):
+                    result = self._index_file(path)
+                else:
+                    result = self._remove_file(path)
+            except Exception:
+                # keep watching; the next change to the file retries it
+                self.stats["errors"] += 1
+                print(f"Error updating file {path}. Skipping.")
+                continue
+            if result:
+                applied.append((path, result))
+
+        if applied and self.path_index is not None and self.path_index_file:
+            try:
+                self.path_index.save(self.path_index_file)
+            except OSError:
+                print("Warning: Could not save the file-name index.")
+        if applied and self.on_change:
+            self.on_change(applied)
+        self.text_cache.save_stats()
+
+    def _index_file(self, path):
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if self._known.get(path) == signature:
+            self.stats["unchanged"] += 1
+            return None
+
+        loader = LOADERS[os.path.splitext(path)[1]]
+        aliases = self._aliases_of(path)
+        # Whatever this file was a copy of, its old content no longer counts
+        self._forget(path)
+        count = self.dedup.index(path, self.text_cache.load(path, loader))
+        # Drop chunks beyond the new end of the file
+        remove_stale_chunks(self.collection, path, keep=count)
+        self._restore_aliases(path, aliases)
+
+        if self.path_index is not None:
+            entry = self.path_index.files.get(normalize_path(path))
+            self.path_index.add(path, added=entry["added"] if entry else None)
+        self._known[path] = signature
+        self.stats["indexed"] += 1
+        return UPSERT
+
+    def _aliases_of(self, path):
+        stored = self.collection.get(where={"source": path}, limit=1, include=["metadatas"])
+        return get_aliases(stored["metadatas"][0]) if stored["ids"] else []
+
+    def _forget(self, path):
+        self.dedup.forget(path)
+        remove_alias(self.collection, path.replace("\\", "/"))
+
+    def _restore_aliases(self, path, aliases):
+        # Duplicates were only indexed through this file; now that its content
+        # changed or is gone, index them as files of their own
+        for alias in aliases:
+            if alias != path and os.path.isfile(alias):
+                self._known.pop(alias, None)
+                self._index_file(alias)
+
+    def _remove_file(self, path):
+        if path not in self._known and (
+            self.path_index is None or path not in self.path_index
+        ):
+            return None
+        aliases = self._aliases_of(path)
+        remove_stale_chunks(self.collection, path)
+        self._forget(path)
+        self._restore_aliases(path, aliases)
+        if self.path_index is not None:
+            self.path_index.remove(path)
+        self._known.pop(path, None)
+        self.stats["removed"] += 1
+        return DELETE
+
+
+def watch_folder(
+    directory, collection, path_index=None, path_index_file=None, owner=None, **options
+):
+    """
+    Return the running watcher of a folder, starting one if needed.
+
+    Sessions of the Streamlit app share one watcher per folder, so each change
+    is indexed once and by a single writer. Each session registers as an owner,
+    and the watcher runs until every owner has called stop_watching.
+
+    Args:
+        directory (str): The indexed folder.
+        collection: The collection holding the folder's chunks.
+        path_index (PathIndex | None): Path index updated alongside the collection.
+        path_index_file (str | None): Where to save the path index after changes.
+        owner (str | None): Identifies the caller, e.g. a session id.
+        **options: Further FolderWatcher arguments for a new watcher.
+
+    Returns:
+        FolderWatcher: The folder's watcher.
+    """
+    key = os.path.abspath(directory)
+    with _watchers_lock:
+        watcher = _watchers.get(key)
+        if watcher is None or not watcher.running:
+            watcher = FolderWatcher(
+                directory, collection, path_index, path_index_file, **options
+            ).start()
+            _watchers[key] = watcher
+        _watcher_owners.setdefault(key, set()).add(owner)
+        return watcher
+
+
+def stop_watching(directory, owner=None):
+    """
+    Release a folder's watcher, stopping it once no other owner is left.
+
+    Args:
+        directory (str): The watched folder.
+        owner (str | None): The owner passed to watch_folder. Callers that
+            never watched the folder do not affect the watcher.
+
+    Returns:
+        bool: Whether the watcher was stopped.
+    """
+    key = os.path.abspath(directory)
+    with _watchers_lock:
+        owners = _watcher_owners.get(key)
+        if owners is None or owner not in owners:
+            return False
+        owners.discard(owner)
+        if owners:
+            return False
+        del _watcher_owners[key]
+        watcher = _watchers.pop(key, None)
+    if watcher is not None:
+        watcher.stop()
+    return watcher is not None
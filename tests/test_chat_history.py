@@ -0,0 +1,112 @@
+# type: ignore
+
+"""
+Unit tests for chat_history.py
+
+Tests the in-memory window, offloading old messages to disk and reading them
+back by range, reloading them after an idle session returns, the incrementally
+maintained LangChain history and clearing.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from chat_history import ChatHistory
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+def make_history(tmp_path, turns, max_in_memory=6):
+    """Return a history holding the given number of question/answer turns"""
+    history = ChatHistory("session", max_in_memory=max_in_memory, directory=str(tmp_path))
+    for turn in range(turns):
+        history.append("user", f"question {turn}")
+        history.append("assistant", f"answer {turn} ✓")
+    return history
+
+
+class TestChatHistory:
+    """Test cases for ChatHistory"""
+
+    def test_short_conversation_stays_in_memory(self, tmp_path):
+        """Test that nothing is written while under the memory cap"""
+        history = make_history(tmp_path, 2)
+
+        assert len(history) == 4
+        assert history.offloaded == 0
+        assert not os.path.exists(history.filepath)
+        assert history.recent(3) == [
+            {"role": "assistant", "content": "answer 0 ✓"},
+            {"role": "user", "content": "question 1"},
+            {"role": "assistant", "content": "answer 1 ✓"},
+        ]
+
+    def test_old_messages_are_offloaded(self, tmp_path):
+        """Test that memory holds at most max_in_memory messages"""
+        history = make_history(tmp_path, 10)
+
+        assert len(history) == 20
+        assert history.offloaded == 14
+        assert len(history.recent(100)) == 6
+        assert history.recent(1) == [{"role": "assistant", "content": "answer 9 ✓"}]
+
+    def test_ranges_span_disk_and_memory(self, tmp_path):
+        """Test that any range of messages reads back in order"""
+        history = make_history(tmp_path, 10)
+
+        everything = history.messages(0, len(history))
+        middle = history.messages(12, 16)
+
+        assert [message["content"] for message in everything[:2]] == ["question 0", "answer 0 ✓"]
+        assert everything[-1]["content"] == "answer 9 ✓"
+        assert [message["content"] for message in middle] == [
+            "question 6",
+            "answer 6 ✓",
+            "question 7",
+            "answer 7 ✓",
+        ]
+        assert history.messages(18, 100) == everything[18:]
+        assert history.messages(5, 5) == []
+
+    def test_langchain_history_is_incremental(self, tmp_path):
+        """Test that LangChain messages are built once and follow the memory window"""
+        history = make_history(tmp_path, 2)
+        before = history.langchain_history()
+
+        history.append("user", "question 2")
+        after = history.langchain_history()
+
+        assert after[:4] == before and all(a is b for a, b in zip(after, before))
+        assert [type(message) for message in after] == [HumanMessage, AIMessage] * 2 + [
+            HumanMessage
+        ]
+        assert len(make_history(tmp_path / "long", 10).langchain_history()) == 6
+
+    def test_reload_undoes_offload_all(self, tmp_path):
+        """Test that the newest messages return to memory after everything was offloaded"""
+        history = make_history(tmp_path, 10)
+        recent = history.recent(100)
+
+        history.offload_all()
+        assert history.recent() == [] and history.offloaded == 20
+        history.reload()
+
+        assert history.recent(100) == recent
+        assert history.offloaded == 14
+        assert len(history.langchain_history()) == 6
+        history.append("user", "question 10")
+        assert history.messages(14, 16) == recent[:2]
+        assert history.messages(0, 1) == [{"role": "user", "content": "question 0"}]
+
+    def test_clear(self, tmp_path):
+        """Test that clearing forgets every message and deletes the file"""
+        history = make_history(tmp_path, 10)
+
+        history.clear()
+
+        assert len(history) == 0
+        assert history.langchain_history() == []
+        assert not os.path.exists(history.filepath)
+        history.append("user", "again")
+        assert history.messages(0, 1) == [{"role": "user", "content": "again"}]
@@ -0,0 +1,164 @@
+# type: ignore
+
+"""
+Unit tests for dedup.py
+
+Tests MinHash similarity estimates, LSH lookups, and that an indexing run
+embeds one copy of exact and near-duplicate documents, records the others as
+aliases and reports the savings.
+"""
+
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from dedup import Deduplicator, LSHIndex, MinHasher, normalize_text, shingles
+from numpy_backend import NumpyCollection
+from vector_store import add_chunks, chunk_text, get_aliases
+
+
+def fake_embed(texts):
+    """Deterministic offline embedder that counts the texts it embeds"""
+    fake_embed.calls += len(texts)
+    return [[float(len(text)), float(text.count(" ")), 1.0] for text in texts]
+
+
+fake_embed.calls = 0
+
+
+def make_text(seed, words=400):
+    """Return a reproducible pseudo-random document"""
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def make_collection(tmp_path):
+    """Create an empty NumPy collection with the fake embedder"""
+    return NumpyCollection(str(tmp_path / "store"), "dedup", embedding_function=fake_embed)
+
+
+def sources(collection):
+    """Map each indexed file to its chunk metadatas"""
+    stored = {}
+    for metadata in collection.get(include=["metadatas"])["metadatas"]:
+        stored.setdefault(metadata["source"], []).append(metadata)
+    return stored
+
+
+class TestMinHash:
+    """Test cases for signatures and the LSH index"""
+
+    def test_similarity_estimate(self):
+        """Test that signatures estimate the Jaccard similarity of shingles"""
+        hasher = MinHasher()
+        first = make_text(1)
+        words = first.split()
+        words[100:120] = ["changed"] * 20
+        second = " ".join(words)
+
+        a, b = shingles(first), shingles(second)
+        jaccard = len(a & b) / len(a | b)
+        estimate = (hasher.signature(first) == hasher.signature(second)).mean()
+
+        assert abs(estimate - jaccard) < 0.12
+
+    def test_empty_text(self):
+        """Test that empty text has no signature"""
+        assert MinHasher().signature("") is None
+
+    def test_lsh_finds_near_copies_only(self):
+        """Test that the index returns a near copy and not an unrelated text"""
+        hasher = MinHasher()
+        index = LSHIndex()
+        index.add("original", hasher.signature(make_text(1)))
+        index.add("other", hasher.signature(make_text(2)))
+        near_copy = make_text(1).replace("word7 ", "word8 ", 1)
+
+        match = index.query(hasher.signature(near_copy), threshold=0.9)
+
+        assert match[0] == "original"
+        assert index.query(hasher.signature(make_text(3)), threshold=0.5) is None
+
+
+class TestDeduplicator:
+    """Test cases for deduplicating an indexing run"""
+
+    def test_exact_copies_are_embedded_once(self, tmp_path):
+        """Test that copies differing only in case and spacing become aliases"""
+        collection = make_collection(tmp_path)
+        dedup = Deduplicator(collection)
+        text = make_text(1)
+        fake_embed.calls = 0
+
+        stored = dedup.index("docs/report.txt", text)
+        first_calls = fake_embed.calls
+        skipped = dedup.index("mail/report-final.txt", "  " + text.upper().replace(" ", "\n"))
+
+        assert stored > 0 and skipped == 0
+        assert fake_embed.calls == first_calls
+        assert set(sources(collection)) == {"docs/report.txt"}
+        for metadata in sources(collection)["docs/report.txt"]:
+            assert get_aliases(metadata) == ["mail/report-final.txt"]
+        assert dedup.aliases == {"mail/report-final.txt": ("docs/report.txt", 1.0)}
+
+    def test_near_copies_become_aliases(self, tmp_path):
+        """Test that a lightly edited copy is detected and an unrelated file is not"""
+        collection = make_collection(tmp_path)
+        dedup = Deduplicator(collection)
+        text = make_text(1)
+
+        dedup.index("v1.txt", text)
+        dedup.index("v1-final.txt", text.replace("word7 ", "word8 ", 1) + " signed")
+        dedup.index("other.txt", make_text(2))
+
+        assert set(sources(collection)) == {"v1.txt", "other.txt"}
+        canonical, similarity = dedup.aliases["v1-final.txt"]
+        assert canonical == "v1.txt"
+        assert similarity >= 0.9
+
+    def test_stale_chunks_of_duplicates_are_removed(self, tmp_path):
+        """Test that chunks stored for a copy by an earlier run are deleted"""
+        collection = make_collection(tmp_path)
+        text = make_text(1)
+        add_chunks(chunk_text(text, "copy.txt"), collection)
+
+        dedup = Deduplicator(collection)
+        dedup.index("original.txt", text)
+        dedup.index("copy.txt", text)
+
+        assert set(sources(collection)) == {"original.txt"}
+
+    def test_report(self, tmp_path):
+        """Test the reported chunks, bytes and time saved"""
+        collection = make_collection(tmp_path)
+        dedup = Deduplicator(collection)
+        text = make_text(1)
+
+        chunks = dedup.index("a.txt", text)
+        dedup.index("b.txt", text)
+        dedup.index("c.txt", text)
+        report = dedup.report()
+
+        assert report["files"] == 3
+        assert report["duplicates"] == 2
+        assert report["chunks_skipped"] == 2 * chunks
+        assert report["bytes_skipped"] == 2 * len(text)
+        assert report["seconds_saved"] > 0
+        assert dedup.format_report().startswith("Skipped 2 duplicate files")
+
+    def test_empty_documents_are_not_duplicates(self, tmp_path):
+        """Test that files without text are never aliased to each other"""
+        dedup = Deduplicator(make_collection(tmp_path))
+
+        assert dedup.index("a.pdf", "") == 0
+        assert dedup.index("b.pdf", "  \n") == 0
+        assert dedup.aliases == {}
+        assert dedup.format_report() == ""
+
+
+def test_normalize_text():
+    """Test that case and whitespace do not affect fingerprints"""
+    assert normalize_text("  Hello\n\tWORLD  ") == "hello world"
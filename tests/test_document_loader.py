@@ -9,11 +9,23 @@ including error handling for missing and malformed files.
 
 import sys
 import os
+import zipfile
 from pathlib import Path
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from document_loader import load_txt, load_pdf, load_docx, load_odt
+from document_loader import iter_docx_text, load_txt, load_pdf, load_docx, load_odt
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+MC = 'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+
+
+def write_zip(path, parts):
+    """Write a zip archive of XML parts"""
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+    return str(path)
 
 
 class TestLoadTxt:
@@ -101,6 +113,67 @@ class TestLoadDocx:
 
         assert result == ""
 
+    def test_load_docx_with_tables_headers_and_footers(self, tmp_path):
+        """Test that paragraphs, table cells, headers and footers are extracted in order"""
+        import docx
+
+        document = docx.Document()
+        document.add_heading("Travel policy", level=1)
+        document.add_paragraph("Flights need approval.")
+        document.add_paragraph("")
+        table = document.add_table(rows=2, cols=2)
+        table.cell(0, 0).text = "Economy"
+        table.cell(0, 1).text = "Under 6 hours"
+        table.cell(1, 0).text = "Business"
+        document.add_paragraph("Hotels are booked centrally.")
+        document.sections[0].header.paragraphs[0].text = "ACME Corp"
+        document.sections[0].footer.paragraphs[0].text = "Confidential"
+        path = tmp_path / "policy.docx"
+        document.save(str(path))
+
+        result = load_docx(str(path))
+
+        assert result == (
+            "Travel policy\nFlights need approval.\n\nEconomy\nUnder 6 hours\nBusiness\n"
+            "Hotels are booked centrally.\nACME Corp\nConfidential"
+        )
+
+    def test_load_docx_footnotes_and_revisions(self, tmp_path):
+        """Test footnotes, tabs and breaks, and that deleted text and fallback copies are skipped"""
+        body = (
+            f'<w:document {W} {MC}><w:body>'
+            "<w:p><w:r><w:t>Total</w:t><w:tab/><w:t>42</w:t><w:br/><w:t>units</w:t></w:r>"
+            "<w:del><w:r><w:delText>removed</w:delText></w:r></w:del></w:p>"
+            "<w:p><w:r><mc:AlternateContent><mc:Choice><w:txbxContent>"
+            "<w:p><w:r><w:t>Text box</w:t></w:r></w:p></w:txbxContent></mc:Choice>"
+            "<mc:Fallback><w:p><w:r><w:t>Text box</w:t></w:r></w:p></mc:Fallback>"
+            "</mc:AlternateContent></w:r></w:p>"
+            "</w:body></w:document>"
+        )
+        footnotes = (
+            f"<w:footnotes {W}>"
+            '<w:footnote w:type="separator"><w:p><w:r><w:separator/></w:r></w:p></w:footnote>'
+            "<w:footnote><w:p><w:r><w:t>Source: </w:t><w:t>2024 report</w:t></w:r></w:p></w:footnote>"
+            "</w:footnotes>"
+        )
+        path = write_zip(
+            tmp_path / "notes.docx", {"word/document.xml": body, "word/footnotes.xml": footnotes}
+        )
+
+        assert list(iter_docx_text(path)) == [
+            "Total\t42\nunits", "Text box", "", "Source: 2024 report"
+        ]
+
+    def test_load_docx_rejects_document_type_declarations(self, tmp_path):
+        """Test that XML with a DTD is refused instead of expanding its entities"""
+        body = (
+            '<!DOCTYPE w:document [<!ENTITY a "aaaaaaaaaa">]>'
+            f"<w:document {W}><w:body><w:p><w:r><w:t>&a;</w:t></w:r></w:p></w:body></w:document>"
+        )
+        path = write_zip(tmp_path / "entities.docx", {"word/document.xml": body})
+
+        assert load_docx(path) == ""
+
 
 class TestLoadOdt:
     """Test suite for ODT file loading"""
@@ -119,6 +192,50 @@ class TestLoadOdt:
 
         assert result == ""
 
+    def test_load_odt_with_tables_notes_and_headers(self, tmp_path):
+        """Test that headings, spacing, table cells, footnotes and headers are extracted"""
+        from odf import style, table, text
+        from odf.opendocument import OpenDocumentText
+
+        document = OpenDocumentText()
+        layout = style.PageLayout(name="Layout")
+        document.automaticstyles.addElement(layout)
+        master = style.MasterPage(name="Standard", pagelayoutname=layout)
+        header = style.Header()
+        header.addElement(text.P(text="ACME Corp"))
+        master.addElement(header)
+        document.masterstyles.addElement(master)
+
+        document.text.addElement(text.H(outlinelevel=1, text="Travel policy"))
+        paragraph = text.P(text="Flights")
+        paragraph.addElement(text.S(c=2))
+        paragraph.addText("need approval.")
+        note = text.Note(noteclass="footnote")
+        note.addElement(text.NoteCitation(text="1"))
+        note_body = text.NoteBody()
+        note_body.addElement(text.P(text="Over 500 EUR."))
+        note.addElement(note_body)
+        paragraph.addElement(note)
+        document.text.addElement(paragraph)
+        rates = table.Table()
+        rates.addElement(table.TableColumn(numbercolumnsrepeated=2))
+        row = table.TableRow()
+        for value in ("Economy", "Under 6 hours"):
+            cell = table.TableCell()
+            cell.addElement(text.P(text=value))
+            row.addElement(cell)
+        rates.addElement(row)
+        document.text.addElement(rates)
+        path = tmp_path / "policy.odt"
+        document.save(str(path))
+
+        result = load_odt(str(path))
+
+        assert result == (
+            "Travel policy\nFlights  need approval.1\nEconomy\nUnder 6 hours\n"
+            "Over 500 EUR.\nACME Corp"
+        )
+
 
 def test_all_loaders_return_strings(tmp_path):
     """Test that all loader functions return string type (even on errors)"""
@@ -0,0 +1,180 @@
+# type: ignore
+
+"""
+Unit tests for embeddings.py
+
+Tests batching, dynamic padding and pooling of the local ONNX embedder (with a
+stand-in ONNX Runtime session, since no model is downloaded in tests), its
+configuration from the environment, and that collections only open with the
+model that embedded them.
+"""
+
+import sys
+import os
+import pickle
+
+import numpy as np
+import onnxruntime
+import pytest
+from tokenizers import Tokenizer, models, pre_tokenizers
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from embeddings import (
+    DEFAULT_MODEL_ID,
+    EmbeddingModelError,
+    LocalEmbeddingFunction,
+    embedding_from_environment,
+    embedding_model_id,
+)
+from vector_store import create_collection
+
+VOCABULARY = ["[PAD]", "[UNK]", "alpha", "beta", "gamma", "delta"]
+
+
+class FakeSession:
+    """Stand-in InferenceSession whose token states are one-hot token IDs"""
+
+    shapes = []
+
+    def __init__(self, model_file, sess_options=None, providers=None):
+        self.threads = sess_options.intra_op_num_threads
+
+    def get_inputs(self):
+        return [type("Input", (), {"name": name}) for name in ("input_ids", "attention_mask")]
+
+    def run(self, outputs, inputs):
+        FakeSession.shapes.append(inputs["input_ids"].shape)
+        return [np.eye(len(VOCABULARY), dtype=np.float32)[inputs["input_ids"]]]
+
+
+def make_model(tmp_path):
+    """Write a word-level tokenizer and a placeholder model file"""
+    vocab = {word: i for i, word in enumerate(VOCABULARY)}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+    (tmp_path / "model.onnx").write_bytes(b"placeholder model")
+    return str(tmp_path)
+
+
+@pytest.fixture
+def embedder(tmp_path, monkeypatch):
+    """A LocalEmbeddingFunction running the stand-in session"""
+    monkeypatch.setattr(onnxruntime, "InferenceSession", FakeSession)
+    FakeSession.shapes = []
+    return LocalEmbeddingFunction(make_model(tmp_path), batch_size=2, threads=3, max_length=4)
+
+
+class TestLocalEmbeddingFunction:
+    """Test cases for LocalEmbeddingFunction"""
+
+    def test_mean_pooled_and_normalized(self, embedder):
+        """Test that vectors average the token states and ignore padding"""
+        alone = embedder(["alpha beta"])[0]
+        padded = embedder(["alpha beta", "gamma gamma gamma delta"])[0]
+
+        expected = np.array([0, 0, 1, 1, 0, 0], dtype=np.float32) / np.sqrt(2)
+        assert np.allclose(alone, expected)
+        assert np.allclose(padded, expected)
+
+    def test_batches_sorted_by_length(self, embedder):
+        """Test that similar lengths share a batch and results keep the input order"""
+        texts = ["alpha alpha alpha", "beta", "gamma gamma gamma", "delta"]
+
+        vectors = embedder(texts)
+
+        assert FakeSession.shapes == [(2, 1), (2, 3)]
+        assert [int(np.argmax(vector)) for vector in vectors] == [2, 3, 4, 5]
+        assert embedder._session.threads == 3
+
+    def test_truncation(self, embedder):
+        """Test that texts longer than max_length are truncated"""
+        embedder(["alpha beta gamma delta alpha beta"])
+
+        assert FakeSession.shapes == [(1, 4)]
+
+    def test_empty_input(self, embedder):
+        """Test that no texts give no vectors without loading the model"""
+        assert embedder([]) == []
+        assert embedder._session is None
+
+    def test_pickles_without_session(self, embedder):
+        """Test that worker processes get the settings but load their own session"""
+        embedder(["alpha"])
+
+        copy = pickle.loads(pickle.dumps(embedder))
+
+        assert copy._session is None and copy.batch_size == 2
+        assert np.allclose(copy(["alpha"])[0], embedder(["alpha"])[0])
+
+
+class TestModelIds:
+    """Test cases for model ids"""
+
+    def test_local_model_is_named_by_content(self, tmp_path):
+        """Test that a local model's id changes with the model file"""
+        folder = make_model(tmp_path)
+        first = LocalEmbeddingFunction(folder).model_id
+        (tmp_path / "quantized.onnx").write_bytes(b"other model")
+
+        other = LocalEmbeddingFunction(str(tmp_path / "quantized.onnx")).model_id
+
+        assert first.startswith("model-") and other.startswith("quantized-")
+        assert first.split("-")[1] != other.split("-")[1]
+
+    def test_default_and_explicit_ids(self):
+        """Test the default model id, explicit ids and names of other embedders"""
+        assert LocalEmbeddingFunction().model_id == DEFAULT_MODEL_ID
+        assert LocalEmbeddingFunction(model_id="e5-small").model_id == "e5-small"
+        default = type("Default", (), {"name": staticmethod(lambda: "default")})()
+        assert embedding_model_id(default) == DEFAULT_MODEL_ID
+
+    def test_from_environment(self, monkeypatch, capsys):
+        """Test that settings come from the environment and invalid ones are ignored"""
+        monkeypatch.setenv("EMBEDDING_BATCH_SIZE", "64")
+        monkeypatch.setenv("EMBEDDING_THREADS", "many")
+        monkeypatch.setenv("EMBEDDING_MODEL_ID", "minilm-int8")
+
+        embedder = embedding_from_environment()
+
+        assert embedder.batch_size == 64 and embedder.threads == 0
+        assert embedder.model_id == "minilm-int8"
+        assert "EMBEDDING_THREADS" in capsys.readouterr().out
+
+
+class TestCollectionModel:
+    """Test cases for the model recorded on collections"""
+
+    @pytest.mark.parametrize("backend", ["chroma", "numpy"])
+    def test_other_model_is_refused(self, tmp_path, backend):
+        """Test that a collection only opens with the model that embedded it"""
+        first = LocalEmbeddingFunction(model_id="first")
+        collection = create_collection(
+            "docs", backend=backend, embedding_function=first, directory=str(tmp_path)
+        )
+        collection.upsert(ids=["a"], documents=["alpha"], embeddings=[[1.0, 0.0]])
+
+        assert collection.metadata["embedding_model"] == "first"
+        with pytest.raises(EmbeddingModelError):
+            create_collection(
+                "docs",
+                backend=backend,
+                embedding_function=LocalEmbeddingFunction(model_id="second"),
+                directory=str(tmp_path),
+            )
+        reopened = create_collection(
+            "docs", backend=backend, embedding_function=first, directory=str(tmp_path)
+        )
+        assert reopened._embedding_function is first
+
+    def test_empty_collection_adopts_model(self, tmp_path):
+        """Test that a collection without chunks switches to the configured model"""
+        options = {"backend": "numpy", "directory": str(tmp_path)}
+        create_collection("docs", embedding_function=LocalEmbeddingFunction(model_id="a"), **options)
+
+        collection = create_collection(
+            "docs", embedding_function=LocalEmbeddingFunction(model_id="b"), **options
+        )
+
+        assert collection.metadata["embedding_model"] == "b"
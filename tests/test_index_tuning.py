@@ -0,0 +1,83 @@
+# type: ignore
+
+"""
+Unit tests for index_tuning.py
+
+Tests exact neighbour search, the recommendation rule and a small end-to-end
+sweep over a sampled collection.
+"""
+
+import sys
+import os
+import uuid
+
+import chromadb
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from index_tuning import exact_neighbours, recommend, sample_embeddings, tune_index
+
+
+def make_collection(count=300, dim=8, seed=0):
+    """In-memory collection filled with random embeddings"""
+    rng = np.random.default_rng(seed)
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(
+        name=f"test-{uuid.uuid4().hex}", embedding_function=None
+    )
+    collection.add(
+        ids=[str(i) for i in range(count)],
+        embeddings=rng.standard_normal((count, dim)).astype(np.float32),
+    )
+    return collection
+
+
+def test_exact_neighbours_spaces():
+    """Test that exact search ranks by the collection's distance"""
+    corpus = np.array([[1.0, 0.0], [10.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    query = np.array([[2.0, 0.0]], dtype=np.float32)
+
+    assert exact_neighbours(corpus, query, 2, "l2").tolist() == [[0, 2]]
+    assert exact_neighbours(corpus, query, 1, "ip").tolist() == [[1]]
+    assert exact_neighbours(corpus, query, 3, "cosine")[0, 2] == 2
+
+
+def test_recommend_prefers_fastest_passing_setting():
+    """Test that the lowest p95 meeting the target wins, else the best recall"""
+    results = [
+        {"recall": 0.99, "p95_ms": 3.0, "build_s": 1.0},
+        {"recall": 0.96, "p95_ms": 1.0, "build_s": 1.0},
+        {"recall": 0.80, "p95_ms": 0.5, "build_s": 1.0},
+    ]
+
+    assert recommend(results, 0.95) is results[1]
+    assert recommend(results, 0.999) is results[0]
+    assert recommend([], 0.95) is None
+
+
+def test_sample_embeddings_limits_size():
+    """Test that sampling returns at most the requested number of vectors"""
+    collection = make_collection()
+
+    assert sample_embeddings(collection, 50).shape == (50, 8)
+    assert sample_embeddings(collection, 1000).shape == (300, 8)
+
+
+def test_tune_index_sweeps_grid():
+    """Test that every grid combination is measured and one is recommended"""
+    collection = make_collection()
+    seen = []
+
+    report = tune_index(
+        collection,
+        n_queries=20,
+        k=5,
+        grid={"max_neighbors": (8,), "ef_construction": (32,), "ef_search": (5, 50)},
+        progress=seen.append,
+    )
+
+    assert len(report["results"]) == 2 == len(seen)
+    assert report["sample"] == 280
+    assert report["recommended"] in report["results"]
+    assert report["results"][1]["recall"] >= report["results"][0]["recall"]
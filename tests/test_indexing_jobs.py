@@ -0,0 +1,161 @@
+# type: ignore
+
+"""
+Unit tests for indexing_jobs.py
+
+Tests job keys, background indexing with progress reporting, searching while a
+job runs, and sessions sharing one job per folder.
+"""
+
+import sys
+import os
+import threading
+import uuid
+
+import chromadb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from indexing_jobs import (
+    DONE,
+    RUNNING,
+    IndexingJob,
+    folder_key,
+    format_status,
+    get_job,
+    start_indexing,
+    zip_key,
+)
+
+
+class FakeEmbeddingFunction(chromadb.EmbeddingFunction):
+    """Deterministic offline embedder"""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[float(len(text)), float(text.count("a")), 1.0] for text in input]
+
+    @staticmethod
+    def name():
+        return "fake"
+
+
+class GatedEmbeddingFunction(FakeEmbeddingFunction):
+    """Fake embedder that blocks after the first file until released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.first_done = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, input):
+        self.calls += 1
+        if self.calls > 1:
+            self.first_done.set()
+            self.release.wait(5)
+        return super().__call__(input)
+
+
+def make_files(tmp_path, count=3):
+    """Write small text files and return their paths"""
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    files = []
+    for i in range(count):
+        path = folder / f"file_{i}.txt"
+        path.write_text(f"document number {i}", encoding="utf-8")
+        files.append(str(path))
+    return files
+
+
+def job_options(tmp_path, embedding_function):
+    """Keep the store and path index inside the test's folder"""
+    return {
+        "backend": "numpy",
+        "directory": str(tmp_path / "store"),
+        "embedding_function": embedding_function,
+        "path_index_dir": str(tmp_path / "path_index"),
+    }
+
+
+class TestJobKeys:
+    """Test cases for folder_key and zip_key"""
+
+    def test_folder_key_normalizes_path(self, tmp_path):
+        """Test that different spellings of one folder share a key"""
+        assert folder_key(str(tmp_path)) == folder_key(str(tmp_path / "docs" / ".."))
+
+    def test_zip_key_uses_contents(self):
+        """Test that ZIP keys depend on the contents only"""
+        assert zip_key(b"same") == zip_key(b"same")
+        assert zip_key(b"same") != zip_key(b"other")
+
+
+class TestIndexingJob:
+    """Test cases for IndexingJob"""
+
+    def test_indexes_files_in_background(self, tmp_path):
+        """Test that a job indexes every file and builds the path index"""
+        files = make_files(tmp_path) + [str(tmp_path / "docs" / "image.png")]
+        job = IndexingJob(
+            "folder:test", "docs", files, **job_options(tmp_path, FakeEmbeddingFunction())
+        ).start()
+
+        assert job.wait(5)
+        status = job.status()
+        assert status["state"] == DONE
+        assert status["files_done"] == status["files_total"] == 4
+        assert status["chunks"] == 3
+        assert status["eta_seconds"] == 0.0
+        assert len(status["errors"]) == 1 and "not supported" in status["errors"][0]
+        assert job.collection.count() == 3
+        assert len(job.path_index) == 4
+        assert "4/4 files, 3 chunks" in format_status(status)
+
+    def test_progress_and_search_while_running(self, tmp_path):
+        """Test that progress and already indexed chunks are visible mid-job"""
+        files = make_files(tmp_path)
+        embedder = GatedEmbeddingFunction()
+        job = IndexingJob(
+            "folder:test", "docs", files, **job_options(tmp_path, embedder)
+        ).start()
+        try:
+            assert embedder.first_done.wait(5)
+            status = job.status()
+            assert status["state"] == RUNNING
+            assert status["files_done"] == 1
+            assert status["eta_seconds"] is not None
+            assert job.collection.count() == 1
+            assert job.path_index is None
+        finally:
+            embedder.release.set()
+        assert job.wait(5)
+        assert job.collection.count() == 3
+
+
+class TestStartIndexing:
+    """Test cases for the per-process job registry"""
+
+    def test_sessions_share_running_job(self, tmp_path):
+        """Test that loading the same folder attaches to the running job"""
+        files = make_files(tmp_path)
+        embedder = GatedEmbeddingFunction()
+        key = f"folder:{uuid.uuid4()}"
+        options = job_options(tmp_path, embedder)
+
+        first = start_indexing(key, "docs", files, **options)
+        try:
+            second = start_indexing(key, "docs", files, **options)
+            assert second is first
+            assert get_job(key) is first
+        finally:
+            embedder.release.set()
+        assert first.wait(5)
+
+        # A finished job is replaced, re-indexing the folder
+        third = start_indexing(key, "docs", files, **job_options(tmp_path, FakeEmbeddingFunction()))
+        assert third is not first
+        assert third.wait(5)
+        assert third.collection.count() == 3
@@ -0,0 +1,300 @@
+# type: ignore
+
+"""
+Unit tests for llm_client.py
+
+Tests the token bucket, retries with backoff, the concurrency cap and request
+coalescing against a local fake LLM that injects rate-limit errors, and that
+generate_answer raises LLMError instead of exiting.
+"""
+
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from llm_client import (
+    LLMClient,
+    LLMError,
+    TokenBucket,
+    client_from_environment,
+    is_retryable,
+    retry_after,
+)
+from response_generator import generate_answer, wrap_llm
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+class RateLimited(Exception):
+    """Error shaped like google.api_core's ResourceExhausted"""
+
+    code = 429
+
+
+class BadRequest(Exception):
+    """Error shaped like google.api_core's InvalidArgument"""
+
+    code = 400
+
+
+class FakeLLM:
+    """Local model that fails its first calls and can hold calls open"""
+
+    def __init__(self, failures=0, error=RateLimited, gate=None):
+        self.failures = failures
+        self.error = error
+        self.gate = gate
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, prompt):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            fail = self.calls <= self.failures
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            else:
+                time.sleep(0.01)
+            if fail:
+                raise self.error("429 Resource has been exhausted (e.g. check quota).")
+            return f"answer to {prompt}"
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class FakeClock:
+    """Clock that only advances when sleep is called"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_client(llm, clock=None, **options):
+    """Return a client that never really sleeps"""
+    clock = clock or FakeClock()
+    options = {"requests_per_minute": None, "tokens_per_minute": None, **options}
+    return LLMClient(llm, clock=clock, sleep=clock.sleep, **options)
+
+
+class TestTokenBucket:
+    """Test cases for TokenBucket"""
+
+    def test_waits_for_refill(self):
+        """Test that a burst beyond the capacity waits for the refill rate"""
+        clock = FakeClock()
+        bucket = TokenBucket(60, capacity=2, clock=clock, sleep=clock.sleep)
+
+        waits = [bucket.acquire() for _ in range(4)]
+
+        assert waits[:2] == [0.0, 0.0]
+        assert waits[2] == pytest.approx(1.0)
+        assert waits[3] == pytest.approx(1.0)
+
+    def test_large_requests_are_capped(self):
+        """Test that a request larger than the bucket waits for a full bucket"""
+        clock = FakeClock()
+        bucket = TokenBucket(600, clock=clock, sleep=clock.sleep)
+
+        assert bucket.acquire(10_000) == 0.0
+        assert bucket.acquire(600) == pytest.approx(60.0)
+
+
+class TestRetries:
+    """Test cases for retrying failed calls"""
+
+    def test_rate_limits_are_retried(self):
+        """Test that 429s are retried with growing, jittered backoff"""
+        clock = FakeClock()
+        llm = FakeLLM(failures=3)
+        client = make_client(llm, clock, base_delay=1.0, max_delay=10.0)
+
+        answer = client.invoke("question")
+
+        assert answer == "answer to question"
+        assert llm.calls == 4
+        for attempt, seconds in enumerate(clock.sleeps):
+            assert 0.5 * 2**attempt <= seconds <= 2**attempt
+
+    def test_gives_up_after_max_retries(self):
+        """Test that persistent rate limits raise LLMError"""
+        llm = FakeLLM(failures=100)
+        client = make_client(llm, max_retries=2)
+
+        with pytest.raises(LLMError, match="rate limit"):
+            client.invoke("question")
+        assert llm.calls == 3
+
+    def test_other_errors_fail_fast(self):
+        """Test that a non-retryable error is not retried"""
+        llm = FakeLLM(failures=1, error=BadRequest)
+        client = make_client(llm)
+
+        with pytest.raises(LLMError):
+            client.invoke("question")
+        assert llm.calls == 1
+
+    def test_retry_hint_is_honoured(self):
+        """Test that the server's retry delay replaces the backoff"""
+        error = RateLimited("429 Please retry in 7.5s.")
+
+        assert retry_after(error) == 7.5
+        assert make_client(FakeLLM()).backoff(0, error) == 7.5
+
+    def test_error_classification(self):
+        """Test which errors are worth retrying"""
+        assert is_retryable(RateLimited("quota"))
+        assert is_retryable(TimeoutError())
+        assert is_retryable(Exception("503 Service Unavailable"))
+        assert not is_retryable(BadRequest("API key not valid"))
+
+    def test_requests_per_minute(self):
+        """Test that calls beyond the request quota are delayed"""
+        clock = FakeClock()
+        client = make_client(FakeLLM(), clock, requests_per_minute=2)
+
+        for number in range(3):
+            client.invoke(f"question {number}")
+
+        assert clock.sleeps == [pytest.approx(30.0)]
+
+
+class TestConcurrency:
+    """Test cases for the concurrency cap and request coalescing"""
+
+    def run_threads(self, client, prompts):
+        """Invoke the client from one thread per prompt and collect the answers"""
+        answers = [None] * len(prompts)
+
+        def ask(index):
+            answers[index] = client.invoke(prompts[index])
+
+        threads = [threading.Thread(target=ask, args=(i,)) for i in range(len(prompts))]
+        for thread in threads:
+            thread.start()
+        return threads, answers
+
+    def test_identical_prompts_share_one_call(self):
+        """Test that concurrent duplicate prompts are coalesced"""
+        gate = threading.Event()
+        llm = FakeLLM(gate=gate)
+        client = make_client(llm)
+
+        threads, answers = self.run_threads(client, ["same question"] * 5)
+        while not client._in_flight:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+        assert llm.calls == 1
+        assert answers == ["answer to same question"] * 5
+        assert not client._in_flight
+
+    def test_coalesced_callers_share_the_error(self):
+        """Test that waiting duplicates get the leader's LLMError"""
+        gate = threading.Event()
+        llm = FakeLLM(failures=1, error=BadRequest, gate=gate)
+        client = make_client(llm)
+        errors = []
+
+        def ask():
+            try:
+                client.invoke("same question")
+            except LLMError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=ask) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+        assert llm.calls == 1
+        assert len(errors) == 3
+
+    def test_concurrency_cap(self):
+        """Test that no more than max_concurrency calls run at once"""
+        llm = FakeLLM()
+        client = make_client(llm, max_concurrency=2)
+
+        threads, answers = self.run_threads(client, [f"question {i}" for i in range(8)])
+        for thread in threads:
+            thread.join()
+
+        assert llm.calls == 8
+        assert llm.max_active == 2
+        assert all(answers)
+
+
+def test_client_from_environment(monkeypatch):
+    """Test that limits are read from the environment"""
+    monkeypatch.setenv("LLM_REQUESTS_PER_MINUTE", "0")
+    monkeypatch.setenv("LLM_MAX_RETRIES", "1")
+    monkeypatch.delenv("LLM_TOKENS_PER_MINUTE", raising=False)
+    monkeypatch.delenv("LLM_MAX_CONCURRENCY", raising=False)
+
+    client = client_from_environment(FakeLLM())
+
+    assert client.requests is None
+    assert client.tokens is not None
+    assert client.max_retries == 1
+
+
+def test_generate_answer_raises_instead_of_exiting(monkeypatch):
+    """Test that a failing model raises LLMError rather than SystemExit"""
+    monkeypatch.chdir(ROOT)
+    client = make_client(FakeLLM(failures=100), max_retries=1)
+    results = {"documents": [["text"]], "metadatas": [[{"source": "a.txt"}]]}
+
+    with pytest.raises(LLMError, match="rate limit"):
+        generate_answer(client, "question", results, [])
+
+
+def test_generate_answer_with_client(monkeypatch):
+    """Test that the prompt is rendered and sent through the client"""
+    monkeypatch.chdir(ROOT)
+    llm = FakeLLM(failures=1)
+    results = {"documents": [["the report is due friday"]], "metadatas": [[{"source": "a.txt"}]]}
+
+    answer = generate_answer(make_client(llm), "when is it due?", results, [])
+
+    assert llm.calls == 2
+    assert "the report is due friday" in answer
+    assert "when is it due?" in answer
+
+
+def test_bare_model_gets_one_client(monkeypatch):
+    """Test that a bare model is wrapped in the same client on every question"""
+    monkeypatch.chdir(ROOT)
+    llm = FakeLLM()
+    results = {"documents": [["text"]], "metadatas": [[{"source": "a.txt"}]]}
+
+    generate_answer(llm, "first question", results, [])
+    client = wrap_llm(llm)
+    generate_answer(llm, "second question", results, [])
+
+    assert wrap_llm(llm) is client
+    assert wrap_llm(client) is client
+    assert client.llm is llm and llm.calls == 2
@@ -0,0 +1,213 @@
+# type: ignore
+
+"""
+Unit tests for maintenance.py
+
+Tests listing collections with their source folders, deleting collections of
+removed folders, purging chunks of removed files and compacting the store.
+"""
+
+import sys
+import os
+
+import chromadb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import maintenance
+from manage import main
+from path_index import PathIndex, path_index_file
+from vector_store import add_alias, add_chunks, chunk_text, create_collection
+
+
+class FakeEmbeddingFunction(chromadb.EmbeddingFunction):
+    """Deterministic offline embedder"""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[float(len(text)), float(text.count("a")), 1.0] for text in input]
+
+    @staticmethod
+    def name():
+        return "fake"
+
+
+def make_folder(tmp_path, name, files):
+    """Create a folder of text files and return it with the file paths"""
+    folder = tmp_path / name
+    folder.mkdir()
+    paths = []
+    for filename in files:
+        (folder / filename).write_text(f"contents of {filename}", encoding="utf-8")
+        paths.append(str(folder / filename))
+    return folder, paths
+
+
+def index(folder, paths, store, backend):
+    """Index files into a folder's collection and path index"""
+    collection = create_collection(
+        str(folder),
+        backend=backend,
+        embedding_function=FakeEmbeddingFunction(),
+        directory=str(store),
+    )
+    for path in paths:
+        add_chunks(chunk_text(f"contents of {os.path.basename(path)}", path), collection)
+    index_file = path_index_file(collection.name, str(store / "path_index"))
+    PathIndex.from_files(paths).save(index_file)
+    return collection, index_file
+
+
+def sources(collection):
+    """Return the indexed file paths"""
+    return {m["source"] for m in collection.get(include=["metadatas"])["metadatas"]}
+
+
+class TestListCollections:
+    """Test cases for list_collections"""
+
+    def test_reports_both_backends(self, tmp_path):
+        """Test that collections of both backends are listed with their source"""
+        store = tmp_path / "store"
+        folder, paths = make_folder(tmp_path, "docs", ["a.txt", "b.txt"])
+        name = index(folder, paths, store, "chroma")[0].name
+        index(folder, paths[:1], store, "numpy")
+        create_collection("upload.zip", backend="numpy", directory=str(store))
+
+        rows = {(r["backend"], r["name"]): r for r in maintenance.list_collections(str(store))}
+
+        chroma = rows[("chroma", name)]
+        assert chroma["chunks"] == 2 and chroma["bytes"] > 0
+        assert chroma["path"] == str(folder) and chroma["folder"]
+        assert not chroma["missing"] and chroma["last_used"]
+        assert rows[("numpy", name)]["chunks"] == 1
+        assert rows[("numpy", "upload.zip")]["folder"] is False
+
+
+class TestCleanup:
+    """Test cases for cleanup and compact"""
+
+    def test_deletes_collections_of_removed_folders(self, tmp_path):
+        """Test that a removed folder's collection and path index are deleted"""
+        store = tmp_path / "store"
+        gone, gone_paths = make_folder(tmp_path, "gone", ["a.txt"])
+        kept, kept_paths = make_folder(tmp_path, "kept", ["b.txt"])
+        gone_collection, gone_index = index(gone, gone_paths, store, "chroma")
+        kept_collection, _ = index(kept, kept_paths, store, "numpy")
+        create_collection("upload.zip", backend="numpy", directory=str(store))
+        for path in gone_paths:
+            os.remove(path)
+        os.rmdir(gone)
+
+        dry_run = maintenance.cleanup(str(store), dry_run=True)
+        assert [row["name"] for row in dry_run["collections"]] == [gone_collection.name]
+        assert len(maintenance.list_collections(str(store))) == 3
+
+        maintenance.cleanup(str(store))
+
+        names = sorted(row["name"] for row in maintenance.list_collections(str(store)))
+        assert names == sorted([kept_collection.name, "upload.zip"])
+        assert not os.path.exists(gone_index)
+
+    def test_purges_chunks_of_removed_files(self, tmp_path):
+        """Test that chunks of deleted files go and files with a surviving copy stay"""
+        store = tmp_path / "store"
+        folder, paths = make_folder(tmp_path, "docs", ["a.txt", "b.txt", "c.txt", "copy.txt"])
+        collection, index_file = index(folder, paths[:3], store, "numpy")
+        add_alias(collection, paths[2], paths[3])
+        for path in paths[1:3]:
+            os.remove(path)
+
+        report = maintenance.cleanup(str(store))
+
+        assert report["files"] == [(collection.name, 1, 1)]
+        assert sources(collection) == {paths[0], paths[2]}
+        assert paths[1] not in PathIndex.load(index_file)
+
+    def test_relative_sources_resolve_against_indexing_directory(self, tmp_path, monkeypatch):
+        """Test that cleanup run from another directory only purges files really deleted"""
+        store = tmp_path / "store"
+        project, elsewhere = tmp_path / "project", tmp_path / "elsewhere"
+        project.mkdir()
+        elsewhere.mkdir()
+        monkeypatch.chdir(project)
+        make_folder(project, "docs", ["a.txt", "b.txt"])
+        index(
+            "docs",
+            [os.path.join("docs", name) for name in ("a.txt", "b.txt")],
+            store,
+            "numpy",
+        )
+
+        monkeypatch.chdir(elsewhere)
+        assert maintenance.cleanup(str(store), dry_run=True)["files"] == []
+
+        os.remove(project / "docs" / "b.txt")
+        report = maintenance.cleanup(str(store), dry_run=True)
+        assert [(files, chunks) for _, files, chunks in report["files"]] == [(1, 1)]
+
+    def test_relative_sources_without_directory_are_kept(self, tmp_path, monkeypatch):
+        """Test that relative sources of collections without a recorded directory are skipped"""
+        store = tmp_path / "store"
+        monkeypatch.chdir(tmp_path)
+        make_folder(tmp_path, "docs", ["a.txt"])
+        collection, _ = index("docs", [os.path.join("docs", "a.txt")], store, "numpy")
+        os.remove(tmp_path / "docs" / "a.txt")
+
+        assert maintenance.find_missing_files(collection) == {}
+        assert maintenance.find_missing_files(collection, base_directory=str(tmp_path)) == {
+            "docs/a.txt": 1
+        }
+
+    def test_compact_drops_deleted_rows(self, tmp_path):
+        """Test that compaction shrinks a NumPy collection and keeps its chunks readable"""
+        store = tmp_path / "store"
+        folder, paths = make_folder(tmp_path, "docs", [f"{i}.txt" for i in range(20)])
+        collection, _ = index(folder, paths, store, "numpy")
+        collection.delete(where={"source": {"$in": paths[:15]}})
+
+        report = maintenance.compact(str(store))
+
+        assert report["rows"] == 15 and report["after"] < report["before"]
+        reopened = create_collection(
+            str(folder),
+            backend="numpy",
+            embedding_function=FakeEmbeddingFunction(),
+            directory=str(store),
+        )
+        stored = reopened.get(include=["documents", "metadatas"])
+        assert sorted(m["source"] for m in stored["metadatas"]) == sorted(paths[15:])
+        assert sorted(stored["documents"]) == sorted(f"contents of {i}.txt" for i in range(15, 20))
+        results = reopened.query(query_embeddings=[[14.0, 0.0, 1.0]], n_results=1)
+        assert results["ids"][0]
+        reopened.upsert(ids=["new"], embeddings=[[1.0, 0.0, 0.0]], documents=["new chunk"])
+        assert reopened.count() == 6
+        assert reopened.get(ids=["new"], include=["documents"])["documents"] == ["new chunk"]
+
+    def test_compact_removes_files_of_deleted_chroma_collections(self, tmp_path):
+        """Test that index folders Chroma leaves behind for deleted collections are removed"""
+        store = tmp_path / "store"
+        folder, paths = make_folder(tmp_path, "docs", ["a.txt"])
+        collection, _ = index(folder, paths, store, "chroma")
+        segments = {name for name in os.listdir(store) if name.count("-") == 4}
+        assert segments
+        maintenance.delete_collection(collection.name, "chroma", str(store))
+
+        maintenance.compact(str(store))
+
+        assert not segments & set(os.listdir(store))
+
+
+def test_stats_command(tmp_path, capsys):
+    """Test that manage.py stats prints one line per collection"""
+    store = tmp_path / "store"
+    folder, paths = make_folder(tmp_path, "docs", ["a.txt"])
+    collection, _ = index(folder, paths, store, "numpy")
+
+    assert main(["stats", "--directory", str(store)]) == 0
+
+    output = capsys.readouterr().out
+    assert collection.name in output and str(folder) in output
+    assert "1 collections" in output
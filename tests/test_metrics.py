@@ -0,0 +1,205 @@
+# type: ignore
+
+"""
+Unit tests for metrics.py
+
+Tests disabled no-op recording, spans, counters and per-thread traces, the
+Prometheus and JSON exports, configuration from the environment and the stages
+recorded by the indexing and retrieval pipeline.
+"""
+
+import sys
+import os
+import json
+import threading
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from metrics import Metrics, format_breakdown, metrics
+from numpy_backend import NumpyCollection
+from retrieval_cache import RetrievalCache
+from retrieval_system import query_documents
+from vector_store import add_chunks, chunk_text
+
+
+def fake_embed(texts):
+    """Deterministic offline embedder"""
+    return [[float(len(text)), float(text.count("e")), 1.0] for text in texts]
+
+
+@pytest.fixture
+def enabled_metrics(monkeypatch):
+    """Enable the process-wide registry for one test"""
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+class TestRecording:
+    """Test cases for spans, counters and traces"""
+
+    def test_disabled_records_nothing(self):
+        """Test that a disabled registry returns a shared no-op span"""
+        registry = Metrics()
+
+        with registry.span("embed") as first, registry.span("upsert") as second:
+            registry.count("chunks", 3)
+
+        assert first is second
+        assert registry.snapshot() == {"enabled": False, "timers": {}, "counters": {}}
+
+    def test_spans_and_counters(self):
+        """Test that spans accumulate per stage and counters add up"""
+        registry = Metrics(enabled=True)
+
+        for _ in range(3):
+            with registry.span("embed"):
+                pass
+        registry.count("chunks", 5)
+        registry.count("chunks", 2)
+
+        snapshot = registry.snapshot()
+        assert snapshot["timers"]["embed"]["count"] == 3
+        assert snapshot["timers"]["embed"]["max_ms"] >= snapshot["timers"]["embed"]["mean_ms"]
+        assert snapshot["counters"] == {"chunks": 7}
+
+    def test_timed_decorator(self):
+        """Test that decorated functions are timed only while enabled"""
+        registry = Metrics()
+
+        @registry.timed("chunk")
+        def double(value):
+            return value * 2
+
+        assert double(2) == 4
+        registry.enabled = True
+        assert double(3) == 6
+
+        assert registry.snapshot()["timers"]["chunk"]["count"] == 1
+        assert double.__name__ == "double"
+
+    def test_trace_is_per_thread(self):
+        """Test that a trace only collects spans from its own thread"""
+        registry = Metrics(enabled=True)
+
+        def other_thread():
+            with registry.span("background"):
+                pass
+
+        with registry.trace() as trace:
+            with registry.span("retrieve"):
+                with registry.span("embed_query"):
+                    pass
+            thread = threading.Thread(target=other_thread)
+            thread.start()
+            thread.join()
+            with registry.span("llm"):
+                pass
+
+        stages = [entry["stage"] for entry in trace.breakdown()]
+        assert stages == ["retrieve", "embed_query", "llm"]
+        assert trace.seconds is not None
+        assert format_breakdown(trace).startswith("retrieve ")
+        assert "background" in registry.snapshot()["timers"]
+
+
+class TestExport:
+    """Test cases for the Prometheus, JSON and text exports"""
+
+    def make_registry(self):
+        """Return a registry with one stage and one counter"""
+        registry = Metrics(enabled=True)
+        registry.observe("embed", 0.5)
+        registry.count("chunks", 4)
+        return registry
+
+    def test_prometheus_text(self):
+        """Test the Prometheus exposition format"""
+        text = self.make_registry().to_prometheus()
+
+        assert "# TYPE docchat_stage_seconds summary" in text
+        assert 'docchat_stage_seconds_sum{stage="embed"} 0.500000' in text
+        assert 'docchat_stage_seconds_count{stage="embed"} 1' in text
+        assert 'docchat_events_total{name="chunks"} 4' in text
+
+    def test_write_json(self, tmp_path):
+        """Test that totals are written as JSON"""
+        filepath = tmp_path / "metrics.json"
+
+        self.make_registry().write_json(str(filepath))
+
+        data = json.loads(filepath.read_text(encoding="utf-8"))
+        assert data["timers"]["embed"]["count"] == 1
+        assert data["counters"]["chunks"] == 4
+
+    def test_serve_prometheus(self):
+        """Test that the endpoint serves the current totals"""
+        registry = self.make_registry()
+        server = registry.serve_prometheus(0)
+        try:
+            assert registry.serve_prometheus(0) is server
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+                body = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert 'docchat_events_total{name="chunks"} 4' in body
+
+    def test_format(self):
+        """Test the human-readable report"""
+        report = self.make_registry().format()
+
+        assert report.splitlines()[0].startswith("embed: 1 calls, 0.50 s total")
+        assert report.splitlines()[1] == "chunks: 4"
+
+    def test_configure_from_environment(self, monkeypatch):
+        """Test that METRICS_ENABLED switches recording on and off"""
+        registry = Metrics()
+        monkeypatch.setenv("METRICS_ENABLED", "true")
+        monkeypatch.delenv("METRICS_PORT", raising=False)
+        monkeypatch.delenv("METRICS_FILE", raising=False)
+
+        registry.configure()
+        assert registry.enabled
+
+        monkeypatch.setenv("METRICS_ENABLED", "false")
+        registry.configure()
+        assert not registry.enabled
+
+
+class TestPipelineStages:
+    """Test cases for the stages recorded by indexing and retrieval"""
+
+    def test_indexing_stages(self, tmp_path, enabled_metrics):
+        """Test that chunking, embedding and upserting are timed and counted"""
+        collection = NumpyCollection(str(tmp_path / "store"), "test", embedding_function=fake_embed)
+
+        add_chunks(chunk_text("some text to index", "notes.txt"), collection)
+
+        snapshot = enabled_metrics.snapshot()
+        assert {"chunk", "embed", "upsert"} <= set(snapshot["timers"])
+        assert snapshot["counters"]["files"] == 1
+        assert snapshot["counters"]["chunks"] == 1
+        assert snapshot["counters"]["document_tokens"] > 0
+
+    def test_retrieval_stages(self, tmp_path, enabled_metrics):
+        """Test that retrieval, query embedding and cache lookups are recorded"""
+        collection = NumpyCollection(str(tmp_path / "store"), "test", embedding_function=fake_embed)
+        add_chunks(chunk_text("some text to index", "notes.txt"), collection)
+        cache = RetrievalCache()
+
+        with enabled_metrics.trace() as trace:
+            query_documents(collection, "what text?", n_results=1, cache=cache)
+            query_documents(collection, "what text?", n_results=1, cache=cache)
+
+        counters = enabled_metrics.snapshot()["counters"]
+        assert counters["cache_misses"] == 1
+        assert counters["cache_hits"] == 1
+        assert [entry["stage"] for entry in trace.breakdown()] == ["retrieve", "embed_query"]
+        assert trace.breakdown()[0]["calls"] == 2
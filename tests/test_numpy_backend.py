@@ -0,0 +1,262 @@
+# type: ignore
+
+"""
+Unit tests for numpy_backend.py
+
+Tests the memory-mapped NumPy collection: writes, top-k queries, metadata
+filters, deletes, visibility of writes to other handles on the same files and
+compressed (int8/PCA) storage.
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import vector_store
+from numpy_backend import NumpyCollection, matches_where
+from retrieval_system import query_documents
+from vector_store import add_chunks, chunk_text, create_collection, optimize_collection
+
+
+def fake_embed(texts):
+    """Deterministic 3-dimensional embedding from simple text statistics"""
+    return [[float(len(t)), float(t.count("a")), 1.0] for t in texts]
+
+
+def make_collection(tmp_path, **kwargs):
+    return NumpyCollection(str(tmp_path / "store"), "test", embedding_function=fake_embed, **kwargs)
+
+
+class TestNumpyCollection:
+    """Test suite for the NumPy collection API"""
+
+    def test_upsert_and_get(self, tmp_path):
+        """Test that records are stored and fetched by ID"""
+        collection = make_collection(tmp_path)
+        collection.upsert(
+            ids=["a", "b"], documents=["one", "two"], metadatas=[{"n": 1}, {"n": 2}]
+        )
+
+        result = collection.get(ids=["b", "missing"])
+
+        assert collection.count() == 2
+        assert result["ids"] == ["b"]
+        assert result["documents"] == ["two"]
+        assert result["metadatas"] == [{"n": 2}]
+
+    def test_upsert_overwrites_existing_ids(self, tmp_path):
+        """Test that upserting an existing ID replaces it in place"""
+        collection = make_collection(tmp_path)
+        collection.upsert(ids=["a"], documents=["old"], metadatas=[{"v": 1}])
+        collection.upsert(ids=["a"], documents=["new"], metadatas=[{"v": 2}])
+
+        assert collection.count() == 1
+        assert collection.get(ids=["a"])["documents"] == ["new"]
+
+    def test_query_returns_nearest_first(self, tmp_path):
+        """Test top-k ordering and cosine distances"""
+        collection = make_collection(tmp_path)
+        collection.upsert(
+            ids=["x", "y", "z"],
+            documents=["x", "y", "z"],
+            embeddings=[[1, 0, 0], [0, 1, 0], [1, 1, 0]],
+        )
+
+        result = collection.query(query_embeddings=[[1, 0.1, 0]], n_results=2)
+
+        assert result["ids"] == [["x", "z"]]
+        assert result["distances"][0][0] == pytest.approx(1 - 1 / np.sqrt(1.01), abs=1e-4)
+
+    def test_query_with_where_filter(self, tmp_path):
+        """Test that metadata filters restrict the candidates"""
+        collection = make_collection(tmp_path)
+        collection.upsert(
+            ids=["x", "y"],
+            documents=["x", "y"],
+            metadatas=[{"source": "a.txt"}, {"source": "b.txt"}],
+            embeddings=[[1, 0, 0], [0, 1, 0]],
+        )
+
+        result = collection.query(
+            query_embeddings=[[1, 0, 0]], n_results=5, where={"source": "b.txt"}
+        )
+
+        assert result["ids"] == [["y"]]
+
+    def test_delete_hides_records(self, tmp_path):
+        """Test that deleted records are excluded from reads and queries"""
+        collection = make_collection(tmp_path)
+        collection.upsert(
+            ids=["x", "y"], documents=["x", "y"], metadatas=[{"s": 1}, {"s": 2}]
+        )
+
+        collection.delete(where={"s": 1})
+
+        assert collection.count() == 1
+        assert collection.get()["ids"] == ["y"]
+        assert collection.query(query_texts=["x"], n_results=5)["ids"] == [["y"]]
+
+    def test_writes_visible_to_other_handles(self, tmp_path):
+        """Test that a second handle on the same files sees new rows"""
+        writer = make_collection(tmp_path)
+        reader = make_collection(tmp_path)
+
+        writer.upsert(ids=["a"], documents=["aaa"])
+
+        assert reader.count() == 1
+        assert reader.get(ids=["a"])["documents"] == ["aaa"]
+
+    def test_interrupted_append_is_discarded(self, tmp_path):
+        """Test that rows a crashed write left half-written do not shift later rows"""
+        collection = make_collection(tmp_path)
+        collection.upsert(ids=["a", "b"], documents=["one", "two"], metadatas=[{"n": 1}, {"n": 2}])
+        # A write that stopped before committing its row to alive.bin
+        store = tmp_path / "store"
+        for filename, data in (
+            ("documents.idx", b"\x00" * 16),
+            ("metadatas.idx", b"\x00" * 8),
+            ("embeddings.bin", b"\x00" * 12),
+            ("ids.txt", b"\nlost"),
+        ):
+            with open(store / filename, "ab") as file:
+                file.write(data)
+
+        reopened = make_collection(tmp_path)
+        assert reopened.count() == 2
+        reopened.upsert(ids=["c"], documents=["three"], metadatas=[{"n": 3}])
+
+        result = make_collection(tmp_path).get()
+        assert result["ids"] == ["a", "b", "c"]
+        assert result["documents"] == ["one", "two", "three"]
+        assert result["metadatas"] == [{"n": 1}, {"n": 2}, {"n": 3}]
+        nearest = make_collection(tmp_path).query(query_embeddings=fake_embed(["three"]), n_results=1)
+        assert nearest["ids"] == [["c"]]
+
+    def test_reopen_keeps_metadata(self, tmp_path):
+        """Test that collection metadata survives reopening"""
+        collection = make_collection(tmp_path, metadata={"chunk_format": 3})
+        collection.modify(metadata={"chunk_format": 3, "extra": True})
+
+        reopened = make_collection(tmp_path)
+
+        assert reopened.metadata == {"chunk_format": 3, "extra": True}
+        assert reopened.id == collection.id
+
+    def test_empty_collection_query(self, tmp_path):
+        """Test that querying an empty collection returns empty results"""
+        collection = make_collection(tmp_path)
+
+        result = collection.query(query_embeddings=[[1, 0, 0]], n_results=3)
+
+        assert result["ids"] == [[]]
+
+
+def clustered_vectors(count=400, dim=16, seed=0):
+    """Unit vectors near an 8-dimensional subspace"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, 8)) @ rng.standard_normal((8, dim))
+    vectors += 0.05 * rng.standard_normal((count, dim))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(collection, vectors):
+    ids = [str(i) for i in range(len(vectors))]
+    collection.upsert(ids=ids, embeddings=vectors, documents=ids)
+
+
+class TestCompression:
+    """Test suite for compressed storage"""
+
+    def test_int8_pca_storage(self, tmp_path):
+        """Test that fitting shrinks stored vectors and keeps nearest neighbours"""
+        vectors = clustered_vectors()
+        collection = make_collection(tmp_path, compression="int8,pca:8")
+        fill(collection, vectors)
+
+        assert collection.fit_compression()
+
+        size = os.path.getsize(tmp_path / "store" / "embeddings.bin")
+        result = collection.query(query_embeddings=vectors[:20], n_results=1)
+        assert size == 400 * 8
+        assert [ids[0] for ids in result["ids"]] == [str(i) for i in range(20)]
+
+    def test_rescore_returns_exact_distances(self, tmp_path):
+        """Test that rescoring ranks candidates with the original vectors"""
+        vectors = clustered_vectors()
+        collection = make_collection(tmp_path, compression="int8,pca:4,rescore")
+        fill(collection, vectors)
+        collection.fit_compression()
+
+        result = collection.query(query_embeddings=vectors[:1], n_results=3)
+
+        exact = 1.0 - vectors[[int(i) for i in result["ids"][0]]] @ vectors[0]
+        assert result["ids"][0][0] == "0"
+        assert np.allclose(result["distances"][0], exact, atol=1e-5)
+
+    def test_writes_after_fit_are_encoded(self, tmp_path):
+        """Test that new rows are encoded with the fitted codec and visible on reopen"""
+        vectors = clustered_vectors(count=401)
+        collection = make_collection(tmp_path, compression="int8")
+        fill(collection, vectors[:400])
+        collection.fit_compression()
+
+        collection.upsert(ids=["new"], embeddings=vectors[400:], documents=["new"])
+        reopened = make_collection(tmp_path)
+
+        result = reopened.query(query_embeddings=vectors[400:], n_results=1)
+        assert result["ids"] == [["new"]]
+        assert reopened.get(ids=["new"], include=["embeddings"])["embeddings"].shape == (1, 16)
+
+    def test_too_few_rows_skips_fit(self, tmp_path):
+        """Test that compression is not fitted on a tiny collection"""
+        collection = make_collection(tmp_path, compression="int8")
+        fill(collection, clustered_vectors(count=10))
+
+        assert not collection.fit_compression()
+        assert not os.path.exists(tmp_path / "store" / "codec.npz")
+
+    def test_optimize_collection(self, tmp_path, monkeypatch):
+        """Test that optimize_collection fits NumPy compression and skips other backends"""
+        monkeypatch.setattr(vector_store, "VECTORDB_PATH", str(tmp_path))
+        collection = create_collection(
+            "compressed", backend="numpy", embedding_function=fake_embed, compression="int8"
+        )
+        fill(collection, clustered_vectors())
+
+        assert optimize_collection(collection)
+        assert not optimize_collection(collection)
+        assert not optimize_collection(object())
+
+
+def test_matches_where_operators():
+    """Test the supported Chroma-style filter operators"""
+    metadata = {"source": "a.txt", "chunk": 3}
+
+    assert matches_where(metadata, {"source": "a.txt"})
+    assert matches_where(metadata, {"chunk": {"$gte": 3}})
+    assert not matches_where(metadata, {"chunk": {"$in": [1, 2]}})
+    assert matches_where(metadata, {"$or": [{"chunk": 1}, {"source": "a.txt"}]})
+    assert not matches_where(metadata, {"$and": [{"chunk": 3}, {"source": "b.txt"}]})
+
+
+def test_create_collection_numpy_backend(tmp_path, monkeypatch):
+    """Test that add_chunks and query_documents work through the NumPy backend"""
+    monkeypatch.setattr(vector_store, "VECTORDB_PATH", str(tmp_path))
+
+    collection = create_collection("my docs", backend="numpy", embedding_function=fake_embed)
+    add_chunks(chunk_text("alpha beta", "a.txt"), collection)
+    results = query_documents(collection, "alpha beta", n_results=1)
+
+    assert isinstance(collection, NumpyCollection)
+    assert results["metadatas"][0][0]["source"] == "a.txt"
+    assert os.path.isdir(tmp_path / "numpy" / "my_docs")
+
+
+def test_create_collection_unknown_backend():
+    """Test that an unknown backend name is rejected"""
+    with pytest.raises(ValueError):
+        create_collection("docs", backend="missing")
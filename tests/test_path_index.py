@@ -0,0 +1,132 @@
+# type: ignore
+
+"""
+Unit tests for path_index.py
+
+Tests the directory trie, file-name token/trigram lookups and JSON persistence
+of the structured path index.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import vector_store
+from path_index import PathIndex, build_path_index, path_index_file, tokenize_name
+
+FILES = [
+    "/srv/docs/contracts/acme_contract.pdf",
+    "/srv/docs/contracts/2024/renewal.pdf",
+    "/srv/docs/contracts/notes.txt",
+    "/srv/docs/finance/invoice_2024-Q3.pdf",
+    "C:\\Users\\me\\finance\\Invoice-March.docx",
+]
+
+
+class TestPathIndex:
+    """Test suite for the in-memory path index"""
+
+    def test_list_directory_recursive(self):
+        """Test that a folder listing includes files in subfolders"""
+        index = PathIndex.from_files(FILES)
+
+        result = index.list_directory("/srv/docs/contracts")
+
+        assert len(result) == 3
+        assert "/srv/docs/contracts/2024/renewal.pdf" in result
+
+    def test_list_directory_by_trailing_folder_and_extension(self):
+        """Test that a bare folder name matches anywhere and extensions filter"""
+        index = PathIndex.from_files(FILES)
+
+        result = index.list_directory("contracts", extension=".pdf")
+
+        assert result == [
+            "/srv/docs/contracts/2024/renewal.pdf",
+            "/srv/docs/contracts/acme_contract.pdf",
+        ]
+
+    def test_list_directory_non_recursive(self):
+        """Test that recursive=False only lists files directly in the folder"""
+        index = PathIndex.from_files(FILES)
+
+        result = index.list_directory("contracts", recursive=False)
+
+        assert "/srv/docs/contracts/2024/renewal.pdf" not in result
+        assert len(result) == 2
+
+    def test_search_matches_tokens_and_substrings(self):
+        """Test that terms match whole tokens and partial names case-insensitively"""
+        index = PathIndex.from_files(FILES)
+
+        assert len(index.search(["invoice"])) == 2
+        assert index.search(["contr"]) == ["/srv/docs/contracts/acme_contract.pdf"]
+        assert index.search(["invoice"], extension=".docx") == [
+            "C:/Users/me/finance/Invoice-March.docx"
+        ]
+
+    def test_search_requires_all_terms(self):
+        """Test that multiple terms are combined with AND"""
+        index = PathIndex.from_files(FILES)
+
+        assert index.search(["invoice", "march"]) == [
+            "C:/Users/me/finance/Invoice-March.docx"
+        ]
+        assert index.search(["invoice", "renewal"]) == []
+
+    def test_remove_file(self):
+        """Test that removed files disappear from every lookup"""
+        index = PathIndex.from_files(FILES)
+
+        index.remove("/srv/docs/contracts/notes.txt")
+
+        assert len(index) == 4
+        assert index.search(["notes"]) == []
+        assert "/srv/docs/contracts/notes.txt" not in index.list_directory("contracts")
+
+
+def test_tokenize_name():
+    """Test that file names split on punctuation into lowercase tokens"""
+    assert tokenize_name("Invoice_2024-Q3.pdf") == ["invoice", "2024", "q3", "pdf"]
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    """Test that a saved index reloads with its lookups rebuilt"""
+    filepath = str(tmp_path / "index.json")
+    PathIndex.from_files(FILES).save(filepath)
+
+    index = PathIndex.load(filepath)
+
+    assert len(index) == len(FILES)
+    assert len(index.search(["invoice"])) == 2
+
+
+def test_load_missing_file_returns_empty_index(tmp_path):
+    """Test that loading a non-existent index gives an empty index"""
+    index = PathIndex.load(str(tmp_path / "missing.json"))
+
+    assert len(index) == 0
+
+
+def test_build_path_index_preserves_added_time(tmp_path):
+    """Test that rebuilding keeps the time a file was first indexed"""
+    directory = str(tmp_path)
+    first = build_path_index(FILES[:1], "docs", directory)
+    added = first.files[FILES[0]]["added"]
+
+    second = build_path_index(FILES[:2], "docs", directory)
+
+    assert second.files[FILES[0]]["added"] == added
+    assert os.path.exists(path_index_file("docs", directory))
+
+
+def test_index_files_live_in_the_vector_store(tmp_path, monkeypatch):
+    """Test that path indexes default to a folder inside VECTORDB_PATH"""
+    monkeypatch.setattr(vector_store, "VECTORDB_PATH", str(tmp_path / "store"))
+
+    build_path_index(FILES[:2], "contracts")
+
+    filepath = path_index_file("contracts")
+    assert filepath == os.path.join(str(tmp_path / "store"), "path_index", "contracts.json")
+    assert len(PathIndex.load(filepath)) == 2
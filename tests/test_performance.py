@@ -0,0 +1,245 @@
+# type: ignore
+
+"""
+Performance tests for chunking, scanning, loading and querying
+
+Runs fixed-seed workloads and checks their time and peak Python memory against
+tests/performance_baseline.json, so a change that makes a stage much slower or
+hungrier fails even though its results are still correct.
+
+These tests take a few minutes and are deselected by default; run them with:
+
+    pytest -m performance
+
+Record a new baseline after an intended change, or on a new machine (times are
+only comparable on the machine that recorded them), with:
+
+    PERF_UPDATE_BASELINE=1 pytest -m performance
+"""
+
+import sys
+import os
+import hashlib
+import json
+import random
+import shutil
+import time
+import tracemalloc
+
+import chromadb
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from document_loader import load_docx
+from retrieval_system import query_documents
+from scan_folders import scan_folders
+from vector_store import chunk_text, create_collection
+
+pytestmark = pytest.mark.performance
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "performance_baseline.json")
+
+# Allowed slowdown and memory growth over the baseline. Timings vary between
+# runs much more than allocations do. Short workloads also get TIME_SLACK
+# seconds, since a slow disk or scheduler pause alone can exceed 1.5x of them.
+TIME_TOLERANCE = float(os.getenv("PERF_TIME_TOLERANCE", "1.5"))
+TIME_SLACK = float(os.getenv("PERF_TIME_SLACK", "0.5"))
+MEMORY_TOLERANCE = float(os.getenv("PERF_MEMORY_TOLERANCE", "1.2"))
+UPDATE_BASELINE = os.getenv("PERF_UPDATE_BASELINE", "").lower() in ("1", "true", "yes")
+
+SEED = 0
+TEXT_BYTES = 50_000_000
+TREE_FILES = 100_000
+DOCX_FILES = 1_000
+COLLECTION_CHUNKS = 100_000
+QUERIES = 500
+DIMENSIONS = 64
+
+
+class FakeEmbeddingFunction(chromadb.EmbeddingFunction):
+    """Deterministic offline embedder with a random vector per text"""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+            rng = np.random.default_rng(int.from_bytes(digest, "little"))
+            vectors.append(rng.standard_normal(DIMENSIONS).astype(np.float32))
+        return vectors
+
+    @staticmethod
+    def name():
+        return "fake"
+
+
+def load_baseline():
+    """Return the stored measurements by workload"""
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_baseline(name, measured):
+    """Store one workload's measurements"""
+    baseline = load_baseline()
+    baseline[name] = measured
+    with open(BASELINE_FILE, "w", encoding="utf-8") as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def measure(function):
+    """Return a workload's wall time and peak traced memory"""
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+
+    # Tracing slows allocation-heavy code several times over, so memory is
+    # measured in a second run
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(seconds, 3), "peak_mb": round(peak / 1e6, 1)}
+
+
+def check_budget(name, function):
+    """Measure a workload and compare it with its baseline, or record it"""
+    measured = measure(function)
+    if UPDATE_BASELINE:
+        save_baseline(name, measured)
+        return
+    expected = load_baseline().get(name)
+    if expected is None:
+        pytest.skip(f"No baseline for {name}; record one with PERF_UPDATE_BASELINE=1")
+
+    time_budget = max(expected["seconds"] * TIME_TOLERANCE, expected["seconds"] + TIME_SLACK)
+    memory_budget = expected["peak_mb"] * MEMORY_TOLERANCE
+    assert measured["seconds"] <= time_budget, (
+        f"{name} took {measured['seconds']:.2f} s, budget {time_budget:.2f} s "
+        f"(baseline {expected['seconds']:.2f} s)"
+    )
+    assert measured["peak_mb"] <= memory_budget, (
+        f"{name} peaked at {measured['peak_mb']:.1f} MB, budget {memory_budget:.1f} MB "
+        f"(baseline {expected['peak_mb']:.1f} MB)"
+    )
+
+
+def make_text(size):
+    """Return paragraphs of random words totalling about size characters"""
+    rng = random.Random(SEED)
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+    paragraphs, total = [], 0
+    while total < size:
+        paragraph = " ".join(rng.choices(words, k=rng.randint(20, 120))) + "."
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+@pytest.fixture(scope="module")
+def file_tree(tmp_path_factory):
+    """A tree of 100 folders with 10 subfolders of 100 empty files each"""
+    root = tmp_path_factory.mktemp("tree")
+    per_folder = TREE_FILES // 1000
+    for top in range(100):
+        for sub in range(10):
+            folder = root / f"folder{top}" / f"sub{sub}"
+            folder.mkdir(parents=True)
+            for index in range(per_folder):
+                (folder / f"file{index}.txt").touch()
+    return str(root)
+
+
+@pytest.fixture(scope="module")
+def docx_files(tmp_path_factory):
+    """1k DOCX files of 40 paragraphs and a table"""
+    import docx
+
+    root = tmp_path_factory.mktemp("docx")
+    rng = random.Random(SEED)
+    paths = []
+    for index in range(DOCX_FILES):
+        document = docx.Document()
+        document.add_heading(f"Report {index}", level=1)
+        for paragraph in range(40):
+            document.add_paragraph(
+                " ".join(rng.choice(("budget", "travel", "policy", "review")) for _ in range(30))
+            )
+        table = document.add_table(rows=3, cols=3)
+        for row in table.rows:
+            for cell in row.cells:
+                cell.text = str(rng.randint(0, 1000))
+        path = root / f"report{index}.docx"
+        document.save(str(path))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture(scope="module")
+def large_collection(tmp_path_factory):
+    """A NumPy collection of 100k chunks with fake embeddings"""
+    directory = str(tmp_path_factory.mktemp("store"))
+    embedding_function = FakeEmbeddingFunction()
+    collection = create_collection(
+        "perf_collection",
+        backend="numpy",
+        embedding_function=embedding_function,
+        directory=directory,
+    )
+    for start in range(0, COLLECTION_CHUNKS, 5000):
+        rows = range(start, start + 5000)
+        documents = [f"chunk {row} of file {row // 100}" for row in rows]
+        collection.upsert(
+            ids=[str(row) for row in rows],
+            documents=documents,
+            metadatas=[{"source": f"file{row // 100}.txt", "chunk": row % 100} for row in rows],
+            embeddings=embedding_function(documents),
+        )
+    yield create_collection(
+        "perf_collection",
+        backend="numpy",
+        embedding_function=embedding_function,
+        directory=directory,
+    )
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestPerformance:
+    """Test cases for the time and memory budgets of each stage"""
+
+    def test_chunk_large_text(self):
+        """Test chunking a 50 MB text"""
+        text = make_text(TEXT_BYTES)
+
+        check_budget("chunk_50mb_text", lambda: chunk_text(text, "large.txt"))
+
+    def test_scan_large_tree(self, file_tree):
+        """Test scanning a tree of 100k files"""
+        assert len(scan_folders(file_tree)) == TREE_FILES
+
+        check_budget("scan_100k_files", lambda: scan_folders(file_tree))
+
+    def test_load_docx_files(self, docx_files):
+        """Test loading 1k DOCX files"""
+        check_budget("load_1k_docx", lambda: [load_docx(path) for path in docx_files])
+
+    def test_query_large_collection(self, large_collection):
+        """Test answering 500 questions from a 100k-chunk collection"""
+        questions = [f"question {index}" for index in range(QUERIES)]
+
+        check_budget(
+            "query_100k_chunks",
+            lambda: [query_documents(large_collection, question) for question in questions],
+        )
@@ -0,0 +1,128 @@
+# type: ignore
+
+"""
+Unit tests for profiling.py
+
+Tests that disabled runs are not profiled, that enabled runs save pstats and
+collapsed-stack artifacts, how stacks are collapsed, and profiling an indexing
+job.
+"""
+
+import sys
+import os
+import pstats
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import profiling
+from indexing_jobs import IndexingJob
+from profiling import collapse_stacks, format_run, profile_run, top_functions
+
+
+def fibonacci(n):
+    """Recursive workload with a recognizable name"""
+    return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+
+
+def workload():
+    """Call the recursive workload and a built-in"""
+    sorted(range(20000), key=lambda value: -value)
+    return fibonacci(15)
+
+
+def fake_embed(texts):
+    """Deterministic offline embedder"""
+    return [[float(len(text)), 1.0, 1.0] for text in texts]
+
+
+class TestProfileRun:
+    """Test cases for profile_run"""
+
+    def test_disabled_run_is_not_profiled(self, tmp_path):
+        """Test that a disabled run yields None and saves nothing"""
+        with profile_run("query", enabled=False, directory=str(tmp_path)) as run:
+            workload()
+
+        assert run is None
+        assert not os.listdir(tmp_path)
+
+    def test_saves_pstats_and_collapsed_stacks(self, tmp_path):
+        """Test that both artifacts are written and readable"""
+        with profile_run("slow question", directory=str(tmp_path)) as run:
+            workload()
+
+        assert run.seconds > 0
+        assert run.pstats_file.endswith("-slow_question.pstats")
+        functions = pstats.Stats(run.pstats_file).stats
+        assert any(name == "fibonacci" for _, _, name in functions)
+
+        with open(run.collapsed_file, "r", encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        assert lines
+        for line in lines:
+            stack, microseconds = line.rsplit(" ", 1)
+            assert int(microseconds) > 0
+        assert any(line.startswith("workload (test_profiling.py:") for line in lines)
+
+    def test_report(self, tmp_path):
+        """Test the text report of the slowest functions"""
+        with profile_run("query", directory=str(tmp_path)) as run:
+            workload()
+
+        rows = top_functions(run.stats, limit=3)
+        report = format_run(run, limit=3)
+
+        assert rows[0]["cumulative_s"] >= rows[-1]["cumulative_s"]
+        assert run.collapsed_file in report
+        assert len(report.splitlines()) == 4
+
+
+class TestCollapseStacks:
+    """Test cases for collapse_stacks"""
+
+    def test_recursion_ends_the_path(self, tmp_path):
+        """Test that recursive calls are folded into one frame"""
+        with profile_run("query", directory=str(tmp_path)) as run:
+            fibonacci(12)
+
+        stacks = collapse_stacks(run.stats)
+
+        fibonacci_stacks = [stack for stack in stacks if "fibonacci" in stack]
+        assert fibonacci_stacks
+        assert all(stack.count("fibonacci") == 1 for stack in fibonacci_stacks)
+
+    def test_time_is_preserved(self, tmp_path):
+        """Test that collapsed stacks account for the profiled own time"""
+        with profile_run("query", directory=str(tmp_path)) as run:
+            workload()
+
+        own_time = sum(entry[2] for entry in run.stats.stats.values())
+        collapsed = sum(collapse_stacks(run.stats).values()) / 1e6
+
+        assert abs(collapsed - own_time) < 0.1 * own_time + 0.001
+
+
+class TestIndexingJobProfile:
+    """Test cases for profiling a background indexing job"""
+
+    def test_job_saves_profile(self, tmp_path, monkeypatch):
+        """Test that a profiled job keeps its run once finished"""
+        monkeypatch.setattr(profiling, "PROFILES_PATH", str(tmp_path / "profiles"))
+        file = tmp_path / "notes.txt"
+        file.write_text("some text to index", encoding="utf-8")
+
+        job = IndexingJob(
+            "folder:profiled",
+            "docs",
+            [str(file)],
+            backend="numpy",
+            directory=str(tmp_path / "store"),
+            embedding_function=fake_embed,
+            path_index_dir=str(tmp_path / "path_index"),
+            profile=True,
+        ).start()
+
+        assert job.wait(5)
+        assert job.status()["state"] == "done"
+        assert os.path.dirname(job.profile_run.pstats_file) == str(tmp_path / "profiles")
+        assert os.path.exists(job.profile_run.collapsed_file)
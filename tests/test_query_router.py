@@ -0,0 +1,166 @@
+# type: ignore
+
+"""
+Unit tests for query_router.py
+
+Tests intent detection and direct answers for metadata questions, the optional
+local classifier, and routed vs. LLM statistics.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from path_index import PathIndex
+from query_router import ADDED, COUNT, LIST, IntentClassifier, QueryRouter, RouterStats
+
+FILES = [
+    "/docs/contracts/acme.pdf",
+    "/docs/contracts/notes.txt",
+    "/docs/finance/budget.txt",
+    "/docs/finance/invoice.pdf",
+]
+
+
+class FakeCollection:
+    """Minimal collection exposing only count()"""
+
+    def count(self):
+        return 42
+
+
+def make_router(**kwargs):
+    return QueryRouter(PathIndex.from_files(FILES), FakeCollection(), **kwargs)
+
+
+class TestDetectIntent:
+    """Test suite for deterministic intent rules"""
+
+    def test_metadata_questions(self):
+        """Test that counting, listing and date questions are detected"""
+        router = make_router(use_classifier=False)
+
+        assert router.detect_intent("How many documents are indexed?") == COUNT
+        assert router.detect_intent("list the PDFs under /contracts") == LIST
+        assert router.detect_intent("what files are in the folder finance") == LIST
+        assert router.detect_intent("when was budget.txt added?") == ADDED
+
+    def test_content_questions_go_to_llm(self):
+        """Test that questions about document content are not routed"""
+        router = make_router(use_classifier=False)
+
+        assert router.detect_intent("which files mention invoices") is None
+        assert router.detect_intent("what does the contract say") is None
+        assert router.detect_intent("summarize the budget") is None
+
+    def test_content_questions_mentioning_documents_go_to_llm(self):
+        """Test that words between the trigger and the file noun mean a content question"""
+        router = make_router()
+
+        for question in (
+            "how many days of leave does the policy document give?",
+            "What is the number of employees listed in the documents?",
+            "show me the termination clause in the contract document",
+            "List all action items from the report document",
+            "Give me a summary of the documents",
+        ):
+            assert router.detect_intent(question) is None, question
+            assert router.route(question) is None, question
+
+    def test_content_questions_about_files_go_to_llm(self):
+        """Test that questions about which documents a process needs are not file listings"""
+        router = make_router()
+
+        for question in (
+            "What documents are required for a visa application?",
+            "what files were submitted with the invoice?",
+            "When was the leave policy changed?",
+            "when was the contract updated?",
+        ):
+            assert router.route(question) is None, question
+
+    def test_changes_to_named_files_are_metadata(self):
+        """Test that modification questions naming a file or document are still routed"""
+        router = make_router(use_classifier=False)
+
+        assert router.detect_intent("when was budget.txt last modified?") == ADDED
+        assert router.detect_intent("when was the budget document updated?") == ADDED
+        assert router.detect_intent("which pdfs do you have") == LIST
+        assert router.detect_intent("what files are there") == LIST
+
+    def test_qualified_file_nouns(self):
+        """Test that determiners and words like "indexed" still count as metadata questions"""
+        router = make_router()
+
+        assert router.detect_intent("how many PDF files are there") == COUNT
+        assert router.detect_intent("count the indexed documents") == COUNT
+        assert router.detect_intent("please list all uploaded files") == LIST
+        assert router.detect_intent("show me the documents under contracts") == LIST
+
+
+class TestRoute:
+    """Test suite for answers built from the path index"""
+
+    def test_count_all(self):
+        """Test that counts include indexed files and stored chunks"""
+        answer = make_router().route("how many documents are indexed?")
+
+        assert "4 indexed files" in answer
+        assert "42" in answer
+
+    def test_count_filtered(self):
+        """Test counting files of one type in one folder"""
+        answer = make_router().route("how many PDFs under contracts")
+
+        assert answer == "There is 1 indexed PDF file in 'contracts'."
+
+    def test_list_folder(self):
+        """Test that folder listings contain every file in the folder"""
+        answer = make_router().route("what files are in the folder finance")
+
+        assert "/docs/finance/budget.txt" in answer
+        assert "/docs/finance/invoice.pdf" in answer
+        assert "contracts" not in answer
+
+    def test_added_time(self):
+        """Test that date questions report when a file was indexed"""
+        answer = make_router().route("when was budget.txt added?")
+
+        assert answer.startswith("- /docs/finance/budget.txt: added")
+
+    def test_unknown_file_falls_back_to_llm(self):
+        """Test that date questions about unknown files are not answered directly"""
+        assert make_router().route("when was the roadmap added?") is None
+
+    def test_no_path_index(self):
+        """Test that nothing is routed before the path index exists"""
+        assert QueryRouter(None).route("how many files are there") is None
+
+
+def test_classifier_catches_other_phrasings():
+    """Test that the optional classifier routes phrasings the rules miss"""
+    assert make_router(use_classifier=False).detect_intent("how big is the collection") is None
+    assert make_router(use_classifier=True).detect_intent("how big is the collection") == COUNT
+
+
+def test_classifier_predicts_rag_for_content():
+    """Test that content questions are classified as RAG questions"""
+    label, _ = IntentClassifier().predict("what does the agreement say about payment")
+
+    assert label == "rag"
+
+
+def test_router_stats_summary():
+    """Test per-route counts and latency aggregation"""
+    stats = RouterStats()
+    stats.record("routed", 0.001)
+    stats.record("llm", 2.0)
+    stats.record("llm", 4.0)
+
+    summary = stats.summary()
+
+    assert summary["routed"]["count"] == 1
+    assert summary["llm"]["count"] == 2
+    assert summary["llm"]["mean_ms"] == 3000.0
+    assert "llm: 2 queries" in stats.format()
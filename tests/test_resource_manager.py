@@ -0,0 +1,190 @@
+# type: ignore
+
+"""
+Unit tests for resource_manager.py
+
+Tests reference counting of shared collections, LRU unloading past the memory
+ceiling, reopening unloaded collections, evicting idle sessions and the
+reported stats.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from chat_history import ChatHistory
+from resource_manager import BYTES_PER_CHUNK, SWEEP_INTERVAL, ResourceManager
+
+
+class FakeClock:
+    """Clock advanced by hand"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCollection:
+    """Collection holding a fixed number of chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def count(self):
+        return self.chunks
+
+
+def make_manager(chunks_limit=10, idle_timeout=60):
+    """Create a manager whose ceiling fits chunks_limit chunks"""
+    clock = FakeClock()
+    manager = ResourceManager(
+        memory_limit=chunks_limit * BYTES_PER_CHUNK, idle_timeout=idle_timeout, clock=clock
+    )
+    return manager, clock
+
+
+class TestCollections:
+    """Test cases for shared collection handles"""
+
+    def test_sessions_share_a_collection(self):
+        """Test that two sessions on one key get the same handle and both count"""
+        manager, _ = make_manager()
+        collection = FakeCollection(4)
+
+        manager.attach("a", "folder:docs", collection, reopen=lambda: FakeCollection(4))
+
+        assert manager.get("b", "folder:docs") is collection
+        assert manager.stats()["collections"][0]["sessions"] == 2
+        manager.detach("a")
+        assert manager.stats()["collections"][0]["sessions"] == 1
+
+    def test_unknown_key(self):
+        """Test that get returns None for a key never attached"""
+        manager, _ = make_manager()
+
+        assert manager.get("a", "missing") is None
+
+    def test_lru_unload_past_the_ceiling(self):
+        """Test that the least recently used unreferenced collections are unloaded"""
+        manager, clock = make_manager(chunks_limit=10)
+        unloaded = []
+        for key in ("old", "new"):
+            manager.attach(
+                key,
+                key,
+                FakeCollection(8),
+                reopen=lambda: FakeCollection(8),
+                unload=lambda key=key: unloaded.append(key),
+            )
+            clock.now += 1
+
+        manager.detach("old")
+        assert unloaded == []
+        manager.detach("new")
+
+        assert unloaded == ["old"]
+        resident = {c["key"]: c["resident"] for c in manager.stats()["collections"]}
+        assert resident == {"old": False, "new": True}
+        assert manager.unloaded_collections == 1
+
+    def test_busy_collections_stay_open(self):
+        """Test that a collection being indexed is not unloaded"""
+        manager, _ = make_manager(chunks_limit=1)
+        manager.attach("a", "job", FakeCollection(8), reopen=None, busy=lambda: True)
+
+        manager.detach("a")
+
+        assert manager.stats()["collections"][0]["resident"]
+
+    def test_reopen_after_unload(self):
+        """Test that get reopens an unloaded collection"""
+        manager, _ = make_manager(chunks_limit=1)
+        reopened = FakeCollection(2)
+        manager.attach("a", "job", FakeCollection(8), reopen=lambda: reopened)
+        manager.detach("a")
+
+        assert manager.get("a", "job") is reopened
+        assert manager.stats()["resident_bytes"] == 2 * BYTES_PER_CHUNK
+
+
+class TestSessions:
+    """Test cases for idle-session eviction"""
+
+    def test_idle_sessions_are_evicted(self, tmp_path):
+        """Test that an idle session's chat is offloaded and its handle released"""
+        manager, clock = make_manager(chunks_limit=0, idle_timeout=60)
+        chat = ChatHistory("idle", directory=str(tmp_path))
+        chat.append("user", "hello")
+        evicted = []
+        manager.attach("idle", "job", FakeCollection(4), reopen=lambda: FakeCollection(4))
+        manager.touch("idle", chat=chat, on_evict=lambda: evicted.append("idle"))
+
+        clock.now += 30
+        manager.touch("active")
+        clock.now += 31
+        assert manager.evict_idle() == ["idle"]
+
+        assert evicted == ["idle"]
+        assert chat.offloaded == 1 and chat.recent() == []
+        assert chat.messages(0, 1) == [{"role": "user", "content": "hello"}]
+        stats = manager.stats()
+        assert [s["session"] for s in stats["sessions"]] == ["active"]
+        assert stats["collections"][0]["resident"] is False
+        assert stats["evicted_sessions"] == 1
+
+    def test_returning_session_gets_its_history_back(self, tmp_path):
+        """Test that a chat offloaded on eviction is reloaded when the session returns"""
+        manager, clock = make_manager(idle_timeout=60)
+        chat = ChatHistory("back", max_in_memory=3, directory=str(tmp_path))
+        for index in range(5):
+            chat.append("user", f"message {index}")
+        history = [message.content for message in chat.langchain_history()]
+        manager.touch("back", chat=chat)
+
+        clock.now += 61
+        assert manager.evict_idle() == ["back"]
+        assert chat.langchain_history() == []
+
+        manager.touch("back", chat=chat)
+
+        assert [message.content for message in chat.langchain_history()] == history
+        assert chat.offloaded == 2 and len(chat.recent()) == 3
+        chat.append("user", "message 5")
+        contents = [message["content"] for message in chat.messages(0, len(chat))]
+        assert contents == [f"message {index}" for index in range(6)]
+
+    def test_touch_sweeps_periodically(self):
+        """Test that touch evicts idle sessions once a sweep interval has passed"""
+        manager, clock = make_manager(idle_timeout=SWEEP_INTERVAL / 2)
+        manager.touch("idle")
+
+        clock.now += SWEEP_INTERVAL
+        manager.touch("active")
+
+        assert [s["session"] for s in manager.stats()["sessions"]] == ["active"]
+
+    def test_stats_include_chat_memory(self, tmp_path):
+        """Test that stats report the memory of each session's chat"""
+        manager, _ = make_manager()
+        chat = ChatHistory("a", directory=str(tmp_path))
+        chat.append("user", "x" * 1000)
+
+        manager.touch("a", chat=chat)
+
+        assert manager.stats()["sessions"][0]["chat_bytes"] >= 2000
+
+
+def test_configure(monkeypatch, capsys):
+    """Test that settings come from the environment and invalid ones are ignored"""
+    monkeypatch.setenv("RESOURCE_MEMORY_LIMIT_MB", "2")
+    monkeypatch.setenv("SESSION_IDLE_TIMEOUT", "soon")
+    manager = ResourceManager(idle_timeout=60)
+
+    manager.configure()
+
+    assert manager.memory_limit == 2 * 1024 * 1024
+    assert manager.idle_timeout == 60
+    assert "SESSION_IDLE_TIMEOUT" in capsys.readouterr().out
@@ -0,0 +1,85 @@
+# type: ignore
+
+"""
+Unit tests for response_generator.py
+
+Tests prompt context rendering and chat history helpers without calling the LLM.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from response_generator import format_context, set_history, set_langchain_history
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+class TestFormatContext:
+    """Test suite for rendering retrieved chunks into the prompt"""
+
+    def test_each_source_cited_once(self):
+        """Test that chunks from the same file share a single citation"""
+        results = {
+            "documents": [["second", "other", "first"]],
+            "metadatas": [
+                [
+                    {"source": "a/report.txt", "chunk": 1},
+                    {"source": "b/notes.txt", "chunk": 0},
+                    {"source": "a/report.txt", "chunk": 0},
+                ]
+            ],
+        }
+
+        context = format_context(results)
+
+        assert context.count("[Source: a/report.txt]") == 1
+        assert context.count("[Source: b/notes.txt]") == 1
+        # Sources keep retrieval order, chunks are in document order
+        assert context.index("a/report.txt") < context.index("b/notes.txt")
+        assert context.index("first") < context.index("second")
+
+    def test_matching_files_are_listed(self):
+        """Test that path index matches are appended as their own section"""
+        results = {"documents": [["text"]], "metadatas": [[{"source": "a.txt"}]]}
+
+        context = format_context(results, files=["docs/a.txt", "docs/b.pdf"])
+
+        assert "[Indexed files matching the question]" in context
+        assert "- docs/b.pdf" in context
+
+    def test_duplicate_copies_are_cited(self):
+        """Test that aliases recorded at indexing time are cited with their source"""
+        metadata = {"source": "a/report.txt", "chunk": 0, "aliases": "b/report.txt\nc/report.txt"}
+        results = {"documents": [["text"]], "metadatas": [[metadata]]}
+
+        context = format_context(results)
+
+        assert context.startswith(
+            "[Source: a/report.txt]\n[Same document: b/report.txt, c/report.txt]\ntext"
+        )
+
+    def test_empty_results(self):
+        """Test that empty query results render an empty context"""
+        assert format_context({"documents": [[]], "metadatas": [[]]}) == ""
+
+
+def test_set_history_appends_messages():
+    """Test that a question/answer pair is appended as LangChain messages"""
+    history = set_history(None, "question", "answer")
+
+    assert isinstance(history[0], HumanMessage)
+    assert isinstance(history[1], AIMessage)
+
+
+def test_set_langchain_history_converts_roles():
+    """Test conversion from Streamlit message dicts to LangChain messages"""
+    messages = [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
+
+    history = set_langchain_history(messages)
+
+    assert [type(m) for m in history] == [HumanMessage, AIMessage]
+    assert history[1].content == "hello"
@@ -0,0 +1,158 @@
+# type: ignore
+
+"""
+Unit tests for retrieval_cache.py
+
+Tests the LRU caches and cached query_documents lookups, including
+invalidation when add_chunks writes to the collection.
+"""
+
+import sys
+import os
+import uuid
+
+import chromadb
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from retrieval_cache import LRUCache, RetrievalCache, normalize_query
+from retrieval_system import query_documents
+from vector_store import add_chunks, chunk_text, create_collection
+
+
+class CountingEmbeddingFunction(chromadb.EmbeddingFunction):
+    """Offline embedder that counts how many texts it has embedded"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, input):
+        self.calls += len(input)
+        return [[float(len(text)), float(text.count("a")), 1.0] for text in input]
+
+    @staticmethod
+    def name():
+        return "counting"
+
+
+def make_collection():
+    embedder = CountingEmbeddingFunction()
+    collection = chromadb.EphemeralClient().create_collection(
+        name=f"test-{uuid.uuid4().hex}", embedding_function=embedder
+    )
+    add_chunks(chunk_text("alpha beta gamma", "a.txt"), collection)
+    return collection, embedder
+
+
+class TestLRUCache:
+    """Test suite for the bounded LRU cache"""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest unused entry is dropped when full"""
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert len(cache) == 2
+
+    def test_hit_rate(self):
+        """Test that hits and misses are counted"""
+        cache = LRUCache(4)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("missing")
+
+        assert cache.stats()["hit_rate"] == 0.5
+
+    def test_zero_size_disables_cache(self):
+        """Test that a zero-sized cache stores nothing"""
+        cache = LRUCache(0)
+        cache.put("a", 1)
+
+        assert cache.get("a") is None
+
+
+def test_normalize_query():
+    """Test that case and whitespace differences share a cache entry"""
+    assert normalize_query("  What  is\nAlpha? ") == normalize_query("what is alpha?")
+
+
+class TestCachedQueryDocuments:
+    """Test suite for query_documents with a RetrievalCache"""
+
+    def test_repeated_query_hits_cache(self):
+        """Test that a repeated question skips embedding and the index"""
+        collection, embedder = make_collection()
+        cache = RetrievalCache()
+        embedder.calls = 0
+
+        first = query_documents(collection, "alpha?", n_results=1, cache=cache)
+        second = query_documents(collection, "  ALPHA? ", n_results=1, cache=cache)
+
+        assert first == second
+        assert embedder.calls == 1
+        assert cache.results.stats()["hits"] == 1
+
+    def test_write_invalidates_results_but_keeps_embedding(self):
+        """Test that add_chunks bumps the version so stale results are not served"""
+        collection, embedder = make_collection()
+        cache = RetrievalCache()
+        query_documents(collection, "alpha", n_results=5, cache=cache)
+
+        add_chunks(chunk_text("delta", "b.txt"), collection)
+        embedder.calls = 0
+        results = query_documents(collection, "alpha", n_results=5, cache=cache)
+
+        assert len(results["ids"][0]) == 2
+        assert embedder.calls == 0
+        assert cache.embeddings.stats()["hits"] == 1
+
+    @pytest.mark.parametrize("backend", ["chroma", "numpy"])
+    def test_writes_from_other_processes_invalidate_results(self, tmp_path, backend):
+        """Test that a write that bypasses this process's version counter still invalidates results"""
+        embedder = CountingEmbeddingFunction()
+        name = f"test-{uuid.uuid4().hex}"
+        options = {"backend": backend, "embedding_function": embedder, "directory": str(tmp_path)}
+        collection = create_collection(name, **options)
+        add_chunks(chunk_text("alpha beta gamma", "a.txt"), collection)
+        cache = RetrievalCache()
+        query_documents(collection, "alpha", n_results=5, cache=cache)
+
+        # Another process writes straight to the store through its own handle
+        other = create_collection(name, **options)
+        other.upsert(ids=["other"], documents=["delta"], embeddings=embedder(["delta"]))
+        results = query_documents(collection, "alpha", n_results=5, cache=cache)
+
+        assert len(results["ids"][0]) == 2
+        assert cache.results.stats()["hits"] == 0
+
+    def test_filters_are_part_of_the_key(self):
+        """Test that different metadata filters are cached separately"""
+        collection, _ = make_collection()
+        add_chunks(chunk_text("delta", "b.txt"), collection)
+        cache = RetrievalCache()
+
+        all_results = query_documents(collection, "alpha", n_results=5, cache=cache)
+        filtered = query_documents(
+            collection, "alpha", n_results=5, where={"source": "b.txt"}, cache=cache
+        )
+
+        assert len(all_results["ids"][0]) == 2
+        assert [m["source"] for m in filtered["metadatas"][0]] == ["b.txt"]
+        assert cache.results.stats()["hits"] == 0
+
+    def test_cached_results_are_copies(self):
+        """Test that mutating returned results does not corrupt the cache"""
+        collection, _ = make_collection()
+        cache = RetrievalCache()
+
+        first = query_documents(collection, "alpha", n_results=1, cache=cache)
+        first["documents"][0].clear()
+        second = query_documents(collection, "alpha", n_results=1, cache=cache)
+
+        assert second["documents"][0] == ["alpha beta gamma"]
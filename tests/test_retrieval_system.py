@@ -0,0 +1,281 @@
+# type: ignore
+
+"""
+Unit tests for retrieval_system.py
+
+Tests question parsing, file lookups through the path index, neighbour
+expansion and federated queries over several collections.
+"""
+
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from path_index import PathIndex
+from retrieval_system import (
+    expand_neighbours,
+    format_shards,
+    merge_chunks,
+    normalize_distance,
+    parse_file_query,
+    query_collections,
+    search_files,
+)
+from vector_store import chunk_id
+
+FILES = [
+    "/srv/docs/contracts/acme.pdf",
+    "/srv/docs/contracts/notes.txt",
+    "/srv/docs/finance/invoice_2024.pdf",
+    "/srv/docs/finance/budget.txt",
+]
+
+
+class FakeCollection:
+    """In-memory stand-in for a collection that only supports get(ids=...)"""
+
+    def __init__(self, chunks):
+        self.chunks = {
+            chunk_id(source, index): text
+            for source, texts in chunks.items()
+            for index, text in enumerate(texts)
+        }
+        self.get_calls = 0
+
+    def get(self, ids, include=None):
+        self.get_calls += 1
+        found = [id_ for id_ in ids if id_ in self.chunks]
+        return {"ids": found, "documents": [self.chunks[id_] for id_ in found]}
+
+
+def make_results(hits):
+    """Build query results from (source, chunk, distance) tuples"""
+    return {
+        "documents": [["hit"] * len(hits)],
+        "metadatas": [[{"source": s, "chunk": c} for s, c, _ in hits]],
+        "distances": [[d for _, _, d in hits]],
+    }
+
+
+class FakeShard:
+    """Collection stand-in answering query() with fixed hits after an optional delay"""
+
+    def __init__(self, name, hits, space="l2", delay=0.0, error=None):
+        self.name = name
+        self.space = space
+        self.hits = hits
+        self.delay = delay
+        self.error = error
+        self.released = threading.Event()
+
+    def query(self, query_texts, n_results, where=None):
+        if self.delay:
+            self.released.wait(self.delay)
+        if self.error:
+            raise self.error
+        hits = self.hits[:n_results]
+        return {
+            "ids": [[f"{self.name}-{i}" for i in range(len(hits))]],
+            "documents": [[text for text, _ in hits]],
+            "metadatas": [[{"source": f"{self.name}.txt", "chunk": i} for i in range(len(hits))]],
+            "distances": [[distance for _, distance in hits]],
+        }
+
+
+class TestQueryCollections:
+    """Test suite for federated queries across collections"""
+
+    def test_merges_by_normalized_distance(self):
+        """Test that shards in different spaces are ranked on one scale"""
+        shards = [
+            FakeShard("hr", [("hr best", 0.4), ("hr far", 1.6)], space="l2"),
+            FakeShard("finance", [("finance", 0.3)], space="cosine"),
+        ]
+
+        results = query_collections(shards, "question", n_results=2)
+
+        assert results["documents"] == [["hr best", "finance"]]
+        assert results["distances"] == [[0.2, 0.3]]
+        assert results["metadatas"][0][0]["collection"] == "hr"
+        assert [shard["status"] for shard in results["shards"]] == ["ok", "ok"]
+
+    def test_slow_shard_returns_partial_results(self):
+        """Test that a shard exceeding the timeout is reported and skipped"""
+        slow = FakeShard("slow", [("late", 0.0)], delay=5.0)
+        fast = FakeShard("fast", [("early", 0.5)])
+
+        start = time.perf_counter()
+        results = query_collections([slow, fast], "question", timeout=0.2)
+        elapsed = time.perf_counter() - start
+        slow.released.set()
+
+        assert elapsed < 2.0
+        assert results["documents"] == [["early"]]
+        assert results["shards"][0]["status"] == "timeout"
+        assert results["shards"][1]["latency_ms"] < results["shards"][0]["latency_ms"]
+
+    def test_failing_shard_is_reported(self):
+        """Test that an exception in one shard does not fail the query"""
+        broken = FakeShard("broken", [], error=RuntimeError("index missing"))
+        healthy = FakeShard("healthy", [("text", 0.1)])
+
+        results = query_collections([broken, healthy], "question")
+
+        assert results["shards"][0]["status"] == "error"
+        assert "index missing" in results["shards"][0]["error"]
+        assert results["documents"] == [["text"]]
+        assert "broken: error" in format_shards(results["shards"])
+
+
+def test_normalize_distance():
+    """Test that squared L2 distances of unit vectors map to cosine distance"""
+    assert normalize_distance(1.0, "l2") == 0.5
+    assert normalize_distance(0.25, "cosine") == 0.25
+
+
+class TestExpandNeighbours:
+    """Test suite for small-to-big expansion of retrieved chunks"""
+
+    def test_hit_is_expanded_with_neighbours(self):
+        """Test that a hit gains the chunks before and after it"""
+        collection = FakeCollection({"a.txt": ["zero", "one", "two", "three"]})
+
+        result = expand_neighbours(collection, make_results([("a.txt", 2, 0.1)]))
+
+        assert result["ids"] == [[chunk_id("a.txt", 1)]]
+        assert result["documents"] == [["one\n\ntwo\n\nthree"]]
+        assert result["metadatas"][0][0] == {"source": "a.txt", "chunk": 1, "chunk_end": 3}
+        assert collection.get_calls == 1
+
+    def test_hit_metadata_is_kept(self):
+        """Test that an aliased hit keeps its aliases and collection after expansion"""
+        collection = FakeCollection({"a.txt": ["zero", "one"]})
+        results = make_results([("a.txt", 1, 0.1)])
+        results["metadatas"][0][0].update(aliases="copy/a.txt", collection="docs")
+
+        result = expand_neighbours(collection, results)
+
+        assert result["metadatas"][0][0] == {
+            "source": "a.txt",
+            "chunk": 0,
+            "chunk_end": 1,
+            "aliases": "copy/a.txt",
+            "collection": "docs",
+        }
+
+    def test_adjacent_hits_are_merged(self):
+        """Test that overlapping windows become one passage with the best distance"""
+        collection = FakeCollection({"a.txt": ["c0", "c1", "c2", "c3", "c4"]})
+
+        result = expand_neighbours(
+            collection, make_results([("a.txt", 1, 0.5), ("a.txt", 2, 0.2)])
+        )
+
+        assert result["documents"] == [["c0\n\nc1\n\nc2\n\nc3"]]
+        assert result["distances"] == [[0.2]]
+
+    def test_passages_sorted_by_distance(self):
+        """Test that passages from different files keep best-first order"""
+        collection = FakeCollection({"a.txt": ["a0"], "b.txt": ["b0"]})
+
+        result = expand_neighbours(
+            collection, make_results([("a.txt", 0, 0.9), ("b.txt", 0, 0.1)])
+        )
+
+        assert result["documents"] == [["b0", "a0"]]
+
+    def test_window_zero_returns_results_unchanged(self):
+        """Test that expansion can be disabled"""
+        results = make_results([("a.txt", 0, 0.1)])
+
+        assert expand_neighbours(FakeCollection({}), results, window=0) is results
+
+
+def test_merge_chunks_drops_overlap():
+    """Test that text repeated by the splitter overlap appears only once"""
+    parts = ["The quick brown fox jumps", "brown fox jumps over the lazy dog"]
+
+    assert merge_chunks(parts) == "The quick brown fox jumps over the lazy dog"
+
+
+def test_merge_chunks_without_overlap_needs_separator():
+    """Test that chunks sharing no overlap are only joined with an explicit separator"""
+    parts = ["The quick brown fox", "jumps over the lazy dog"]
+
+    with pytest.raises(ValueError):
+        merge_chunks(parts)
+    assert merge_chunks(parts, separator="\n\n") == "The quick brown fox\n\njumps over the lazy dog"
+
+
+class TestParseFileQuery:
+    """Test suite for extracting file hints from questions"""
+
+    def test_extension_and_folder(self):
+        """Test that file types and "under <folder>" are recognised"""
+        parsed = parse_file_query("list the PDFs under /contracts")
+
+        assert parsed["extension"] == ".pdf"
+        assert parsed["folder"] == "/contracts"
+        assert parsed["terms"] == []
+
+    def test_named_folder(self):
+        """Test the "in the folder X" and "in X folder" phrasings"""
+        assert parse_file_query("what is in the folder finance")["folder"] == "finance"
+        assert parse_file_query("files inside HR folder")["folder"] == "HR"
+
+    def test_plural_terms_are_singularised(self):
+        """Test that keywords are reduced so plurals match file names"""
+        parsed = parse_file_query("which files mention invoices?")
+
+        assert parsed["terms"] == ["invoice"]
+        assert parsed["mentions_files"] is True
+
+    def test_content_question_does_not_mention_files(self):
+        """Test that ordinary questions are not treated as file listings"""
+        parsed = parse_file_query("what is the total budget")
+
+        assert parsed["mentions_files"] is False
+        assert parsed["folder"] is None
+
+
+class TestSearchFiles:
+    """Test suite for answering file questions from the path index"""
+
+    def test_list_pdfs_under_folder(self):
+        """Test listing files of one type inside a folder"""
+        index = PathIndex.from_files(FILES)
+
+        result = search_files(index, "list the PDFs under /contracts")
+
+        assert result == ["/srv/docs/contracts/acme.pdf"]
+
+    def test_files_matching_name(self):
+        """Test that file-name keywords find matching files"""
+        index = PathIndex.from_files(FILES)
+
+        result = search_files(index, "which files mention invoices")
+
+        assert result == ["/srv/docs/finance/invoice_2024.pdf"]
+
+    def test_generic_file_question_lists_files(self):
+        """Test that a general question about files lists indexed files"""
+        index = PathIndex.from_files(FILES)
+
+        result = search_files(index, "what files are indexed?", limit=3)
+
+        assert len(result) == 3
+
+    def test_unrelated_question_returns_nothing(self):
+        """Test that content questions with no name match return no files"""
+        index = PathIndex.from_files(FILES)
+
+        assert search_files(index, "who signed the agreement") == []
+
+    def test_missing_index(self):
+        """Test that a missing path index is handled gracefully"""
+        assert search_files(None, "list all files") == []
@@ -0,0 +1,227 @@
+# type: ignore
+
+"""
+Unit tests for sharded_indexing.py
+
+Tests deterministic shard assignment, indexing shards in worker processes,
+resuming completed shards, merging shards and opening them for federated search.
+"""
+
+import sys
+import os
+
+import chromadb
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from embeddings import EmbeddingModelError
+from numpy_backend import NumpyCollection
+from retrieval_system import query_collections
+from sharded_indexing import (
+    load_shards,
+    merge_shards,
+    open_shards,
+    run_sharded_indexing,
+    shard_directory,
+    shard_of,
+    split_files,
+)
+from vector_store import get_aliases
+
+
+class FakeEmbeddingFunction(chromadb.EmbeddingFunction):
+    """Deterministic offline embedder; module level so worker processes can unpickle it"""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[float(len(text)), float(text.count("a")), 1.0] for text in input]
+
+    @staticmethod
+    def name():
+        return "fake"
+
+
+def make_files(tmp_path, count=6):
+    """Write small text files and return their paths"""
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    files = []
+    for i in range(count):
+        path = folder / f"file_{i}.txt"
+        path.write_text(f"document number {i} " + "a" * i, encoding="utf-8")
+        files.append(str(path))
+    return files
+
+
+def test_shard_assignment_is_deterministic():
+    """Test that every path maps to one stable shard regardless of separators"""
+    files = [f"data/folder/file_{i}.txt" for i in range(100)]
+
+    shards = split_files(files, 4)
+
+    assert sorted(file for shard in shards for file in shard) == sorted(files)
+    assert all(shards)
+    assert shard_of("data/folder/file_1.txt", 4) == shard_of("data\\folder\\file_1.txt", 4)
+
+
+def test_sharded_indexing_in_processes(tmp_path):
+    """Test that worker processes index each shard into its own store"""
+    files = make_files(tmp_path)
+    directory = str(tmp_path / "shards")
+
+    manifests = run_sharded_indexing(
+        "docs",
+        files,
+        3,
+        processes=2,
+        backend="numpy",
+        directory=directory,
+        embedding_function=FakeEmbeddingFunction(),
+    )
+
+    assert [manifest["shard"] for manifest in manifests] == [0, 1, 2]
+    assert sum(manifest["chunks"] for manifest in manifests) == len(files)
+    settings, stored = load_shards("docs", directory)
+    assert settings["num_shards"] == 3
+    assert all(manifest["status"] == "complete" for manifest in stored)
+
+
+def test_completed_shards_are_skipped(tmp_path):
+    """Test that re-running only indexes shards that did not complete"""
+    files = make_files(tmp_path)
+    directory = str(tmp_path / "shards")
+    options = {
+        "processes": 1,
+        "backend": "numpy",
+        "directory": directory,
+        "embedding_function": FakeEmbeddingFunction(),
+    }
+
+    run_sharded_indexing("docs", files, 2, shards=[0], **options)
+    manifests = run_sharded_indexing("docs", files, 2, **options)
+
+    assert manifests[0].get("skipped") is True
+    assert not manifests[1].get("skipped")
+
+
+def test_failed_files_mark_shard_partial(tmp_path):
+    """Test that a shard with failing files is retried and still mergeable"""
+
+    def failing_embed(texts):
+        raise RuntimeError("embedding service unavailable")
+
+    files = make_files(tmp_path, count=2)
+    directory = str(tmp_path / "shards")
+    options = {"processes": 1, "backend": "numpy", "directory": directory}
+
+    manifests = run_sharded_indexing("docs", files, 1, embedding_function=failing_embed, **options)
+    retried = run_sharded_indexing(
+        "docs", files, 1, embedding_function=FakeEmbeddingFunction(), **options
+    )
+
+    assert manifests[0]["status"] == "partial"
+    assert sorted(manifests[0]["failed"]) == sorted(files)
+    assert not retried[0].get("skipped")
+    assert retried[0]["status"] == "complete"
+
+
+def test_duplicates_are_embedded_once_per_shard(tmp_path):
+    """Test that copies within a shard become aliases and shortened files lose stale chunks"""
+    files = make_files(tmp_path, count=2)
+    copy = tmp_path / "docs" / "copy of file_1.txt"
+    copy.write_text(open(files[1], encoding="utf-8").read(), encoding="utf-8")
+    long_file = tmp_path / "docs" / "long.txt"
+    long_file.write_text("word " * 200, encoding="utf-8")
+    files += [str(copy), str(long_file)]
+    directory = str(tmp_path / "shards")
+    options = {
+        "processes": 1,
+        "backend": "numpy",
+        "directory": directory,
+        "embedding_function": FakeEmbeddingFunction(),
+    }
+
+    manifests = run_sharded_indexing("docs", files, 1, **options)
+    # The file shrinks and the shard is indexed again, as after an interrupted run
+    long_file.write_text("word", encoding="utf-8")
+    os.remove(os.path.join(shard_directory("docs", 0, directory), "shard.json"))
+    rerun = run_sharded_indexing("docs", files, 1, **options)
+
+    assert manifests[0]["duplicates"] == 1
+    assert manifests[0]["chunks"] > 3
+    assert rerun[0]["chunks"] == 3
+    (collection,) = open_shards("docs", directory, FakeEmbeddingFunction())
+    stored = collection.get(where={"source": files[1]})
+    assert collection.count() == 3
+    assert get_aliases(stored["metadatas"][0]) == [str(copy)]
+
+
+def test_merge_shards_copies_embeddings(tmp_path):
+    """Test that merging upserts every shard's chunks with their stored embeddings"""
+    files = make_files(tmp_path)
+    directory = str(tmp_path / "shards")
+    run_sharded_indexing(
+        "docs",
+        files,
+        3,
+        processes=1,
+        backend="chroma",
+        directory=directory,
+        embedding_function=FakeEmbeddingFunction(),
+    )
+    target = NumpyCollection(
+        str(tmp_path / "merged"), "merged", embedding_function=FakeEmbeddingFunction()
+    )
+
+    stats = merge_shards("docs", target, directory)
+
+    assert stats["shards"] == 3
+    assert stats["chunks"] == target.count() == len(files)
+    assert sorted(stats["files"]) == sorted(files)
+    assert stats["missing"] == []
+
+
+def test_merge_refuses_shards_of_another_model(tmp_path):
+    """Test that shards embedded with another model are not merged"""
+    files = make_files(tmp_path, count=2)
+    directory = str(tmp_path / "shards")
+    run_sharded_indexing(
+        "docs",
+        files,
+        1,
+        processes=1,
+        backend="numpy",
+        directory=directory,
+        embedding_function=FakeEmbeddingFunction(),
+    )
+    target = NumpyCollection(
+        str(tmp_path / "merged"), "merged", embedding_function=lambda texts: [[1.0]] * len(texts)
+    )
+
+    with pytest.raises(EmbeddingModelError):
+        merge_shards("docs", target, directory)
+
+
+def test_open_shards_for_federated_search(tmp_path):
+    """Test that completed shards can be searched together"""
+    files = make_files(tmp_path)
+    directory = str(tmp_path / "shards")
+    run_sharded_indexing(
+        "docs",
+        files,
+        2,
+        processes=1,
+        backend="numpy",
+        directory=directory,
+        embedding_function=FakeEmbeddingFunction(),
+    )
+
+    shards = open_shards("docs", directory, embedding_function=FakeEmbeddingFunction())
+    results = query_collections(shards, "document number 5 aaaaa", n_results=len(files))
+
+    assert len(shards) == 2
+    assert len(results["ids"][0]) == len(files)
+    assert [shard["status"] for shard in results["shards"]] == ["ok", "ok"]
@@ -0,0 +1,252 @@
+# type: ignore
+
+"""
+Unit tests for snapshot.py
+
+Tests exporting collections to snapshot files, importing them into either
+backend without re-embedding, and rejecting corrupt or newer snapshots.
+"""
+
+import sys
+import os
+import json
+import zipfile
+
+import chromadb
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from numpy_backend import NumpyCollection
+from path_index import PathIndex, path_index_file
+from snapshot import (
+    SNAPSHOT_FORMAT,
+    SnapshotError,
+    export_snapshot,
+    import_snapshot,
+    read_manifest,
+)
+from vector_store import INDEX_PARAMS, create_collection
+
+
+class FakeEmbeddingFunction(chromadb.EmbeddingFunction):
+    """Deterministic offline embedder"""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[float(len(text)), float(text.count("a")), 1.0, 0.5] for text in input]
+
+    @staticmethod
+    def name():
+        return "fake"
+
+
+def fail_embed(texts):
+    """Embedder that must never be called during snapshot import"""
+    raise AssertionError("snapshot import must not re-embed chunks")
+
+
+def make_source(tmp_path, count=5):
+    """NumPy collection with explicit embeddings and a saved path index"""
+    collection = NumpyCollection(
+        str(tmp_path / "source"),
+        "source",
+        metadata={"chunk_format": 3},
+        embedding_function=fail_embed,
+    )
+    rng = np.random.default_rng(0)
+    collection.upsert(
+        ids=[f"id-{i}" for i in range(count)],
+        documents=[f"chunk {i} é" for i in range(count)],
+        metadatas=[{"source": f"doc{i % 2}.txt", "chunk": i} for i in range(count)],
+        embeddings=rng.standard_normal((count, 4)),
+    )
+    index_dir = str(tmp_path / "path_index")
+    PathIndex.from_files(["doc0.txt", "doc1.txt"]).save(path_index_file("source", index_dir))
+    return collection, index_dir
+
+
+class TestSnapshot:
+    """Test suite for snapshot export and import"""
+
+    def test_round_trip_keeps_chunks_and_vectors(self, tmp_path):
+        """Test that an imported snapshot matches the exported collection"""
+        source, index_dir = make_source(tmp_path)
+        snapshot = str(tmp_path / "source.snapshot")
+
+        manifest = export_snapshot(source, snapshot, path_index_dir=index_dir, batch_size=2)
+        stats = import_snapshot(
+            snapshot,
+            path="copy",
+            backend="numpy",
+            directory=str(tmp_path / "replica"),
+            embedding_function=fail_embed,
+            path_index_dir=str(tmp_path / "replica_index"),
+            batch_size=2,
+        )
+
+        assert manifest["chunks"] == stats["chunks"] == 5
+        copy = NumpyCollection(str(tmp_path / "replica" / "numpy" / "copy"), "copy")
+        original = source.get(ids=["id-3"], include=["documents", "metadatas", "embeddings"])
+        restored = copy.get(ids=["id-3"], include=["documents", "metadatas", "embeddings"])
+        assert restored["documents"] == original["documents"]
+        assert restored["metadatas"] == original["metadatas"]
+        assert np.allclose(restored["embeddings"], original["embeddings"])
+        assert copy.metadata["chunk_format"] == 3
+        assert PathIndex.load(path_index_file("copy", str(tmp_path / "replica_index")))
+
+    def test_import_into_chroma(self, tmp_path):
+        """Test that a snapshot loads into a Chroma collection"""
+        source, index_dir = make_source(tmp_path)
+        snapshot = str(tmp_path / "source.snapshot")
+        export_snapshot(source, snapshot, path_index_dir=index_dir)
+
+        stats = import_snapshot(
+            snapshot,
+            backend="chroma",
+            directory=str(tmp_path / "chroma"),
+            embedding_function=fail_embed,
+            path_index_dir=str(tmp_path / "replica_index"),
+        )
+
+        assert stats["collection"] == "source"
+        assert stats["chunks"] == 5
+
+    def test_chroma_round_trip(self, tmp_path):
+        """Test that a Chroma export imports into Chroma with its HNSW settings"""
+        source, _ = make_source(tmp_path)
+        chroma = create_collection(
+            "chroma_source",
+            backend="chroma",
+            embedding_function=FakeEmbeddingFunction(),
+            index_params="space=cosine,ef_search=40",
+            directory=str(tmp_path / "chroma"),
+        )
+        stored = source.get(include=["documents", "metadatas", "embeddings"])
+        chroma.upsert(
+            ids=stored["ids"],
+            documents=stored["documents"],
+            metadatas=stored["metadatas"],
+            embeddings=stored["embeddings"],
+        )
+        snapshot = str(tmp_path / "chroma.snapshot")
+
+        manifest = export_snapshot(
+            chroma, snapshot, path_index_dir=str(tmp_path / "path_index")
+        )
+        stats = import_snapshot(
+            snapshot,
+            path="chroma_copy",
+            backend="chroma",
+            directory=str(tmp_path / "replica"),
+            embedding_function=FakeEmbeddingFunction(),
+            path_index_dir=str(tmp_path / "replica_index"),
+        )
+
+        assert set(manifest["index_params"]) <= set(INDEX_PARAMS)
+        assert stats["chunks"] == 5
+        copy = create_collection(
+            "chroma_copy",
+            backend="chroma",
+            embedding_function=FakeEmbeddingFunction(),
+            directory=str(tmp_path / "replica"),
+        )
+        assert copy.configuration["hnsw"]["space"] == "cosine"
+        restored = copy.get(ids=["id-3"], include=["documents", "embeddings"])
+        assert restored["documents"] == ["chunk 3 é"]
+        assert np.allclose(restored["embeddings"][0], stored["embeddings"][3])
+
+    def test_unknown_index_params_are_ignored(self, tmp_path):
+        """Test that settings create_collection does not accept are dropped on import"""
+        source, index_dir = make_source(tmp_path)
+        snapshot = str(tmp_path / "source.snapshot")
+        manifest = export_snapshot(source, snapshot, path_index_dir=index_dir)
+        manifest["index_params"] = {"space": "l2", "resize_factor": 1.2, "sync_threshold": 1000}
+        rewritten = str(tmp_path / "rewritten.snapshot")
+        with zipfile.ZipFile(snapshot) as old, zipfile.ZipFile(rewritten, "w") as new:
+            for member in old.namelist():
+                data = json.dumps(manifest) if member == "manifest.json" else old.read(member)
+                new.writestr(member, data)
+
+        stats = import_snapshot(
+            rewritten,
+            backend="chroma",
+            directory=str(tmp_path / "chroma"),
+            embedding_function=fail_embed,
+            path_index_dir=str(tmp_path / "replica_index"),
+        )
+
+        assert stats["chunks"] == 5
+
+    def test_non_empty_target_requires_replace(self, tmp_path):
+        """Test that importing over existing chunks needs replace=True"""
+        source, index_dir = make_source(tmp_path)
+        snapshot = str(tmp_path / "source.snapshot")
+        export_snapshot(source, snapshot, path_index_dir=index_dir)
+        options = {
+            "backend": "numpy",
+            "directory": str(tmp_path / "replica"),
+            "embedding_function": fail_embed,
+            "path_index_dir": str(tmp_path / "replica_index"),
+        }
+        import_snapshot(snapshot, **options)
+
+        with pytest.raises(SnapshotError):
+            import_snapshot(snapshot, **options)
+        assert import_snapshot(snapshot, replace=True, **options)["chunks"] == 5
+
+    def test_model_mismatch_is_rejected(self, tmp_path):
+        """Test that a snapshot from another model is refused unless explicitly allowed"""
+        source, index_dir = make_source(tmp_path)
+        snapshot = str(tmp_path / "source.snapshot")
+        export_snapshot(source, snapshot, path_index_dir=index_dir)
+        options = {
+            "backend": "numpy",
+            "directory": str(tmp_path / "replica"),
+            "embedding_function": FakeEmbeddingFunction(),
+            "path_index_dir": str(tmp_path / "replica_index"),
+        }
+
+        with pytest.raises(SnapshotError):
+            import_snapshot(snapshot, **options)
+        stats = import_snapshot(snapshot, allow_model_mismatch=True, **options)
+
+        assert stats["chunks"] == 5
+        copy = NumpyCollection(str(tmp_path / "replica" / "numpy" / "source"), "source")
+        # The collection keeps recording the model its queries are embedded with
+        assert copy.metadata["embedding_model"] == "fake"
+
+    def test_corrupt_member_is_rejected(self, tmp_path):
+        """Test that a checksum mismatch is detected"""
+        source, index_dir = make_source(tmp_path)
+        snapshot = str(tmp_path / "source.snapshot")
+        manifest = export_snapshot(source, snapshot, path_index_dir=index_dir)
+        manifest["checksums"]["chunks.jsonl"] = "0" * 64
+        rewritten = str(tmp_path / "rewritten.snapshot")
+        with zipfile.ZipFile(snapshot) as old, zipfile.ZipFile(rewritten, "w") as new:
+            for member in old.namelist():
+                data = json.dumps(manifest) if member == "manifest.json" else old.read(member)
+                new.writestr(member, data)
+
+        with pytest.raises(SnapshotError):
+            read_manifest(rewritten)
+
+    def test_newer_format_is_rejected(self, tmp_path):
+        """Test that snapshots from a newer format version are refused"""
+        snapshot = str(tmp_path / "future.snapshot")
+        with zipfile.ZipFile(snapshot, "w") as archive:
+            archive.writestr("manifest.json", json.dumps({"format": SNAPSHOT_FORMAT + 1}))
+
+        with pytest.raises(SnapshotError):
+            read_manifest(snapshot)
+
+    def test_not_a_snapshot(self, tmp_path):
+        """Test that arbitrary files raise SnapshotError"""
+        bogus = tmp_path / "bogus.snapshot"
+        bogus.write_text("not a zip", encoding="utf-8")
+
+        with pytest.raises(SnapshotError):
+            read_manifest(str(bogus))
@@ -0,0 +1,129 @@
+# type: ignore
+
+"""
+Startup tests for the entry points
+
+Imports what cli.py, app.py and manage.py import at startup in a fresh
+interpreter and checks the -X importtime total against a budget, that heavy
+dependencies are only imported on first use, and that importing does not read
+the .env file.
+"""
+
+import ast
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+
+# Seconds the project modules of one entry point may take to import. They take
+# about 0.05 s; importing chromadb or LangChain eagerly costs well over 0.5 s.
+STARTUP_BUDGET = 0.3
+
+# Packages that must not be imported until they are needed
+HEAVY_PACKAGES = (
+    "chromadb",
+    "langchain",
+    "langchain_core",
+    "langchain_google_genai",
+    "langchain_text_splitters",
+    "pypdf",
+    "docx",
+    "odf",
+)
+
+
+def project_imports(entry_point):
+    """Return the project modules an entry point imports at the top level"""
+    with open(os.path.join(SRC, entry_point), "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        elif isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        modules += [
+            name for name in names if os.path.exists(os.path.join(SRC, f"{name}.py"))
+        ]
+    return modules
+
+
+def run_python(code, cwd=SRC, importtime=False):
+    """Run code in a fresh interpreter and return the completed process"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    env = {**os.environ, "PYTHONPATH": os.path.abspath(SRC)}
+    return subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True, check=True)
+
+
+def import_seconds(stderr, modules):
+    """Sum the cumulative -X importtime of the given top-level imports"""
+    total = 0.0
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() in modules and not parts[2].startswith("  "):
+            total += int(parts[1]) / 1e6
+    return total
+
+
+@pytest.mark.parametrize("entry_point", ["cli.py", "app.py", "manage.py"])
+class TestEntryPointImports:
+    """Test cases for the import cost of each entry point"""
+
+    def test_within_budget(self, entry_point):
+        """Test that the entry point's project modules import within the budget"""
+        modules = project_imports(entry_point)
+        result = run_python(f"import {', '.join(modules)}", importtime=True)
+
+        seconds = import_seconds(result.stderr, modules)
+
+        assert 0 < seconds < STARTUP_BUDGET, f"{entry_point} imports took {seconds:.2f} s"
+
+    def test_heavy_packages_not_imported(self, entry_point):
+        """Test that no heavy dependency is imported at startup"""
+        modules = project_imports(entry_point)
+        code = (
+            f"import sys, json; import {', '.join(modules)}; "
+            "print(json.dumps(sorted({name.split('.')[0] for name in sys.modules})))"
+        )
+
+        loaded = set(json.loads(run_python(code).stdout))
+
+        assert loaded.isdisjoint(HEAVY_PACKAGES), sorted(loaded & set(HEAVY_PACKAGES))
+
+
+class TestLazyImports:
+    """Test cases for importing dependencies on first use"""
+
+    def test_txt_loading_skips_document_parsers(self, tmp_path):
+        """Test that loading a text file does not import the PDF, DOCX or ODT parsers"""
+        file = tmp_path / "notes.txt"
+        file.write_text("plain text", encoding="utf-8")
+        code = (
+            "import sys; from document_loader import LOADERS; "
+            f"print(LOADERS['.txt']({str(file)!r})); "
+            "print(any(name in sys.modules for name in ('pypdf', 'docx', 'odf')))"
+        )
+
+        output = run_python(code).stdout.split()
+
+        assert output == ["plain", "text", "False"]
+
+    def test_env_file_not_read_on_import(self, tmp_path):
+        """Test that importing response_generator leaves the environment alone"""
+        (tmp_path / ".env").write_text("STARTUP_TEST_SETTING=from-env-file\n", encoding="utf-8")
+        code = (
+            "import os, response_generator; "
+            "print(os.getenv('STARTUP_TEST_SETTING', 'unset')); "
+            "from utils import load_environment; load_environment(); "
+            "print(os.getenv('STARTUP_TEST_SETTING'))"
+        )
+
+        output = run_python(code, cwd=str(tmp_path)).stdout.split()
+
+        assert output == ["unset", "from-env-file"]
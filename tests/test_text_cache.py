@@ -0,0 +1,208 @@
+# type: ignore
+
+"""
+Unit tests for text_cache.py
+
+Tests that extracted text is reused for identical file contents and loader
+versions, stored compressed, evicted least recently used first past the size
+cap, and reported with its hit rate.
+"""
+
+import sys
+import os
+import shutil
+import zlib
+
+import chromadb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import text_cache
+from indexing_jobs import IndexingJob
+from manage import main
+from text_cache import STATS_FILE, TextCache
+
+
+class FakeEmbeddingFunction(chromadb.EmbeddingFunction):
+    """Deterministic offline embedder"""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[float(len(text)), float(text.count("a")), 1.0] for text in input]
+
+    @staticmethod
+    def name():
+        return "fake"
+
+
+class CountingLoader:
+    """Loader returning a file's bytes as text and counting its calls"""
+
+    def __init__(self, result=None):
+        self.calls = 0
+        self.result = result
+
+    def __call__(self, filepath):
+        self.calls += 1
+        if self.result is not None:
+            return self.result
+        with open(filepath, "r", encoding="utf-8") as file:
+            return "extracted: " + file.read() * 20
+
+
+def write(path, content):
+    """Write a text file and return its path"""
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+class TestTextCache:
+    """Test cases for TextCache"""
+
+    def test_second_load_skips_extraction(self, tmp_path):
+        """Test that a document is extracted once and its text stored compressed"""
+        cache = TextCache(str(tmp_path / "cache"))
+        loader = CountingLoader()
+        pdf = write(tmp_path / "report.pdf", "quarterly budget ")
+
+        first = cache.load(pdf, loader)
+        second = cache.load(pdf, loader)
+
+        assert first == second and loader.calls == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+        (entry,) = [name for name in os.listdir(cache.directory) if name.endswith(".z")]
+        with open(os.path.join(cache.directory, entry), "rb") as file:
+            data = file.read()
+        assert zlib.decompress(data).decode("utf-8") == first
+        assert len(data) < len(first)
+
+    def test_keyed_by_content_and_loader_version(self, tmp_path, monkeypatch):
+        """Test that copies hit, while edited files and new loader versions miss"""
+        cache = TextCache(str(tmp_path / "cache"))
+        loader = CountingLoader()
+        pdf = write(tmp_path / "report.pdf", "version one")
+        cache.load(pdf, loader)
+        copy = str(tmp_path / "copy of report.pdf")
+        shutil.copy(pdf, copy)
+
+        cache.load(copy, loader)
+        assert loader.calls == 1
+
+        write(tmp_path / "report.pdf", "version two")
+        assert cache.load(pdf, loader) == "extracted: " + "version two" * 20
+        assert loader.calls == 2
+
+        monkeypatch.setitem(text_cache.LOADER_VERSIONS, ".pdf", 99)
+        cache.load(copy, loader)
+        assert loader.calls == 3
+
+    def test_plain_text_and_failures_are_not_cached(self, tmp_path):
+        """Test that TXT files and failed extractions always run the loader"""
+        cache = TextCache(str(tmp_path / "cache"))
+        txt = write(tmp_path / "notes.txt", "notes")
+        loader = CountingLoader()
+        cache.load(txt, loader)
+        cache.load(txt, loader)
+
+        failing = CountingLoader(result="")
+        pdf = write(tmp_path / "broken.pdf", "not a pdf")
+        cache.load(pdf, failing)
+        cache.load(pdf, failing)
+
+        assert loader.calls == 2 and failing.calls == 2
+        assert not os.path.exists(cache.directory)
+
+    def test_disabled_cache_writes_nothing(self, tmp_path):
+        """Test that a cap of 0 turns the cache off"""
+        cache = TextCache(str(tmp_path / "cache"), max_bytes=0)
+        loader = CountingLoader()
+        pdf = write(tmp_path / "report.pdf", "budget")
+
+        cache.load(pdf, loader)
+        cache.load(pdf, loader)
+
+        assert loader.calls == 2
+        assert not os.path.exists(cache.directory)
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test that entries are evicted oldest use first once over the cap"""
+        cache = TextCache(str(tmp_path / "cache"))
+        texts = {f"doc{i}": os.urandom(1500).hex() for i in range(4)}
+        for i, key in enumerate(["doc0", "doc1", "doc2"]):
+            cache.put(key, texts[key])
+            os.utime(cache._path(key), (1000 + i, 1000 + i))
+        # Room for three and a half entries
+        cache.max_bytes = int(3.5 * os.path.getsize(cache._path("doc0")))
+        # doc0 is read again, so doc1 is now the least recently used
+        assert cache.get("doc0") == texts["doc0"]
+
+        cache.put("doc3", texts["doc3"])
+
+        assert cache.get("doc1") is None
+        assert all(cache.get(key) == texts[key] for key in ("doc0", "doc2", "doc3"))
+        assert cache.report()["bytes"] <= cache.max_bytes
+
+    def test_report_accumulates_runs(self, tmp_path):
+        """Test that the hit rate covers every saved run and clear resets it"""
+        directory = str(tmp_path / "cache")
+        pdf = write(tmp_path / "report.pdf", "budget")
+        for _ in range(2):
+            cache = TextCache(directory)
+            cache.load(pdf, CountingLoader())
+            cache.load(pdf, CountingLoader())
+            cache.save_stats()
+            cache.save_stats()
+
+        report = TextCache(directory).report()
+
+        assert (report["entries"], report["hits"], report["misses"]) == (1, 3, 1)
+        assert report["hit_rate"] == 0.75
+        assert TextCache(directory).clear() == 1
+        assert TextCache(directory).report()["hit_rate"] is None
+        assert not os.path.exists(os.path.join(directory, STATS_FILE))
+
+
+def test_reindexing_reuses_extracted_text(tmp_path):
+    """Test that indexing a folder again reads documents from the cache"""
+    import docx
+
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    document = docx.Document()
+    document.add_paragraph("The travel budget for 2024 is 10,000 EUR.")
+    document.save(str(folder / "budget.docx"))
+    files = [str(folder / "budget.docx")]
+    cache = TextCache(str(tmp_path / "cache"))
+
+    for _ in range(2):
+        job = IndexingJob(
+            "key",
+            str(folder),
+            files,
+            directory=str(tmp_path / "store"),
+            embedding_function=FakeEmbeddingFunction(),
+            path_index_dir=str(tmp_path / "path_index"),
+            text_cache=cache,
+        ).start()
+        assert job.wait(10)
+        assert job.status()["chunks"] == 1
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.report()["hit_rate"] == 0.5
+
+
+def test_text_cache_command(tmp_path, capsys):
+    """Test that manage.py text-cache prints the size and hit rate"""
+    directory = str(tmp_path / "cache")
+    cache = TextCache(directory)
+    pdf = write(tmp_path / "report.pdf", "budget")
+    cache.load(pdf, CountingLoader())
+    cache.load(pdf, CountingLoader())
+    cache.save_stats()
+
+    assert main(["text-cache", "--directory", directory]) == 0
+
+    output = capsys.readouterr().out
+    assert "1 documents" in output and "50% of extractions skipped" in output
@@ -13,7 +13,7 @@ import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from utils import sanitize_filename
+from utils import sanitize_filename, estimate_tokens, env_number
 
 
 class TestSanitizeFilename:
@@ -91,3 +91,23 @@ def test_sanitize_preserves_numbers():
     filename = "report2024_v2.pdf"
     result = sanitize_filename(filename)
     assert result == "report2024_v2.pdf"
+
+
+def test_estimate_tokens():
+    """Test the ~4 characters per token heuristic and empty input"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a") == 1
+    assert estimate_tokens("x" * 400) == 100
+
+
+def test_env_number(monkeypatch, capsys):
+    """Test that numeric settings take the default's type and fall back when invalid"""
+    monkeypatch.setenv("TEST_SETTING", "2.5")
+    assert env_number("TEST_SETTING", 1.0) == 2.5
+
+    monkeypatch.setenv("TEST_SETTING", "")
+    assert env_number("TEST_SETTING", 3) == 3
+
+    monkeypatch.setenv("TEST_SETTING", "many")
+    assert env_number("TEST_SETTING", 3) == 3
+    assert "Ignoring invalid TEST_SETTING" in capsys.readouterr().out
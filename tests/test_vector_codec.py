@@ -0,0 +1,103 @@
+# type: ignore
+
+"""
+Unit tests for vector_codec.py
+
+Tests parsing of compression specs and the fitted PCA/truncation and int8
+codecs: round trips, scoring on codes and persistence.
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from vector_codec import VectorCodec, parse_compression
+
+
+def unit_vectors(count, dim, latent=4, seed=0):
+    """Unit vectors lying close to a low-dimensional subspace"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, latent)) @ rng.standard_normal((latent, dim))
+    vectors += 0.01 * rng.standard_normal((count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+class TestParseCompression:
+    """Test suite for compression specs"""
+
+    def test_full_spec(self):
+        """Test that every option of a spec is parsed"""
+        assert parse_compression("int8, pca:128, rescore") == {
+            "dtype": "int8",
+            "dims": 128,
+            "method": "pca",
+            "rescore": True,
+        }
+
+    def test_empty_spec(self):
+        """Test that an empty spec means no compression"""
+        assert parse_compression("") is None
+        assert parse_compression(None) is None
+
+    def test_unknown_option(self):
+        """Test that unknown options are rejected"""
+        with pytest.raises(ValueError):
+            parse_compression("int4")
+
+
+class TestVectorCodec:
+    """Test suite for fitted codecs"""
+
+    def test_pca_round_trip(self):
+        """Test that PCA to the latent dimension reconstructs vectors closely"""
+        vectors = unit_vectors(300, 32)
+        codec = VectorCodec.fit(vectors, dims=4)
+
+        codes = codec.encode(vectors)
+
+        assert codes.shape == (300, 4)
+        assert np.abs(codec.decode(codes) - vectors).max() < 0.1
+
+    def test_int8_codes(self):
+        """Test that int8 codes use the full range and decode approximately"""
+        vectors = unit_vectors(300, 16)
+        codec = VectorCodec.fit(vectors, dtype="int8")
+
+        codes = codec.encode(vectors)
+
+        assert codes.dtype == np.int8
+        assert np.abs(codes).max() == 127
+        assert np.abs(codec.decode(codes) - vectors).max() < 0.02
+
+    def test_truncate_keeps_leading_dimensions(self):
+        """Test that truncation keeps the first dimensions unchanged"""
+        vectors = unit_vectors(10, 8)
+        codec = VectorCodec.fit(vectors, dims=3, method="truncate")
+
+        assert np.allclose(codec.encode(vectors), vectors[:, :3])
+
+    def test_scores_on_codes_match_decoded_vectors(self):
+        """Test that query weights score codes like the decoded vectors"""
+        vectors = unit_vectors(300, 32)
+        codec = VectorCodec.fit(vectors, dtype="int8", dims=8)
+        codes = codec.encode(vectors)
+
+        weights, offsets = codec.prepare_queries(vectors[:5])
+        scores = codes.astype(np.float32) @ weights.T + offsets
+
+        assert np.allclose(scores.T, vectors[:5] @ codec.decode(codes).T, atol=1e-4)
+
+    def test_save_and_load(self, tmp_path):
+        """Test that a saved codec encodes identically after loading"""
+        vectors = unit_vectors(300, 16)
+        codec = VectorCodec.fit(vectors, dtype="int8", dims=4)
+        codec.save(str(tmp_path / "codec.npz"))
+
+        loaded = VectorCodec.load(str(tmp_path / "codec.npz"))
+
+        assert loaded.dtype == np.int8
+        assert np.array_equal(loaded.encode(vectors), codec.encode(vectors))
@@ -9,13 +9,56 @@ including metadata generation and document splitting logic.
 
 import sys
 import os
+import uuid
+
+import chromadb
+import pytest
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from vector_store import chunk_text, create_file_index_chunk
+import vector_store
+from vector_store import (
+    CHUNK_FORMAT,
+    CollectionNotFoundError,
+    add_alias,
+    add_chunks,
+    chunk_id,
+    chunk_text,
+    create_collection,
+    get_aliases,
+    get_index_params,
+    LEGACY_FILE_INDEX_SOURCE,
+    migrate_collection,
+    open_collection,
+    parse_index_params,
+)
 from langchain.schema import Document
 
 
+class FakeEmbeddingFunction(chromadb.EmbeddingFunction):
+    """Deterministic offline embedder so tests never download a model"""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[float(len(text)), float(text.count(" ")), 1.0] for text in input]
+
+    @staticmethod
+    def name():
+        return "fake"
+
+
+def make_collection(metadata=None):
+    """Create an isolated in-memory collection using the fake embedder"""
+    client = chromadb.EphemeralClient()
+    return client.create_collection(
+        name=f"test-{uuid.uuid4().hex}",
+        metadata=metadata,
+        embedding_function=FakeEmbeddingFunction(),
+    )
+
+
 class TestChunkText:
     """Test suite for text chunking functionality"""
 
@@ -40,15 +83,16 @@ class TestChunkText:
         assert result[0].metadata["source"] == file
         assert "chunk" in result[0].metadata
 
-    def test_chunk_includes_source_in_content(self):
-        """Test that source file reference is prepended to chunk content"""
+    def test_chunk_stores_raw_content_without_source_header(self):
+        """Test that the source path lives in metadata only, not in chunk content"""
         text = "Test content"
         file = "myfile.txt"
 
         result = chunk_text(text, file)
 
-        assert "[Source: myfile.txt]" in result[0].page_content
-        assert "Test content" in result[0].page_content
+        assert result[0].page_content == "Test content"
+        assert "[Source:" not in result[0].page_content
+        assert result[0].metadata["source"] == "myfile.txt"
 
     def test_chunk_long_text_creates_multiple_chunks(self):
         """Test that text longer than chunk_size (500 chars) is split"""
@@ -67,6 +111,15 @@ class TestChunkText:
         for i, doc in enumerate(result):
             assert doc.metadata["chunk"] == i
 
+    def test_chunk_respects_custom_size(self):
+        """Test that chunk_size bounds the length of every chunk"""
+        text = "word " * 400
+
+        result = chunk_text(text, "test.txt", chunk_size=100, chunk_overlap=10)
+
+        assert all(len(doc.page_content) <= 100 for doc in result)
+        assert len(result) > len(chunk_text(text, "test.txt", chunk_size=1000))
+
     def test_chunk_empty_text(self):
         """Test that empty text input is handled gracefully"""
         text = ""
@@ -83,69 +136,211 @@ class TestChunkText:
         assert isinstance(result[0], Document)
 
 
-class TestCreateFileIndexChunk:
-    """Test suite for file index chunk creation"""
-
-    def test_create_index_with_single_file(self):
-        """Test that single file is properly formatted in index"""
-        files = ["file1.txt"]
-
-        result = create_file_index_chunk(files)
-
-        assert isinstance(result, list)
-        assert len(result) >= 1
-        assert isinstance(result[0], Document)
-        assert "file1.txt" in result[0].page_content
-
-    def test_create_index_with_multiple_files(self):
-        """Test that all files appear in the generated index chunks"""
-        files = ["file1.txt", "file2.pdf", "file3.docx"]
-
-        result = create_file_index_chunk(files)
-
-        assert len(result) >= 1
-
-        all_content = " ".join([doc.page_content for doc in result])
-        for file in files:
-            assert file in all_content
-
-    def test_create_index_includes_header(self):
-        """Test that index contains descriptive header text"""
-        files = ["test.txt"]
-
-        result = create_file_index_chunk(files)
-
-        assert "indexed" in result[0].page_content.lower()
-
-    def test_create_index_metadata_correct(self):
-        """Test that index chunks have proper metadata attribution"""
-        files = ["file1.txt", "file2.txt"]
-
-        result = create_file_index_chunk(files)
-
-        for doc in result:
-            assert doc.metadata["source"] == "indexing files"
-            assert "chunk" in doc.metadata
-
-    def test_create_index_empty_file_list(self):
-        """Test that empty file list is handled without errors"""
-        files = []
-
-        result = create_file_index_chunk(files)
-
-        assert isinstance(result, list)
-
-    def test_create_index_many_files(self):
-        """Test that large file lists are chunked appropriately"""
-        files = [f"file{i}.txt" for i in range(100)]
-
-        result = create_file_index_chunk(files)
-
-        assert len(result) >= 1
-
-        all_content = " ".join([doc.page_content for doc in result])
-        assert "file0.txt" in all_content
-        assert "file99.txt" in all_content
+class TestMigrateCollection:
+    """Test suite for upgrading chunks stored by older versions"""
+
+    def test_migration_strips_legacy_headers(self):
+        """Test that legacy headers are removed and savings are reported"""
+        collection = make_collection()
+        header = "[Source: deep/folder/report.txt]\n\n"
+        collection.add(
+            ids=["a", "b"],
+            documents=[header + "first chunk", header + "second chunk"],
+            metadatas=[
+                {"source": "deep/folder/report.txt", "chunk": 0},
+                {"source": "deep/folder/report.txt", "chunk": 1},
+            ],
+        )
+
+        stats = migrate_collection(collection)
+
+        assert stats["chunks"] == 2
+        assert stats["bytes_saved"] == 2 * len(header)
+        assert stats["tokens_saved"] > 0
+        # Both chunks fit into one chunk of the current size; chunks without
+        # overlap are joined at a paragraph break
+        stored = collection.get()["documents"]
+        assert stored == ["first chunk\n\nsecond chunk"]
+        assert collection.metadata["chunk_format"] == CHUNK_FORMAT
+
+    def test_migration_skips_current_collections(self):
+        """Test that collections already in the current format are not rescanned"""
+        collection = make_collection(metadata={"chunk_format": CHUNK_FORMAT})
+        collection.add(ids=["a"], documents=["[Source: x.txt]\n\nkept as is"])
+
+        stats = migrate_collection(collection)
+
+        assert stats["chunks"] == 0
+        assert collection.get(ids=["a"])["documents"] == ["[Source: x.txt]\n\nkept as is"]
+
+    def test_migration_removes_file_list_chunks(self):
+        """Test that embedded file-list chunks are deleted in favour of the path index"""
+        collection = make_collection(metadata={"chunk_format": 2})
+        collection.add(
+            ids=["doc", "index"],
+            documents=["content", "The following files were indexed:\na.txt"],
+            metadatas=[
+                {"source": "a.txt", "chunk": 0},
+                {"source": LEGACY_FILE_INDEX_SOURCE, "chunk": 0},
+            ],
+        )
+
+        stats = migrate_collection(collection)
+
+        assert stats["removed"] == 1
+        stored = collection.get()
+        assert stored["ids"] == [chunk_id("a.txt", 0)]
+        assert stored["documents"] == ["content"]
+
+    def test_migration_rechunks_large_chunks(self):
+        """Test that format 3 chunks are split again at CHUNK_SIZE, keeping aliases"""
+        # The 500-character chunks with 50 characters of overlap written before format 4
+        collection = make_collection(metadata={"chunk_format": 3})
+        text = " ".join(f"word{index}" for index in range(600))
+        old_chunks = chunk_text(text, "docs/report.txt", chunk_size=500, chunk_overlap=50)
+        for chunk in old_chunks:
+            chunk.metadata["aliases"] = "copies/report.txt"
+        add_chunks(old_chunks, collection)
+        other = chunk_text("short note", "docs/note.txt", chunk_size=500, chunk_overlap=50)
+        add_chunks(other, collection)
+
+        stats = migrate_collection(collection)
+
+        expected = chunk_text(text, "docs/report.txt")
+        stored = collection.get(
+            ids=[chunk_id("docs/report.txt", index) for index in range(len(expected))]
+        )
+        assert stats["rechunked_files"] == 2
+        assert len(expected) > len(old_chunks)
+        assert collection.count() == len(expected) + 1
+        assert stored["documents"] == [chunk.page_content for chunk in expected]
+        assert all(get_aliases(metadata) == ["copies/report.txt"] for metadata in stored["metadatas"])
+        assert collection.metadata["chunk_format"] == CHUNK_FORMAT
+
+    def test_migration_is_idempotent(self):
+        """Test that running the migration twice only rewrites chunks once"""
+        collection = make_collection()
+        collection.add(ids=["a"], documents=["[Source: x.txt]\n\ncontent"])
+
+        migrate_collection(collection)
+        stats = migrate_collection(collection)
+
+        assert stats["chunks"] == 0
+
+
+class TestOpenCollection:
+    """Test suite for opening existing collections without creating them"""
+
+    @pytest.mark.parametrize("backend", ["chroma", "numpy"])
+    def test_unknown_path_is_not_created(self, tmp_path, backend):
+        """Test that a mistyped path raises instead of creating an empty collection"""
+        options = {
+            "backend": backend,
+            "embedding_function": FakeEmbeddingFunction(),
+            "directory": str(tmp_path),
+        }
+
+        with pytest.raises(CollectionNotFoundError):
+            open_collection("missing", **options)
+        with pytest.raises(CollectionNotFoundError):
+            open_collection("missing", **options)
+
+    @pytest.mark.parametrize("backend", ["chroma", "numpy"])
+    def test_existing_collection_is_opened(self, tmp_path, backend):
+        """Test that a collection created by indexing is returned with its chunks"""
+        options = {
+            "backend": backend,
+            "embedding_function": FakeEmbeddingFunction(),
+            "directory": str(tmp_path),
+        }
+        add_chunks(chunk_text("some text", "a.txt"), create_collection("docs", **options))
+
+        collection = open_collection("docs", **options)
+
+        assert collection.count() == 1
+
+
+class TestIndexParams:
+    """Test suite for HNSW index configuration"""
+
+    def test_parse_accepts_aliases(self):
+        """Test that specs are parsed with M/search_ef aliases and typed values"""
+        params = parse_index_params("M=32, construction_ef=200, search_ef=80, space=cosine")
+
+        assert params == {
+            "max_neighbors": 32,
+            "ef_construction": 200,
+            "ef_search": 80,
+            "space": "cosine",
+        }
+
+    def test_parse_rejects_unknown_params(self):
+        """Test that unknown parameters and spaces are rejected"""
+        with pytest.raises(ValueError):
+            parse_index_params("ef=10")
+        with pytest.raises(ValueError):
+            parse_index_params({"space": "hamming"})
+
+    def test_params_persist_with_collection(self, tmp_path, monkeypatch):
+        """Test that index settings are stored and updatable ones change on reopen"""
+        monkeypatch.setattr(vector_store, "VECTORDB_PATH", str(tmp_path))
+        name = f"tuned-{uuid.uuid4().hex}"
+        embedder = FakeEmbeddingFunction()
+
+        create_collection(
+            name,
+            backend="chroma",
+            embedding_function=embedder,
+            index_params={"space": "cosine", "max_neighbors": 8, "ef_search": 20},
+        )
+        reopened = create_collection(
+            name, backend="chroma", embedding_function=embedder, index_params="ef_search=90"
+        )
+
+        params = get_index_params(reopened)
+        assert params["space"] == "cosine"
+        assert params["max_neighbors"] == 8
+        assert params["ef_search"] == 90
+
+    def test_migration_keeps_index_params(self):
+        """Test that rewriting collection metadata keeps the HNSW settings"""
+        client = chromadb.EphemeralClient()
+        collection = client.create_collection(
+            name=f"test-{uuid.uuid4().hex}",
+            configuration={"hnsw": {"space": "cosine"}},
+            metadata={"chunk_format": 1},
+            embedding_function=FakeEmbeddingFunction(),
+        )
+
+        migrate_collection(collection)
+
+        assert get_index_params(client.get_collection(collection.name))["space"] == "cosine"
+
+
+def test_add_alias_records_copies_on_every_chunk():
+    """Test that aliases are appended once to the metadata of each chunk"""
+    collection = make_collection()
+    chunks = chunk_text("word " * 200, "docs/report.txt")
+    add_chunks(chunks, collection)
+
+    assert add_alias(collection, "docs/report.txt", "mail/report.txt") == len(chunks)
+    add_alias(collection, "docs/report.txt", "mail/report.txt")
+    add_alias(collection, "docs/report.txt", "old/report.txt")
+    assert add_alias(collection, "docs/missing.txt", "copy.txt") == 0
+
+    metadatas = collection.get(include=["metadatas"])["metadatas"]
+    assert all(
+        get_aliases(metadata) == ["mail/report.txt", "old/report.txt"] for metadata in metadatas
+    )
+    assert all(metadata["source"] == "docs/report.txt" for metadata in metadatas)
+    assert get_aliases({"source": "a.txt"}) == []
+
+
+def test_chunk_id_is_deterministic():
+    """Test that chunk IDs depend only on source and index"""
+    assert chunk_id("a.txt", 0) == chunk_id("a.txt", 0)
+    assert chunk_id("a.txt", 0) != chunk_id("a.txt", 1)
+    assert chunk_id("a.txt", 0) != chunk_id("b.txt", 0)
 
 
 def test_chunk_text_realistic_document():
@@ -175,7 +370,7 @@ def test_chunk_text_realistic_document():
 
     assert isinstance(result, list)
     assert all(isinstance(doc, Document) for doc in result)
-    assert all("[Source: sample.txt]" in doc.page_content for doc in result)
+    assert all("[Source:" not in doc.page_content for doc in result)
 
     for i, doc in enumerate(result):
         assert doc.metadata["source"] == "sample.txt"
@@ -0,0 +1,326 @@
+# type: ignore
+
+"""
+Unit tests for watcher.py
+
+Tests snapshot diffs, re-indexing changed files, removing deleted files and
+stale chunks, recording copies as aliases, syncing changes made while not
+watching, and sharing one watcher per folder.
+"""
+
+import sys
+import os
+import time
+
+import chromadb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from dedup import Deduplicator
+from numpy_backend import NumpyCollection
+from path_index import PathIndex
+from vector_store import get_aliases
+from watcher import (
+    DELETE,
+    UPSERT,
+    FolderWatcher,
+    diff_snapshots,
+    snapshot_files,
+    stop_watching,
+    watch_folder,
+)
+
+
+class FakeEmbeddingFunction(chromadb.EmbeddingFunction):
+    """Deterministic offline embedder"""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[float(len(text)), float(text.count("a")), 1.0] for text in input]
+
+    @staticmethod
+    def name():
+        return "fake"
+
+
+def make_collection(tmp_path):
+    """Create an empty NumPy collection with the fake embedder"""
+    return NumpyCollection(
+        str(tmp_path / "store"), "watched", embedding_function=FakeEmbeddingFunction()
+    )
+
+
+def sources(collection):
+    """Map each indexed file to its number of chunks"""
+    counts = {}
+    for metadata in collection.get(include=["metadatas"])["metadatas"]:
+        counts[metadata["source"]] = counts.get(metadata["source"], 0) + 1
+    return counts
+
+
+def aliases_of(collection, file):
+    """Return the aliases recorded on a file's first chunk"""
+    where = {"$and": [{"source": str(file)}, {"chunk": 0}]}
+    stored = collection.get(where=where, include=["metadatas"])
+    return get_aliases(stored["metadatas"][0]) if stored["ids"] else None
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll a condition until it holds or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def start_polling(folder, collection, path_index=None, **options):
+    """Start a fast polling watcher for tests"""
+    return FolderWatcher(
+        str(folder),
+        collection,
+        path_index,
+        debounce=0.05,
+        poll_interval=0.05,
+        use_watchdog=False,
+        **options,
+    ).start()
+
+
+class TestSnapshots:
+    """Test cases for snapshot_files and diff_snapshots"""
+
+    def test_only_supported_files(self, tmp_path):
+        """Test that snapshots skip file types without a loader"""
+        (tmp_path / "a.txt").write_text("text", encoding="utf-8")
+        (tmp_path / "b.bin").write_bytes(b"\x00")
+
+        snapshot = snapshot_files(str(tmp_path))
+
+        assert [os.path.basename(path) for path in snapshot] == ["a.txt"]
+
+    def test_diff(self):
+        """Test that added, changed and removed files are reported"""
+        old = {"a.txt": (1, 10), "b.txt": (1, 10), "c.txt": (1, 10)}
+        new = {"a.txt": (1, 10), "b.txt": (2, 12), "d.txt": (1, 5)}
+
+        changes = diff_snapshots(old, new)
+
+        assert sorted(changes) == [
+            ("b.txt", UPSERT),
+            ("c.txt", DELETE),
+            ("d.txt", UPSERT),
+        ]
+
+
+class TestFolderWatcher:
+    """Test cases for FolderWatcher in polling mode"""
+
+    def test_indexes_new_and_modified_files(self, tmp_path):
+        """Test that new files are indexed and edits replace their chunks"""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        collection = make_collection(tmp_path)
+        path_index = PathIndex()
+        watcher = start_polling(folder, collection, path_index)
+        try:
+            file = folder / "notes.txt"
+            file.write_text("first version " * 200, encoding="utf-8")
+            assert wait_for(lambda: sources(collection).get(str(file), 0) > 1)
+            assert wait_for(lambda: str(file) in path_index)
+
+            # A shorter version must not leave chunks of the old one behind
+            file.write_text("second version", encoding="utf-8")
+            assert wait_for(lambda: sources(collection).get(str(file)) == 1)
+            documents = collection.get(include=["documents"])["documents"]
+            assert documents == ["second version"]
+        finally:
+            watcher.stop()
+        assert watcher.mode == "polling"
+        assert not watcher.running
+
+    def test_removes_deleted_files(self, tmp_path):
+        """Test that deleting a file removes its chunks and path index entry"""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        file = folder / "gone.txt"
+        file.write_text("soon deleted", encoding="utf-8")
+        collection = make_collection(tmp_path)
+        path_index = PathIndex()
+        watcher = start_polling(folder, collection, path_index)
+        try:
+            # Existing files are assumed indexed; touch it to index it now
+            file.write_text("soon deleted!", encoding="utf-8")
+            assert wait_for(lambda: str(file) in sources(collection))
+
+            file.unlink()
+            assert wait_for(lambda: not sources(collection))
+            assert wait_for(lambda: str(file) not in path_index)
+        finally:
+            watcher.stop()
+        assert watcher.stats["removed"] == 1
+
+    def test_coalesces_bursts_of_writes(self, tmp_path):
+        """Test that repeated notifications for one file index it once"""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        file = folder / "busy.txt"
+        collection = make_collection(tmp_path)
+        watcher = FolderWatcher(
+            str(folder), collection, debounce=0.3, poll_interval=60, use_watchdog=False
+        ).start()
+        try:
+            for i in range(5):
+                file.write_text(f"revision {i}", encoding="utf-8")
+                watcher.notify(str(file), UPSERT)
+                time.sleep(0.02)
+            assert wait_for(lambda: watcher.stats["indexed"] == 1)
+            time.sleep(0.4)
+        finally:
+            watcher.stop()
+        assert watcher.stats["indexed"] == 1
+        assert collection.get(include=["documents"])["documents"] == ["revision 4"]
+
+    def test_sync_on_start(self, tmp_path):
+        """Test that changes made while not watching are applied on start"""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        kept = folder / "kept.txt"
+        kept.write_text("unchanged", encoding="utf-8")
+        removed = folder / "removed.txt"
+        removed.write_text("deleted later", encoding="utf-8")
+        collection = make_collection(tmp_path)
+        path_index = PathIndex.from_files([str(kept), str(removed)])
+        removed_chunk = {"source": str(removed), "chunk": 0, "modified": 0.0}
+        collection.upsert(ids=["r"], documents=["deleted later"], metadatas=[removed_chunk])
+
+        removed.unlink()
+        added = folder / "added.txt"
+        added.write_text("new while stopped", encoding="utf-8")
+        changes = []
+        watcher = FolderWatcher(
+            str(folder),
+            collection,
+            path_index,
+            debounce=0.05,
+            poll_interval=60,
+            use_watchdog=False,
+            on_change=changes.extend,
+        ).start(sync=True)
+        try:
+            assert wait_for(lambda: len(changes) == 2)
+        finally:
+            watcher.stop()
+
+        assert sorted(changes) == [(str(added), UPSERT), (str(removed), DELETE)]
+        assert sources(collection) == {str(added): 1}
+        assert str(kept) in path_index and str(removed) not in path_index
+
+    def test_aliases_are_indexed_when_their_copy_changes(self, tmp_path):
+        """Test that duplicates indexed through a file get chunks of their own once it changes"""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        original = folder / "report.txt"
+        original.write_text("quarterly report", encoding="utf-8")
+        copy = folder / "report-copy.txt"
+        copy.write_text("quarterly report", encoding="utf-8")
+        collection = make_collection(tmp_path)
+        dedup = Deduplicator(collection)
+        dedup.index(str(original), "quarterly report")
+        dedup.index(str(copy), "quarterly report")
+        assert sources(collection) == {str(original): 1}
+
+        watcher = start_polling(folder, collection)
+        try:
+            original.write_text("rewritten report", encoding="utf-8")
+            assert wait_for(lambda: sources(collection).get(str(copy)) == 1)
+        finally:
+            watcher.stop()
+        assert sources(collection) == {str(original): 1, str(copy): 1}
+
+    def test_new_copies_are_recorded_as_aliases(self, tmp_path):
+        """Test that a copy written while watching is aliased instead of embedded again"""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        collection = make_collection(tmp_path)
+        original = folder / "report.txt"
+        copy = folder / "report-copy.txt"
+        watcher = start_polling(folder, collection)
+        try:
+            original.write_text("quarterly report", encoding="utf-8")
+            assert wait_for(lambda: str(original) in sources(collection))
+            copy.write_text("quarterly report", encoding="utf-8")
+            assert wait_for(lambda: aliases_of(collection, original) == [str(copy)])
+        finally:
+            watcher.stop()
+        assert sources(collection) == {str(original): 1}
+
+    def test_changed_or_deleted_copies_leave_the_aliases(self, tmp_path):
+        """Test that an alias is dropped from its canonical once its content changes or it is deleted"""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        original = folder / "report.txt"
+        original.write_text("quarterly report", encoding="utf-8")
+        edited = folder / "report-v2.txt"
+        edited.write_text("quarterly report", encoding="utf-8")
+        deleted = folder / "report-old.txt"
+        deleted.write_text("quarterly report", encoding="utf-8")
+        collection = make_collection(tmp_path)
+        dedup = Deduplicator(collection)
+        for file in (original, edited, deleted):
+            dedup.index(str(file), "quarterly report")
+        assert aliases_of(collection, original) == [str(edited), str(deleted)]
+
+        watcher = start_polling(folder, collection)
+        try:
+            edited.write_text("annual report", encoding="utf-8")
+            deleted.unlink()
+            assert wait_for(lambda: str(edited) in sources(collection))
+            assert wait_for(lambda: aliases_of(collection, original) == [])
+        finally:
+            watcher.stop()
+        assert sources(collection) == {str(original): 1, str(edited): 1}
+
+
+class TestWatchFolder:
+    """Test cases for the per-folder watcher registry"""
+
+    def test_one_watcher_per_folder(self, tmp_path):
+        """Test that callers share the running watcher until it is stopped"""
+        collection = make_collection(tmp_path)
+
+        first = watch_folder(str(tmp_path), collection, use_watchdog=False)
+        try:
+            second = watch_folder(str(tmp_path), collection, use_watchdog=False)
+            assert second is first
+        finally:
+            stop_watching(str(tmp_path))
+
+        assert not first.running
+        third = watch_folder(str(tmp_path), collection, use_watchdog=False)
+        try:
+            assert third is not first
+        finally:
+            stop_watching(str(tmp_path))
+
+    def test_session_releases_only_its_own_hold(self, tmp_path):
+        """Test that a session turning watching off keeps another session's watcher running"""
+        collection = make_collection(tmp_path)
+
+        first = watch_folder(str(tmp_path), collection, owner="session-a", use_watchdog=False)
+        try:
+            # A session that never watched the folder, then the second watcher
+            assert not stop_watching(str(tmp_path), owner="session-b")
+            assert watch_folder(str(tmp_path), collection, owner="session-b") is first
+
+            assert not stop_watching(str(tmp_path), owner="session-b")
+            assert first.running
+            assert not stop_watching(str(tmp_path), owner="session-b")
+            assert first.running
+        finally:
+            assert stop_watching(str(tmp_path), owner="session-a")
+
+        assert not first.running